@@ -0,0 +1,73 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark for measuring the startup cost of importing compiler_gym.
+
+This benchmark repeatedly runs the equivalent of
+:code:`python -c "import compiler_gym"` in fresh interpreter processes and
+reports the walltime and the peak resident set size of the import, relative to
+an interpreter that imports nothing. Use :code:`--module` to benchmark the
+import of a different module:
+
+    $ bazel run -c opt //benchmarks:import_benchmark -- \\
+        --module=compiler_gym.envs.llvm
+"""
+import json
+import subprocess
+import sys
+from statistics import median
+
+from absl import app, flags
+
+flags.DEFINE_string("module", "compiler_gym", "The name of the module to import.")
+flags.DEFINE_integer("num_runs", 10, "The number of times to import the module.")
+FLAGS = flags.FLAGS
+
+# A script that imports a module and prints the walltime and peak RSS of the
+# interpreter, in seconds and kilobytes respectively.
+_SCRIPT = """\
+import json, resource, sys, time
+start = time.time()
+{imports}
+elapsed = time.time() - start
+maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in kilobytes on Linux, and bytes on macOS.
+if sys.platform == "darwin":
+    maxrss //= 1024
+print(json.dumps([elapsed, maxrss]))
+"""
+
+
+def measure(imports: str):
+    """Return the median walltime and peak RSS of a script in a fresh
+    interpreter.
+    """
+    times, rss = [], []
+    for _ in range(FLAGS.num_runs):
+        stdout = subprocess.check_output(
+            [sys.executable, "-c", _SCRIPT.format(imports=imports)],
+            universal_newlines=True,
+        )
+        elapsed, maxrss = json.loads(stdout.strip().split("\n")[-1])
+        times.append(elapsed)
+        rss.append(maxrss)
+    return median(times), median(rss) / 1024
+
+
+def main(argv):
+    assert len(argv) == 1, f"Unknown arguments: {argv[1:]}"
+
+    baseline_time, baseline_rss = measure("pass")
+    import_time, import_rss = measure(f"import {FLAGS.module}")
+
+    print(f"Module: {FLAGS.module}")
+    print(f"Import time: {(import_time - baseline_time) * 1000:.0f} ms")
+    print(
+        f"Import RSS: {import_rss - baseline_rss:.1f} MB "
+        f"(total: {import_rss:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
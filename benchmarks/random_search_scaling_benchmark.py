@@ -0,0 +1,81 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark of the scaling efficiency of parallel random search.
+
+This benchmark runs a :class:`RandomAgentWorkerPool
+<compiler_gym.random_search.RandomAgentWorkerPool>` with an increasing number of
+workers and reports the number of environment steps per second of each. The
+scaling efficiency is the throughput divided by the throughput of a single
+worker multiplied by the number of workers:
+
+    $ bazel run -c opt //benchmarks:random_search_scaling_benchmark -- \\
+        --env=llvm-autophase-ic-v0 --benchmark=cbench-v1/crc32 --nproc=1,2,4,8
+
+Steps are counted only after a warmup period, so the time taken to start the
+workers and their compiler services is excluded.
+"""
+from functools import partial
+from time import sleep
+
+import gym
+from absl import app, flags
+
+import compiler_gym  # noqa Register environments.
+from compiler_gym.random_search import RandomAgentWorkerPool
+from compiler_gym.util.tabulate import tabulate
+from compiler_gym.util.timer import Timer
+
+flags.DEFINE_string("env", "llvm-autophase-ic-v0", "The environment to benchmark.")
+flags.DEFINE_string("benchmark", "cbench-v1/crc32", "The benchmark to use.")
+flags.DEFINE_list("nproc", ["1", "2", "4", "8"], "The numbers of workers to test.")
+flags.DEFINE_integer(
+    "patience",
+    0,
+    "The number of steps without improvement before a worker starts a new "
+    "episode. If 0, use the size of the action space.",
+)
+flags.DEFINE_float("warmup", 5, "The number of seconds to run before measuring.")
+flags.DEFINE_float("runtime", 20, "The number of seconds to measure for.")
+FLAGS = flags.FLAGS
+
+
+def make_env(env: str, benchmark: str):
+    return gym.make(env, benchmark=benchmark)
+
+
+def measure(nproc: int) -> float:
+    """Return the number of steps per second of a pool of workers."""
+    env_fn = partial(make_env, FLAGS.env, FLAGS.benchmark)
+    with RandomAgentWorkerPool(env_fn, patience=FLAGS.patience, nproc=nproc) as pool:
+        sleep(FLAGS.warmup)
+        start_step_count = pool.progress().total_step_count
+        with Timer() as timer:
+            sleep(FLAGS.runtime)
+            end_step_count = pool.progress().total_step_count
+    return (end_step_count - start_step_count) / timer.time
+
+
+def main(argv):
+    assert len(argv) == 1, f"Unknown arguments: {argv[1:]}"
+
+    # Download any required datasets before timing anything.
+    with make_env(FLAGS.env, FLAGS.benchmark) as env:
+        env.reset()
+
+    rows = []
+    single_worker_throughput = None
+    for nproc in [int(x) for x in FLAGS.nproc]:
+        throughput = measure(nproc)
+        if single_worker_throughput is None:
+            single_worker_throughput = throughput / nproc
+        efficiency = throughput / (single_worker_throughput * nproc)
+        rows.append((nproc, f"{throughput:.1f}", f"{100 * efficiency:.1f}%"))
+        print(rows[-1], flush=True)
+
+    print(tabulate(rows, headers=("Workers", "Steps / sec", "Scaling efficiency")))
+
+
+if __name__ == "__main__":
+    app.run(main)
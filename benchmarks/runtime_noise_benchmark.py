@@ -0,0 +1,149 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark of the noise and cost of runtime measurements.
+
+This benchmark measures the runtime of benchmarks repeatedly using a grid of
+runtime measurement settings. For each setting it reports the noise, as the
+coefficient of variation of the median runtime across repeated observations,
+and the cost, as the mean wall time of computing a single observation. Use this
+to pick the cheapest settings that give an acceptable level of noise on a
+machine:
+
+    $ bazel run -c opt //benchmarks:runtime_noise_benchmark -- \\
+        --benchmarks=cbench-v1/crc32,cbench-v1/qsort \\
+        --warmup_runs=0,1 --measured_runs=1,5,10 --parallelism=1,0 \\
+        --cpu_affinity=2,3
+"""
+import itertools
+from typing import List, Optional
+
+import gym
+import numpy as np
+from absl import app, flags
+
+import compiler_gym  # noqa Register environments.
+from compiler_gym.envs.llvm.datasets.cbench import download_cBench_runtime_data
+from compiler_gym.util.tabulate import tabulate
+from compiler_gym.util.timer import Timer
+
+flags.DEFINE_string("env", "llvm-v0", "The environment to measure runtimes in.")
+flags.DEFINE_list(
+    "benchmarks",
+    ["cbench-v1/crc32", "cbench-v1/qsort"],
+    "The benchmarks to measure.",
+)
+flags.DEFINE_integer(
+    "repetitions",
+    5,
+    "The number of observations to compute for each setting and benchmark.",
+)
+flags.DEFINE_list("warmup_runs", ["0", "1"], "The numbers of warmup runs to test.")
+flags.DEFINE_list(
+    "measured_runs", ["1", "5", "10"], "The numbers of measured runs to test."
+)
+flags.DEFINE_list(
+    "parallelism",
+    ["1", "0"],
+    "The parallelism values to test. Zero uses all available cores.",
+)
+flags.DEFINE_list(
+    "cpu_affinity",
+    [],
+    "If set, also test each setting with the measurements pinned to these CPUs.",
+)
+flags.DEFINE_integer("nice", 0, "The scheduling priority of the benchmark runs.")
+FLAGS = flags.FLAGS
+
+
+def measure(
+    env,
+    benchmark: str,
+    warmup_runs: int,
+    measured_runs: int,
+    parallelism: int,
+    cpu_affinity: Optional[List[str]],
+):
+    """Return the coefficient of variation of the median runtime and the mean
+    wall time of computing an observation.
+    """
+    env.reset(benchmark=benchmark)
+    env.send_params(
+        ("llvm.runtime.warmup_runs", str(warmup_runs)),
+        ("llvm.runtime.measured_runs", str(measured_runs)),
+        ("llvm.runtime.parallelism", str(parallelism)),
+        ("llvm.runtime.cpu_affinity", ",".join(cpu_affinity or [])),
+        ("llvm.runtime.nice", str(FLAGS.nice)),
+    )
+    # Compute one untimed observation to build the binary.
+    env.observation["Runtime"]
+
+    medians = []
+    with Timer() as timer:
+        for _ in range(FLAGS.repetitions):
+            medians.append(np.median(env.observation["Runtime"]))
+    return np.std(medians) / np.mean(medians), timer.time / FLAGS.repetitions
+
+
+def main(argv):
+    assert len(argv) == 1, f"Unrecognized arguments: {argv[1:]}"
+    download_cBench_runtime_data()
+
+    affinities = [None]
+    if FLAGS.cpu_affinity:
+        affinities.append(FLAGS.cpu_affinity)
+
+    env = gym.make(FLAGS.env)
+    try:
+        rows = []
+        for warmup_runs, measured_runs, parallelism, cpu_affinity in itertools.product(
+            [int(x) for x in FLAGS.warmup_runs],
+            [int(x) for x in FLAGS.measured_runs],
+            [int(x) for x in FLAGS.parallelism],
+            affinities,
+        ):
+            noise, cost = zip(
+                *[
+                    measure(
+                        env,
+                        benchmark,
+                        warmup_runs,
+                        measured_runs,
+                        parallelism,
+                        cpu_affinity,
+                    )
+                    for benchmark in FLAGS.benchmarks
+                ]
+            )
+            rows.append(
+                (
+                    warmup_runs,
+                    measured_runs,
+                    parallelism,
+                    ",".join(cpu_affinity) if cpu_affinity else "-",
+                    f"{100 * np.mean(noise):.2f}%",
+                    f"{np.mean(cost):.3f}s",
+                )
+            )
+            print(rows[-1], flush=True)
+    finally:
+        env.close()
+
+    print(
+        tabulate(
+            rows,
+            headers=(
+                "Warmup runs",
+                "Measured runs",
+                "Parallelism",
+                "CPU affinity",
+                "Noise (CV)",
+                "Cost / observation",
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,128 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark for measuring the throughput and memory usage of installing a
+tar dataset.
+
+This benchmark serves a tar archive from a local HTTP server and installs a
+:class:`TarDataset <compiler_gym.datasets.TarDataset>` from it, reporting the
+walltime, throughput, and peak resident set size of the process. By default, a
+synthetic archive of random files is generated. Use :code:`--archive` to
+benchmark an existing archive:
+
+    $ bazel run -c opt //benchmarks:tar_dataset_install_benchmark -- \\
+        --archive=/path/to/llvm_bitcodes-10.0.0-anghabench-v1.tar.bz2
+"""
+import hashlib
+import os
+import resource
+import sys
+import tarfile
+import tempfile
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from threading import Thread
+
+from absl import app, flags
+
+from compiler_gym.datasets import TarDataset
+from compiler_gym.util.runfiles_path import transient_cache_path
+from compiler_gym.util.timer import Timer
+
+flags.DEFINE_string(
+    "archive",
+    None,
+    "The path of a tar archive to install. If not set, a synthetic archive is generated.",
+)
+flags.DEFINE_enum(
+    "compression", "bz2", ["bz2", "gz"], "The compression type of the archive."
+)
+flags.DEFINE_integer("num_files", 10000, "The number of files in a generated archive.")
+flags.DEFINE_integer(
+    "file_size", 4096, "The size of each file in a generated archive, in bytes."
+)
+FLAGS = flags.FLAGS
+
+
+def make_archive(path: Path, compression: str, num_files: int, file_size: int):
+    """Generate a tar archive of random files."""
+    with tempfile.TemporaryDirectory(dir=path.parent) as d:
+        srcs = Path(d) / "benchmarks"
+        srcs.mkdir()
+        for i in range(num_files):
+            (srcs / f"{i}.bc").write_bytes(os.urandom(file_size))
+        with tarfile.open(str(path), f"w:{compression}") as arc:
+            arc.add(str(srcs), arcname="benchmarks")
+
+
+def peak_rss_in_mb() -> float:
+    """Return the peak resident set size of this process."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, and bytes on macOS.
+    return maxrss / 1024 if sys.platform == "linux" else maxrss / 1024 / 1024
+
+
+def main(argv):
+    assert len(argv) == 1, f"Unknown arguments: {argv[1:]}"
+
+    tmpdir_root = transient_cache_path(".")
+    tmpdir_root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(
+        dir=tmpdir_root, prefix="tar_dataset_install_benchmark-"
+    ) as d:
+        d = Path(d)
+        # Isolate the download cache from the real cache.
+        os.environ["COMPILER_GYM_CACHE"] = str(d / "cache")
+
+        if FLAGS.archive:
+            archive = Path(FLAGS.archive).absolute()
+        else:
+            archive = d / f"archive.tar.{FLAGS.compression}"
+            with Timer(f"Generated archive of {FLAGS.num_files} files"):
+                make_archive(
+                    archive, FLAGS.compression, FLAGS.num_files, FLAGS.file_size
+                )
+        archive_size = archive.stat().st_size
+        # Hash the archive in chunks so as not to inflate the peak RSS.
+        checksum = hashlib.sha256()
+        with open(archive, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                checksum.update(chunk)
+        sha256 = checksum.hexdigest()
+
+        class Handler(SimpleHTTPRequestHandler):
+            def translate_path(self, path):
+                return str(archive)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("localhost", 0), Handler)
+        Thread(target=server.serve_forever, daemon=True).start()
+
+        dataset = TarDataset(
+            name="benchmark://benchmark-v0",
+            description="",
+            license="",
+            site_data_base=d / "site_data",
+            tar_urls=[f"http://localhost:{server.server_port}/{archive.name}"],
+            tar_sha256=sha256,
+            tar_compression=FLAGS.compression,
+        )
+        baseline_rss = peak_rss_in_mb()
+        with Timer() as timer:
+            dataset.install()
+        server.shutdown()
+
+        print(f"Archive size: {archive_size / 1e6:.1f} MB")
+        print(f"Installation time: {timer}")
+        print(f"Throughput: {archive_size / 1e6 / timer.time:.1f} MB/s")
+        print(
+            f"Peak RSS: {peak_rss_in_mb():.1f} MB "
+            f"(before installation: {baseline_rss:.1f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
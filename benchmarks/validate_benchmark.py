@@ -0,0 +1,79 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark for the throughput of batched state validation.
+
+This benchmark validates the states in a set of CSV files using
+:func:`compiler_gym.validate_states` and reports the number of states
+validated per second. By default, the results files of the LLVM instruction
+count leaderboard are validated:
+
+    $ python benchmarks/validate_benchmark.py --nproc=16
+
+Alternatively, pass the paths of CSV files to validate:
+
+    $ bazel run -c opt //benchmarks:validate_benchmark -- --nproc=16 \\
+        $PWD/leaderboard/llvm_instcount/random_search/results_p125_t60.csv
+"""
+from functools import partial
+from pathlib import Path
+
+import gym
+from absl import app, flags
+
+import compiler_gym  # noqa Register environments.
+from compiler_gym.compiler_env_state import CompilerEnvStateReader
+from compiler_gym.util.timer import Timer
+from compiler_gym.validate import validate_states
+
+flags.DEFINE_string("env", "llvm-ic-v0", "The environment to validate states of.")
+flags.DEFINE_integer(
+    "nproc", None, "The number of parallel workers. Defaults to the number of cores."
+)
+flags.DEFINE_boolean(
+    "share_prefixes",
+    False,
+    "Replay the action prefixes that are shared between states only once.",
+)
+flags.DEFINE_integer(
+    "max_states",
+    None,
+    "If set, validate only the first this-many states from the inputs.",
+)
+FLAGS = flags.FLAGS
+
+LEADERBOARD_RESULTS = sorted(
+    (Path(__file__).parent.parent / "leaderboard" / "llvm_instcount").glob("*/*.csv")
+)
+
+
+def main(argv):
+    paths = argv[1:] or LEADERBOARD_RESULTS
+    assert paths, "No CSV files to validate"
+    states = list(CompilerEnvStateReader.read_paths([str(p) for p in paths]))
+    if FLAGS.max_states is not None:
+        states = states[: FLAGS.max_states]
+    print(
+        f"Validating {len(states)} states of "
+        f"{len({s.benchmark for s in states})} benchmarks from {len(paths)} files"
+    )
+
+    error_count = 0
+    with Timer() as timer:
+        for result in validate_states(
+            partial(gym.make, FLAGS.env),
+            states,
+            nproc=FLAGS.nproc,
+            share_prefixes=FLAGS.share_prefixes,
+        ):
+            if not result.okay():
+                error_count += 1
+    print(
+        f"Validated {len(states)} states in {timer}, "
+        f"{len(states) / timer.time:.2f} states/sec, {error_count} errors"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
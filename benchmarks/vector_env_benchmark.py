@@ -0,0 +1,88 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A benchmark for comparing the throughput of vectorized environments.
+
+This benchmark steps a :class:`CompilerVectorEnv
+<compiler_gym.vector.CompilerVectorEnv>` and a
+:code:`gym.vector.AsyncVectorEnv` of the same environments with random actions,
+and reports the startup time and the number of environment steps per second of
+each:
+
+    $ bazel run -c opt //benchmarks:vector_env_benchmark -- \\
+        --env=llvm-autophase-ic-v0 --benchmark=cbench-v1/crc32 --num_envs=16
+"""
+from functools import partial
+
+import gym
+from absl import app, flags
+
+import compiler_gym  # noqa Register environments.
+from compiler_gym.util.timer import Timer
+from compiler_gym.vector import CompilerVectorEnv
+
+flags.DEFINE_string("env", "llvm-autophase-ic-v0", "The environment to benchmark.")
+flags.DEFINE_string("benchmark", "cbench-v1/crc32", "The benchmark to use.")
+flags.DEFINE_integer("num_envs", 8, "The number of sub-environments.")
+flags.DEFINE_integer(
+    "num_services", 1, "The number of services used by CompilerVectorEnv."
+)
+flags.DEFINE_integer("num_steps", 100, "The number of vector steps to run.")
+flags.DEFINE_integer(
+    "episode_length",
+    20,
+    "The number of steps after which the sub-environments are reset.",
+)
+FLAGS = flags.FLAGS
+
+
+def make_env(env: str, benchmark: str):
+    return gym.make(env, benchmark=benchmark)
+
+
+def run(name: str, make_vector_env) -> None:
+    """Step a vector environment with random actions and print its
+    throughput.
+    """
+    with Timer() as startup:
+        env = make_vector_env()
+    try:
+        env.reset()
+        with Timer() as timer:
+            for i in range(FLAGS.num_steps):
+                if i and not i % FLAGS.episode_length:
+                    env.reset()
+                env.step([env.action_space.sample() for _ in range(FLAGS.num_envs)])
+    finally:
+        env.close()
+    steps_per_second = FLAGS.num_steps * FLAGS.num_envs / timer.time
+    print(
+        f"{name}: startup {startup}, "
+        f"{FLAGS.num_steps * FLAGS.num_envs} steps in {timer}, "
+        f"{steps_per_second:.1f} steps/sec"
+    )
+
+
+def main(argv):
+    assert len(argv) == 1, f"Unknown arguments: {argv[1:]}"
+    env_fn = partial(make_env, FLAGS.env, FLAGS.benchmark)
+
+    # Download any required datasets before timing anything.
+    with env_fn() as env:
+        env.reset()
+
+    run(
+        "CompilerVectorEnv",
+        lambda: CompilerVectorEnv(
+            env_fn, n=FLAGS.num_envs, num_services=FLAGS.num_services
+        ),
+    )
+    run(
+        "gym.vector.AsyncVectorEnv",
+        lambda: gym.vector.AsyncVectorEnv([env_fn] * FLAGS.num_envs),
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -18,11 +18,12 @@ space on a Dijkstra benchmark for 60 seconds using:
 .. code-block::
 
     $ python -m compiler_gym.bin.random_search --env=llvm-ic-v0 --benchmark=cbench-v1/dijkstra --runtime=60
-    Started 16 worker threads for benchmark benchmark://cbench-v1/dijkstra (410 instructions) using reward IrInstructionCountOz.
+    Started 16 worker processes for benchmark benchmark://cbench-v1/dijkstra (410 instructions) using reward IrInstructionCountOz.
     === Running for a minute ===
     Runtime: a minute. Num steps: 470,407 (7,780 / sec). Num episodes: 4,616 (76 / sec). Num restarts: 0.
     Best reward: 101.59% (96 passes, found after 35 seconds)
-    Ending jobs ... done
+    Ending worker processes ... done
+    Throughput: 7,763 steps / sec across 16 workers (485 steps / sec / worker).
     Step [000 / 096]: reward=0.621951
     Step [001 / 096]: reward=0.621951, change=0.000000, action=AlwaysInlinerLegacyPass
     ...
@@ -49,11 +50,14 @@ Execution strategy
 The results of the search are logged to files. Control the location of these
 logs using the :code:`--output_dir=/path` flag.
 
-Multiple agents are run in parallel. By default, the number of agents is equal
-to the number of processors on the host machine. Set a different value using
-:code:`--nproc`.
+Multiple agents are run in parallel, each in its own process with its own
+environment. By default, the number of agents is equal to the number of
+processors on the host machine. Set a different value using :code:`--nproc`.
+Agents keep their environment for as long as it is usable and start each new
+episode by restoring a snapshot of the initial state.
 """
 import sys
+from functools import partial
 from pathlib import Path
 
 from absl import app, flags
@@ -62,7 +66,7 @@ import compiler_gym.util.flags.nproc  # noqa Flag definition.
 import compiler_gym.util.flags.output_dir  # noqa Flag definition.
 from compiler_gym.random_search import random_search
 from compiler_gym.util.flags.benchmark_from_flags import benchmark_from_flags
-from compiler_gym.util.flags.env_from_flags import env_from_flags
+from compiler_gym.util.flags.env_from_flags import env_from_argv, env_from_flags
 
 flags.DEFINE_boolean("ls_reward", False, "List the available reward spaces and exit.")
 flags.DEFINE_integer(
@@ -100,8 +104,9 @@ def main(argv):
 
     assert FLAGS.patience >= 0, "--patience must be >= 0"
 
-    def make_env():
-        return env_from_flags(benchmark=benchmark_from_flags())
+    # The environment factory is pickled to the worker processes, which parse
+    # the command line flags for themselves.
+    make_env = partial(env_from_argv, sys.argv, benchmark=benchmark_from_flags())
 
     env = make_env()
     try:
@@ -71,6 +71,13 @@ flags.DEFINE_boolean(
     "Whether to print results in the order they are provided. "
     "The default is to print results as soon as they are available.",
 )
+flags.DEFINE_boolean(
+    "share_prefixes",
+    False,
+    "Replay the actions that are shared between states of the same benchmark "
+    "only once. This is faster when many states share long action prefixes, "
+    "but the reported walltimes exclude the time to replay shared prefixes.",
+)
 flags.DEFINE_string(
     "reward_aggregation",
     "geomean",
@@ -91,7 +98,9 @@ flags.DEFINE_boolean(
 flags.DEFINE_string(
     "validation_logfile",
     "validation.log.json",
-    "The path of a file to write a JSON validation log to.",
+    "The path of a file to write a JSON validation log to. The log is written "
+    "as results become available. If the process is killed before validation "
+    "completes, the JSON list in the log is not terminated.",
 )
 FLAGS = flags.FLAGS
 
@@ -150,6 +159,7 @@ def main(argv):
             states,
             nproc=FLAGS.nproc,
             inorder=FLAGS.inorder,
+            share_prefixes=FLAGS.share_prefixes,
         )
 
     # Determine the name of the reward space.
@@ -208,27 +218,31 @@ def main(argv):
         )
 
     progress_message(len(states))
-    result_dicts = []
-
-    def dump_result_dicst_to_json():
-        with open(FLAGS.validation_logfile, "w") as f:
-            json.dump(result_dicts, f)
-
-    for i, result in enumerate(validation_results, start=1):
-        intermediate_print("\r\033[K", to_string(result, name_col_width), sep="")
-        progress_message(len(states) - i)
-        result_dicts.append(result.dict())
-
-        if not result.okay():
-            error_count += 1
-        elif result.reward_validated and not result.reward_validation_failed:
-            rewards.append(result.state.reward)
-            walltimes.append(result.state.walltime)
-
-        if not i % 10:
-            dump_result_dicst_to_json()
 
-    dump_result_dicst_to_json()
+    # Stream the validation log to disk as a JSON list, one result at a time,
+    # so that a partial log is available if validation is interrupted. The list
+    # is closed even if validation raises, so that the log remains valid JSON.
+    with open(FLAGS.validation_logfile, "w") as logfile:
+        logfile.write("[")
+        try:
+            for i, result in enumerate(validation_results, start=1):
+                intermediate_print(
+                    "\r\033[K", to_string(result, name_col_width), sep=""
+                )
+                progress_message(len(states) - i)
+
+                if i > 1:
+                    logfile.write(",\n")
+                logfile.write(json.dumps(result.dict()))
+                logfile.flush()
+
+                if not result.okay():
+                    error_count += 1
+                elif result.reward_validated and not result.reward_validation_failed:
+                    rewards.append(result.state.reward)
+                    walltimes.append(result.state.walltime)
+        finally:
+            logfile.write("]\n")
 
     # Print a summary footer.
     intermediate_print("\r\033[K----", "-" * name_col_width, "-----------", sep="")
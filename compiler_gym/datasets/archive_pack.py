@@ -0,0 +1,168 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a seekable, memory-mapped container of files."""
+import io
+import mmap
+import shutil
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from compiler_gym.util.filesystem import atomic_file_write
+
+# The file format is:
+#
+#     [magic: 8 bytes][count: uint64][table_start: uint64]
+#     [data]
+#     [table: count * (name_offset, name_size, data_offset, data_size)]
+#     [names]
+#
+# where data is the concatenated, uncompressed contents of the files, and the
+# table has one entry per file, sorted by name. name_offset is relative to the
+# start of the names section, and data_offset is relative to the start of the
+# file. All integers are little-endian uint64s.
+_MAGIC = b"CGARPACK"
+_HEADER = struct.Struct("<8sQQ")
+_ENTRY = struct.Struct("<QQQQ")
+
+# A file to add to a pack: a tuple of name, size in bytes, and a file object to
+# read the contents from.
+PackMember = Tuple[str, int, BinaryIO]
+
+
+class ArchivePack:
+    """A read-only collection of named files that are stored, uncompressed, in
+    a single memory-mapped file.
+
+    Opening a pack and reading a file from it do not require scanning the
+    directory tree or the contents of the pack. Files are located by a binary
+    search of a sorted table of names, and their contents are sliced from the
+    memory map, so the pages of a pack are shared between processes that open
+    it.
+
+    Use :meth:`ArchivePack.build` to create a pack.
+    """
+
+    def __init__(self, path: Path):
+        """Open a pack.
+
+        :param path: The path of the pack file.
+
+        :raises FileNotFoundError: If the file does not exist.
+
+        :raises ValueError: If the file is not a valid pack.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = f.seek(0, io.SEEK_END)
+            if size < _HEADER.size:
+                raise ValueError(f"Invalid archive pack: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._table_start = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Invalid archive pack: {path}")
+        self._names_start = self._table_start + self._count * _ENTRY.size
+
+    @classmethod
+    def build(cls, path: Path, members: Iterable[PackMember]) -> "ArchivePack":
+        """Create a pack file and open it.
+
+        The contents of each member are copied to the pack as they are
+        iterated over, so members may be read from a stream, such as a tar
+        archive opened in stream mode. The file is written atomically, so
+        concurrent readers will never see a partially written pack.
+
+        :param path: The path of the pack file to write.
+
+        :param members: An iterable of :code:`(name, size, fileobj)` tuples. The
+            file objects are read immediately, before the next member is
+            requested.
+
+        :return: The opened pack.
+
+        :raises ValueError: If a name is repeated, or if a file object does not
+            contain the stated number of bytes.
+        """
+        entries: List[Tuple[bytes, int, int]] = []
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_file_write(path, fileobj=True) as f:
+            f.write(_HEADER.pack(_MAGIC, 0, 0))
+            for name, size, fileobj in members:
+                offset = f.tell()
+                shutil.copyfileobj(fileobj, f)
+                if f.tell() - offset != size:
+                    raise ValueError(
+                        f"Expected {size} bytes for '{name}', read {f.tell() - offset}"
+                    )
+                entries.append((name.encode("utf-8"), offset, size))
+
+            entries.sort()
+            for a, b in zip(entries, entries[1:]):
+                if a[0] == b[0]:
+                    raise ValueError(f"Duplicate name: '{a[0].decode('utf-8')}'")
+
+            table_start = f.tell()
+            name_offset = 0
+            for name, offset, size in entries:
+                f.write(_ENTRY.pack(name_offset, len(name), offset, size))
+                name_offset += len(name)
+            for name, _, _ in entries:
+                f.write(name)
+
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, len(entries), table_start))
+        return cls(path)
+
+    def _entry(self, index: int) -> Tuple[int, int, int, int]:
+        return _ENTRY.unpack_from(self._mmap, self._table_start + index * _ENTRY.size)
+
+    def _name(self, index: int) -> bytes:
+        name_offset, name_size, _, _ = self._entry(index)
+        start = self._names_start + name_offset
+        return self._mmap[start : start + name_size]
+
+    def _find(self, name: str) -> int:
+        """Return the position of a name in the table, or -1 if not found."""
+        key = name.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._name(lo) == key:
+            return lo
+        return -1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names of the files in the pack, in sorted order."""
+        for i in range(self._count):
+            yield self._name(i).decode("utf-8")
+
+    def read(self, name: str) -> bytes:
+        """Read the contents of a file.
+
+        :param name: The name of the file.
+
+        :return: The file contents.
+
+        :raises KeyError: If the pack does not contain a file with this name.
+        """
+        index = self._find(name)
+        if index < 0:
+            raise KeyError(name)
+        _, _, offset, size = self._entry(index)
+        return self._mmap[offset : offset + size]
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -2,14 +2,40 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
+import hashlib
 import os
 from pathlib import Path
-from typing import Iterable, List
+from threading import Lock
+from typing import Iterable, List, Optional
 
 import numpy as np
+from fasteners import InterProcessLock
 
 from compiler_gym.datasets.dataset import Benchmark, Dataset
-from compiler_gym.util.decorators import memoized_property
+from compiler_gym.datasets.uri_index import UriIndex
+
+
+def _directory_tree_fingerprint(root: Path) -> str:
+    """Return a hash of the paths and modification times of every directory in
+    a tree.
+
+    This lists every directory in the tree, so it costs about as much as
+    walking the tree. It is computed once when the URI index is opened, not on
+    every read of the index.
+    """
+    fingerprint = hashlib.sha256()
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        fingerprint.update(
+            f"{directory}:{os.stat(directory).st_mtime_ns}\n".encode("utf-8")
+        )
+        with os.scandir(directory) as it:
+            subdirectories = sorted(
+                entry.path for entry in it if entry.is_dir(follow_symlinks=False)
+            )
+        pending += reversed(subdirectories)
+    return fingerprint.hexdigest()
 
 
 class FilesDataset(Dataset):
@@ -39,6 +65,25 @@ class FilesDataset(Dataset):
             "benchmark://ds-v0/subdir/subdir/b",
             "benchmark://ds-v0/subdir/subdir/c",
         ]
+
+    The list of URIs is stored in an index file in the dataset's site data
+    directory. The index is built on first use and is memory-mapped, so that
+    :meth:`size <compiler_gym.datasets.Dataset.size>`, :meth:`random_benchmark()
+    <compiler_gym.datasets.Dataset.random_benchmark>`, and
+    :meth:`benchmark_from_index()
+    <compiler_gym.datasets.FilesDataset.benchmark_from_index>` do not need to
+    walk the directory tree, and so that processes using the same dataset share
+    a single copy of the list.
+
+    When the index is first opened, it is checked against the modification
+    times of the directories in the dataset tree. These change when a file is
+    added to, removed from, or renamed within a directory. If any have changed
+    since the index was built, it is rebuilt. Once opened, the index is not
+    checked again. Call :meth:`refresh()
+    <compiler_gym.datasets.FilesDataset.refresh>` after changing the files in
+    the dataset to pick up the changes, or :meth:`uninstall()
+    <compiler_gym.datasets.Dataset.uninstall>` to force the index to be
+    rebuilt.
     """
 
     def __init__(
@@ -59,7 +104,8 @@ class FilesDataset(Dataset):
             the dataset. Memoizing the URIs enables faster repeated iteration
             over :meth:`dataset.benchmark_uris()
             <compiler_gym.datasets.Dataset.benchmark_uris>` at the expense of
-            increased memory overhead as the file list must be kept in memory.
+            increased memory overhead as the list must be kept in memory. If
+            not memoized, the URIs are read from the memory-mapped index file.
 
         :param dataset_args: See :meth:`Dataset.__init__()
             <compiler_gym.datasets.Dataset.__init__>`.
@@ -68,16 +114,77 @@ class FilesDataset(Dataset):
         self.dataset_root = dataset_root
         self.benchmark_file_suffix = benchmark_file_suffix
         self.memoize_uris = memoize_uris
-        self._memoized_uris = None
 
-    @memoized_property
-    def size(self) -> int:  # pylint: disable=invalid-overriden-method
+        self._uri_index: Optional[UriIndex] = None
+        self._memoized_uris: Optional[List[str]] = None
+        self._uri_index_lock = Lock()
+
+    def _uri_index_fingerprint(self) -> str:
+        """Return a string that changes whenever the set of benchmarks in the
+        dataset changes. Subclasses may override this.
+        """
         self.install()
-        return sum(
-            sum(1 for f in files if f.endswith(self.benchmark_file_suffix))
-            for (_, _, files) in os.walk(self.dataset_root)
+        return ":".join(
+            [
+                str(self.dataset_root),
+                self.benchmark_file_suffix,
+                _directory_tree_fingerprint(self.dataset_root)
+                if self.dataset_root.is_dir()
+                else "",
+            ]
         )
 
+    def _uri_index_names(self) -> Iterable[str]:
+        """Return the benchmark URIs to store in the index, without the
+        dataset name prefix. Subclasses may override this.
+        """
+        prefix_len = len(self.name) + 1
+        return (uri[prefix_len:] for uri in self._benchmark_uris_iter)
+
+    def _get_uri_index(self) -> UriIndex:
+        """Return the index of the benchmark URIs in this dataset, building it
+        if required.
+        """
+        with self._uri_index_lock:
+            if self._uri_index is not None:
+                return self._uri_index
+
+            fingerprint = hashlib.sha256(
+                self._uri_index_fingerprint().encode("utf-8")
+            ).hexdigest()
+            path = self.site_data_path / f"uri_index-{fingerprint}.bin"
+
+            if not path.is_file():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with InterProcessLock(self.site_data_path / ".uri_index_lock"):
+                    # Repeat the check now that we have acquired the lock, as
+                    # another process may have built the index.
+                    if not path.is_file():
+                        self.logger.debug("Building %s URI index", self.name)
+                        # Remove stale indices.
+                        for stale in self.site_data_path.glob("uri_index-*.bin"):
+                            stale.unlink()
+                        UriIndex.build(path, self._uri_index_names()).close()
+
+            self._uri_index = UriIndex(path)
+            return self._uri_index
+
+    def refresh(self) -> None:
+        """Check for benchmark files that have been added or removed since the
+        list of benchmarks was read, rebuilding the index if required.
+        """
+        with self._uri_index_lock:
+            self._uri_index = None
+            self._memoized_uris = None
+
+    def uninstall(self) -> None:
+        self.refresh()
+        super().uninstall()
+
+    @property
+    def size(self) -> int:
+        return len(self._get_uri_index())
+
     @property
     def _benchmark_uris_iter(self) -> Iterable[str]:
         """Return an iterator over benchmark URIs that is consistent across runs."""
@@ -103,13 +210,15 @@ class FilesDataset(Dataset):
         return list(self._benchmark_uris_iter)
 
     def benchmark_uris(self) -> Iterable[str]:
-        if self._memoized_uris:
+        if self._memoized_uris is not None:
             yield from self._memoized_uris
-        elif self.memoize_uris:
-            self._memoized_uris = self._benchmark_uris
+            return
+        uris = (f"{self.name}/{name}" for name in self._get_uri_index())
+        if self.memoize_uris:
+            self._memoized_uris = list(uris)
             yield from self._memoized_uris
         else:
-            yield from self._benchmark_uris_iter
+            yield from uris
 
     def benchmark(self, uri: str) -> Benchmark:
         self.install()
@@ -120,5 +229,18 @@ class FilesDataset(Dataset):
             raise LookupError(f"Benchmark not found: {uri} (file not found: {abspath})")
         return self.benchmark_class.from_file(uri, abspath)
 
+    def benchmark_from_index(self, index: int) -> Benchmark:
+        """Select a benchmark by its position in :meth:`benchmark_uris()
+        <compiler_gym.datasets.Dataset.benchmark_uris>`.
+
+        :param index: A number in the range 0 <= n < :code:`len(dataset)`.
+
+        :return: A :class:`Benchmark <compiler_gym.datasets.Benchmark>`
+            instance.
+
+        :raise IndexError: If :code:`index` is out of range.
+        """
+        return self.benchmark(f"{self.name}/{self._get_uri_index()[int(index)]}")
+
     def _random_benchmark(self, random_state: np.random.Generator) -> Benchmark:
-        return self.benchmark(random_state.choice(list(self.benchmark_uris())))
+        return self.benchmark_from_index(random_state.integers(self.size))
@@ -5,17 +5,131 @@
 import bz2
 import gzip
 import io
+import os
 import shutil
+import subprocess
 import tarfile
+from contextlib import contextmanager
+from pathlib import Path
 from threading import Lock
-from typing import Iterable, List, Optional
+from time import time
+from typing import Iterable, Iterator, List, Optional
 
 from fasteners import InterProcessLock
 
+from compiler_gym.datasets.archive_pack import ArchivePack
+from compiler_gym.datasets.benchmark import Benchmark
 from compiler_gym.datasets.files_dataset import FilesDataset
-from compiler_gym.util.decorators import memoized_property
-from compiler_gym.util.download import download
+from compiler_gym.util.download import download, download_to_file
 from compiler_gym.util.filesystem import atomic_file_write
+from compiler_gym.util.timer import humanize_duration
+
+# Parallel decompression tools for each compression type, in order of
+# preference. If none of these are available, decompression is done in-process.
+_PARALLEL_DECOMPRESSORS = {
+    "bz2": ["lbzip2", "pbzip2"],
+    "gz": ["pigz"],
+}
+
+
+@contextmanager
+def _open_tar_stream(path: Path, compression: str) -> Iterator[tarfile.TarFile]:
+    """Open a compressed tar archive for reading as a stream.
+
+    Where a parallel decompression tool is available on the :code:`$PATH`
+    (:code:`lbzip2` or :code:`pbzip2` for bz2 archives, :code:`pigz` for gz
+    archives), decompression runs in a subprocess using all cores, concurrently
+    with reading.
+
+    :raises OSError: If decompression fails.
+    """
+    for tool in _PARALLEL_DECOMPRESSORS.get(compression, []):
+        tool_path = shutil.which(tool)
+        if tool_path:
+            break
+    else:
+        with tarfile.open(str(path), mode=f"r|{compression}") as arc:
+            yield arc
+        return
+
+    process = subprocess.Popen(
+        [tool_path, "-dc", str(path)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as arc:
+            yield arc
+        # Drain any trailing padding after the end of the archive, else the
+        # decompressor would be killed by SIGPIPE.
+        while process.stdout.read(1024 * 1024):
+            pass
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode:
+        raise OSError(
+            f"Failed to decompress {path} using {tool}: {stderr.decode('utf-8')}"
+        )
+
+
+def extract_tar(path: Path, compression: str, outdir: Path) -> None:
+    """Extract a compressed tar archive.
+
+    The archive is decompressed and extracted as a stream, so that members are
+    written to disk as they are decompressed and the archive is never held in
+    memory. Where a parallel decompression tool is available on the
+    :code:`$PATH` (:code:`lbzip2` or :code:`pbzip2` for bz2 archives,
+    :code:`pigz` for gz archives), decompression runs in a subprocess using all
+    cores, concurrently with extraction.
+
+    :param path: The path of the archive.
+
+    :param compression: The archive compression type. One of {"bz2", "gz"}.
+
+    :param outdir: The directory to extract the archive to.
+
+    :raises OSError: If decompression fails.
+    """
+    with _open_tar_stream(path, compression) as arc:
+        arc.extractall(str(outdir))
+
+
+def pack_tar(
+    path: Path, compression: str, outpath: Path, strip_prefix: str = ""
+) -> ArchivePack:
+    """Convert a compressed tar archive to an :class:`ArchivePack
+    <compiler_gym.datasets.archive_pack.ArchivePack>`.
+
+    The regular files of the archive are copied to the pack as the archive is
+    decompressed, so neither the archive nor its files are held in memory, and
+    nothing is extracted to the filesystem.
+
+    :param path: The path of the archive.
+
+    :param compression: The archive compression type. One of {"bz2", "gz"}.
+
+    :param outpath: The path of the pack file to write.
+
+    :param strip_prefix: An optional path prefix to strip. Only files that
+        match this path prefix are added to the pack.
+
+    :return: The opened pack.
+
+    :raises OSError: If decompression fails.
+    """
+    prefix = f"{strip_prefix.strip('/')}/" if strip_prefix.strip("/") else ""
+
+    def members(arc: tarfile.TarFile):
+        for member in arc:
+            name = os.path.normpath(member.name)
+            if not member.isfile() or not name.startswith(prefix):
+                continue
+            yield name[len(prefix) :], member.size, arc.extractfile(member)
+
+    with _open_tar_stream(path, compression) as arc:
+        return ArchivePack.build(outpath, members(arc))
 
 
 class TarDataset(FilesDataset):
@@ -24,6 +138,20 @@ class TarDataset(FilesDataset):
     This extends the :class:`FilesDataset <compiler_gym.datasets.FilesDataset>`
     class by adding support for compressed archives of files. The archive is
     downloaded and unpacked on-demand.
+
+    By default the archive is extracted to the filesystem. For archives of many
+    small files, pass :code:`extract=False` to instead convert the archive into
+    a single, indexed :class:`ArchivePack
+    <compiler_gym.datasets.archive_pack.ArchivePack>` file. Benchmarks are then
+    read from the memory-mapped pack by :meth:`benchmark()
+    <compiler_gym.datasets.Dataset.benchmark>` and passed to the compiler
+    service by value, without creating or scanning a directory tree.
+
+    If the archive has already been extracted by an earlier version of the
+    dataset, the extracted tree is used even when :code:`extract=False`, so that
+    existing installs are not downloaded again. Call :meth:`uninstall()
+    <compiler_gym.datasets.Dataset.uninstall>` to replace an extracted install
+    with a pack.
     """
 
     def __init__(
@@ -32,6 +160,7 @@ class TarDataset(FilesDataset):
         tar_sha256: Optional[str] = None,
         tar_compression: str = "bz2",
         strip_prefix: str = "",
+        extract: bool = True,
         **dataset_args,
     ):
         """Constructor.
@@ -46,6 +175,11 @@ class TarDataset(FilesDataset):
         :param strip_prefix: An optional path prefix to strip. Only files that
             match this path prefix will be used as benchmarks.
 
+        :param extract: Whether to extract the archive to the filesystem. If
+            :code:`False`, the archive is converted into an indexed pack file,
+            and :code:`dataset_root` does not exist unless the archive was
+            already extracted by an earlier install.
+
         :param dataset_args: See :meth:`FilesDataset.__init__()
             <compiler_gym.datasets.FilesDataset.__init__>`.
         """
@@ -59,14 +193,56 @@ class TarDataset(FilesDataset):
         self.tar_sha256 = tar_sha256
         self.tar_compression = tar_compression
         self.strip_prefix = strip_prefix
+        self.extract = extract
 
         self._tar_extracted_marker = self.site_data_path / ".extracted"
+        self._tar_packed_marker = self.site_data_path / ".packed"
+        # Whether benchmarks are read from the extracted tree rather than the
+        # pack. Resolved on first use.
+        self._use_extracted_tree: Optional[bool] = None
         self._tar_lock = Lock()
         self._tar_lockfile = self.site_data_path / ".install_lock"
 
+        self._pack_path = self.site_data_path / "contents.pack"
+        self._pack: Optional[ArchivePack] = None
+        self._pack_lock = Lock()
+
     @property
     def installed(self) -> bool:
-        return self._tar_extracted_marker.is_file()
+        return self._tar_extracted_marker.is_file() or (
+            not self.extract and self._tar_packed_marker.is_file()
+        )
+
+    @property
+    def _extracted(self) -> bool:
+        """Whether benchmarks are read from the extracted archive. This is the
+        case if :code:`extract` is set, or if an earlier install extracted the
+        archive.
+        """
+        if self._use_extracted_tree is None:
+            self._use_extracted_tree = (
+                self.extract or self._tar_extracted_marker.is_file()
+            )
+        return self._use_extracted_tree
+
+    @property
+    def _install_marker(self) -> Path:
+        return (
+            self._tar_extracted_marker if self._extracted else self._tar_packed_marker
+        )
+
+    def _uri_index_fingerprint(self) -> str:
+        # The contents of the dataset only change when the archive is
+        # unpacked, which recreates the marker file.
+        self.install()
+        return ":".join(
+            [
+                str(self.dataset_root),
+                self.benchmark_file_suffix,
+                str(self._extracted),
+                str(os.stat(self._install_marker).st_mtime_ns),
+            ]
+        )
 
     def install(self) -> None:
         super().install()
@@ -83,25 +259,94 @@ class TarDataset(FilesDataset):
 
             # Remove any partially-completed prior extraction.
             shutil.rmtree(self.site_data_path / "contents", ignore_errors=True)
+            if self._pack_path.is_file():
+                self._pack_path.unlink()
 
             self.logger.info("Downloading %s dataset", self.name)
-            tar_data = io.BytesIO(download(self.tar_urls, self.tar_sha256))
+            if self.tar_sha256:
+                tar_path = download_to_file(self.tar_urls, self.tar_sha256)
+            else:
+                # Without a checksum the download cannot be cached, so write it
+                # to a temporary file.
+                tar_path = self.site_data_path / ".download.tar"
+                self.site_data_path.mkdir(parents=True, exist_ok=True)
+                with atomic_file_write(tar_path, fileobj=True) as f:
+                    f.write(download(self.tar_urls))
+
             self.logger.info("Unpacking %s dataset", self.name)
-            with tarfile.open(
-                fileobj=tar_data, mode=f"r:{self.tar_compression}"
-            ) as arc:
-                arc.extractall(str(self.site_data_path / "contents"))
+            start_time = time()
+            self._use_extracted_tree = self.extract
+            if self.extract:
+                extract_tar(
+                    tar_path, self.tar_compression, self.site_data_path / "contents"
+                )
+            else:
+                pack_tar(
+                    tar_path,
+                    self.tar_compression,
+                    self._pack_path,
+                    strip_prefix=self.strip_prefix,
+                ).close()
+            elapsed = max(time() - start_time, 1e-6)
+            tar_size = tar_path.stat().st_size
+            self.logger.info(
+                "Unpacked %s dataset in %s (%.1f MB/s)",
+                self.name,
+                humanize_duration(elapsed),
+                tar_size / 1e6 / elapsed,
+            )
+            if not self.tar_sha256:
+                tar_path.unlink()
 
             # We're done. The last thing we do is create the marker file to
             # signal to any other install() invocations that the dataset is
             # ready.
-            self._tar_extracted_marker.touch()
+            self._install_marker.touch()
 
-        if self.strip_prefix and not self.dataset_root.is_dir():
+        if self._extracted and self.strip_prefix and not self.dataset_root.is_dir():
             raise FileNotFoundError(
                 f"Directory prefix '{self.strip_prefix}' not found in dataset '{self.name}'"
             )
 
+    def uninstall(self) -> None:
+        with self._pack_lock:
+            if self._pack is not None:
+                self._pack.close()
+                self._pack = None
+        super().uninstall()
+        self._use_extracted_tree = None
+
+    def _get_pack(self) -> ArchivePack:
+        """Return the pack of benchmark files, installing it if required."""
+        self.install()
+        with self._pack_lock:
+            if self._pack is None:
+                self._pack = ArchivePack(self._pack_path)
+            return self._pack
+
+    @property
+    def _benchmark_uris_iter(self) -> Iterable[str]:
+        if self._extracted:
+            yield from super()._benchmark_uris_iter
+            return
+        suffix_len = len(self.benchmark_file_suffix)
+        for name in self._get_pack():
+            if name.endswith(self.benchmark_file_suffix):
+                yield f"{self.name}/{name[: len(name) - suffix_len]}"
+
+    def benchmark(self, uri: str) -> Benchmark:
+        if self._extracted:
+            return super().benchmark(uri)
+
+        relpath = f"{uri[len(self.name) + 1:]}{self.benchmark_file_suffix}"
+        try:
+            data = self._get_pack().read(relpath)
+        except KeyError as e:
+            raise LookupError(
+                f"Benchmark not found: {uri} (file not found in archive: {relpath})"
+            ) from e
+        return self.benchmark_class.from_file_contents(uri, data)
+
 
 class TarDatasetWithManifest(TarDataset):
     """A tarball-based dataset that reads the benchmark URIs from a separate
@@ -164,7 +409,7 @@ class TarDatasetWithManifest(TarDataset):
         self.logger.debug("Read %s manifest, %d entries", self.name, len(uris))
         return uris
 
-    @memoized_property
+    @property
     def _benchmark_uris(self) -> List[str]:
         """Fetch or download the URI list."""
         if self._manifest_path.is_file():
@@ -207,9 +452,11 @@ class TarDatasetWithManifest(TarDataset):
             )
             return uris
 
-    @memoized_property
-    def size(self) -> int:
-        return len(self._benchmark_uris)
+    def _uri_index_fingerprint(self) -> str:
+        # The benchmark URIs are read from the manifest, so the dataset does not
+        # need to be installed to build the index.
+        return self.manifest_sha256
 
-    def benchmark_uris(self) -> Iterable[str]:
-        yield from iter(self._benchmark_uris)
+    def _uri_index_names(self) -> Iterable[str]:
+        prefix_len = len(self.name) + 1
+        return (uri[prefix_len:] for uri in self._benchmark_uris)
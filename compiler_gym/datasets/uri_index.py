@@ -0,0 +1,108 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a persistent, memory-mapped index of benchmark names."""
+import io
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from compiler_gym.util.filesystem import atomic_file_write
+
+# The file format is:
+#
+#     [magic: 8 bytes][count: uint64][offsets: (count + 1) * uint64][names]
+#
+# where names are the concatenated UTF-8 encoded names and offsets[i] is the
+# position of the i-th name relative to the start of the names section. All
+# integers are little-endian.
+_MAGIC = b"CGURIIDX"
+_HEADER = struct.Struct("<8sQ")
+_OFFSET = struct.Struct("<Q")
+
+
+class UriIndex:
+    """A read-only list of names that is stored in a memory-mapped file.
+
+    Opening an index, computing its length, and looking up a name by position
+    are all O(1) operations, regardless of the number of names in the index.
+    The file is memory-mapped, so the pages of an index are shared between
+    processes that open it.
+
+    Use :meth:`UriIndex.build` to create an index.
+    """
+
+    def __init__(self, path: Path):
+        """Open an index.
+
+        :param path: The path of the index file.
+
+        :raises FileNotFoundError: If the file does not exist.
+
+        :raises ValueError: If the file is not a valid index.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = f.seek(0, io.SEEK_END)
+            if size < _HEADER.size + _OFFSET.size:
+                raise ValueError(f"Invalid URI index: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Invalid URI index: {path}")
+        self._names_start = _HEADER.size + (self._count + 1) * _OFFSET.size
+
+    @classmethod
+    def build(cls, path: Path, names: Iterable[str]) -> "UriIndex":
+        """Create an index file and open it.
+
+        The file is written atomically, so concurrent readers will never see a
+        partially written index.
+
+        :param path: The path of the index file to write.
+
+        :param names: The names to store, in order.
+
+        :return: The opened index.
+        """
+        offsets = array("Q", [0])
+        data = io.BytesIO()
+        for name in names:
+            data.write(name.encode("utf-8"))
+            offsets.append(data.tell())
+        if sys.byteorder != "little":
+            offsets.byteswap()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_file_write(path, fileobj=True) as f:
+            f.write(_HEADER.pack(_MAGIC, len(offsets) - 1))
+            f.write(offsets.tobytes())
+            f.write(data.getbuffer())
+        return cls(path)
+
+    def _offset(self, index: int) -> int:
+        return _OFFSET.unpack_from(self._mmap, _HEADER.size + index * _OFFSET.size)[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(f"URI index out of range: {index}")
+        start = self._names_start + self._offset(index)
+        end = self._names_start + self._offset(index + 1)
+        return self._mmap[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -4,10 +4,14 @@
 # LICENSE file in the root directory of this source tree.
 from compiler_gym.envs.compiler_env import CompilerEnv
 from compiler_gym.envs.llvm.llvm_env import LlvmEnv
+from compiler_gym.envs.session_checkpoint import SessionCheckpoint
+from compiler_gym.envs.session_snapshot import SessionSnapshot
 from compiler_gym.util.registration import COMPILER_GYM_ENVS
 
 __all__ = [
     "CompilerEnv",
     "LlvmEnv",
+    "SessionCheckpoint",
+    "SessionSnapshot",
     "COMPILER_GYM_ENVS",
 ]
@@ -7,11 +7,21 @@ import logging
 import numbers
 import warnings
 from collections.abc import Iterable as IterableType
-from copy import deepcopy
+from copy import copy, deepcopy
 from math import isclose
 from pathlib import Path
-from time import time
-from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from time import perf_counter, time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import gym
 import numpy as np
@@ -20,11 +30,14 @@ from gym.spaces import Space
 
 from compiler_gym.compiler_env_state import CompilerEnvState
 from compiler_gym.datasets import Benchmark, Dataset, Datasets
+from compiler_gym.envs.session_checkpoint import SessionCheckpoint
+from compiler_gym.envs.session_snapshot import SessionSnapshot
 from compiler_gym.service import (
     CompilerGymServiceConnection,
     ConnectionOpts,
     ServiceError,
     ServiceOSError,
+    ServicePool,
     ServiceTransportError,
     SessionNotFound,
 )
@@ -37,6 +50,17 @@ from compiler_gym.service.proto import (
     ForkSessionRequest,
     GetVersionReply,
     GetVersionRequest,
+    LoadSessionReply,
+    LoadSessionRequest,
+    ReleaseSnapshotsRequest,
+    RestoreSessionRequest,
+    SaveSessionReply,
+    SaveSessionRequest,
+    SendSessionParameterReply,
+    SendSessionParameterRequest,
+    SessionParameter,
+    SnapshotSessionReply,
+    SnapshotSessionRequest,
     StartSessionRequest,
     StepReply,
     StepRequest,
@@ -67,6 +91,47 @@ def _wrapped_step(
         raise
 
 
+def _wrapped_step_batch(
+    service: CompilerGymServiceConnection, requests: List[StepRequest]
+) -> List[Union[StepReply, Exception]]:
+    """Call the StepBatch() RPC endpoint. Returns a reply or an exception for
+    each request.
+    """
+    return [
+        SessionNotFound(str(result))
+        if isinstance(result, FileNotFoundError)
+        and str(result).startswith("Session not found")
+        else result
+        for result in service.step_batch(requests)
+    ]
+
+
+# The errors that end the current episode of a step, rather than being raised
+# to the caller.
+_STEP_ERRORS = (
+    ServiceError,
+    ServiceTransportError,
+    ServiceOSError,
+    TimeoutError,
+    SessionNotFound,
+)
+
+
+class _PendingStep(NamedTuple):
+    """A step whose request has been built but whose reply has not yet been
+    handled. See :meth:`CompilerEnv._begin_step()`.
+    """
+
+    actions: List[int]
+    request: StepRequest
+    user_observation_spaces: List[ObservationSpaceSpec]
+    reward_spaces: List[Reward]
+    observations_to_compute: List[ObservationSpaceSpec]
+    observation_space_index_map: Dict[ObservationSpaceSpec, int]
+    step_start_time: Optional[float]
+    rpc_start_time: Optional[float]
+
+
 class CompilerEnv(gym.Env):
     """An OpenAI gym environment for compiler optimizations.
 
@@ -139,6 +204,10 @@ class CompilerEnv(gym.Env):
         action_space: Optional[str] = None,
         connection_settings: Optional[ConnectionOpts] = None,
         service_connection: Optional[CompilerGymServiceConnection] = None,
+        service_pool: Optional[ServicePool] = None,
+        auto_checkpoint_interval: Optional[int] = None,
+        record_step_timings: bool = False,
+        zero_copy_observations: bool = False,
         logger: Optional[logging.Logger] = None,
     ):
         """Construct and initialize a CompilerGym service environment.
@@ -186,6 +255,33 @@ class CompilerEnv(gym.Env):
         :param service_connection: An existing compiler gym service connection
             to use.
 
+        :param service_pool: A :class:`ServicePool
+            <compiler_gym.service.ServicePool>` to use. If provided, the
+            environment uses the least loaded service in the pool, or the
+            service of :code:`service_connection` if that is also provided, and
+            the service is returned to the pool when the environment is closed.
+
+        :param auto_checkpoint_interval: If provided, save a checkpoint of the
+            episode using :meth:`save_checkpoint()
+            <compiler_gym.envs.CompilerEnv.save_checkpoint>` after every this
+            many actions. If the service dies, the episode is then recovered by
+            loading the last checkpoint and replaying only the actions that
+            followed it, rather than replaying the entire episode.
+
+        :param record_step_timings: If :code:`True`, measure the wall time of
+            each phase of every step, both in the compiler service and in this
+            process, and return the breakdown in the :code:`"timings"` entry of
+            the info dict returned by :meth:`step()
+            <compiler_gym.envs.CompilerEnv.step>`. Can be changed later by
+            setting :code:`env.record_step_timings`.
+
+        :param zero_copy_observations: If :code:`True`, observations that the
+            service sends in the packed array encoding are returned as
+            read-only views of the received message rather than copied into
+            new arrays. This saves a copy per observation, but the arrays
+            cannot be modified in place. Can be changed later by setting
+            :code:`env.zero_copy_observations`.
+
         :param logger: The logger to use for this environment. If not provided,
             a :code:`compiler_gym.envs` logger is used and assigned the
             verbosity returned by :func:`get_logging_level()
@@ -213,11 +309,18 @@ class CompilerEnv(gym.Env):
 
         self.action_space_name = action_space
 
-        self.service = service_connection or CompilerGymServiceConnection(
-            endpoint=self._service_endpoint,
-            opts=self._connection_settings,
-            logger=self.logger,
-        )
+        self._service_pool = service_pool
+        # Set when a step error suggests that a pooled service is hung, so that
+        # close() asks the pool to restart it.
+        self._service_suspect = False
+        if service_pool:
+            self.service = service_pool.acquire(service_connection)
+        else:
+            self.service = service_connection or CompilerGymServiceConnection(
+                endpoint=self._service_endpoint,
+                opts=self._connection_settings,
+                logger=self.logger,
+            )
         self.datasets = Datasets(datasets or [])
 
         # If no reward space is specified, generate some from numeric observation spaces
@@ -283,6 +386,12 @@ class CompilerEnv(gym.Env):
         self.episode_reward: Optional[float] = None
         self.episode_start_time: float = time()
         self.actions: List[int] = []
+        self.auto_checkpoint_interval = auto_checkpoint_interval
+        self._auto_checkpoint: Optional[SessionCheckpoint] = None
+        self.record_step_timings = record_step_timings
+        self.zero_copy_observations = zero_copy_observations
+        # Session parameters that are sent to every new session.
+        self._session_parameters: Dict[str, str] = {}
 
         # Initialize the default observation/reward spaces.
         self.observation_space_spec: Optional[ObservationSpaceSpec] = None
@@ -302,6 +411,19 @@ class CompilerEnv(gym.Env):
         """A dictionary of datasets."""
         return {d.name: d for d in self.datasets}
 
+    @property
+    def zero_copy_observations(self) -> bool:
+        """Whether array observations are returned as read-only arrays that may
+        share memory with the received message and the observation cache,
+        rather than as writable copies. See :meth:`__init__()
+        <compiler_gym.envs.CompilerEnv.__init__>`.
+        """
+        return self.observation.zero_copy
+
+    @zero_copy_observations.setter
+    def zero_copy_observations(self, zero_copy: bool) -> None:
+        self.observation.zero_copy = zero_copy
+
     @property
     def versions(self) -> GetVersionReply:
         """Get the version numbers from the compiler service."""
@@ -524,14 +646,7 @@ class CompilerEnv(gym.Env):
         :return: A new environment instance.
         """
         if not self.in_episode:
-            actions = self.actions.copy()
-            self.reset()
-            if actions:
-                self.logger.warning(
-                    "Parent service of fork() has died, replaying state"
-                )
-                _, _, done, _ = self.step(actions)
-                assert not done, "Failed to replay action sequence"
+            self._recover_episode("fork")
 
         request = ForkSessionRequest(session_id=self._session_id)
         try:
@@ -545,7 +660,10 @@ class CompilerEnv(gym.Env):
                 action_space=self.action_space,
                 connection_settings=self._connection_settings,
                 service_connection=self.service,
+                service_pool=self._service_pool,
             )
+            # The forked session inherits the session parameters.
+            new_env._session_parameters = dict(self._session_parameters)
 
             # Set the session ID.
             new_env._session_id = reply.session_id  # pylint: disable=protected-access
@@ -571,15 +689,21 @@ class CompilerEnv(gym.Env):
                 action_space=self.action_space,
                 benchmark=self.benchmark,
                 connection_settings=self._connection_settings,
+                service_pool=self._service_pool,
             )
+            new_env._session_parameters = dict(self._session_parameters)
             new_env.reset()
             _, _, done, _ = new_env.step(self.actions)
             assert not done, "Failed to replay action sequence in forked environment"
 
-        # Create copies of the mutable reward and observation spaces. This
-        # is required to correctly calculate incremental updates.
+        new_env.record_step_timings = self.record_step_timings
+        new_env.zero_copy_observations = self.zero_copy_observations
+
+        # Create copies of the reward spaces, which hold the per-episode state
+        # required to correctly calculate incremental updates. Observation
+        # spaces are immutable, so they are shared with the new environment.
         new_env.reward.spaces = deepcopy(self.reward.spaces)
-        new_env.observation.spaces = deepcopy(self.observation.spaces)
+        new_env.observation.spaces = dict(self.observation.spaces)
 
         # Set the default observation and reward types. Note the use of IDs here
         # to prevent passing the spaces by reference.
@@ -592,9 +716,364 @@ class CompilerEnv(gym.Env):
         new_env.episode_reward = self.episode_reward
         new_env.episode_start_time = self.episode_start_time
         new_env.actions = self.actions.copy()
+        # Checkpoints are immutable, so they are shared with the new
+        # environment.
+        new_env.auto_checkpoint_interval = self.auto_checkpoint_interval
+        new_env._auto_checkpoint = self._auto_checkpoint
 
         return new_env
 
+    def snapshot(self) -> SessionSnapshot:
+        """Take a snapshot of the current environment state.
+
+        Unlike :meth:`fork() <compiler_gym.envs.CompilerEnv.fork>`, this does
+        not create a new session or environment. The compiler state is stored by
+        the compiler service, which holds snapshots in memory up to a budget
+        and then spills the least recently used to disk. The snapshot is
+        released once the returned handle is no longer referenced.
+
+        If not already in an episode, :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>` is called.
+
+        Example usage:
+
+            >>> env = gym.make("llvm-v0")
+            >>> env.reset()
+            >>> snapshot = env.snapshot()
+            >>> env.step(env.action_space.sample())
+            >>> env.restore(snapshot)
+            >>> env.actions == snapshot.actions
+            True
+
+        :return: A snapshot handle that can be passed to :meth:`restore()
+            <compiler_gym.envs.CompilerEnv.restore>`.
+        """
+        if not self.in_episode:
+            self._recover_episode("snapshot")
+
+        self._release_snapshots()
+        snapshot_id = None
+        try:
+            reply: SnapshotSessionReply = self.service(
+                self.service.stub.SnapshotSession,
+                SnapshotSessionRequest(session_id=self._session_id),
+            )
+            snapshot_id = reply.snapshot_id
+        except NotImplementedError:
+            # The service does not support snapshots. The handle records the
+            # episode so that restore() can replay it.
+            pass
+
+        return SessionSnapshot(
+            benchmark=self._benchmark_in_use,
+            actions=self.actions.copy(),
+            episode_reward=self.episode_reward,
+            reward_spaces={k: copy(v) for k, v in self.reward.spaces.items()},
+            snapshot_id=snapshot_id,
+            connection=self.service.connection,
+            released_snapshots=self.service.released_snapshots,
+        )
+
+    def restore(self, snapshot: SessionSnapshot) -> None:
+        """Restore the environment to the state of a snapshot.
+
+        The current session is rewound in place using a single call to the
+        compiler service. If the snapshot is not available on the service, for
+        example because it was taken by an environment using a different
+        service or the service has been restarted since, the state is recreated
+        by replaying the actions of the episode. A snapshot can be restored any
+        number of times.
+
+        :param snapshot: A snapshot returned by :meth:`snapshot()
+            <compiler_gym.envs.CompilerEnv.snapshot>`.
+        """
+        restored = False
+        if (
+            self.in_episode
+            and not snapshot.released
+            and snapshot.connection is self.service.connection
+        ):
+            self._release_snapshots()
+            try:
+                self.service(
+                    self.service.stub.RestoreSession,
+                    RestoreSessionRequest(
+                        session_id=self._session_id, snapshot_id=snapshot.snapshot_id
+                    ),
+                )
+                restored = True
+                # The restored session has the parameters of the snapshot.
+                self._resend_session_parameters()
+            except (NotImplementedError, FileNotFoundError) as e:
+                self.logger.debug("Failed to restore snapshot, replaying state: %s", e)
+
+        if not restored:
+            self._replay_episode(snapshot.benchmark, snapshot.actions)
+        self._set_episode_state(snapshot)
+
+    def save_checkpoint(self) -> SessionCheckpoint:
+        """Save a checkpoint of the current environment state.
+
+        The checkpoint contains the serialized compiler state, which is held by
+        the client. Loading a checkpoint costs a single deserialization, rather
+        than replaying every action of the episode, and works on any service of
+        the same compiler version, including after the service that the
+        checkpoint was saved from has died.
+
+        If not already in an episode, :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>` is called.
+
+        :return: A checkpoint that can be passed to :meth:`load_checkpoint()
+            <compiler_gym.envs.CompilerEnv.load_checkpoint>`.
+        """
+        if not self.in_episode:
+            self._recover_episode("save_checkpoint")
+
+        state = None
+        try:
+            reply: SaveSessionReply = self.service(
+                self.service.stub.SaveSession,
+                SaveSessionRequest(session_id=self._session_id),
+            )
+            state = reply.state
+        except NotImplementedError:
+            # The service does not support serialization. The checkpoint
+            # records the episode so that load_checkpoint() can replay it.
+            pass
+
+        return SessionCheckpoint(
+            benchmark=self._benchmark_in_use,
+            actions=self.actions.copy(),
+            episode_reward=self.episode_reward,
+            reward_spaces={k: copy(v) for k, v in self.reward.spaces.items()},
+            state=state,
+        )
+
+    def load_checkpoint(self, checkpoint: SessionCheckpoint) -> None:
+        """Replace the current episode with the state of a checkpoint.
+
+        This starts a new session from the serialized compiler state of the
+        checkpoint. If the checkpoint has no serialized state, or the service
+        does not support loading it, the state is recreated by replaying the
+        actions of the episode. A checkpoint can be loaded any number of times.
+
+        :param checkpoint: A checkpoint returned by :meth:`save_checkpoint()
+            <compiler_gym.envs.CompilerEnv.save_checkpoint>`.
+        """
+        reply: Optional[LoadSessionReply] = None
+        if checkpoint.state is not None:
+            self._start_service()
+            # End the current episode. This may fail if the service has died
+            # since the episode started, which is fine.
+            if self.in_episode:
+                try:
+                    self.service(
+                        self.service.stub.EndSession,
+                        EndSessionRequest(session_id=self._session_id),
+                    )
+                except (ServiceError, FileNotFoundError) as e:
+                    self.logger.debug("Failed to end session: %s", e)
+                self._session_id = None
+            try:
+                reply = self.service(
+                    self.service.stub.LoadSession,
+                    LoadSessionRequest(state=checkpoint.state),
+                )
+            except NotImplementedError as e:
+                self.logger.debug("Failed to load checkpoint, replaying state: %s", e)
+
+        if reply is None:
+            self._replay_episode(checkpoint.benchmark, checkpoint.actions)
+        else:
+            self._session_id = reply.session_id
+            self.observation.session_id = reply.session_id
+            self.reward.get_cost = self.observation.__getitem__
+            self.episode_start_time = time()
+            self._resend_session_parameters()
+        self._set_episode_state(checkpoint)
+
+    def _replay_episode(self, benchmark: Benchmark, actions: List[int]) -> None:
+        """Start a new episode of a benchmark and replay a list of actions,
+        without changing the benchmark used by subsequent calls to reset().
+        """
+        next_benchmark = self._next_benchmark
+        self._next_benchmark = benchmark
+        try:
+            self.reset()
+        finally:
+            self._next_benchmark = next_benchmark
+        if actions:
+            _, _, done, _ = self.raw_step(actions, [], [])
+            assert not done, "Failed to replay action sequence"
+
+    def _set_episode_state(
+        self, state: Union[SessionSnapshot, SessionCheckpoint]
+    ) -> None:
+        """Copy over the episode state of a snapshot or checkpoint. The reward
+        spaces are copied so that the state can be restored again.
+        """
+        self._benchmark_in_use = state.benchmark
+        self.actions = state.actions.copy()
+        self.episode_reward = state.episode_reward
+        self.reward.spaces = {k: copy(v) for k, v in state.reward_spaces.items()}
+        if self.reward_space:
+            self.reward_space = self.reward_space.id
+        self.observation.clear_cache()
+        self.reward.clear_cache()
+        # A loaded checkpoint becomes the latest checkpoint of the episode.
+        self._auto_checkpoint = (
+            state
+            if isinstance(state, SessionCheckpoint) and state.state is not None
+            else None
+        )
+
+    def _recover_episode(self, caller: str) -> None:
+        """Start a new episode in the state of the current one. This is called
+        when the current episode has ended, such as when the service has died.
+        If an automatic checkpoint of the episode exists, it is loaded and only
+        the actions that followed it are replayed.
+        """
+        actions = self.actions.copy()
+        checkpoint = self._auto_checkpoint
+        if (
+            actions
+            and checkpoint
+            and checkpoint.benchmark.uri == self._benchmark_in_use.uri
+            and actions[: len(checkpoint.actions)] == checkpoint.actions
+        ):
+            self.logger.warning(
+                "Parent service of %s() has died, restoring state from checkpoint",
+                caller,
+            )
+            self.load_checkpoint(checkpoint)
+            actions = actions[len(checkpoint.actions) :]
+        else:
+            self.reset()
+            if actions:
+                self.logger.warning(
+                    "Parent service of %s() has died, replaying state", caller
+                )
+        if actions:
+            _, _, done, _ = self.step(actions)
+            assert not done, "Failed to replay action sequence"
+
+    def _auto_checkpoint_step(self) -> None:
+        """Save a checkpoint if enough actions have been taken since the last."""
+        checkpoint_actions = (
+            len(self._auto_checkpoint.actions) if self._auto_checkpoint else 0
+        )
+        if len(self.actions) - checkpoint_actions < self.auto_checkpoint_interval:
+            return
+        checkpoint = self.save_checkpoint()
+        if checkpoint.state is None:
+            self.logger.warning(
+                "Service does not support checkpoints, disabling auto-checkpointing"
+            )
+            self.auto_checkpoint_interval = None
+        else:
+            self._auto_checkpoint = checkpoint
+
+    def send_param(self, key: str, value: str) -> str:
+        """Send a single parameter to the compiler service.
+
+        See :meth:`send_params() <compiler_gym.envs.CompilerEnv.send_params>`
+        for more information.
+
+        :param key: The parameter key.
+
+        :param value: The parameter value.
+
+        :return: The response from the compiler service.
+
+        :raises NotImplementedError: If the compiler service does not support
+            session parameters.
+
+        :raises ValueError: If the parameter is not valid.
+        """
+        return self.send_params((key, value))[0]
+
+    def send_params(self, *params: Tuple[str, str]) -> List[str]:
+        """Send a list of parameters to the compiler service.
+
+        Session parameters are key-value pairs that configure the behavior of
+        the current session, such as the settings that are used to compute an
+        observation. The supported parameters are defined by the compiler
+        service. Parameters are remembered by the environment and sent again to
+        the new session that is started by each call to :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>`, and forked environments inherit
+        the parameters of their parent. The observation returned by
+        :meth:`reset() <compiler_gym.envs.CompilerEnv.reset>` is computed after
+        the parameters are sent.
+
+        If not already in an episode, :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>` is called.
+
+        Example usage:
+
+            >>> env = gym.make("llvm-v0")
+            >>> env.send_params(
+            ...     ("llvm.runtime.warmup_runs", "1"),
+            ...     ("llvm.runtime.measured_runs", "5"),
+            ... )
+            ['1', '5']
+
+        :param params: A list of :code:`(key, value)` tuples.
+
+        :return: The responses of the compiler service, one per parameter.
+
+        :raises NotImplementedError: If the compiler service does not support
+            session parameters.
+
+        :raises ValueError: If a parameter is not valid.
+        """
+        if not self.in_episode:
+            self.reset()
+
+        params = [(str(key), str(value)) for key, value in params]
+        reply = self._send_session_parameters(params)
+        self._session_parameters.update(params)
+        return list(reply.reply)
+
+    def _send_session_parameters(
+        self, params: List[Tuple[str, str]]
+    ) -> SendSessionParameterReply:
+        return self.service(
+            self.service.stub.SendSessionParameter,
+            SendSessionParameterRequest(
+                session_id=self._session_id,
+                parameter=[
+                    SessionParameter(key=key, value=value) for key, value in params
+                ],
+            ),
+        )
+
+    def _resend_session_parameters(self) -> None:
+        """Send the session parameters to a newly started session."""
+        if self._session_parameters:
+            self._send_session_parameters(list(self._session_parameters.items()))
+
+    def _release_snapshots(self) -> None:
+        """Release the service-side snapshots that are no longer referenced."""
+        # Snapshots may be released concurrently by the garbage collector, and
+        # environments that share the service may release snapshots from other
+        # threads, so each ID is removed from the queue atomically.
+        released = self.service.released_snapshots
+        snapshot_ids = []
+        while True:
+            try:
+                snapshot_ids.append(released.popleft())
+            except IndexError:
+                break
+        if not snapshot_ids:
+            return
+        try:
+            self.service(
+                self.service.stub.ReleaseSnapshots,
+                ReleaseSnapshotsRequest(snapshot_id=snapshot_ids),
+            )
+        except NotImplementedError:
+            pass
+
     def close(self):
         """Close the environment.
 
@@ -621,6 +1100,15 @@ class CompilerEnv(gym.Env):
         """
         # Try and close out the episode, but errors are okay.
         close_service = True
+        if self.service and not self.service.closed:
+            try:
+                self._release_snapshots()
+            except Exception as e:
+                self.logger.warning(
+                    "Failed to release snapshots on close(): %s (%s)",
+                    e,
+                    type(e).__name__,
+                )
         if self.in_episode:
             try:
                 reply: EndSessionReply = self.service(
@@ -638,11 +1126,17 @@ class CompilerEnv(gym.Env):
                     type(e).__name__,
                 )
             self._session_id = None
+            self.observation.clear_cache()
+            self.reward.clear_cache()
 
-        if self.service and close_service:
+        if self.service and self._service_pool:
+            # Return the service to the pool rather than closing it.
+            self._service_pool.release(self.service, suspect=self._service_suspect)
+        elif self.service and close_service:
             self.service.close()
 
         self.service = None
+        self._service_suspect = False
 
     def __del__(self):
         # Don't let the service be orphaned if user forgot to close(), or
@@ -651,6 +1145,15 @@ class CompilerEnv(gym.Env):
         if hasattr(self, "service") and getattr(self, "service"):
             self.close()
 
+    def _start_service(self) -> None:
+        """Start a new service if required."""
+        if self.service is None and self._service_pool:
+            self.service = self._service_pool.acquire()
+        elif self.service is None:
+            self.service = CompilerGymServiceConnection(
+                self._service_endpoint, self._connection_settings
+            )
+
     def reset(  # pylint: disable=arguments-differ
         self,
         benchmark: Optional[Union[str, Benchmark]] = None,
@@ -688,11 +1191,7 @@ class CompilerEnv(gym.Env):
                 "access the available benchmarks."
             )
 
-        # Start a new service if required.
-        if self.service is None:
-            self.service = CompilerGymServiceConnection(
-                self._service_endpoint, self._connection_settings
-            )
+        self._start_service()
 
         self.action_space_name = action_space or self.action_space_name
 
@@ -709,6 +1208,10 @@ class CompilerEnv(gym.Env):
             self.benchmark = benchmark
         self._benchmark_in_use = self._next_benchmark
 
+        # Session parameters may change the initial observation, so if there are
+        # any to send to the new session then the observation is computed after
+        # they have been sent, rather than by StartSession().
+        observe_on_start = bool(self.observation_space and not self._session_parameters)
         start_session_request = StartSessionRequest(
             benchmark=self._benchmark_in_use.uri,
             action_space=(
@@ -717,15 +1220,27 @@ class CompilerEnv(gym.Env):
                 else 0
             ),
             observation_space=(
-                [self.observation_space_spec.index] if self.observation_space else None
+                [self.observation_space_spec.index] if observe_on_start else None
+            ),
+            packed_observations=(
+                observe_on_start
+                and self.observation_space_spec.supports_packed_encoding
             ),
         )
+        # If this benchmark has not yet been sent to the service, send it along
+        # with the request so that the session can be started in a single round
+        # trip.
+        if self._benchmark_in_use.uri not in self.service.benchmarks_sent:
+            start_session_request.benchmark_definition.CopyFrom(
+                self._benchmark_in_use.proto
+            )
 
         try:
             reply = self.service(self.service.stub.StartSession, start_session_request)
         except FileNotFoundError:
-            # The benchmark was not found, so try adding it and repeating the
-            # request.
+            # The benchmark was not found, either because the service has
+            # evicted it from its cache or because the service does not support
+            # inline benchmark definitions. Add it and repeat the request.
             self.service(
                 self.service.stub.AddBenchmark,
                 AddBenchmarkRequest(benchmark=[self._benchmark_in_use.proto]),
@@ -734,7 +1249,12 @@ class CompilerEnv(gym.Env):
         except (ServiceError, ServiceTransportError, TimeoutError) as e:
             # Abort and retry on error.
             self.logger.warning("%s on reset(): %s", type(e).__name__, e)
-            if self.service:
+            if self.service and self._service_pool:
+                # A pooled service is shared with other environments, so it is
+                # not closed here. The pool restarts it once no environment is
+                # using it, in case it is hung.
+                self._service_pool.release(self.service, suspect=True)
+            elif self.service:
                 self.service.close()
             self.service = None
 
@@ -750,11 +1270,15 @@ class CompilerEnv(gym.Env):
                     retry_count=retry_count + 1,
                 )
 
+        self.service.benchmarks_sent.add(self._benchmark_in_use.uri)
         self._session_id = reply.session_id
         self.observation.session_id = reply.session_id
+        self.observation.clear_cache()
         self.reward.get_cost = self.observation.__getitem__
         self.episode_start_time = time()
         self.actions = []
+        self._auto_checkpoint = None
+        self._resend_session_parameters()
 
         # If the action space has changed, update it.
         if reply.HasField("new_action_space"):
@@ -766,14 +1290,28 @@ class CompilerEnv(gym.Env):
         if self.reward_space:
             self.episode_reward = 0.0
 
-        if self.observation_space:
+        if self.observation_space and not observe_on_start:
+            return self.observation[self.observation_space_spec.id]
+        elif self.observation_space:
             if len(reply.observation) != 1:
                 raise OSError(
                     f"Expected one observation from service, received {len(reply.observation)}"
                 )
-            return self.observation.spaces[self.observation_space_spec.id].translate(
-                reply.observation[0]
-            )
+            observation = self.observation_space_spec.translate(reply.observation[0])
+            self.observation.update_cache([self.observation_space_spec], [observation])
+            return self._copy_if_read_only(observation)
+
+    def _copy_if_read_only(self, observation: ObservationType) -> ObservationType:
+        """Return a writable copy of a read-only array observation, unless
+        :code:`zero_copy_observations` is set.
+        """
+        if (
+            not self.zero_copy_observations
+            and isinstance(observation, np.ndarray)
+            and not observation.flags.writeable
+        ):
+            return observation.copy()
+        return observation
 
     def raw_step(
         self,
@@ -793,7 +1331,10 @@ class CompilerEnv(gym.Env):
             are evaluated after the actions are applied.
 
         :return: A tuple of observations, rewards, done, and info. Observations
-            and rewards are lists.
+            and rewards are lists. If :code:`env.record_step_timings` is set,
+            the info dict contains a :code:`"timings"` entry with the wall times
+            of the step, in seconds. See :meth:`step()
+            <compiler_gym.envs.CompilerEnv.step>` for its format.
 
         :raises SessionNotFound: If :meth:`reset()
             <compiler_gym.envs.CompilerEnv.reset>` has not been called.
@@ -805,9 +1346,31 @@ class CompilerEnv(gym.Env):
             :meth:`step() <compiler_gym.envs.CompilerEnv.step>` has equivalent
             functionality, and is less likely to change in the future.
         """
+        pending = self._begin_step(actions, observations, rewards)
+        try:
+            reply = _wrapped_step(self.service, pending.request)
+        except _STEP_ERRORS as e:
+            return self._end_step(pending, e)
+        return self._end_step(pending, reply)
+
+    def _begin_step(
+        self,
+        actions: Iterable[int],
+        observations: Iterable[ObservationSpaceSpec],
+        rewards: Iterable[Reward],
+    ) -> _PendingStep:
+        """The first half of :meth:`raw_step()`: record the actions and build
+        the request to send to the service. The reply must be passed to
+        :meth:`_end_step()`.
+        """
         if not self.in_episode:
             raise SessionNotFound("Must call reset() before step()")
 
+        # Timings are only measured if requested, so that the cost of reading
+        # the clock is not paid by every step.
+        record_timings = self.record_step_timings
+        step_start_time = perf_counter() if record_timings else None
+
         # Build the list of observations that must be computed by the backend
         user_observation_spaces: List[ObservationSpaceSpec] = list(observations)
         reward_spaces: List[Reward] = list(rewards)
@@ -826,8 +1389,14 @@ class CompilerEnv(gym.Env):
             for i, observation_space in enumerate(observations_to_compute)
         }
 
-        # Record the actions.
+        # Record the actions. Any cached observations or rewards are of the
+        # state prior to these actions.
+        actions = list(actions)
+        num_actions = len(self.actions)
         self.actions += actions
+        if len(self.actions) != num_actions:
+            self.observation.clear_cache()
+            self.reward.clear_cache()
 
         # Send the request to the backend service.
         request = StepRequest(
@@ -836,24 +1405,58 @@ class CompilerEnv(gym.Env):
             observation_space=[
                 observation_space.index for observation_space in observations_to_compute
             ],
+            packed_observations=any(
+                observation_space.supports_packed_encoding
+                for observation_space in observations_to_compute
+            ),
+            record_timings=record_timings,
         )
-        try:
-            reply = _wrapped_step(self.service, request)
-        except (
-            ServiceError,
-            ServiceTransportError,
-            ServiceOSError,
-            TimeoutError,
-            SessionNotFound,
-        ) as e:
+        return _PendingStep(
+            actions=actions,
+            request=request,
+            user_observation_spaces=user_observation_spaces,
+            reward_spaces=reward_spaces,
+            observations_to_compute=observations_to_compute,
+            observation_space_index_map=observation_space_index_map,
+            step_start_time=step_start_time,
+            rpc_start_time=perf_counter() if record_timings else None,
+        )
+
+    def _end_step(
+        self, pending: _PendingStep, reply: Union[StepReply, Exception]
+    ) -> StepType:
+        """The second half of :meth:`raw_step()`: handle the reply to a step
+        request built by :meth:`_begin_step()`.
+
+        :param pending: The pending step.
+
+        :param reply: The reply from the service, or the exception raised by
+            the step. Errors that end the episode are reported in the info
+            dict. Other exceptions are raised.
+        """
+        if isinstance(reply, Exception) and not isinstance(reply, _STEP_ERRORS):
+            raise reply
+        record_timings = pending.request.record_timings
+        rpc_end_time = perf_counter() if record_timings else None
+        actions = pending.actions
+        user_observation_spaces = pending.user_observation_spaces
+        reward_spaces = pending.reward_spaces
+        observations_to_compute = pending.observations_to_compute
+        observation_space_index_map = pending.observation_space_index_map
+
+        if isinstance(reply, Exception):
             # Gracefully handle "expected" error types. These non-fatal errors
             # end the current episode and provide some diagnostic information to
-            # the user through the `info` dict.
+            # the user through the `info` dict. A timeout or transport error
+            # may mean that the service is hung.
+            self._service_suspect = isinstance(
+                reply, (ServiceTransportError, TimeoutError)
+            )
             self.close()
 
             info = {
-                "error_type": type(e).__name__,
-                "error_details": str(e),
+                "error_type": type(reply).__name__,
+                "error_details": str(reply),
             }
             default_observations = [
                 observation_space.default_value
@@ -877,11 +1480,28 @@ class CompilerEnv(gym.Env):
                 f"Requested {len(observations_to_compute)} observations "
                 f"but received {len(reply.observation)}"
             )
-        computed_observations = [
-            observation_space.translate(value)
+        if record_timings:
+            translate_timings: Dict[str, float] = {}
+            computed_observations = []
             for observation_space, value in zip(
                 observations_to_compute, reply.observation
-            )
+            ):
+                start_time = perf_counter()
+                computed_observations.append(observation_space.translate(value))
+                translate_timings[observation_space.id] = perf_counter() - start_time
+        else:
+            computed_observations = [
+                observation_space.translate(value)
+                for observation_space, value in zip(
+                    observations_to_compute, reply.observation
+                )
+            ]
+        # The cache keeps its own read-only copy of each array, so the arrays
+        # returned to the caller may be modified without changing the cache.
+        self.observation.update_cache(observations_to_compute, computed_observations)
+        computed_observations = [
+            self._copy_if_read_only(observation)
+            for observation in computed_observations
         ]
 
         # Get the user-requested observation.
@@ -892,7 +1512,10 @@ class CompilerEnv(gym.Env):
 
         # Update and compute the rewards.
         rewards: List[RewardType] = []
+        reward_timings: Dict[str, float] = {}
         for reward_space in reward_spaces:
+            if record_timings:
+                start_time = perf_counter()
             reward_observations = [
                 computed_observations[
                     observation_space_index_map[
@@ -906,12 +1529,41 @@ class CompilerEnv(gym.Env):
                     reward_space.update(actions, reward_observations, self.observation)
                 )
             )
+            if record_timings:
+                reward_timings[reward_space.id] = perf_counter() - start_time
 
         info = {
             "action_had_no_effect": reply.action_had_no_effect,
             "new_action_space": reply.HasField("new_action_space"),
         }
 
+        if record_timings:
+            service_timings = reply.timings
+            rpc_time = rpc_end_time - pending.rpc_start_time
+            info["timings"] = {
+                "service": {
+                    "actions": list(service_timings.action),
+                    "observations": {
+                        observation_space.id: wall_time
+                        for observation_space, wall_time in zip(
+                            observations_to_compute, service_timings.observation
+                        )
+                    },
+                    "pack_observations": service_timings.pack_observations,
+                    "end_of_step": service_timings.end_of_step,
+                    "session": dict(service_timings.session),
+                    "total": service_timings.total,
+                },
+                "client": {
+                    "build_request": pending.rpc_start_time - pending.step_start_time,
+                    "rpc": rpc_time,
+                    "transport": max(rpc_time - service_timings.total, 0),
+                    "translate_observations": translate_timings,
+                    "update_rewards": reward_timings,
+                    "total": perf_counter() - pending.step_start_time,
+                },
+            }
+
         return observations, rewards, reply.end_of_session, info
 
     def step(
@@ -942,6 +1594,54 @@ class CompilerEnv(gym.Env):
 
         :raises SessionNotFound: If :meth:`reset()
             <compiler_gym.envs.CompilerEnv.reset>` has not been called.
+
+        If :code:`env.record_step_timings` is set, the info dict contains a
+        :code:`"timings"` entry with a breakdown of the wall time of the step,
+        in seconds:
+
+        .. code-block:: python
+
+            {
+                "service": {
+                    "actions": [...],  # Applying each action.
+                    "observations": {...},  # Computing each observation.
+                    "pack_observations": ...,
+                    "end_of_step": ...,
+                    "session": {...},  # Reported by the compiler service.
+                    "total": ...,
+                },
+                "client": {
+                    "build_request": ...,
+                    "rpc": ...,  # The round trip of the Step() call.
+                    "transport": ...,  # rpc minus service total.
+                    "translate_observations": {...},
+                    "update_rewards": {...},
+                    "total": ...,
+                },
+            }
+
+        Observations and rewards are keyed by the space ID. Observations that
+        are computed for the requested rewards are included.
+        """
+        actions, observation_spaces, reward_spaces = self._step_spaces(
+            action, observations, rewards
+        )
+        return self._finish_step(
+            observations,
+            rewards,
+            observation_spaces,
+            reward_spaces,
+            self.raw_step(actions, observation_spaces, reward_spaces),
+        )
+
+    def _step_spaces(
+        self,
+        action: Union[ActionType, Iterable[ActionType]],
+        observations: Optional[Iterable[Union[str, ObservationSpaceSpec]]],
+        rewards: Optional[Iterable[Union[str, Reward]]],
+    ) -> Tuple[List[ActionType], List[ObservationSpaceSpec], List[Reward]]:
+        """Coerce the arguments of :meth:`step()` into the arguments of
+        :meth:`raw_step()`.
         """
         # Coerce actions into a list.
         actions = action if isinstance(action, IterableType) else [action]
@@ -972,10 +1672,20 @@ class CompilerEnv(gym.Env):
         else:
             reward_spaces: List[Reward] = []
 
-        # Perform the underlying environment step.
-        observation_values, reward_values, done, info = self.raw_step(
-            actions, observation_spaces, reward_spaces
-        )
+        return actions, observation_spaces, reward_spaces
+
+    def _finish_step(
+        self,
+        observations: Optional[Iterable[Union[str, ObservationSpaceSpec]]],
+        rewards: Optional[Iterable[Union[str, Reward]]],
+        observation_spaces: List[ObservationSpaceSpec],
+        reward_spaces: List[Reward],
+        raw_step_result: StepType,
+    ) -> StepType:
+        """Translate the result of :meth:`raw_step()` into the result of
+        :meth:`step()`.
+        """
+        observation_values, reward_values, done, info = raw_step_result
 
         # Translate observations lists back to the appropriate types.
         if observations is None and self.observation_space_spec:
@@ -991,6 +1701,9 @@ class CompilerEnv(gym.Env):
         elif not reward_spaces:
             reward_values = None
 
+        if self.auto_checkpoint_interval and not done:
+            self._auto_checkpoint_step()
+
         return observation_values, reward_values, done, info
 
     def render(
@@ -1202,46 +1915,7 @@ class CompilerEnv(gym.Env):
                         )
                         break
 
-                    if state.reward is not None and self.reward_space is None:
-                        warnings.warn(
-                            "Validating state with reward, but "
-                            "environment has no reward space set"
-                        )
-                    elif (
-                        state.reward is not None
-                        and self.reward_space
-                        and self.reward_space.deterministic
-                    ):
-                        validation["reward_validated"] = True
-                        # If reward deviates from the expected amount record the
-                        # error but continue with the remainder of the validation.
-                        if not isclose(
-                            state.reward,
-                            replay_target.episode_reward,
-                            rel_tol=1e-5,
-                            abs_tol=1e-10,
-                        ):
-                            validation["reward_validation_failed"] = True
-                            errors.append(
-                                ValidationError(
-                                    type=(
-                                        f"Expected reward {state.reward} but "
-                                        f"received reward {replay_target.episode_reward}"
-                                    ),
-                                    data={
-                                        "expected_reward": state.reward,
-                                        "actual_reward": replay_target.episode_reward,
-                                    },
-                                )
-                            )
-
-                    benchmark = replay_target.benchmark
-                    if benchmark.is_validatable():
-                        validation["benchmark_semantics_validated"] = True
-                        semantics_errors = benchmark.validate(replay_target)
-                        if semantics_errors:
-                            validation["benchmark_semantics_validation_failed"] = True
-                            errors += semantics_errors
+                    replay_target._validate_replayed_state(state, validation, errors)
 
                     # Finished all checks, break the loop.
                     break
@@ -1254,6 +1928,63 @@ class CompilerEnv(gym.Env):
             **validation,
         )
 
+    def _validate_replayed_state(
+        self,
+        state: CompilerEnvState,
+        validation: Dict[str, Any],
+        errors: List[ValidationError],
+    ) -> None:
+        """Check the reward and benchmark semantics of a state that has been
+        replayed on this environment.
+
+        :param state: The state that was replayed.
+
+        :param validation: A dictionary of validation result attributes, which
+            is updated in place.
+
+        :param errors: A list of validation errors, which is extended in place.
+        """
+        if state.reward is not None and self.reward_space is None:
+            warnings.warn(
+                "Validating state with reward, but "
+                "environment has no reward space set"
+            )
+        elif (
+            state.reward is not None
+            and self.reward_space
+            and self.reward_space.deterministic
+        ):
+            validation["reward_validated"] = True
+            # If reward deviates from the expected amount record the
+            # error but continue with the remainder of the validation.
+            if not isclose(
+                state.reward,
+                self.episode_reward,
+                rel_tol=1e-5,
+                abs_tol=1e-10,
+            ):
+                validation["reward_validation_failed"] = True
+                errors.append(
+                    ValidationError(
+                        type=(
+                            f"Expected reward {state.reward} but "
+                            f"received reward {self.episode_reward}"
+                        ),
+                        data={
+                            "expected_reward": state.reward,
+                            "actual_reward": self.episode_reward,
+                        },
+                    )
+                )
+
+        benchmark = self.benchmark
+        if benchmark.is_validatable():
+            validation["benchmark_semantics_validated"] = True
+            semantics_errors = benchmark.validate(self)
+            if semantics_errors:
+                validation["benchmark_semantics_validation_failed"] = True
+                errors += semantics_errors
+
     @deprecated(
         version="0.1.8",
         reason=(
@@ -0,0 +1,163 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a content-addressed cache of compiled bitcodes."""
+import hashlib
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Optional, Union
+
+from fasteners import InterProcessLock
+
+from compiler_gym.util.filesystem import atomic_file_write
+from compiler_gym.util.runfiles_path import cache_path
+
+# The default maximum size of the cache.
+DEFAULT_MAX_SIZE_IN_BYTES = 1024 * 1024 * 1024
+
+
+class CompilationCache:
+    """A content-addressed cache of compilation outputs, similar to ccache.
+
+    Entries are keyed by a hash of all of the inputs to a compilation job, see
+    :meth:`key`. Entries are written atomically, so multiple processes may share
+    a cache directory. When the total size of the cache exceeds
+    :code:`max_size_in_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, root: Path, max_size_in_bytes: int = DEFAULT_MAX_SIZE_IN_BYTES):
+        """Constructor.
+
+        :param root: The directory to store cache entries in.
+
+        :param max_size_in_bytes: The maximum total size of the cache entries.
+        """
+        self.root = Path(root)
+        self.max_size_in_bytes = max_size_in_bytes
+        # An estimate of the size of the cache. This is computed on first use
+        # and then incremented by every put(). Only once the estimate exceeds
+        # the maximum size is the true size computed.
+        self._size_in_bytes: Optional[int] = None
+        self._lock = Lock()
+
+    @staticmethod
+    def key(*inputs: Union[str, bytes]) -> str:
+        """Compute the key for a compilation job from its inputs.
+
+        :param inputs: A sequence of strings or bytes which, together, fully
+            determine the output of the compilation job.
+
+        :return: A hex digest.
+        """
+        sha256 = hashlib.sha256()
+        for data in inputs:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            # Prefix each input with its length so that the boundaries between
+            # inputs are part of the hash.
+            sha256.update(f"{len(data)}:".encode("utf-8"))
+            sha256.update(data)
+        return sha256.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.bc"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Look up a cache entry.
+
+        :param key: The key of the entry.
+
+        :return: The cached bytes, or :code:`None` if not found.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Update the modification time so that eviction is least recently
+            # used.
+            os.utime(path)
+        except FileNotFoundError:
+            # The entry does not exist, or was evicted by another process.
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Add an entry to the cache, evicting old entries if required.
+
+        :param key: The key of the entry.
+
+        :param data: The bytes to cache.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_file_write(path, fileobj=True) as f:
+            f.write(data)
+
+        with self._lock:
+            if self._size_in_bytes is None:
+                self._size_in_bytes = self.size_in_bytes
+            else:
+                self._size_in_bytes += len(data)
+            if self._size_in_bytes > self.max_size_in_bytes:
+                self._size_in_bytes = self._evict()
+
+    def _entries(self):
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".bc"):
+                        try:
+                            yield entry.path, entry.stat()
+                        except FileNotFoundError:
+                            pass
+
+    @property
+    def size_in_bytes(self) -> int:
+        """The total size of the cache entries.
+
+        :type: int
+        """
+        if not self.root.is_dir():
+            return 0
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self) -> int:
+        """Remove the least recently used entries until the cache fits in 90%
+        of the maximum size.
+
+        :return: The size of the cache after eviction.
+        """
+        with InterProcessLock(self.root / ".LOCK"):
+            entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+            size = sum(stat.st_size for _, stat in entries)
+            target_size = int(self.max_size_in_bytes * 0.9)
+            for path, stat in entries:
+                if size <= target_size:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                size -= stat.st_size
+        return size
+
+
+_cache: Optional[CompilationCache] = None
+_cache_lock = Lock()
+
+
+def get_compilation_cache() -> CompilationCache:
+    """Return the singleton compilation cache.
+
+    The cache is stored in :code:`$COMPILER_GYM_CACHE/llvm-compilation-cache`.
+    See :func:`cache_path() <compiler_gym.cache_path>`.
+
+    :return: A compilation cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompilationCache(cache_path("llvm-compilation-cache"))
+        return _cache
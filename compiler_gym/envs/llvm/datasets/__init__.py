@@ -12,6 +12,7 @@ from compiler_gym.envs.llvm.datasets.cbench import CBenchDataset, CBenchLegacyDa
 from compiler_gym.envs.llvm.datasets.chstone import CHStoneDataset
 from compiler_gym.envs.llvm.datasets.clgen import CLgenDataset
 from compiler_gym.envs.llvm.datasets.csmith import CsmithBenchmark, CsmithDataset
+from compiler_gym.envs.llvm.datasets.generator_pool import BenchmarkGeneratorPool
 from compiler_gym.envs.llvm.datasets.llvm_stress import LlvmStressDataset
 from compiler_gym.envs.llvm.datasets.poj104 import POJ104Dataset, POJ104LegacyDataset
 from compiler_gym.util.runfiles_path import site_data_path
@@ -35,6 +36,7 @@ class BlasDataset(TarDatasetWithManifest):
             },
             license="BSD 3-Clause",
             strip_prefix="blas-v0",
+            extract=False,
             description="Basic linear algebra kernels",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -67,6 +69,7 @@ class GitHubDataset(TarDatasetWithManifest):
                 "Paper": "https://arxiv.org/pdf/2012.01470.pdf",
             },
             strip_prefix="github-v0",
+            extract=False,
             description="Compile-only C/C++ objects from GitHub",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -97,6 +100,7 @@ class LinuxDataset(TarDatasetWithManifest):
             references={"Homepage": "https://www.linux.org/"},
             license="GPL-2.0",
             strip_prefix="linux-v0",
+            extract=False,
             description="Compile-only object files from C Linux kernel",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -121,6 +125,7 @@ class MibenchDataset(TarDatasetWithManifest):
             },
             license="BSD 3-Clause",
             strip_prefix="mibench-v0",
+            extract=False,
             description="C benchmarks",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -145,6 +150,7 @@ class NPBDataset(TarDatasetWithManifest):
             },
             license="NASA Open Source Agreement v1.3",
             strip_prefix="npb-v0",
+            extract=False,
             description="NASA Parallel Benchmarks",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -170,6 +176,7 @@ class OpenCVDataset(TarDatasetWithManifest):
             },
             license="Apache 2.0",
             strip_prefix="opencv-v0",
+            extract=False,
             description="Compile-only object files from C++ OpenCV library",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -195,6 +202,7 @@ class TensorFlowDataset(TarDatasetWithManifest):
             },
             license="Apache 2.0",
             strip_prefix="tensorflow-v0",
+            extract=False,
             description="Compile-only object files from C++ TensorFlow library",
             benchmark_file_suffix=".bc",
             site_data_base=site_data_base,
@@ -264,6 +272,7 @@ def get_llvm_datasets(site_data_base: Optional[Path] = None) -> Iterable[Dataset
 
 __all__ = [
     "AnghaBenchDataset",
+    "BenchmarkGeneratorPool",
     "BlasDataset",
     "CBenchDataset",
     "CBenchLegacyDataset",
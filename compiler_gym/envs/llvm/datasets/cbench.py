@@ -3,11 +3,15 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 import enum
+import hashlib
 import io
+import json
 import logging
 import os
 import re
+import shlex
 import shutil
+import signal
 import subprocess
 import sys
 import tarfile
@@ -15,13 +19,20 @@ import tempfile
 from collections import defaultdict
 from pathlib import Path
 from threading import Lock
-from typing import Callable, Dict, List, NamedTuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import fasteners
 
 from compiler_gym.datasets import Benchmark, TarDatasetWithManifest
+from compiler_gym.service.proto import (
+    BenchmarkDynamicConfig,
+    BenchmarkRun,
+    ExecuteSessionReply,
+    ExecuteSessionRequest,
+)
 from compiler_gym.third_party import llvm
 from compiler_gym.util.download import download
+from compiler_gym.util.filesystem import atomic_file_write
 from compiler_gym.util.runfiles_path import cache_path, site_data_path
 from compiler_gym.util.timer import Timer
 from compiler_gym.validation_result import ValidationError
@@ -70,6 +81,10 @@ _SANITIZER_FLAGS = {
 }
 
 
+# Shell operators that prevent a command from being run without a shell.
+_SHELL_OPERATORS = {"|", "||", "&", "&&", ";", "<", ">", ">>", "2>", "2>&1"}
+
+
 class BenchmarkExecutionResult(NamedTuple):
     """The result of running a benchmark."""
 
@@ -86,6 +101,21 @@ class BenchmarkExecutionResult(NamedTuple):
         return self._asdict()  # pylint: disable=no-member
 
 
+def _benchmark_run_env(env: Dict[str, str]) -> Dict[str, str]:
+    """Create a barebones execution environment for a benchmark."""
+    run_env = {
+        "TMPDIR": os.environ.get("TMPDIR", ""),
+        "HOME": os.environ.get("HOME", ""),
+        "USER": os.environ.get("USER", ""),
+        # Disable all logging from GRPC. In the past I have had false-positive
+        # "Wrong output" errors caused by GRPC error messages being logged to
+        # stderr.
+        "GRPC_VERBOSITY": "NONE",
+    }
+    run_env.update(env)
+    return run_env
+
+
 def _compile_and_run_bitcode_file(
     bitcode_file: Path,
     cmd: str,
@@ -105,18 +135,7 @@ def _compile_and_run_bitcode_file(
     with open(cwd / "_finfo_dataset", "w") as f:
         print(num_runs, file=f)
 
-    # Create a barebones execution environment for the benchmark.
-    run_env = {
-        "TMPDIR": os.environ.get("TMPDIR", ""),
-        "HOME": os.environ.get("HOME", ""),
-        "USER": os.environ.get("USER", ""),
-        # Disable all logging from GRPC. In the past I have had false-positive
-        # "Wrong output" errors caused by GRPC error messages being logged to
-        # stderr.
-        "GRPC_VERBOSITY": "NONE",
-    }
-    run_env.update(env)
-
+    run_env = _benchmark_run_env(env)
     error_data = {}
 
     if sanitizer:
@@ -226,6 +245,110 @@ def _compile_and_run_bitcode_file(
     return BenchmarkExecutionResult(walltime_seconds=timer.time, output=output)
 
 
+def _execute_in_service(
+    env: "LlvmEnv",  # noqa: F821
+    cmd: str,
+    cwd: Path,
+    os_env: Dict[str, str],
+    num_runs: int,
+    timeout_seconds: float = 300,
+) -> Optional[BenchmarkExecutionResult]:
+    """Run the current state of an environment using the JIT of the compiler
+    service.
+
+    :return: The result of the execution, or :code:`None` if the command or
+        program cannot be executed by the service.
+    """
+    # Only simple commands can be run without a shell.
+    args = shlex.split(cmd)
+    if not args or args[0] != "$BIN" or _SHELL_OPERATORS.intersection(args):
+        return None
+
+    # See _compile_and_run_bitcode_file().
+    with open(cwd / "_finfo_dataset", "w") as f:
+        print(num_runs, file=f)
+
+    error_data = {"run_cmd": cmd.replace("$BIN", "<jit>")}
+    try:
+        reply: ExecuteSessionReply = env.service(
+            env.service.stub.ExecuteSession,
+            ExecuteSessionRequest(
+                session_id=env._session_id,
+                argument=args[1:],
+                working_directory=str(cwd),
+                environment_variable=_benchmark_run_env(os_env),
+                timeout_seconds=timeout_seconds,
+            ),
+            timeout=timeout_seconds + 60,
+        )
+    except NotImplementedError as e:
+        env.logger.debug("Falling back to lli for benchmark execution: %s", e)
+        return None
+
+    if reply.timed_out:
+        error_data["timeout_seconds"] = timeout_seconds
+        return BenchmarkExecutionResult(
+            walltime_seconds=timeout_seconds,
+            error=ValidationError(type="Execution timeout", data=error_data),
+        )
+
+    try:
+        output = reply.output.decode("utf-8")
+    except UnicodeDecodeError:
+        output = "<binary>"
+
+    if reply.exit_code:
+        if reply.exit_code == 128 + signal.SIGSEGV:
+            error_type = "Segmentation fault"
+        elif reply.exit_code == 128 + signal.SIGILL:
+            error_type = "Illegal Instruction"
+        else:
+            error_type = f"Runtime error ({reply.exit_code})"
+        error_data["return_code"] = reply.exit_code
+        error_data["output"] = output
+        return BenchmarkExecutionResult(
+            walltime_seconds=reply.walltime_seconds,
+            error=ValidationError(type=error_type, data=error_data),
+        )
+    return BenchmarkExecutionResult(
+        walltime_seconds=reply.walltime_seconds, output=output
+    )
+
+
+def _run_benchmark(
+    env: "LlvmEnv",  # noqa: F821
+    cmd: str,
+    cwd: Path,
+    linkopts: List[str],
+    os_env: Dict[str, str],
+    num_runs: int,
+    sanitizer: Optional[LlvmSanitizer],
+) -> BenchmarkExecutionResult:
+    """Run the current state of an environment as a benchmark.
+
+    Benchmarks without a sanitizer are executed by the compiler service where
+    supported, which avoids writing the bitcode to disk and starting an
+    interpreter process. Otherwise the bitcode is compiled and run as a
+    subprocess.
+    """
+    if sanitizer is None:
+        outcome = _execute_in_service(env, cmd, cwd, os_env, num_runs)
+        if outcome is not None:
+            return outcome
+
+    env.write_bitcode(cwd / "benchmark.bc")
+    return _compile_and_run_bitcode_file(
+        bitcode_file=cwd / "benchmark.bc",
+        cmd=cmd,
+        cwd=cwd,
+        num_runs=num_runs,
+        linkopts=linkopts,
+        sanitizer=sanitizer,
+        logger=env.logger,
+        env=os_env,
+    )
+
+
 def download_cBench_runtime_data() -> bool:
     """Download and unpack the cBench runtime dataset."""
     cbench_data = site_data_path("llvm-v0/cbench-v1-runtime-data/runtime_data")
@@ -254,6 +377,154 @@ def download_cBench_runtime_data() -> bool:
 _CBENCH_DOWNLOAD_THREAD_LOCK = Lock()
 
 
+class _GoldStandard(NamedTuple):
+    """The outputs of a reference run of a benchmark."""
+
+    output: str
+    """The console output of the benchmark."""
+
+    output_files: Dict[str, str]
+    """A mapping from output file name to the sha256 hash of its contents."""
+
+
+# An in-memory cache of gold standard outputs, backed by files in
+# _gold_standard_cache_dir().
+_GOLD_STANDARD_CACHE: Dict[str, _GoldStandard] = {}
+_GOLD_STANDARD_CACHE_LOCK = Lock()
+
+
+def _gold_standard_cache_dir() -> Path:
+    return cache_path("cbench-v1-gold-standard")
+
+
+def _gold_standard_cache_key(
+    benchmark: str,
+    compiler_version: str,
+    cmd: str,
+    linkopts: List[str],
+    os_env: Dict[str, str],
+    input_files: List[Path],
+    output_files: List[Path],
+) -> str:
+    """Compute the key of a gold standard output. The reference output of a
+    benchmark is determined by the benchmark, the command and inputs that it is
+    run with, and the version of the compiler that produced it. Input files are
+    identified by the hashes of their contents, so that the key changes if the
+    runtime data is replaced.
+    """
+    key = json.dumps(
+        [
+            benchmark,
+            compiler_version,
+            cmd,
+            linkopts,
+            sorted(os_env.items()),
+            [(p.name, _input_file_sha256(p)) for p in input_files],
+            [str(p) for p in output_files],
+        ]
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _get_gold_standard(key: str) -> Optional[_GoldStandard]:
+    """Look up a gold standard output in the cache."""
+    with _GOLD_STANDARD_CACHE_LOCK:
+        if key in _GOLD_STANDARD_CACHE:
+            return _GOLD_STANDARD_CACHE[key]
+    path = _gold_standard_cache_dir() / f"{key}.json"
+    try:
+        with open(path) as f:
+            gold_standard = _GoldStandard(**json.load(f))
+    except (OSError, TypeError, ValueError):
+        return None
+    with _GOLD_STANDARD_CACHE_LOCK:
+        _GOLD_STANDARD_CACHE[key] = gold_standard
+    return gold_standard
+
+
+def _drop_gold_standard(key: str) -> None:
+    """Remove a gold standard output from the cache."""
+    with _GOLD_STANDARD_CACHE_LOCK:
+        _GOLD_STANDARD_CACHE.pop(key, None)
+    try:
+        (_gold_standard_cache_dir() / f"{key}.json").unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _set_gold_standard(key: str, gold_standard: _GoldStandard) -> None:
+    """Add a gold standard output to the cache."""
+    with _GOLD_STANDARD_CACHE_LOCK:
+        _GOLD_STANDARD_CACHE[key] = gold_standard
+    path = _gold_standard_cache_dir() / f"{key}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_file_write(path, fileobj=True, mode="w") as f:
+        json.dump(gold_standard._asdict(), f)
+
+
+def _file_sha256(path: Path) -> str:
+    """Return the sha256 hash of the contents of a file."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# The hashes of input files, keyed by path, size, and modification time, so that
+# the runtime data is not re-read by every validation.
+_INPUT_FILE_SHA256: Dict[Tuple[str, int, int], str] = {}
+_INPUT_FILE_SHA256_LOCK = Lock()
+
+
+def _input_file_sha256(path: Path) -> str:
+    """Return the sha256 hash of the contents of an input file."""
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _INPUT_FILE_SHA256_LOCK:
+        if key in _INPUT_FILE_SHA256:
+            return _INPUT_FILE_SHA256[key]
+    sha256 = _file_sha256(path)
+    with _INPUT_FILE_SHA256_LOCK:
+        _INPUT_FILE_SHA256[key] = sha256
+    return sha256
+
+
+def _compare_to_gold_standard(
+    gold_standard: _GoldStandard,
+    outcome: BenchmarkExecutionResult,
+    output_paths: List[Path],
+    compare_output: bool,
+    cmd: str,
+) -> Optional[ValidationError]:
+    """Compare the outputs of a benchmark run to the gold standard."""
+    # Difftest the console output.
+    if compare_output and gold_standard.output != outcome.output:
+        return ValidationError(
+            type="Wrong output",
+            data={"expected": gold_standard.output, "actual": outcome.output},
+        )
+
+    # Difftest the output files by comparing hashes of their contents.
+    for path in output_paths:
+        if not path.is_file():
+            return ValidationError(
+                type="Output not generated",
+                data={"path": path.name, "command": cmd},
+            )
+        expected_sha256 = gold_standard.output_files[path.name]
+        actual_sha256 = _file_sha256(path)
+        if actual_sha256 != expected_sha256:
+            return ValidationError(
+                type="Wrong output (file)",
+                data={
+                    "path": path.name,
+                    "expected_sha256": expected_sha256,
+                    "actual_sha256": actual_sha256,
+                },
+            )
+
+
 def _make_cBench_validator(
     cmd: str,
     linkopts: List[str],
@@ -300,15 +571,30 @@ def _make_cBench_validator(
                 pre_execution_callback(cwd)
 
             # Produce a gold-standard output using a reference version of
-            # the benchmark.
+            # the benchmark. The reference output does not depend on the state
+            # being validated, so it is cached.
+            gold_standard = None
+            # Set if the gold standard was produced by this call rather than
+            # read from the cache.
+            new_gold_standard = False
             if compare_output or output_files:
+                gold_standard_key = _gold_standard_cache_key(
+                    benchmark=str(env.benchmark.uri),
+                    compiler_version=env.compiler_version,
+                    cmd=cmd,
+                    linkopts=linkopts,
+                    os_env=os_env,
+                    input_files=[cbench_data / p for p in input_files],
+                    output_files=output_files,
+                )
+                gold_standard = _get_gold_standard(gold_standard_key)
+            if (compare_output or output_files) and gold_standard is None:
                 gs_env = env.fork()
                 try:
                     # Reset to the original benchmark state and compile it.
                     gs_env.reset(benchmark=env.benchmark)
-                    gs_env.write_bitcode(cwd / "benchmark.bc")
-                    gold_standard = _compile_and_run_bitcode_file(
-                        bitcode_file=cwd / "benchmark.bc",
+                    gold_standard_outcome = _run_benchmark(
+                        env=gs_env,
                         cmd=expanded_command,
                         cwd=cwd,
                         num_runs=1,
@@ -316,45 +602,45 @@ def _make_cBench_validator(
                         linkopts=linkopts + ["-O2"],
                         # Always assume safe.
                         sanitizer=None,
-                        logger=env.logger,
-                        env=os_env,
+                        os_env=os_env,
                     )
-                    if gold_standard.error:
+                    if gold_standard_outcome.error:
                         return ValidationError(
-                            type=f"Gold standard: {gold_standard.error.type}",
-                            data=gold_standard.error.data,
+                            type=f"Gold standard: {gold_standard_outcome.error.type}",
+                            data=gold_standard_outcome.error.data,
                         )
                 finally:
                     gs_env.close()
 
                 # Check that the reference run produced the expected output
-                # files.
+                # files, and record their hashes. The files are removed so
+                # that the next run must regenerate them.
+                output_file_hashes = {}
                 for path in output_paths:
                     if not path.is_file():
-                        try:
-                            output = gold_standard.output
-                        except UnicodeDecodeError:
-                            output = "<binary>"
                         raise FileNotFoundError(
                             f"Expected file '{path.name}' not generated\n"
                             f"Benchmark: {env.benchmark}\n"
                             f"Command: {cmd}\n"
-                            f"Output: {output}"
+                            f"Output: {gold_standard_outcome.output}"
                         )
-                    path.rename(f"{path}.gold_standard")
+                    output_file_hashes[path.name] = _file_sha256(path)
+                    path.unlink()
 
-            # Serialize the benchmark to a bitcode file that will then be
-            # compiled to a binary.
-            env.write_bitcode(cwd / "benchmark.bc")
-            outcome = _compile_and_run_bitcode_file(
-                bitcode_file=cwd / "benchmark.bc",
+                gold_standard = _GoldStandard(
+                    output=gold_standard_outcome.output,
+                    output_files=output_file_hashes,
+                )
+                new_gold_standard = True
+
+            outcome = _run_benchmark(
+                env=env,
                 cmd=expanded_command,
                 cwd=cwd,
                 num_runs=num_runs,
                 linkopts=linkopts,
                 sanitizer=sanitizer,
-                logger=env.logger,
-                env=os_env,
+                os_env=os_env,
             )
 
             if outcome.error:
@@ -364,38 +650,21 @@ def _make_cBench_validator(
             if validate_result:
                 validate_result(outcome)
 
-            # Difftest the console output.
-            if compare_output and gold_standard.output != outcome.output:
-                return ValidationError(
-                    type="Wrong output",
-                    data={"expected": gold_standard.output, "actual": outcome.output},
-                )
+            if gold_standard is None:
+                return None
 
-            # Difftest the output files.
-            for path in output_paths:
-                if not path.is_file():
-                    return ValidationError(
-                        type="Output not generated",
-                        data={"path": path.name, "command": cmd},
-                    )
-                diff = subprocess.Popen(
-                    ["diff", str(path), f"{path}.gold_standard"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                )
-                stdout, _ = diff.communicate()
-                if diff.returncode:
-                    try:
-                        stdout = stdout.decode("utf-8")
-                        return ValidationError(
-                            type="Wrong output (file)",
-                            data={"path": path.name, "diff": stdout},
-                        )
-                    except UnicodeDecodeError:
-                        return ValidationError(
-                            type="Wrong output (file)",
-                            data={"path": path.name, "diff": "<binary>"},
-                        )
+            # A new gold standard is cached only once a run has matched it, so
+            # that the output of a faulty reference run is not persisted. A
+            # cached gold standard that does not match is dropped, so that a
+            # retry produces a new one.
+            error = _compare_to_gold_standard(
+                gold_standard, outcome, output_paths, compare_output, cmd
+            )
+            if not error and new_gold_standard:
+                _set_gold_standard(gold_standard_key, gold_standard)
+            elif error and not new_gold_standard:
+                _drop_gold_standard(gold_standard_key)
+            return error
 
     def flaky_wrapped_cb(env: "LlvmEnv") -> Optional[ValidationError]:  # noqa: F821
         """Wrap the validation callback in a flakiness retry loop."""
@@ -466,6 +735,8 @@ def validator(
             pre_execution_callback=pre_execution_callback,
         )
     )
+    if not pre_execution_callback:
+        _add_benchmark_run(benchmark, cmd, linkopts, env)
 
     # Register additional validators using the sanitizers.
     if sys.platform.startswith("linux"):
@@ -496,6 +767,11 @@ class CBenchBenchmark(Benchmark):
         for val in VALIDATORS.get(self.uri, []):
             self.add_validation_callback(val)
 
+        # Describe how to run the benchmark so that the compiler service can
+        # measure its runtime.
+        if self.uri in _DYNAMIC_CONFIGS:
+            self.proto.dynamic_config.CopyFrom(_DYNAMIC_CONFIGS[self.uri])
+
 
 class CBenchDataset(TarDatasetWithManifest):
     def __init__(
@@ -588,6 +864,41 @@ VALIDATORS: Dict[
     str, List[Callable[["LlvmEnv"], Optional[str]]]  # noqa: F821
 ] = defaultdict(list)
 
+# A map from benchmark name to the description of how to build and run the
+# benchmark to measure its runtime. The runs are the validation commands.
+_DYNAMIC_CONFIGS: Dict[str, BenchmarkDynamicConfig] = {}
+
+
+def _add_benchmark_run(
+    benchmark: str, cmd: str, linkopts: List[str], os_env: Dict[str, str]
+) -> None:
+    """Record a validation command as a run of the benchmark for runtime
+    measurements. Commands that require a shell are ignored.
+    """
+    args = shlex.split(cmd)
+    if not args or args[0] != "$BIN" or _SHELL_OPERATORS.intersection(args):
+        return
+
+    if benchmark not in _DYNAMIC_CONFIGS:
+        _DYNAMIC_CONFIGS[benchmark] = BenchmarkDynamicConfig(
+            link_argument=_COMPILE_ARGS
+        )
+    config = _DYNAMIC_CONFIGS[benchmark]
+    for linkopt in linkopts:
+        if linkopt not in config.link_argument:
+            config.link_argument.append(linkopt)
+
+    cbench_data = site_data_path("llvm-v0/cbench-v1-runtime-data/runtime_data")
+    config.run.append(
+        BenchmarkRun(
+            argument=[arg.replace("$D", str(cbench_data)) for arg in args[1:]],
+            environment_variable=_benchmark_run_env(os_env),
+            # cBench benchmarks read the number of iterations to run from this
+            # file.
+            file={"_finfo_dataset": b"1\n"},
+        )
+    )
+
 
 def validate_sha_output(result: BenchmarkExecutionResult) -> Optional[str]:
     """SHA benchmark prints 5 random hex strings. Normally these hex strings are
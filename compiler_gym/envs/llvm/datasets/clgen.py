@@ -4,19 +4,16 @@
 # LICENSE file in the root directory of this source tree.
 import io
 import shutil
-import subprocess
 import tarfile
 from pathlib import Path
-from typing import List
 
 from fasteners import InterProcessLock
 
-from compiler_gym.datasets import Benchmark, BenchmarkInitError, TarDatasetWithManifest
+from compiler_gym.datasets import Benchmark, TarDatasetWithManifest
 from compiler_gym.datasets.benchmark import BenchmarkWithSource
 from compiler_gym.envs.llvm.llvm_benchmark import ClangInvocation
 from compiler_gym.util.download import download
 from compiler_gym.util.filesystem import atomic_file_write
-from compiler_gym.util.truncate import truncate
 
 
 class CLgenDataset(TarDatasetWithManifest):
@@ -130,39 +127,23 @@ class CLgenDataset(TarDatasetWithManifest):
                     f"Benchmark not found: {uri} (file not found: {cl_path}, path_stem {path_stem})"
                 )
 
-            # Compile the OpenCL kernel into a bitcode file.
-            with atomic_file_write(bc_path) as tmp_bc_path:
-                compile_command: List[str] = ClangInvocation.from_c_file(
-                    cl_path,
-                    copt=[
-                        "-isystem",
-                        str(self.libclc_dir),
-                        "-include",
-                        str(self.opencl_h_path),
-                        "-target",
-                        "nvptx64-nvidia-nvcl",
-                        "-ferror-limit=1",  # Stop on first error.
-                        "-w",  # No warnings.
-                    ],
-                ).command(outpath=tmp_bc_path)
-                self.logger.debug("Exec %s", compile_command)
-                clang = subprocess.Popen(
-                    compile_command,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-                _, stderr = clang.communicate(timeout=300)
-
-            if clang.returncode:
-                compile_command = " ".join(compile_command)
-                error = truncate(
-                    stderr.decode("utf-8"), max_lines=20, max_line_len=20000
-                )
-                raise BenchmarkInitError(
-                    f"Compilation job failed!\n"
-                    f"Command: {compile_command}\n"
-                    f"Error: {error}"
-                )
+            # Compile the OpenCL kernel into a bitcode file. The compilation
+            # cache is shared with other datasets and make_benchmark().
+            bitcode = ClangInvocation.from_c_file(
+                cl_path,
+                copt=[
+                    "-isystem",
+                    str(self.libclc_dir),
+                    "-include",
+                    str(self.opencl_h_path),
+                    "-target",
+                    "nvptx64-nvidia-nvcl",
+                    "-ferror-limit=1",  # Stop on first error.
+                    "-w",  # No warnings.
+                ],
+                timeout=300,
+            ).compile()
+            with atomic_file_write(bc_path, fileobj=True) as f:
+                f.write(bitcode)
 
         return BenchmarkWithSource.create(uri, bc_path, "kernel.cl", cl_path)
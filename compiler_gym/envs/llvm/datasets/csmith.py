@@ -8,9 +8,10 @@ import subprocess
 import sys
 import tarfile
 import tempfile
+from functools import partial
 from pathlib import Path
 from threading import Lock
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Tuple
 
 import numpy as np
 from fasteners import InterProcessLock
@@ -18,6 +19,7 @@ from fasteners import InterProcessLock
 from compiler_gym.datasets import Benchmark, BenchmarkSource, Dataset
 from compiler_gym.datasets.benchmark import BenchmarkInitError, BenchmarkWithSource
 from compiler_gym.datasets.dataset import DatasetInitError
+from compiler_gym.envs.llvm.datasets.generator_pool import BenchmarkGeneratorPool
 from compiler_gym.envs.llvm.llvm_benchmark import ClangInvocation
 from compiler_gym.util.decorators import memoized_property
 from compiler_gym.util.download import download
@@ -27,6 +29,52 @@ from compiler_gym.util.runfiles_path import transient_cache_path
 UINT_MAX = (2 ** 32) - 1
 
 
+def generate_csmith_benchmark(
+    csmith_path: Path, clang_compile_command: List[str], seed: int
+) -> Tuple[bytes, bytes]:
+    """Run Csmith with the given seed and compile the output to bitcode.
+
+    This is a module-level function so that it can be run by the worker
+    processes of a :class:`BenchmarkGeneratorPool
+    <compiler_gym.envs.llvm.datasets.BenchmarkGeneratorPool>`.
+
+    :return: A tuple of bitcode and C source bytes.
+
+    :raises BenchmarkInitError: If the generated program fails to compile.
+    """
+    # Run csmith with the given seed and pipe the output to clang to
+    # assemble a bitcode.
+    csmith = subprocess.Popen(
+        [str(csmith_path), "--seed", str(seed)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # Generate the C source.
+    src, _ = csmith.communicate(timeout=300)
+    if csmith.returncode:
+        raise OSError(f"Csmith failed with seed {seed}")
+
+    # Compile to IR.
+    clang = subprocess.Popen(
+        clang_compile_command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    stdout, _ = clang.communicate(src, timeout=300)
+
+    if clang.returncode:
+        compile_cmd = " ".join(clang_compile_command)
+        raise BenchmarkInitError(
+            f"Compilation job failed!\n"
+            f"Csmith seed: {seed}\n"
+            f"Command: {compile_cmd}\n"
+        )
+
+    return stdout, src
+
+
 class CsmithBenchmark(BenchmarkWithSource):
     """A CSmith benchmark."""
 
@@ -111,6 +159,24 @@ class CsmithDataset(Dataset):
     See the `Csmith repo
     <https://github.com/csmith-project/csmith#install-csmith>`_ for further
     details.
+
+    Background generation
+    ---------------------
+
+    Generating and compiling a program can take a while, and a fraction of
+    generated programs fail to initialize. To avoid blocking on this work, call
+    :meth:`start_generator_pool()
+    <compiler_gym.envs.llvm.datasets.CsmithDataset.start_generator_pool>` to
+    generate, validate, and cache programs in a pool of worker processes:
+
+        >>> dataset.start_generator_pool(num_workers=8)
+        >>> benchmark = dataset.random_benchmark(np.random.default_rng(0))
+
+    While the pool is running, :meth:`random_benchmark()
+    <compiler_gym.datasets.Dataset.random_benchmark>` skips seeds that fail
+    validation, so the sequence of benchmarks that it returns differs from the
+    sequence returned without a pool, though it remains deterministic for a
+    given random state.
     """
 
     def __init__(self, site_data_base: Path, sort_order: int = 0):
@@ -148,6 +214,8 @@ class CsmithDataset(Dataset):
             outpath="-"
         )  # Write to stdout.
 
+        self._generator_pool: Optional[BenchmarkGeneratorPool] = None
+
     @property
     def installed(self) -> bool:
         # Fast path for repeated checks to 'installed' without a disk op.
@@ -228,8 +296,58 @@ class CsmithDataset(Dataset):
         return self.benchmark_from_seed(int(uri.split("/")[-1]))
 
     def _random_benchmark(self, random_state: np.random.Generator) -> Benchmark:
-        seed = random_state.integers(UINT_MAX)
-        return self.benchmark_from_seed(seed)
+        if self._generator_pool is None:
+            seed = random_state.integers(UINT_MAX)
+            return self.benchmark_from_seed(seed)
+
+        # Draw seeds until we find one that passes validation.
+        while True:
+            self._generator_pool.submit_lookahead(random_state, UINT_MAX)
+            seed = random_state.integers(UINT_MAX)
+            try:
+                return self.benchmark_from_seed(seed)
+            except BenchmarkInitError as e:
+                self.logger.debug("Skipping Csmith seed %d: %s", seed, e)
+
+    def start_generator_pool(
+        self, num_workers: Optional[int] = None, queue_size: int = 32
+    ) -> BenchmarkGeneratorPool:
+        """Generate benchmarks in a pool of background worker processes.
+
+        Generated benchmarks are validated and cached on disk. Once started,
+        :meth:`benchmark_from_seed()
+        <compiler_gym.envs.llvm.datasets.CsmithDataset.benchmark_from_seed>`
+        raises :class:`BenchmarkInitError
+        <compiler_gym.datasets.BenchmarkInitError>` for seeds that fail
+        validation. Call :meth:`stop_generator_pool()
+        <compiler_gym.envs.llvm.datasets.CsmithDataset.stop_generator_pool>`
+        once done.
+
+        :param num_workers: The number of worker processes. If not provided,
+            the number of CPUs on the machine is used.
+
+        :param queue_size: The maximum number of benchmarks to generate ahead
+            of time.
+
+        :return: The generator pool.
+        """
+        self.install()
+        self.stop_generator_pool()
+        self._generator_pool = BenchmarkGeneratorPool(
+            partial(
+                generate_csmith_benchmark, self.csmith_path, self.clang_compile_command
+            ),
+            cache_dir=self.site_data_path / "generated",
+            num_workers=num_workers,
+            queue_size=queue_size,
+        )
+        return self._generator_pool
+
+    def stop_generator_pool(self) -> None:
+        """Stop the pool of background worker processes, if running."""
+        if self._generator_pool is not None:
+            self._generator_pool.close()
+            self._generator_pool = None
 
     def benchmark_from_seed(self, seed: int) -> CsmithBenchmark:
         """Get a benchmark from a uint32 seed.
@@ -237,38 +355,18 @@ class CsmithDataset(Dataset):
         :param seed: A number in the range 0 <= n < 2^32.
 
         :return: A benchmark instance.
+
+        :raises BenchmarkInitError: If the benchmark fails to compile, or fails
+            validation when a generator pool is running.
         """
         self.install()
 
-        # Run csmith with the given seed and pipe the output to clang to
-        # assemble a bitcode.
-        self.logger.debug("Exec csmith --seed %d", seed)
-        csmith = subprocess.Popen(
-            [str(self.csmith_path), "--seed", str(seed)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-        )
-
-        # Generate the C source.
-        src, _ = csmith.communicate(timeout=300)
-        if csmith.returncode:
-            raise OSError(f"Csmith failed with seed {seed}")
-
-        # Compile to IR.
-        clang = subprocess.Popen(
-            self.clang_compile_command,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-        )
-        stdout, _ = clang.communicate(src, timeout=300)
-
-        if clang.returncode:
-            compile_cmd = " ".join(self.clang_compile_command)
-            raise BenchmarkInitError(
-                f"Compilation job failed!\n"
-                f"Csmith seed: {seed}\n"
-                f"Command: {compile_cmd}\n"
+        if self._generator_pool is None:
+            self.logger.debug("Exec csmith --seed %d", seed)
+            bitcode, src = generate_csmith_benchmark(
+                self.csmith_path, self.clang_compile_command, seed
             )
+        else:
+            bitcode, src = self._generator_pool.get(seed)
 
-        return self.benchmark_class.create(f"{self.name}/{seed}", stdout, src)
+        return self.benchmark_class.create(f"{self.name}/{seed}", bitcode, src)
@@ -0,0 +1,278 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""A pool of worker processes for generating benchmarks ahead of time."""
+import logging
+import multiprocessing
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from compiler_gym.datasets.benchmark import BenchmarkInitError
+from compiler_gym.third_party import llvm
+from compiler_gym.util.filesystem import atomic_file_write
+
+# The result of generating a benchmark: a tuple of bitcode and source bytes.
+GeneratedBenchmark = Tuple[bytes, bytes]
+
+logger = logging.getLogger("compiler_gym.datasets")
+
+
+def validate_bitcode(bitcode: bytes, timeout: int = 300) -> None:
+    """Check that a bitcode can be lowered to an object file.
+
+    This mirrors the work done by the LLVM service when computing the initial
+    code size costs of a benchmark, so a bitcode that passes this check will
+    not fail :meth:`env.reset() <compiler_gym.envs.CompilerEnv.reset>` for
+    that reason.
+
+    :param bitcode: The bitcode to validate.
+
+    :param timeout: The maximum number of seconds to allow for compilation.
+
+    :raises BenchmarkInitError: If compilation fails.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".o") as f:
+        clang = subprocess.Popen(
+            [str(llvm.clang_path()), "-w", "-xir", "-", "-o", f.name, "-c"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        _, stderr = clang.communicate(bitcode, timeout=timeout)
+    if clang.returncode:
+        raise BenchmarkInitError(
+            f"Failed to lower bitcode to an object file:\n{stderr.decode('utf-8')}"
+        )
+
+
+def _generate_and_validate(
+    generator: Callable[[int], GeneratedBenchmark], seed: int
+) -> GeneratedBenchmark:
+    """Worker process entry point."""
+    bitcode, src = generator(seed)
+    validate_bitcode(bitcode)
+    return bitcode, src
+
+
+class BenchmarkGeneratorPool:
+    """A pool of worker processes that generate and validate benchmarks from
+    integer seeds in the background.
+
+    Generated benchmarks are keyed by seed, so the result for a given seed does
+    not depend on when or by which worker it was generated. Results are cached
+    on disk, including the error message for seeds that fail to generate or
+    validate, so each seed is only processed once.
+
+    Use :meth:`submit` to schedule the generation of a seed ahead of time, and
+    :meth:`get` to retrieve the result. At most :code:`queue_size` seeds are
+    pending at once. Once that limit is reached, submitting a new seed cancels
+    the oldest pending seed that has not yet started.
+
+    Worker processes are started by a fork server rather than forked from the
+    calling process, since the caller may be using gRPC, which does not support
+    being forked.
+    """
+
+    def __init__(
+        self,
+        generator: Callable[[int], GeneratedBenchmark],
+        cache_dir: Path,
+        num_workers: Optional[int] = None,
+        queue_size: int = 32,
+    ):
+        """Constructor.
+
+        :param generator: A picklable callable which takes an integer seed and
+            returns a tuple of bitcode and source bytes. It is called in a
+            worker process, so it must be importable by a fresh interpreter.
+
+        :param cache_dir: The directory used to cache generated benchmarks.
+
+        :param num_workers: The number of worker processes. If not provided,
+            the number of CPUs on the machine is used.
+
+        :param queue_size: The maximum number of seeds to generate ahead of
+            time.
+        """
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be positive, got {queue_size}")
+        self.generator = generator
+        self.cache_dir = Path(cache_dir)
+        self.queue_size = queue_size
+        # The mp_context argument was added in Python 3.7.
+        executor_kwargs = (
+            {"mp_context": multiprocessing.get_context("forkserver")}
+            if sys.version_info >= (3, 7)
+            else {}
+        )
+        self._executor = ProcessPoolExecutor(max_workers=num_workers, **executor_kwargs)
+        self._pending: Dict[int, Future] = OrderedDict()
+        # The seeds most recently known to be in the cache, in least recently
+        # used order. This saves stat()-ing the cache for the seeds that
+        # submit_lookahead() submits again on every call.
+        self._completed: Dict[int, None] = OrderedDict()
+        self._lock = Lock()
+
+    def _cache_paths(self, seed: int) -> Tuple[Path, Path, Path]:
+        # Shard the cache by the low byte of the seed to keep directories
+        # small.
+        shard = self.cache_dir / f"{seed % 256:02x}"
+        return (
+            shard / f"{seed}.bc",
+            shard / f"{seed}.src",
+            shard / f"{seed}.error",
+        )
+
+    def _read_cache(self, seed: int) -> Optional[GeneratedBenchmark]:
+        bitcode_path, src_path, error_path = self._cache_paths(seed)
+        if error_path.is_file():
+            raise BenchmarkInitError(error_path.read_text())
+        if bitcode_path.is_file():
+            return bitcode_path.read_bytes(), src_path.read_bytes()
+        return None
+
+    def _mark_completed(self, seed: int) -> None:
+        """Record that a seed is in the cache. Must hold the lock."""
+        self._completed[seed] = None
+        self._completed.move_to_end(seed)
+        while len(self._completed) > 2 * self.queue_size:
+            self._completed.popitem(last=False)
+
+    def _write_cache(self, seed: int, future: Future) -> None:
+        """Done callback that writes the result of a job to the cache."""
+        if future.cancelled():
+            return
+        bitcode_path, src_path, error_path = self._cache_paths(seed)
+        error = future.exception()
+        try:
+            bitcode_path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(error, BenchmarkInitError):
+                with atomic_file_write(error_path, fileobj=True, mode="w") as f:
+                    f.write(str(error))
+            elif error is None:
+                bitcode, src = future.result()
+                # Write the source first, since the presence of the bitcode is
+                # what marks a cache entry as complete.
+                with atomic_file_write(src_path, fileobj=True) as f:
+                    f.write(src)
+                with atomic_file_write(bitcode_path, fileobj=True) as f:
+                    f.write(bitcode)
+            else:
+                return
+        except OSError as e:
+            logger.warning("Failed to cache generated benchmark %d: %s", seed, e)
+            return
+        with self._lock:
+            self._mark_completed(seed)
+
+    def _start(self, seed: int) -> Future:
+        """Start a job to generate a seed and cache the result."""
+        future = self._executor.submit(_generate_and_validate, self.generator, seed)
+        future.add_done_callback(partial(self._write_cache, seed))
+        return future
+
+    def _submit(self, seed: int) -> None:
+        """Add a seed to the pending queue. Must hold the lock."""
+        if seed in self._pending:
+            self._pending.move_to_end(seed)
+            return
+
+        self._pending[seed] = self._start(seed)
+
+        # Evict the oldest pending jobs, cancelling them if they have not yet
+        # started.
+        while len(self._pending) > self.queue_size:
+            _, oldest = self._pending.popitem(last=False)
+            oldest.cancel()
+
+    def submit(self, seed: int) -> None:
+        """Schedule a seed to be generated in the background.
+
+        This is a no-op if the seed is already cached or pending.
+
+        :param seed: The seed to generate.
+        """
+        seed = int(seed)
+        with self._lock:
+            if seed in self._pending:
+                self._pending.move_to_end(seed)
+                return
+            if seed in self._completed:
+                self._completed.move_to_end(seed)
+                return
+        try:
+            cached = self._read_cache(seed)
+        except BenchmarkInitError:
+            cached = True
+        with self._lock:
+            if cached:
+                self._mark_completed(seed)
+            else:
+                self._submit(seed)
+
+    def submit_lookahead(self, random_state: np.random.Generator, high: int) -> None:
+        """Schedule the seeds that the next calls to
+        :code:`random_state.integers(high)` will return.
+
+        This does not modify the state of :code:`random_state`.
+
+        :param random_state: The random number generator that will be used to
+            draw seeds.
+
+        :param high: The exclusive upper bound of the seeds.
+        """
+        lookahead = np.random.Generator(type(random_state.bit_generator)())
+        lookahead.bit_generator.state = random_state.bit_generator.state
+        for _ in range(self.queue_size):
+            self.submit(lookahead.integers(high))
+
+    def get(self, seed: int) -> GeneratedBenchmark:
+        """Return the bitcode and source for a seed, blocking if it has not
+        yet been generated.
+
+        :param seed: The seed to generate.
+
+        :return: A tuple of bitcode and source bytes.
+
+        :raises BenchmarkInitError: If the benchmark fails to generate or
+            validate.
+        """
+        seed = int(seed)
+        with self._lock:
+            future = self._pending.pop(seed, None)
+        if future is None or future.cancelled():
+            cached = self._read_cache(seed)
+            if cached:
+                return cached
+            future = self._start(seed)
+
+        result = future.result()
+        # The done callback that caches the result may not have run yet, so
+        # record the seed here too.
+        with self._lock:
+            self._mark_completed(seed)
+        return result
+
+    def close(self) -> None:
+        """Cancel any pending jobs and shut down the worker processes."""
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "BenchmarkGeneratorPool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -4,18 +4,51 @@
 # LICENSE file in the root directory of this source tree.
 import subprocess
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional, Tuple
 
 import numpy as np
 
 from compiler_gym.datasets import Benchmark, Dataset
 from compiler_gym.datasets.benchmark import BenchmarkInitError
+from compiler_gym.envs.llvm.datasets.generator_pool import BenchmarkGeneratorPool
 from compiler_gym.third_party import llvm
 
 # The maximum value for the --seed argument to llvm-stress.
 UINT_MAX = (2 ** 32) - 1
 
 
+def generate_llvm_stress_benchmark(seed: int) -> Tuple[bytes, bytes]:
+    """Run llvm-stress with the given seed and assemble the output to bitcode.
+
+    This is a module-level function so that it can be run by the worker
+    processes of a :class:`BenchmarkGeneratorPool
+    <compiler_gym.envs.llvm.datasets.BenchmarkGeneratorPool>`.
+
+    :return: A tuple of bitcode and an empty source.
+
+    :raises BenchmarkInitError: If generation fails.
+    """
+    # Run llvm-stress with the given seed and pipe the output to llvm-as to
+    # assemble a bitcode.
+    llvm_stress = subprocess.Popen(
+        [str(llvm.llvm_stress_path()), f"--seed={seed}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    llvm_as = subprocess.Popen(
+        [str(llvm.llvm_as_path()), "-"],
+        stdin=llvm_stress.stdout,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    stdout, _ = llvm_as.communicate(timeout=60)
+    if llvm_stress.returncode or llvm_as.returncode:
+        raise BenchmarkInitError("Failed to generate benchmark")
+
+    return stdout, b""
+
+
 class LlvmStressDataset(Dataset):
     """A dataset which uses llvm-stress to generate programs.
 
@@ -32,6 +65,12 @@ class LlvmStressDataset(Dataset):
     environment and that :meth:`env.reset()
     <compiler_gym.envs.CompilerEnv.reset>` will raise
     :class:`BenchmarkInitError <compiler_gym.datasets.BenchmarkInitError>`.
+
+    Call :meth:`start_generator_pool()
+    <compiler_gym.envs.llvm.datasets.LlvmStressDataset.start_generator_pool>` to
+    generate, validate, and cache benchmarks in a pool of background worker
+    processes. See :class:`CsmithDataset
+    <compiler_gym.envs.llvm.datasets.CsmithDataset>` for details.
     """
 
     def __init__(self, site_data_base: Path, sort_order: int = 0):
@@ -45,6 +84,7 @@ class LlvmStressDataset(Dataset):
             site_data_base=site_data_base,
             sort_order=sort_order,
         )
+        self._generator_pool: Optional[BenchmarkGeneratorPool] = None
 
     @property
     def size(self) -> int:
@@ -59,8 +99,50 @@ class LlvmStressDataset(Dataset):
         return self.benchmark_from_seed(int(uri.split("/")[-1]))
 
     def _random_benchmark(self, random_state: np.random.Generator) -> Benchmark:
-        seed = random_state.integers(UINT_MAX)
-        return self.benchmark_from_seed(seed)
+        if self._generator_pool is None:
+            seed = random_state.integers(UINT_MAX)
+            return self.benchmark_from_seed(seed)
+
+        # Draw seeds until we find one that passes validation.
+        while True:
+            self._generator_pool.submit_lookahead(random_state, UINT_MAX)
+            seed = random_state.integers(UINT_MAX)
+            try:
+                return self.benchmark_from_seed(seed)
+            except BenchmarkInitError as e:
+                self.logger.debug("Skipping llvm-stress seed %d: %s", seed, e)
+
+    def start_generator_pool(
+        self, num_workers: Optional[int] = None, queue_size: int = 32
+    ) -> BenchmarkGeneratorPool:
+        """Generate benchmarks in a pool of background worker processes.
+
+        See :meth:`CsmithDataset.start_generator_pool()
+        <compiler_gym.envs.llvm.datasets.CsmithDataset.start_generator_pool>`.
+
+        :param num_workers: The number of worker processes. If not provided,
+            the number of CPUs on the machine is used.
+
+        :param queue_size: The maximum number of benchmarks to generate ahead
+            of time.
+
+        :return: The generator pool.
+        """
+        self.install()
+        self.stop_generator_pool()
+        self._generator_pool = BenchmarkGeneratorPool(
+            generate_llvm_stress_benchmark,
+            cache_dir=self.site_data_path / "generated",
+            num_workers=num_workers,
+            queue_size=queue_size,
+        )
+        return self._generator_pool
+
+    def stop_generator_pool(self) -> None:
+        """Stop the pool of background worker processes, if running."""
+        if self._generator_pool is not None:
+            self._generator_pool.close()
+            self._generator_pool = None
 
     def benchmark_from_seed(self, seed: int) -> Benchmark:
         """Get a benchmark from a uint32 seed.
@@ -68,25 +150,15 @@ class LlvmStressDataset(Dataset):
         :param seed: A number in the range 0 <= n < 2^32.
 
         :return: A benchmark instance.
+
+        :raises BenchmarkInitError: If the benchmark fails to generate, or fails
+            validation when a generator pool is running.
         """
         self.install()
 
-        # Run llvm-stress with the given seed and pipe the output to llvm-as to
-        # assemble a bitcode.
-        llvm_stress = subprocess.Popen(
-            [str(llvm.llvm_stress_path()), f"--seed={seed}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        llvm_as = subprocess.Popen(
-            [str(llvm.llvm_as_path()), "-"],
-            stdin=llvm_stress.stdout,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        stdout, _ = llvm_as.communicate(timeout=60)
-        if llvm_stress.returncode or llvm_as.returncode:
-            raise BenchmarkInitError("Failed to generate benchmark")
+        if self._generator_pool is None:
+            bitcode, _ = generate_llvm_stress_benchmark(seed)
+        else:
+            bitcode, _ = self._generator_pool.get(seed)
 
-        return Benchmark.from_file_contents(f"{self.name}/{seed}", stdout)
+        return Benchmark.from_file_contents(f"{self.name}/{seed}", bitcode)
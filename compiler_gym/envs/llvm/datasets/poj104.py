@@ -2,19 +2,17 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-import subprocess
 import sys
 from concurrent.futures import as_completed
 from pathlib import Path
 from typing import Optional
 
-from compiler_gym.datasets import Benchmark, BenchmarkInitError, TarDatasetWithManifest
+from compiler_gym.datasets import Benchmark, TarDatasetWithManifest
 from compiler_gym.datasets.benchmark import BenchmarkWithSource
 from compiler_gym.envs.llvm.llvm_benchmark import ClangInvocation
 from compiler_gym.util import thread_pool
 from compiler_gym.util.download import download
 from compiler_gym.util.filesystem import atomic_file_write
-from compiler_gym.util.truncate import truncate
 
 
 class POJ104Dataset(TarDatasetWithManifest):
@@ -69,7 +67,7 @@ class POJ104Dataset(TarDatasetWithManifest):
     def benchmark(self, uri: Optional[str] = None) -> Benchmark:
         self.install()
         if uri is None or len(uri) <= len(self.name) + 1:
-            return self._get_benchmark_by_index(self.random.integers(self.size))
+            return self.random_benchmark()
 
         # The absolute path of the file, without an extension.
         path_stem = self.dataset_root / uri[len(self.name) + 1 :]
@@ -88,40 +86,22 @@ class POJ104Dataset(TarDatasetWithManifest):
             with open(cc_file_path) as f:
                 src = self.preprocess_poj104_source(f.read())
 
-            # Compile the C++ source into a bitcode file.
-            with atomic_file_write(bitcode_path) as tmp_bitcode_path:
-                compile_cmd = ClangInvocation.from_c_file(
-                    "-",
-                    copt=[
-                        "-xc++",
-                        "-ferror-limit=1",  # Stop on first error.
-                        "-w",  # No warnings.
-                        # Some of the programs use the gets() function that was
-                        # deprecated in C++11 and removed in C++14.
-                        "-std=c++11",
-                    ],
-                ).command(outpath=tmp_bitcode_path)
-                self.logger.debug("Exec %s", compile_cmd)
-                clang = subprocess.Popen(
-                    compile_cmd,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-                _, stderr = clang.communicate(src.encode("utf-8"), timeout=300)
-
-            if clang.returncode:
-                compile_cmd = " ".join(compile_cmd)
-                error = truncate(stderr.decode("utf-8"), max_lines=20, max_line_len=100)
-                raise BenchmarkInitError(
-                    f"Compilation job failed!\n"
-                    f"Command: {compile_cmd}\n"
-                    f"Error: {error}"
-                )
-            if not bitcode_path.is_file():
-                raise BenchmarkInitError(
-                    f"Compilation job failed to produce output file!\nCommand: {compile_cmd}"
-                )
+            # Compile the C++ source into a bitcode file. The compilation cache
+            # is shared with other datasets and make_benchmark().
+            bitcode = ClangInvocation.from_c_file(
+                "-",
+                copt=[
+                    "-xc++",
+                    "-ferror-limit=1",  # Stop on first error.
+                    "-w",  # No warnings.
+                    # Some of the programs use the gets() function that was
+                    # deprecated in C++11 and removed in C++14.
+                    "-std=c++11",
+                ],
+                timeout=300,
+            ).compile(stdin=src.encode("utf-8"))
+            with atomic_file_write(bitcode_path, fileobj=True) as f:
+                f.write(bitcode)
 
         return BenchmarkWithSource.create(uri, bitcode_path, "source.cc", cc_file_path)
 
@@ -15,9 +15,11 @@ from signal import Signals
 from typing import Iterable, List, Optional, Union
 
 from compiler_gym.datasets import Benchmark, BenchmarkInitError
+from compiler_gym.envs.llvm.compilation_cache import get_compilation_cache
 from compiler_gym.third_party import llvm
 from compiler_gym.util.runfiles_path import transient_cache_path
 from compiler_gym.util.thread_pool import get_thread_pool_executor
+from compiler_gym.util.truncate import truncate
 
 
 def _communicate(process, input=None, timeout=None):
@@ -107,6 +109,36 @@ def get_system_includes() -> List[Path]:
     return _SYSTEM_INCLUDES
 
 
+# Memoized clang version string. Call _get_clang_version() to access it.
+_CLANG_VERSION = None
+
+
+def _get_clang_version() -> str:
+    """Return the output of :code:`clang --version`."""
+    global _CLANG_VERSION
+    if _CLANG_VERSION is None:
+        process = subprocess.Popen(
+            [str(llvm.clang_path()), "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        stdout, stderr = _communicate(process, timeout=60)
+        if process.returncode:
+            raise OSError(f"Failed to determine clang version: {stderr.strip()}")
+        _CLANG_VERSION = stdout
+    return _CLANG_VERSION
+
+
+def _format_returncode(returncode: int) -> str:
+    try:
+        # Try and decode the name of a signal. Signal returncodes
+        # are negative.
+        return f"{returncode} ({Signals(abs(returncode)).name})"
+    except ValueError:
+        return str(returncode)
+
+
 class ClangInvocation:
     """Class to represent a single invocation of the clang compiler."""
 
@@ -126,17 +158,121 @@ class ClangInvocation:
         self.system_includes = system_includes
         self.timeout = timeout
 
-    def command(self, outpath: Path) -> List[str]:
+    def _base_command(self) -> List[str]:
         cmd = [str(llvm.clang_path())]
         if self.system_includes:
             for directory in get_system_includes():
                 cmd += ["-isystem", str(directory)]
 
         cmd += [str(s) for s in self.args]
-        cmd += ["-c", "-emit-llvm", "-o", str(outpath)]
-
         return cmd
 
+    def command(self, outpath: Path) -> List[str]:
+        return self._base_command() + ["-c", "-emit-llvm", "-o", str(outpath)]
+
+    def preprocess_command(self) -> List[str]:
+        """Return the command that runs only the preprocessor for this
+        invocation, writing the preprocessed source to stdout.
+        """
+        return self._base_command() + ["-E", "-o", "-"]
+
+    def _preprocess(self, stdin: Optional[bytes] = None) -> Optional[bytes]:
+        """Run the preprocessor and return its output, or :code:`None` if
+        preprocessing fails.
+        """
+        process = subprocess.Popen(
+            self.preprocess_command(),
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        stdout, _ = _communicate(process, input=stdin, timeout=self.timeout)
+        if process.returncode:
+            return None
+        return stdout
+
+    def cache_key(self, stdin: Optional[bytes] = None) -> Optional[str]:
+        """Compute the compilation cache key for this invocation.
+
+        The key is derived from the clang version, the arguments, the contents
+        of any arguments that are paths of files, the data passed to stdin, and
+        the output of the preprocessor. Hashing the preprocessed source means
+        that a change to any header that the input includes, whether it is
+        found relative to the source, under a :code:`-I` directory, or in the
+        system include paths, produces a different key.
+
+        :param stdin: The data that will be passed to clang on stdin.
+
+        :return: A key for the :class:`CompilationCache
+            <compiler_gym.envs.llvm.compilation_cache.CompilationCache>`, or
+            :code:`None` if the input cannot be preprocessed, in which case the
+            result of compilation must not be cached.
+
+        :raises TimeoutExpired: If preprocessing exceeds :code:`timeout`
+            seconds.
+        """
+        preprocessed = self._preprocess(stdin)
+        if preprocessed is None:
+            return None
+
+        inputs = [_get_clang_version()]
+        if self.system_includes:
+            inputs += [str(d) for d in get_system_includes()]
+        for arg in self.args:
+            arg = str(arg)
+            inputs.append(arg)
+            if arg != "-" and Path(arg).is_file():
+                inputs.append(Path(arg).read_bytes())
+        inputs.append(stdin or b"")
+        inputs.append(preprocessed)
+        return get_compilation_cache().key(*inputs)
+
+    def compile(self, stdin: Optional[bytes] = None, cache: bool = True) -> bytes:
+        """Run the compilation job and return the bitcode.
+
+        :param stdin: Data to pass to clang on stdin.
+
+        :param cache: Whether to use the :func:`compilation cache
+            <compiler_gym.envs.llvm.compilation_cache.get_compilation_cache>`.
+            If :code:`True`, the input is preprocessed to compute a cache key,
+            and clang only compiles it if there is no cached bitcode for the
+            same preprocessed source and options.
+
+        :return: The bitcode.
+
+        :raises BenchmarkInitError: If compilation fails.
+
+        :raises TimeoutExpired: If compilation exceeds :code:`timeout` seconds.
+        """
+        # Inputs that cannot be preprocessed have no cache key. Compile them
+        # without the cache so that clang reports the error.
+        key = self.cache_key(stdin) if cache else None
+        if key:
+            bitcode = get_compilation_cache().get(key)
+            if bitcode is not None:
+                return bitcode
+
+        cmd = self.command(outpath="-")
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        bitcode, stderr = _communicate(process, input=stdin, timeout=self.timeout)
+        if process.returncode:
+            error = truncate(stderr.decode("utf-8"), max_lines=20, max_line_len=20000)
+            raise BenchmarkInitError(
+                f"Compilation job failed with returncode "
+                f"{_format_returncode(process.returncode)}\n"
+                f"Command: {' '.join(cmd)}\n"
+                f"Stderr: {error.strip()}"
+            )
+
+        if key:
+            get_compilation_cache().put(key, bitcode)
+        return bitcode
+
     @classmethod
     def from_c_file(
         cls,
@@ -180,20 +316,20 @@ def _run_command(cmd: List[str], timeout: int):
     )
     _, stderr = _communicate(process, timeout=timeout)
     if process.returncode:
-        returncode = process.returncode
-        try:
-            # Try and decode the name of a signal. Signal returncodes
-            # are negative.
-            returncode = f"{returncode} ({Signals(abs(returncode)).name})"
-        except ValueError:
-            pass
         raise BenchmarkInitError(
-            f"Compilation job failed with returncode {returncode}\n"
+            f"Compilation job failed with returncode "
+            f"{_format_returncode(process.returncode)}\n"
             f"Command: {' '.join(cmd)}\n"
             f"Stderr: {stderr.strip()}"
         )
 
 
+def _compile_to_path(job: ClangInvocation, outpath: Path) -> None:
+    bitcode = job.compile()
+    with open(outpath, "wb") as f:
+        f.write(bitcode)
+
+
 def make_benchmark(
     inputs: Union[str, Path, ClangInvocation, List[Union[str, Path, ClangInvocation]]],
     copt: Optional[List[str]] = None,
@@ -217,6 +353,10 @@ def make_benchmark(
 
         $ clang my_app.c -O0 -c -emit-llvm -o benchmark.bc
 
+    Compiled bitcodes are stored in a :func:`compilation cache
+    <compiler_gym.envs.llvm.compilation_cache.get_compilation_cache>`, so
+    repeated calls on the same sources with the same options do not recompile.
+
     Additional compile-time arguments to clang can be provided using the
     :code:`copt` argument:
 
@@ -353,7 +493,7 @@ def make_benchmark(
 
             # Fire off the clang and llvm-as jobs.
             futures = [
-                executor.submit(_run_command, job.command(out), job.timeout)
+                executor.submit(_compile_to_path, job, out)
                 for job, out in zip(clang_jobs, clang_outs)
             ] + [
                 executor.submit(_run_command, command, timeout)
@@ -6,7 +6,8 @@
 import os
 import shutil
 from pathlib import Path
-from typing import Iterable, List, Optional, Union, cast
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple, Union, cast
 
 import numpy as np
 from gym.spaces import Box
@@ -20,6 +21,7 @@ from compiler_gym.envs.llvm.llvm_rewards import (
     BaselineImprovementNormalizedReward,
     CostFunctionReward,
     NormalizedReward,
+    RuntimeReward,
 )
 from compiler_gym.spaces import Commandline, CommandlineFlag, Scalar, Sequence
 from compiler_gym.third_party.autophase import AUTOPHASE_FEATURE_NAMES
@@ -27,6 +29,7 @@ from compiler_gym.third_party.inst2vec import Inst2vecEncoder
 from compiler_gym.third_party.llvm import download_llvm_files
 from compiler_gym.third_party.llvm.instcount import INST_COUNT_FEATURE_NAMES
 from compiler_gym.util.runfiles_path import runfiles_path
+from compiler_gym.views import ObservationSpaceSpec
 
 _ACTIONS_LIST = Path(
     runfiles_path("compiler_gym/envs/llvm/service/passes/actions_list.txt")
@@ -54,22 +57,184 @@ _ACTIONS = list(_read_list_file(_ACTIONS_LIST))
 _FLAGS = dict(zip(_ACTIONS, _read_list_file(_FLAGS_LIST)))
 _DESCRIPTIONS = dict(zip(_ACTIONS, _read_list_file(_DESCRIPTIONS_LIST)))
 
+# The encoder is shared between environments. Its vocabulary and embeddings
+# are loaded on first use.
 _INST2VEC_ENCODER = Inst2vecEncoder()
 
 
-_LLVM_DATASETS: Optional[List[Dataset]] = None
+_LLVM_DATASETS: Dict[Optional[Path], List[Dataset]] = {}
+_LLVM_DATASETS_LOCK = Lock()
 
 
 def _get_llvm_datasets(site_data_base: Optional[Path] = None) -> Iterable[Dataset]:
-    """Get the LLVM datasets. Use a singleton value when site_data_base is the
-    default value.
+    """Get the LLVM datasets. Use a singleton value for each site_data_base."""
+    with _LLVM_DATASETS_LOCK:
+        if site_data_base not in _LLVM_DATASETS:
+            _LLVM_DATASETS[site_data_base] = list(
+                get_llvm_datasets(site_data_base=site_data_base)
+            )
+        return _LLVM_DATASETS[site_data_base]
+
+
+def _make_observation_spaces(
+    spaces: Dict[str, ObservationSpaceSpec]
+) -> Dict[str, ObservationSpaceSpec]:
+    """Create the LLVM-specific observation spaces, given the observation spaces
+    of the LLVM service.
+    """
+    spaces = dict(spaces)
+
+    def add_derived_space(id: str, base_id: str, **kwargs) -> None:
+        spaces[id] = spaces[base_id].make_derived_space(id=id, **kwargs)
+
+    add_derived_space(
+        id="CpuInfo",
+        base_id="CpuInfo",
+        translate=lambda base_observation: base_observation,
+        space=DictSpace(
+            {
+                "name": Sequence(size_range=(0, None), dtype=str),
+                "cores_count": Scalar(min=None, max=None, dtype=int),
+                "l1i_cache_size": Scalar(min=None, max=None, dtype=int),
+                "l1i_cache_count": Scalar(min=None, max=None, dtype=int),
+                "l1d_cache_size": Scalar(min=None, max=None, dtype=int),
+                "l1d_cache_count": Scalar(min=None, max=None, dtype=int),
+                "l2_cache_size": Scalar(min=None, max=None, dtype=int),
+                "l2_cache_count": Scalar(min=None, max=None, dtype=int),
+                "l3_cache_size": Scalar(min=None, max=None, dtype=int),
+                "l3_cache_count": Scalar(min=None, max=None, dtype=int),
+                "l4_cache_size": Scalar(min=None, max=None, dtype=int),
+                "l4_cache_count": Scalar(min=None, max=None, dtype=int),
+            }
+        ),
+    )
+
+    add_derived_space(
+        id="Inst2vecPreprocessedText",
+        base_id="Ir",
+        space=Sequence(size_range=(0, None), dtype=str),
+        translate=_INST2VEC_ENCODER.preprocess,
+        default_value="",
+    )
+    add_derived_space(
+        id="Inst2vecEmbeddingIndices",
+        base_id="Ir",
+        space=Sequence(size_range=(0, None), dtype=np.int32),
+        translate=lambda base_observation: _INST2VEC_ENCODER.encode(
+            _INST2VEC_ENCODER.preprocess(base_observation)
+        ),
+        lazy_default_value=lambda: np.array([_INST2VEC_ENCODER.vocab["!UNK"]]),
+    )
+    add_derived_space(
+        id="Inst2vec",
+        base_id="Ir",
+        space=Sequence(size_range=(0, None), dtype=np.ndarray),
+        translate=lambda base_observation: _INST2VEC_ENCODER.embed(
+            _INST2VEC_ENCODER.encode(_INST2VEC_ENCODER.preprocess(base_observation))
+        ),
+        lazy_default_value=lambda: np.vstack(
+            [_INST2VEC_ENCODER.embeddings[_INST2VEC_ENCODER.vocab["!UNK"]]]
+        ),
+    )
+
+    add_derived_space(
+        id="InstCountDict",
+        base_id="InstCount",
+        space=DictSpace(
+            {
+                f"{name}Count": Scalar(min=0, max=None, dtype=int)
+                for name in INST_COUNT_FEATURE_NAMES
+            }
+        ),
+        translate=lambda base_observation: {
+            f"{name}Count": val
+            for name, val in zip(INST_COUNT_FEATURE_NAMES, base_observation)
+        },
+    )
+
+    add_derived_space(
+        id="InstCountNorm",
+        base_id="InstCount",
+        space=Box(
+            low=0,
+            high=1,
+            shape=(len(INST_COUNT_FEATURE_NAMES) - 1,),
+            dtype=np.float32,
+        ),
+        translate=lambda base_observation: (
+            base_observation[1:] / max(base_observation[0], 1)
+        ).astype(np.float32),
+    )
+
+    add_derived_space(
+        id="InstCountNormDict",
+        base_id="InstCountNorm",
+        space=DictSpace(
+            {
+                f"{name}Density": Scalar(min=0, max=None, dtype=int)
+                for name in INST_COUNT_FEATURE_NAMES[1:]
+            }
+        ),
+        translate=lambda base_observation: {
+            f"{name}Density": val
+            for name, val in zip(INST_COUNT_FEATURE_NAMES[1:], base_observation)
+        },
+    )
+
+    add_derived_space(
+        id="AutophaseDict",
+        base_id="Autophase",
+        space=DictSpace(
+            {
+                name: Scalar(min=0, max=None, dtype=int)
+                for name in AUTOPHASE_FEATURE_NAMES
+            }
+        ),
+        translate=lambda base_observation: {
+            name: val for name, val in zip(AUTOPHASE_FEATURE_NAMES, base_observation)
+        },
+    )
+
+    # The number of runtime measurements is configured using session
+    # parameters, so runtimes are variable-length sequences. The default value,
+    # which is returned on error, is empty.
+    for runtime_space in ["Runtime", "RuntimeO0"]:
+        add_derived_space(
+            id=runtime_space,
+            base_id=runtime_space,
+            space=Sequence(size_range=(0, None), dtype=np.float64),
+            translate=lambda base_observation: base_observation,
+            default_value=np.array([], dtype=np.float64),
+        )
+
+    return spaces
+
+
+# The LLVM observation spaces, keyed by the service observation spaces that
+# they were created from. These are immutable and shared between environments.
+_OBSERVATION_SPACES: List[
+    Tuple[List[ObservationSpaceSpec], Dict[str, ObservationSpaceSpec]]
+] = []
+_OBSERVATION_SPACES_LOCK = Lock()
+
+
+def _get_observation_spaces(
+    spaces: Dict[str, ObservationSpaceSpec]
+) -> Dict[str, ObservationSpaceSpec]:
+    """Return the LLVM-specific observation spaces for the given observation
+    spaces of the LLVM service, creating them if required.
     """
-    global _LLVM_DATASETS
-    if site_data_base is None:
-        if _LLVM_DATASETS is None:
-            _LLVM_DATASETS = list(get_llvm_datasets(site_data_base=site_data_base))
-        return _LLVM_DATASETS
-    return get_llvm_datasets(site_data_base=site_data_base)
+    base_spaces = list(spaces.values())
+    with _OBSERVATION_SPACES_LOCK:
+        for cached_base_spaces, cached_spaces in _OBSERVATION_SPACES:
+            # The service spaces are themselves shared, so compare by identity.
+            if len(cached_base_spaces) == len(base_spaces) and all(
+                a is b for a, b in zip(cached_base_spaces, base_spaces)
+            ):
+                return cached_spaces
+        llvm_spaces = _make_observation_spaces(spaces)
+        _OBSERVATION_SPACES.append((base_spaces, llvm_spaces))
+        return llvm_spaces
 
 
 class LlvmEnv(CompilerEnv):
@@ -181,114 +346,23 @@ class LlvmEnv(CompilerEnv):
                     deterministic=True,
                     platform_dependent=True,
                 ),
+                RuntimeReward(
+                    id="Runtime",
+                    runtime_function="Runtime",
+                    init_runtime_function="RuntimeO0",
+                    default_negates_returns=True,
+                    deterministic=False,
+                    platform_dependent=True,
+                ),
             ],
         )
 
         self.inst2vec = _INST2VEC_ENCODER
 
-        self.observation.spaces["CpuInfo"].space = DictSpace(
-            {
-                "name": Sequence(size_range=(0, None), dtype=str),
-                "cores_count": Scalar(min=None, max=None, dtype=int),
-                "l1i_cache_size": Scalar(min=None, max=None, dtype=int),
-                "l1i_cache_count": Scalar(min=None, max=None, dtype=int),
-                "l1d_cache_size": Scalar(min=None, max=None, dtype=int),
-                "l1d_cache_count": Scalar(min=None, max=None, dtype=int),
-                "l2_cache_size": Scalar(min=None, max=None, dtype=int),
-                "l2_cache_count": Scalar(min=None, max=None, dtype=int),
-                "l3_cache_size": Scalar(min=None, max=None, dtype=int),
-                "l3_cache_count": Scalar(min=None, max=None, dtype=int),
-                "l4_cache_size": Scalar(min=None, max=None, dtype=int),
-                "l4_cache_count": Scalar(min=None, max=None, dtype=int),
-            }
-        )
-
-        self.observation.add_derived_space(
-            id="Inst2vecPreprocessedText",
-            base_id="Ir",
-            space=Sequence(size_range=(0, None), dtype=str),
-            translate=self.inst2vec.preprocess,
-            default_value="",
-        )
-        self.observation.add_derived_space(
-            id="Inst2vecEmbeddingIndices",
-            base_id="Ir",
-            space=Sequence(size_range=(0, None), dtype=np.int32),
-            translate=lambda base_observation: self.inst2vec.encode(
-                self.inst2vec.preprocess(base_observation)
-            ),
-            default_value=np.array([self.inst2vec.vocab["!UNK"]]),
-        )
-        self.observation.add_derived_space(
-            id="Inst2vec",
-            base_id="Ir",
-            space=Sequence(size_range=(0, None), dtype=np.ndarray),
-            translate=lambda base_observation: self.inst2vec.embed(
-                self.inst2vec.encode(self.inst2vec.preprocess(base_observation))
-            ),
-            default_value=np.vstack(
-                [self.inst2vec.embeddings[self.inst2vec.vocab["!UNK"]]]
-            ),
-        )
-
-        self.observation.add_derived_space(
-            id="InstCountDict",
-            base_id="InstCount",
-            space=DictSpace(
-                {
-                    f"{name}Count": Scalar(min=0, max=None, dtype=int)
-                    for name in INST_COUNT_FEATURE_NAMES
-                }
-            ),
-            translate=lambda base_observation: {
-                f"{name}Count": val
-                for name, val in zip(INST_COUNT_FEATURE_NAMES, base_observation)
-            },
-        )
-
-        self.observation.add_derived_space(
-            id="InstCountNorm",
-            base_id="InstCount",
-            space=Box(
-                low=0,
-                high=1,
-                shape=(len(INST_COUNT_FEATURE_NAMES) - 1,),
-                dtype=np.float32,
-            ),
-            translate=lambda base_observation: (
-                base_observation[1:] / max(base_observation[0], 1)
-            ).astype(np.float32),
-        )
-
-        self.observation.add_derived_space(
-            id="InstCountNormDict",
-            base_id="InstCountNorm",
-            space=DictSpace(
-                {
-                    f"{name}Density": Scalar(min=0, max=None, dtype=int)
-                    for name in INST_COUNT_FEATURE_NAMES[1:]
-                }
-            ),
-            translate=lambda base_observation: {
-                f"{name}Density": val
-                for name, val in zip(INST_COUNT_FEATURE_NAMES[1:], base_observation)
-            },
-        )
-
-        self.observation.add_derived_space(
-            id="AutophaseDict",
-            base_id="Autophase",
-            space=DictSpace(
-                {
-                    name: Scalar(min=0, max=None, dtype=int)
-                    for name in AUTOPHASE_FEATURE_NAMES
-                }
-            ),
-            translate=lambda base_observation: {
-                name: val
-                for name, val in zip(AUTOPHASE_FEATURE_NAMES, base_observation)
-            },
-        )
+        # The derived observation spaces are immutable, so they are created
+        # once and shared between environments.
+        for space in _get_observation_spaces(self.observation.spaces).values():
+            self.observation._add_space(space)  # pylint: disable=protected-access
 
     def reset(self, *args, **kwargs):
         try:
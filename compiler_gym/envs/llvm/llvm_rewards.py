@@ -3,7 +3,9 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """This module defines reward spaces used by the LLVM environment."""
-from typing import List, Optional
+from typing import Callable, List, Optional
+
+import numpy as np
 
 from compiler_gym.datasets import Benchmark
 from compiler_gym.spaces.reward import Reward
@@ -110,3 +112,69 @@ class BaselineImprovementNormalizedReward(NormalizedReward):
         init_cost = observation_view[self.init_cost_function]
         baseline_cost = observation_view[self.baseline_cost_function]
         return max(init_cost - baseline_cost, 1)
+
+
+class RuntimeReward(Reward):
+    """A reward function that uses the reduction in runtime of a benchmark.
+
+    Runtime observations are lists of measurements. An estimator, such as the
+    median, is used to reduce the list to a scalar runtime. The reward of a step
+    is the reduction in estimated runtime since the previous step, normalized to
+    the estimated runtime of the unoptimized benchmark.
+    """
+
+    __slots__ = [
+        "runtime_function",
+        "init_runtime_function",
+        "estimator",
+        "init_runtime",
+        "previous_runtime",
+    ]
+
+    def __init__(
+        self,
+        runtime_function: str = "Runtime",
+        init_runtime_function: str = "RuntimeO0",
+        estimator: Callable[[np.ndarray], float] = np.median,
+        **kwargs,
+    ):
+        """Constructor.
+
+        :param runtime_function: The ID of the observation space used to produce
+            runtime measurements.
+        :param init_runtime_function: The ID of an observation space that
+            produces runtime measurements of the benchmark before any actions
+            are made.
+        :param estimator: A function that reduces a list of runtime
+            measurements to a scalar runtime.
+        """
+        super().__init__(observation_spaces=[runtime_function], **kwargs)
+        self.runtime_function: str = runtime_function
+        self.init_runtime_function: str = init_runtime_function
+        self.estimator = estimator
+        self.init_runtime: Optional[float] = None
+        self.previous_runtime: Optional[float] = None
+
+    def reset(self, benchmark: Benchmark) -> None:
+        """Called on env.reset(). Reset incremental progress."""
+        del benchmark  # unused
+        self.init_runtime = None
+        self.previous_runtime = None
+
+    def update(
+        self,
+        actions: List[int],
+        observations: List[ObservationType],
+        observation_view: ObservationView,
+    ) -> RewardType:
+        """Called on env.step(). Compute and return new reward."""
+        del actions  # unused
+        runtime = float(self.estimator(observations[0]))
+        if self.init_runtime is None:
+            self.init_runtime = float(
+                self.estimator(observation_view[self.init_runtime_function])
+            )
+            self.previous_runtime = self.init_runtime
+        reward = RewardType((self.previous_runtime - runtime) / self.init_runtime)
+        self.previous_runtime = runtime
+        return reward
@@ -74,6 +74,28 @@ class BenchmarkFactory {
   [[nodiscard]] grpc::Status getBenchmark(const compiler_gym::Benchmark& benchmarkMessage,
                                           std::unique_ptr<Benchmark>* benchmark);
 
+  /**
+   * The number of bitcodes that are loaded in memory.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t loadedBenchmarksCount() const { return benchmarks_.size(); }
+
+  /**
+   * The combined size of the bitcodes that are loaded in memory, in bytes.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t loadedBenchmarksSize() const { return loadedBenchmarksSize_; }
+
+  /**
+   * The maximum combined size of the loaded bitcodes before evictions, in
+   * bytes.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t maxLoadedBenchmarksSize() const { return maxLoadedBenchmarkSize_; }
+
  private:
   [[nodiscard]] grpc::Status addBitcode(const std::string& uri, const Bitcode& bitcode);
 
@@ -0,0 +1,150 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+//
+// Compile an LLVM bitcode file using the ORC JIT and run its main() function.
+//
+// This binary is run by executeModule() in Execution.h, so that programs run in
+// a new single-threaded process rather than in a fork of the multithreaded
+// service.
+//
+// Usage:
+//
+//     $ compiler_gym-llvm-execute-module <bitcode> [args...]
+//
+// Errors that prevent the program from being run are written to file
+// descriptor 3, and the binary exits with code 127. File descriptor 3 is closed
+// before the program starts.
+#include <dirent.h>
+#include <sys/resource.h>
+#include <unistd.h>
+
+#include <cstdint>
+#include <cstdlib>
+#include <memory>
+#include <string>
+#include <vector>
+
+#include "llvm/Bitcode/BitcodeReader.h"
+#include "llvm/ExecutionEngine/Orc/ExecutionUtils.h"
+#include "llvm/ExecutionEngine/Orc/LLJIT.h"
+#include "llvm/IR/LLVMContext.h"
+#include "llvm/Support/Error.h"
+#include "llvm/Support/MemoryBuffer.h"
+#include "llvm/Support/TargetSelect.h"
+
+namespace {
+
+// The file descriptor that setup errors are written to. Keep in sync with
+// Execution.cc.
+constexpr int kSetupErrorFd = 3;
+
+// The exit code if the module could not be run. Keep in sync with
+// Execution.cc.
+constexpr int kSetupErrorExitCode = 127;
+
+[[noreturn]] void exitWithSetupError(const std::string& message) {
+  if (write(kSetupErrorFd, message.data(), message.size()) < 0) {
+    // Nothing more we can do.
+  }
+  _exit(kSetupErrorExitCode);
+}
+
+// Close every file descriptor that was inherited from the service, other than
+// stdin, stdout, stderr, and the setup error descriptor. The service may have
+// open sockets and the pipes of other concurrent executions, and a program
+// that held the write end of another execution's output pipe would prevent
+// that execution from seeing EOF.
+void closeInheritedFileDescriptors() {
+  std::vector<int> fds;
+  if (DIR* dir = opendir("/dev/fd")) {
+    while (const dirent* entry = readdir(dir)) {
+      const int fd = std::atoi(entry->d_name);
+      if (fd > kSetupErrorFd && fd != dirfd(dir)) {
+        fds.push_back(fd);
+      }
+    }
+    closedir(dir);
+  } else {
+    struct rlimit limit;
+    const int maxFd = !getrlimit(RLIMIT_NOFILE, &limit) && limit.rlim_cur != RLIM_INFINITY
+                          ? static_cast<int>(limit.rlim_cur)
+                          : 65536;
+    for (int fd = kSetupErrorFd + 1; fd < maxFd; ++fd) {
+      fds.push_back(fd);
+    }
+  }
+  for (int fd : fds) {
+    close(fd);
+  }
+}
+
+}  // anonymous namespace
+
+int main(int argc, char** argv) {
+  closeInheritedFileDescriptors();
+  if (argc < 2) {
+    exitWithSetupError("Usage: compiler_gym-llvm-execute-module <bitcode> [args...]");
+  }
+
+  llvm::InitializeNativeTarget();
+  llvm::InitializeNativeTargetAsmPrinter();
+
+  auto buffer = llvm::MemoryBuffer::getFile(argv[1]);
+  if (!buffer) {
+    exitWithSetupError("Failed to read bitcode file: " + buffer.getError().message());
+  }
+
+  auto context = std::make_unique<llvm::LLVMContext>();
+  auto module = llvm::parseBitcodeFile((*buffer)->getMemBufferRef(), *context);
+  if (!module) {
+    exitWithSetupError(llvm::toString(module.takeError()));
+  }
+
+  auto jit = llvm::orc::LLJITBuilder().create();
+  if (!jit) {
+    exitWithSetupError(llvm::toString(jit.takeError()));
+  }
+
+  // Resolve external symbols, such as libc, against the current process.
+  auto generator = llvm::orc::DynamicLibrarySearchGenerator::GetForCurrentProcess(
+      (*jit)->getDataLayout().getGlobalPrefix());
+  if (!generator) {
+    exitWithSetupError(llvm::toString(generator.takeError()));
+  }
+  (*jit)->getMainJITDylib().addGenerator(std::move(*generator));
+
+  if (auto error = (*jit)->addIRModule(
+          llvm::orc::ThreadSafeModule(std::move(*module), std::move(context)))) {
+    exitWithSetupError(llvm::toString(std::move(error)));
+  }
+
+  auto mainSymbol = (*jit)->lookup("main");
+  if (!mainSymbol) {
+    exitWithSetupError(llvm::toString(mainSymbol.takeError()));
+  }
+  if (auto error = (*jit)->runConstructors()) {
+    exitWithSetupError(llvm::toString(std::move(error)));
+  }
+  close(kSetupErrorFd);
+
+  std::vector<std::string> arguments{"benchmark"};
+  for (int i = 2; i < argc; ++i) {
+    arguments.push_back(argv[i]);
+  }
+  std::vector<char*> programArgv;
+  for (auto& argument : arguments) {
+    programArgv.push_back(argument.data());
+  }
+  programArgv.push_back(nullptr);
+
+  using MainFunction = int(int, char**);
+  auto* programMain =
+      reinterpret_cast<MainFunction*>(static_cast<uintptr_t>(mainSymbol->getAddress()));
+  const int returnCode = programMain(static_cast<int>(arguments.size()), programArgv.data());
+
+  // Exit while the JIT is still alive, since handlers that the program
+  // registered with atexit() may point into JIT-compiled code.
+  std::exit(returnCode);
+}
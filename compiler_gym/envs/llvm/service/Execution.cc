@@ -0,0 +1,302 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/envs/llvm/service/Execution.h"
+
+#include <fcntl.h>
+#include <fmt/format.h>
+#include <glog/logging.h>
+#include <poll.h>
+#include <signal.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#include <cerrno>
+#include <chrono>
+#include <cmath>
+#include <cstring>
+#include <optional>
+#include <string>
+#include <system_error>
+#include <thread>
+#include <vector>
+
+#ifdef __linux__
+#include <sys/prctl.h>
+#endif
+
+#include "compiler_gym/util/RunfilesPath.h"
+#include "llvm/Bitcode/BitcodeWriter.h"
+#include "llvm/Support/raw_ostream.h"
+
+namespace fs = boost::filesystem;
+
+using grpc::Status;
+using grpc::StatusCode;
+
+namespace compiler_gym::llvm_service {
+
+namespace {
+
+// The file descriptor that the runner binary writes setup errors to. Keep in
+// sync with ExecuteModule.cc.
+constexpr int kSetupErrorFd = 3;
+
+// The exit code of the child process if the module could not be run. Keep in
+// sync with ExecuteModule.cc.
+constexpr int kSetupErrorExitCode = 127;
+
+// Create a pipe whose file descriptors are closed on exec, so that they are not
+// inherited by the children of concurrent executions.
+int pipeCloexec(int fds[2]) {
+#ifdef __linux__
+  return pipe2(fds, O_CLOEXEC);
+#else
+  if (pipe(fds)) {
+    return -1;
+  }
+  fcntl(fds[0], F_SETFD, FD_CLOEXEC);
+  fcntl(fds[1], F_SETFD, FD_CLOEXEC);
+  return 0;
+#endif
+}
+
+// Report an error that prevented the runner binary from being executed and
+// exit. This is called in the child process between fork() and exec(), so it
+// must only call async-signal-safe functions.
+[[noreturn]] void exitWithSetupError(const char* message) {
+  if (write(kSetupErrorFd, message, strlen(message)) < 0) {
+    // Nothing more we can do.
+  }
+  _exit(kSetupErrorExitCode);
+}
+
+// Read all available data from a file descriptor until EOF.
+std::string readAll(int fd) {
+  std::string data;
+  char buffer[4096];
+  ssize_t size;
+  while ((size = read(fd, buffer, sizeof(buffer))) > 0) {
+    data.append(buffer, size);
+  }
+  return data;
+}
+
+}  // anonymous namespace
+
+Status executeModule(const llvm::Module& module, const ExecuteSessionRequest& request,
+                     const fs::path& workingDirectory, ExecuteSessionReply& reply) {
+  const fs::path runner =
+      util::getRunfilesPath("compiler_gym/envs/llvm/service/compiler_gym-llvm-execute-module");
+  if (!fs::exists(runner)) {
+    return Status(StatusCode::INTERNAL, fmt::format("File not found: {}", runner.string()));
+  }
+
+  fs::path cwd = request.working_directory();
+  std::optional<fs::path> temporaryDirectory;
+  if (cwd.empty()) {
+    temporaryDirectory = fs::unique_path(workingDirectory / "execute-%%%%-%%%%");
+    fs::create_directories(*temporaryDirectory);
+    cwd = *temporaryDirectory;
+  }
+
+  // Remove the temporary files on every return path.
+  const fs::path bitcodePath = fs::unique_path(workingDirectory / "execute-%%%%-%%%%.bc");
+  struct TemporaryFilesGuard {
+    const fs::path& bitcodePath;
+    const std::optional<fs::path>& temporaryDirectory;
+    ~TemporaryFilesGuard() {
+      boost::system::error_code ec;
+      fs::remove(bitcodePath, ec);
+      if (temporaryDirectory.has_value()) {
+        fs::remove_all(*temporaryDirectory, ec);
+      }
+    }
+  } temporaryFilesGuard{bitcodePath, temporaryDirectory};
+
+  // Serialize the module for the runner binary. The bitcode is written to the
+  // service working directory so that the program's working directory is not
+  // modified.
+  {
+    std::error_code error;
+    llvm::raw_fd_ostream bitcodeStream(bitcodePath.string(), error);
+    if (error) {
+      return Status(StatusCode::INTERNAL,
+                    fmt::format("Failed to write bitcode file: {}", error.message()));
+    }
+    llvm::WriteBitcodeToFile(module, bitcodeStream);
+    bitcodeStream.close();
+    if (bitcodeStream.has_error()) {
+      bitcodeStream.clear_error();
+      return Status(StatusCode::INTERNAL, "Failed to write bitcode file");
+    }
+  }
+
+  // Prepare everything that the child process needs before forking, since
+  // only async-signal-safe functions may be called in the child of a
+  // multithreaded process.
+  std::vector<std::string> arguments{runner.string(), bitcodePath.string()};
+  arguments.insert(arguments.end(), request.argument().begin(), request.argument().end());
+  std::vector<char*> argv;
+  for (auto& argument : arguments) {
+    argv.push_back(argument.data());
+  }
+  argv.push_back(nullptr);
+
+  // The program environment contains only the requested variables.
+  std::vector<std::string> environment;
+  for (const auto& [name, value] : request.environment_variable()) {
+    environment.push_back(name + "=" + value);
+  }
+  std::vector<char*> envp;
+  for (auto& variable : environment) {
+    envp.push_back(variable.data());
+  }
+  envp.push_back(nullptr);
+
+  const std::string cwdString = cwd.string();
+
+  // Sandbox limits. The CPU time limit is a backstop for the wall time limit
+  // that is enforced below.
+  const bool hasTimeout = request.timeout_seconds() > 0;
+  const struct rlimit noCoreDumps = {0, 0};
+  const rlim_t cpuSeconds =
+      hasTimeout ? static_cast<rlim_t>(std::ceil(request.timeout_seconds())) + 1 : RLIM_INFINITY;
+  const struct rlimit cpuLimit = {cpuSeconds, cpuSeconds};
+
+  const int devNull = open("/dev/null", O_RDONLY | O_CLOEXEC);
+  if (devNull < 0) {
+    return Status(StatusCode::INTERNAL, "Failed to open /dev/null");
+  }
+  int outputPipe[2];
+  int errorPipe[2];
+  if (pipeCloexec(outputPipe)) {
+    close(devNull);
+    return Status(StatusCode::INTERNAL, "Failed to create output pipe");
+  }
+  if (pipeCloexec(errorPipe)) {
+    for (int fd : {devNull, outputPipe[0], outputPipe[1]}) {
+      close(fd);
+    }
+    return Status(StatusCode::INTERNAL, "Failed to create error pipe");
+  }
+
+  const auto startTime = std::chrono::steady_clock::now();
+  const auto deadline =
+      startTime + std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                      std::chrono::duration<double>(request.timeout_seconds()));
+
+  const pid_t pid = fork();
+  if (pid < 0) {
+    for (int fd : {devNull, outputPipe[0], outputPipe[1], errorPipe[0], errorPipe[1]}) {
+      close(fd);
+    }
+    return Status(StatusCode::INTERNAL, "fork() failed");
+  }
+  if (pid == 0) {
+#ifdef __linux__
+    // Do not outlive the service.
+    prctl(PR_SET_PDEATHSIG, SIGKILL);
+#endif
+    setpgid(0, 0);
+    // Redirect stdout and stderr to the output pipe, stdin from /dev/null, and
+    // the setup error descriptor to the error pipe. dup2() clears the
+    // close-on-exec flag of the new descriptors. If the error pipe is already
+    // descriptor 3, dup2() is a no-op, so clear its flag explicitly.
+    dup2(outputPipe[1], STDOUT_FILENO);
+    dup2(outputPipe[1], STDERR_FILENO);
+    dup2(devNull, STDIN_FILENO);
+    if (errorPipe[1] == kSetupErrorFd) {
+      fcntl(kSetupErrorFd, F_SETFD, 0);
+    } else if (dup2(errorPipe[1], kSetupErrorFd) < 0) {
+      _exit(kSetupErrorExitCode);
+    }
+    if (chdir(cwdString.c_str())) {
+      exitWithSetupError("Failed to change to working directory");
+    }
+    setrlimit(RLIMIT_CORE, &noCoreDumps);
+    if (hasTimeout) {
+      setrlimit(RLIMIT_CPU, &cpuLimit);
+    }
+    // Any other inherited descriptors that are not closed on exec are closed
+    // by the runner before the program starts.
+    execve(argv[0], argv.data(), envp.data());
+    exitWithSetupError("Failed to execute compiler_gym-llvm-execute-module");
+  }
+  // Set the process group of the child from both processes to avoid a race.
+  setpgid(pid, pid);
+  close(devNull);
+  close(outputPipe[1]);
+  close(errorPipe[1]);
+
+  // Read the program output until EOF or the timeout.
+  std::string output;
+  bool timedOut = false;
+  char buffer[4096];
+  while (true) {
+    int pollTimeoutMs = -1;
+    if (hasTimeout) {
+      const auto remaining = deadline - std::chrono::steady_clock::now();
+      if (remaining <= std::chrono::steady_clock::duration::zero()) {
+        timedOut = true;
+        break;
+      }
+      pollTimeoutMs = static_cast<int>(
+          std::chrono::duration_cast<std::chrono::milliseconds>(remaining).count() + 1);
+    }
+    struct pollfd pollFd = {outputPipe[0], POLLIN, 0};
+    const int ready = poll(&pollFd, 1, pollTimeoutMs);
+    if (ready < 0 && errno == EINTR) {
+      continue;
+    } else if (ready < 0) {
+      break;
+    } else if (ready == 0) {
+      continue;
+    }
+    const ssize_t size = read(outputPipe[0], buffer, sizeof(buffer));
+    if (size <= 0) {
+      break;
+    }
+    output.append(buffer, size);
+  }
+
+  // Wait for the child to exit. It may have closed its output before exiting.
+  int status = 0;
+  while (!timedOut && waitpid(pid, &status, WNOHANG) == 0) {
+    if (hasTimeout && std::chrono::steady_clock::now() >= deadline) {
+      timedOut = true;
+      break;
+    }
+    std::this_thread::sleep_for(std::chrono::milliseconds(1));
+  }
+  if (timedOut) {
+    kill(-pid, SIGKILL);
+    kill(pid, SIGKILL);
+    waitpid(pid, &status, 0);
+  }
+  const auto endTime = std::chrono::steady_clock::now();
+
+  const std::string setupError = readAll(errorPipe[0]);
+  close(outputPipe[0]);
+  close(errorPipe[0]);
+
+  if (!setupError.empty()) {
+    return Status(StatusCode::UNIMPLEMENTED, fmt::format("JIT execution failed: {}", setupError));
+  }
+
+  if (WIFEXITED(status)) {
+    reply.set_exit_code(WEXITSTATUS(status));
+  } else if (WIFSIGNALED(status)) {
+    reply.set_exit_code(128 + WTERMSIG(status));
+  }
+  reply.set_output(output);
+  reply.set_walltime_seconds(std::chrono::duration<double>(endTime - startTime).count());
+  reply.set_timed_out(timedOut);
+  VLOG(2) << "Executed module in " << reply.walltime_seconds() << "s, exit code "
+          << reply.exit_code();
+  return Status::OK;
+}
+
+}  // namespace compiler_gym::llvm_service
@@ -0,0 +1,44 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <grpcpp/grpcpp.h>
+
+#include "boost/filesystem.hpp"
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+#include "llvm/IR/Module.h"
+
+namespace compiler_gym::llvm_service {
+
+/**
+ * Compile an LLVM module using the ORC JIT and run its `main()` function.
+ *
+ * The module is serialized to bitcode and run by the
+ * `compiler_gym-llvm-execute-module` binary in a child process, so that a crash
+ * of the program does not affect the caller, and so that the program does not
+ * run in a fork of the multithreaded caller. The child process runs in its own
+ * process group with core dumps disabled and an environment that contains only
+ * the variables of the request. It does not inherit any file descriptors other
+ * than stdin, stdout, and stderr, and is killed if it exceeds the timeout of
+ * the request. External symbols are resolved against the libraries that are
+ * loaded in the child process.
+ *
+ * @param module The module to run.
+ * @param request The execution request, which provides the program arguments,
+ *    working directory, environment variables, and timeout.
+ * @param workingDirectory A directory in which a temporary working directory
+ *    is created if the request does not set one.
+ * @param reply The execution result.
+ * @return `OK` if the program was run, regardless of its exit code,
+ *    `UNIMPLEMENTED` if the module could not be compiled by the JIT, for
+ *    example because of an unresolved external symbol, or `INTERNAL` if the
+ *    child process could not be created or the runner binary is not found.
+ */
+[[nodiscard]] grpc::Status executeModule(const llvm::Module& module,
+                                         const ExecuteSessionRequest& request,
+                                         const boost::filesystem::path& workingDirectory,
+                                         ExecuteSessionReply& reply);
+
+}  // namespace compiler_gym::llvm_service
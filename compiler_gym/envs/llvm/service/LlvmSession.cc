@@ -8,6 +8,8 @@
 #include <fmt/format.h>
 #include <glog/logging.h>
 
+#include <chrono>
+#include <cstring>
 #include <iomanip>
 #include <optional>
 #include <subprocess/subprocess.hpp>
@@ -17,7 +19,9 @@
 #include "compiler_gym/envs/llvm/service/Benchmark.h"
 #include "compiler_gym/envs/llvm/service/BenchmarkFactory.h"
 #include "compiler_gym/envs/llvm/service/Cost.h"
+#include "compiler_gym/envs/llvm/service/Execution.h"
 #include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+#include "compiler_gym/envs/llvm/service/Runtime.h"
 #include "compiler_gym/envs/llvm/service/passes/ActionHeaders.h"
 #include "compiler_gym/envs/llvm/service/passes/ActionSwitch.h"
 #include "compiler_gym/third_party/autophase/InstCount.h"
@@ -51,6 +55,13 @@ using ActionSpaceProto = compiler_gym::ActionSpace;
 
 namespace {
 
+using Clock = std::chrono::steady_clock;
+
+// Return the wall time in seconds that has elapsed since a start time.
+double secondsSince(Clock::time_point startTime) {
+  return std::chrono::duration<double>(Clock::now() - startTime).count();
+}
+
 // Return the target library information for a module.
 llvm::TargetLibraryInfoImpl getTargetLibraryInfo(llvm::Module& module) {
   llvm::Triple triple(module.getTargetTriple());
@@ -109,6 +120,30 @@ Status writeBitcodeToFile(const llvm::Module& module, const fs::path& path) {
   return Status::OK;
 }
 
+// The serialized state of a session is:
+//
+//     [action space: int32][baseline costs: numBaselineCosts * double]
+//     [name size: uint64][name][benchmark size: uint64][benchmark][bitcode]
+//
+// where benchmark is the serialized Benchmark message that is used to measure
+// runtimes, or empty if the benchmark cannot be run.
+//
+// using the native byte order.
+template <typename T>
+void appendValue(std::string& state, const T& value) {
+  state.append(reinterpret_cast<const char*>(&value), sizeof(T));
+}
+
+template <typename T>
+Status readValue(const std::string& state, size_t& offset, T* value) {
+  if (offset + sizeof(T) > state.size()) {
+    return Status(StatusCode::INVALID_ARGUMENT, "Truncated session state");
+  }
+  std::memcpy(value, state.data() + offset, sizeof(T));
+  offset += sizeof(T);
+  return Status::OK;
+}
+
 }  // anonymous namespace
 
 std::string LlvmSession::getCompilerVersion() const {
@@ -143,15 +178,112 @@ Status LlvmSession::init(const ActionSpace& actionSpace, const BenchmarkProto& b
   LlvmActionSpace actionSpaceEnum;
   RETURN_IF_ERROR(util::pascalCaseToEnum(actionSpace.name(), &actionSpaceEnum));
 
+  // Keep the benchmark definition if it can be run, so that the runtime of the
+  // unoptimized benchmark can be measured later.
+  if (benchmark.dynamic_config().run_size()) {
+    runtimeBenchmark_ = benchmark;
+  }
+
   return init(actionSpaceEnum, std::move(llvmBenchmark));
 }
 
 Status LlvmSession::init(CompilationSession* other) {
   // TODO: Static cast?
   auto llvmOther = static_cast<LlvmSession*>(other);
+  runtimeBenchmark_ = llvmOther->runtimeBenchmark_;
+  runtimeConfig_ = llvmOther->runtimeConfig_;
   return init(llvmOther->actionSpace(), llvmOther->benchmark().clone(workingDirectory()));
 }
 
+Status LlvmSession::saveState(std::string& state) {
+  DCHECK(benchmark_) << "Calling saveState() before init()";
+
+  Bitcode bitcode;
+  llvm::raw_svector_ostream ostream(bitcode);
+  llvm::WriteBitcodeToFile(benchmark().module(), ostream);
+
+  std::string runtimeBenchmark;
+  if (runtimeBenchmark_.has_value()) {
+    runtimeBenchmark_->SerializeToString(&runtimeBenchmark);
+  }
+
+  state.clear();
+  state.reserve(sizeof(int32_t) + sizeof(BaselineCosts) + 2 * sizeof(uint64_t) +
+                benchmark().name().size() + runtimeBenchmark.size() + bitcode.size());
+  appendValue(state, static_cast<int32_t>(actionSpace()));
+  appendValue(state, benchmark().baselineCosts());
+  appendValue(state, static_cast<uint64_t>(benchmark().name().size()));
+  state.append(benchmark().name());
+  appendValue(state, static_cast<uint64_t>(runtimeBenchmark.size()));
+  state.append(runtimeBenchmark);
+  state.append(bitcode.data(), bitcode.size());
+  return Status::OK;
+}
+
+Status LlvmSession::loadState(const std::string& state) {
+  size_t offset = 0;
+  int32_t actionSpaceValue;
+  BaselineCosts baselineCosts;
+  uint64_t nameSize;
+  RETURN_IF_ERROR(readValue(state, offset, &actionSpaceValue));
+  RETURN_IF_ERROR(readValue(state, offset, &baselineCosts));
+  RETURN_IF_ERROR(readValue(state, offset, &nameSize));
+  if (offset + nameSize > state.size()) {
+    return Status(StatusCode::INVALID_ARGUMENT, "Truncated session state");
+  }
+  const std::string name = state.substr(offset, nameSize);
+  offset += nameSize;
+
+  uint64_t runtimeBenchmarkSize;
+  RETURN_IF_ERROR(readValue(state, offset, &runtimeBenchmarkSize));
+  if (offset + runtimeBenchmarkSize > state.size()) {
+    return Status(StatusCode::INVALID_ARGUMENT, "Truncated session state");
+  }
+  if (runtimeBenchmarkSize) {
+    BenchmarkProto runtimeBenchmark;
+    if (!runtimeBenchmark.ParseFromArray(state.data() + offset, runtimeBenchmarkSize)) {
+      return Status(StatusCode::INVALID_ARGUMENT, "Invalid benchmark in session state");
+    }
+    runtimeBenchmark_ = runtimeBenchmark;
+  }
+  offset += runtimeBenchmarkSize;
+
+  LlvmActionSpace actionSpace;
+  RETURN_IF_ERROR(util::intToEnum(actionSpaceValue, &actionSpace));
+
+  const Bitcode bitcode(llvm::StringRef(state.data() + offset, state.size() - offset));
+  Status status;
+  auto context = std::make_unique<llvm::LLVMContext>();
+  std::unique_ptr<llvm::Module> module = makeModule(*context, bitcode, name, &status);
+  RETURN_IF_ERROR(status);
+
+  return init(actionSpace,
+              std::make_unique<Benchmark>(name, std::move(context), std::move(module),
+                                          bitcode.size(), workingDirectory(), baselineCosts));
+}
+
+Status LlvmSession::execute(const ExecuteSessionRequest& request, ExecuteSessionReply& reply) {
+  DCHECK(benchmark_) << "Calling execute() before init()";
+  return executeModule(benchmark().module(), request, workingDirectory(), reply);
+}
+
+Status LlvmSession::handleSessionParameter(const std::string& key, const std::string& value,
+                                           std::string& reply) {
+  return setRuntimeConfigParameter(runtimeConfig_, key, value, reply);
+}
+
+std::map<std::string, double> LlvmSession::getCompilerStats() const {
+  const BenchmarkFactory& benchmarkFactory = BenchmarkFactory::getSingleton(workingDirectory());
+  return {
+      {"llvm.benchmark_factory.loaded_benchmarks",
+       static_cast<double>(benchmarkFactory.loadedBenchmarksCount())},
+      {"llvm.benchmark_factory.loaded_bitcode_bytes",
+       static_cast<double>(benchmarkFactory.loadedBenchmarksSize())},
+      {"llvm.benchmark_factory.max_loaded_bitcode_bytes",
+       static_cast<double>(benchmarkFactory.maxLoadedBenchmarksSize())},
+  };
+}
+
 Status LlvmSession::init(const LlvmActionSpace& actionSpace, std::unique_ptr<Benchmark> benchmark) {
   benchmark_ = std::move(benchmark);
   actionSpace_ = actionSpace;
@@ -182,9 +314,14 @@ Status LlvmSession::endOfStep(bool actionHadNoEffect, bool& endOfEpisode,
                               std::optional<ActionSpace>& newActionSpace) {
   if (actionHadNoEffect) {
     return Status::OK;
-  } else {
+  }
+  if (!recordingTimings()) {
     return benchmark().verify_module();
   }
+  const auto startTime = Clock::now();
+  const Status status = benchmark().verify_module();
+  recordTiming("llvm.verify_module", secondsSince(startTime));
+  return status;
 }
 
 Status LlvmSession::computeObservation(const ObservationSpace& observationSpace,
@@ -295,9 +432,13 @@ Status LlvmSession::computeObservation(LlvmObservationSpace space, Observation&
   switch (space) {
     case LlvmObservationSpace::IR: {
       // Serialize the LLVM module to an IR string.
+      const auto startTime = recordingTimings() ? Clock::now() : Clock::time_point();
       std::string ir;
       llvm::raw_string_ostream rso(ir);
       benchmark().module().print(rso, /*AAW=*/nullptr);
+      if (recordingTimings()) {
+        recordTiming("llvm.ir.print", secondsSince(startTime));
+      }
       reply.set_string_value(ir);
       break;
     }
@@ -332,12 +473,17 @@ Status LlvmSession::computeObservation(LlvmObservationSpace space, Observation&
     }
     case LlvmObservationSpace::PROGRAML: {
       // Build the ProGraML graph.
+      auto startTime = recordingTimings() ? Clock::now() : Clock::time_point();
       programl::ProgramGraph graph;
       auto status =
           programl::ir::llvm::BuildProgramGraph(benchmark().module(), &graph, programlOptions_);
       if (!status.ok()) {
         return Status(StatusCode::INTERNAL, status.error_message());
       }
+      if (recordingTimings()) {
+        recordTiming("llvm.programl.build", secondsSince(startTime));
+        startTime = Clock::now();
+      }
 
       // Serialize the graph to a JSON node link graph.
       json nodeLinkGraph;
@@ -346,6 +492,9 @@ Status LlvmSession::computeObservation(LlvmObservationSpace space, Observation&
         return Status(StatusCode::INTERNAL, status.error_message());
       }
       *reply.mutable_string_value() = nodeLinkGraph.dump();
+      if (recordingTimings()) {
+        recordTiming("llvm.programl.serialize", secondsSince(startTime));
+      }
       break;
     }
     case LlvmObservationSpace::CPU_INFO: {
@@ -450,6 +599,32 @@ Status LlvmSession::computeObservation(LlvmObservationSpace space, Observation&
       break;
     }
 #endif
+    case LlvmObservationSpace::RUNTIME: {
+      std::vector<double> measurements;
+      RETURN_IF_ERROR(measureRuntime(benchmark().module(), benchmark().module_hash(),
+                                     runtimeBenchmark_.has_value()
+                                         ? runtimeBenchmark_->dynamic_config()
+                                         : BenchmarkDynamicConfig::default_instance(),
+                                     runtimeConfig_, workingDirectory(), measurements));
+      *reply.mutable_double_list()->mutable_value() = {measurements.begin(), measurements.end()};
+      break;
+    }
+    case LlvmObservationSpace::RUNTIME_O0: {
+      if (!runtimeBenchmark_.has_value()) {
+        return Status(StatusCode::INVALID_ARGUMENT,
+                      "Benchmark does not support runtime measurements, no runs are configured");
+      }
+      // Measure a fresh copy of the benchmark that has not been optimized.
+      std::unique_ptr<Benchmark> unoptimized;
+      RETURN_IF_ERROR(BenchmarkFactory::getSingleton(workingDirectory())
+                          .getBenchmark(*runtimeBenchmark_, &unoptimized));
+      std::vector<double> measurements;
+      RETURN_IF_ERROR(measureRuntime(unoptimized->module(), unoptimized->module_hash(),
+                                     runtimeBenchmark_->dynamic_config(), runtimeConfig_,
+                                     workingDirectory(), measurements));
+      *reply.mutable_double_list()->mutable_value() = {measurements.begin(), measurements.end()};
+      break;
+    }
   }
 
   return Status::OK;
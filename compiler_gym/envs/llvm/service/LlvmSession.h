@@ -8,6 +8,7 @@
 #include <grpcpp/grpcpp.h>
 
 #include <magic_enum.hpp>
+#include <map>
 #include <memory>
 #include <optional>
 #include <unordered_map>
@@ -16,6 +17,7 @@
 #include "compiler_gym/envs/llvm/service/Benchmark.h"
 #include "compiler_gym/envs/llvm/service/Cost.h"
 #include "compiler_gym/envs/llvm/service/ObservationSpaces.h"
+#include "compiler_gym/envs/llvm/service/Runtime.h"
 #include "compiler_gym/service/CompilationSession.h"
 #include "compiler_gym/service/proto/compiler_gym_service.grpc.pb.h"
 #include "llvm/Analysis/ProfileSummaryInfo.h"
@@ -50,6 +52,19 @@ class LlvmSession final : public CompilationSession {
 
   [[nodiscard]] grpc::Status init(CompilationSession* other) final override;
 
+  [[nodiscard]] grpc::Status saveState(std::string& state) final override;
+
+  [[nodiscard]] grpc::Status loadState(const std::string& state) final override;
+
+  [[nodiscard]] grpc::Status execute(const ExecuteSessionRequest& request,
+                                     ExecuteSessionReply& reply) final override;
+
+  [[nodiscard]] grpc::Status handleSessionParameter(const std::string& key,
+                                                    const std::string& value,
+                                                    std::string& reply) final override;
+
+  std::map<std::string, double> getCompilerStats() const final override;
+
   [[nodiscard]] grpc::Status applyAction(const Action& action, bool& endOfEpisode,
                                          std::optional<ActionSpace>& newActionSpace,
                                          bool& actionHadNoEffect) final override;
@@ -128,6 +143,10 @@ class LlvmSession final : public CompilationSession {
   LlvmActionSpace actionSpace_;
   std::unique_ptr<Benchmark> benchmark_;
   llvm::TargetLibraryInfoImpl tlii_;
+  // The benchmark definition, if the benchmark can be run to measure runtime.
+  std::optional<compiler_gym::Benchmark> runtimeBenchmark_;
+  // The settings used to measure runtime, configured by session parameters.
+  RuntimeConfig runtimeConfig_;
 };
 
 }  // namespace compiler_gym::llvm_service
@@ -147,6 +147,18 @@ std::vector<ObservationSpace> getLlvmObservationSpaceList() {
         break;
       }
 #endif
+      case LlvmObservationSpace::RUNTIME:
+      case LlvmObservationSpace::RUNTIME_O0: {
+        // The number of measurements is configurable, so a single range is
+        // used to describe the bounds of every element.
+        ScalarRange measurementRange;
+        measurementRange.mutable_min()->set_value(0);
+        *space.mutable_double_range_list()->add_range() = measurementRange;
+        space.set_deterministic(false);
+        space.set_platform_dependent(true);
+        space.mutable_default_value()->mutable_double_list();
+        break;
+      }
     }
     spaces.push_back(space);
   }
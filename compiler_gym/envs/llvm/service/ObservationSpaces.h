@@ -82,6 +82,15 @@ enum class LlvmObservationSpace {
   /** The platform-dependent size of the .text section of the compiled binary. */
   TEXT_SIZE_OZ,
 #endif
+  /**
+   * A list of wall time measurements of the compiled benchmark, in seconds.
+   *
+   * The number of measurements, warmup runs, and other settings are
+   * configured using session parameters.
+   */
+  RUNTIME,
+  /** A list of wall time measurements of the unoptimized benchmark. */
+  RUNTIME_O0,
 };
 
 /** Return the list of available observation spaces. */
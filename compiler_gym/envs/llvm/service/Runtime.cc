@@ -0,0 +1,517 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/envs/llvm/service/Runtime.h"
+
+#include <fcntl.h>
+#include <fmt/format.h>
+#include <glog/logging.h>
+#include <sched.h>
+#include <signal.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#include <atomic>
+#include <cerrno>
+#include <chrono>
+#include <condition_variable>
+#include <cstring>
+#include <fstream>
+#include <functional>
+#include <iomanip>
+#include <list>
+#include <mutex>
+#include <optional>
+#include <sstream>
+#include <subprocess/subprocess.hpp>
+#include <thread>
+#include <unordered_map>
+
+#include "compiler_gym/util/GrpcStatusMacros.h"
+#include "compiler_gym/util/RunfilesPath.h"
+#include "llvm/Support/raw_ostream.h"
+
+namespace fs = boost::filesystem;
+
+using grpc::Status;
+using grpc::StatusCode;
+
+namespace compiler_gym::llvm_service {
+
+namespace {
+
+// The maximum number of binaries to keep on disk. Binaries are evicted in
+// least-recently-used order.
+constexpr size_t kMaxCachedBinaries = 128;
+
+// The maximum number of bytes of program output to include in error messages.
+constexpr size_t kMaxErrorOutputSize = 1024;
+
+// The exit code of the child process if the binary could not be run.
+constexpr int kSetupErrorExitCode = 127;
+
+// The largest CPU number that can be used for CPU affinity. This matches
+// CPU_SETSIZE on Linux.
+constexpr int kMaxCpuNumber = 1023;
+
+Status parseInt(const std::string& key, const std::string& value, int minValue, int maxValue,
+                int* result) {
+  try {
+    size_t end;
+    *result = std::stoi(value, &end);
+    if (end != value.size()) {
+      throw std::invalid_argument(value);
+    }
+  } catch (std::exception const& e) {
+    return Status(StatusCode::INVALID_ARGUMENT,
+                  fmt::format("Invalid value for session parameter {}: \"{}\"", key, value));
+  }
+  if (*result < minValue || *result > maxValue) {
+    return Status(StatusCode::INVALID_ARGUMENT,
+                  fmt::format("Session parameter {} must be in the range [{}, {}], got {}", key,
+                              minValue, maxValue, *result));
+  }
+  return Status::OK;
+}
+
+// Return the number of CPUs that this process may run on.
+int getAvailableCpuCount() {
+#ifdef __linux__
+  cpu_set_t cpus;
+  CPU_ZERO(&cpus);
+  if (!sched_getaffinity(0, sizeof(cpus), &cpus)) {
+    return CPU_COUNT(&cpus);
+  }
+#endif
+  return std::max(static_cast<int>(std::thread::hardware_concurrency()), 1);
+}
+
+// Hex encode a module hash.
+std::string hashToString(const BenchmarkHash& hash) {
+  std::stringstream ss;
+  for (uint32_t val : hash) {
+    ss << std::setfill('0') << std::setw(sizeof(BenchmarkHash::value_type) * 2) << std::hex << val;
+  }
+  return ss.str();
+}
+
+// A cache of compiled binaries, keyed by module hash and link arguments.
+//
+// The binaries are stored in the working directory of the service so that they
+// are shared by all sessions.
+class BinaryCache {
+ public:
+  static BinaryCache& getSingleton() {
+    static BinaryCache cache;
+    return cache;
+  }
+
+  Status getBinary(const llvm::Module& module, const BenchmarkHash& moduleHash,
+                   const BenchmarkDynamicConfig& dynamicConfig, const fs::path& workingDirectory,
+                   fs::path& binary) {
+    std::vector<std::string> linkArguments{dynamicConfig.link_argument().begin(),
+                                           dynamicConfig.link_argument().end()};
+    std::string joinedLinkArguments;
+    for (const auto& argument : linkArguments) {
+      joinedLinkArguments += argument + '\n';
+    }
+    const std::string key = fmt::format("{}-{:016x}", hashToString(moduleHash),
+                                        std::hash<std::string>{}(joinedLinkArguments));
+    binary = workingDirectory / "runtime-binaries" / key;
+
+    if (touch(key) && fs::exists(binary)) {
+      VLOG(3) << "Runtime binary cache hit: " << key;
+      return Status::OK;
+    }
+
+    VLOG(3) << "Runtime binary cache miss: " << key;
+    RETURN_IF_ERROR(compile(module, linkArguments, binary));
+    insert(key, binary);
+    return Status::OK;
+  }
+
+ private:
+  // Mark a key as recently used. Returns whether the key is in the cache.
+  bool touch(const std::string& key) {
+    const std::lock_guard<std::mutex> lock(mutex_);
+    auto it = entries_.find(key);
+    if (it == entries_.end()) {
+      return false;
+    }
+    order_.splice(order_.begin(), order_, it->second.first);
+    return true;
+  }
+
+  void insert(const std::string& key, const fs::path& binary) {
+    const std::lock_guard<std::mutex> lock(mutex_);
+    if (entries_.find(key) != entries_.end()) {
+      return;
+    }
+    order_.push_front(key);
+    entries_[key] = {order_.begin(), binary};
+    while (order_.size() > kMaxCachedBinaries) {
+      auto evicted = entries_.find(order_.back());
+      boost::system::error_code ec;
+      fs::remove(evicted->second.second, ec);
+      entries_.erase(evicted);
+      order_.pop_back();
+    }
+  }
+
+  static Status compile(const llvm::Module& module, const std::vector<std::string>& linkArguments,
+                        const fs::path& binary) {
+    const auto clangPath = util::getSiteDataPath("llvm-v0/bin/clang");
+    DCHECK(fs::exists(clangPath)) << fmt::format("File not found: {}", clangPath.string());
+
+    std::string ir;
+    llvm::raw_string_ostream rso(ir);
+    module.print(rso, /*AAW=*/nullptr);
+    rso.flush();
+
+    fs::create_directories(binary.parent_path());
+    // Compile to a temporary path and rename it into place so that a
+    // concurrent compilation of the same module never observes a partially
+    // written binary.
+    const auto tmpBinary = fs::unique_path(binary.parent_path() / "tmp-%%%%-%%%%");
+
+    // -disable-llvm-passes prevents clang from optimizing the IR so that the
+    // binary reflects the optimizations that were applied in the session,
+    // while still using an optimizing code generator.
+    std::vector<std::string> clangCmd{clangPath.string(),
+                                      "-w",
+                                      "-O2",
+                                      "-Xclang",
+                                      "-disable-llvm-passes",
+                                      "-xir",
+                                      "-",
+                                      "-o",
+                                      tmpBinary.string()};
+    clangCmd.insert(clangCmd.end(), linkArguments.begin(), linkArguments.end());
+    auto clang =
+        subprocess::Popen(clangCmd, subprocess::input{subprocess::PIPE},
+                          subprocess::output{subprocess::PIPE}, subprocess::error{subprocess::PIPE});
+    const auto clangOutput = clang.communicate(ir.c_str(), ir.size());
+    if (clang.retcode()) {
+      boost::system::error_code ec;
+      fs::remove(tmpBinary, ec);
+      const std::string error(clangOutput.second.buf.begin(), clangOutput.second.buf.end());
+      return Status(StatusCode::INVALID_ARGUMENT,
+                    fmt::format("Failed to compile benchmark binary.\nError from clang:\n{}", error));
+    }
+    fs::rename(tmpBinary, binary);
+    return Status::OK;
+  }
+
+  std::mutex mutex_;
+  // Keys in most-recently-used order.
+  std::list<std::string> order_;
+  std::unordered_map<std::string, std::pair<std::list<std::string>::iterator, fs::path>> entries_;
+};
+
+// Read up to kMaxErrorOutputSize bytes from the end of a file.
+std::string readOutputTail(const fs::path& path) {
+  std::ifstream file(path.string(), std::ios::binary | std::ios::ate);
+  if (!file) {
+    return "";
+  }
+  const std::streamoff size = file.tellg();
+  const std::streamoff start = std::max<std::streamoff>(0, size - kMaxErrorOutputSize);
+  file.seekg(start);
+  std::string output(static_cast<size_t>(size - start), '\0');
+  file.read(output.data(), output.size());
+  return output;
+}
+
+// Run a binary once and measure its wall time.
+//
+// The binary is run in a new process group in the given working directory,
+// with its output written to outputPath. The child process is pinned to `cpu`
+// if set, and its priority is set to `niceness`.
+Status runBinary(const fs::path& binary, const BenchmarkRun& run, const fs::path& cwd,
+                 const fs::path& outputPath, std::optional<int> cpu, int niceness,
+                 double timeoutSeconds, double& walltimeSeconds) {
+  for (const auto& [name, contents] : run.file()) {
+    std::ofstream file((cwd / name).string(), std::ios::binary);
+    file << contents;
+    if (!file) {
+      return Status(StatusCode::INTERNAL, fmt::format("Failed to write file: {}", name));
+    }
+  }
+
+  // Prepare everything that the child process needs before forking, since
+  // only async-signal-safe functions may be called in the child of a
+  // multithreaded process.
+  std::vector<std::string> arguments{binary.string()};
+  arguments.insert(arguments.end(), run.argument().begin(), run.argument().end());
+  std::vector<char*> argv;
+  for (auto& argument : arguments) {
+    argv.push_back(argument.data());
+  }
+  argv.push_back(nullptr);
+
+  std::vector<std::string> environment;
+  for (const auto& [name, value] : run.environment_variable()) {
+    environment.push_back(name + "=" + value);
+  }
+  std::vector<char*> envp;
+  for (auto& variable : environment) {
+    envp.push_back(variable.data());
+  }
+  envp.push_back(nullptr);
+
+  const std::string cwdString = cwd.string();
+  // The output file is close-on-exec so that it is not inherited by binaries
+  // that are started concurrently by other threads. The duplicates that the
+  // child makes for its stdout and stderr do not inherit the flag.
+  const int outputFd =
+      open(outputPath.string().c_str(), O_WRONLY | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+  if (outputFd < 0) {
+    return Status(StatusCode::INTERNAL, "Failed to open benchmark output file");
+  }
+  // The child writes to the error pipe only if it fails to exec the binary.
+  // The write end is closed automatically by a successful exec.
+  int errorPipe[2];
+#ifdef __linux__
+  const int pipeError = pipe2(errorPipe, O_CLOEXEC);
+#else
+  const int pipeError = pipe(errorPipe);
+  if (!pipeError) {
+    fcntl(errorPipe[0], F_SETFD, FD_CLOEXEC);
+    fcntl(errorPipe[1], F_SETFD, FD_CLOEXEC);
+  }
+#endif
+  if (pipeError) {
+    close(outputFd);
+    return Status(StatusCode::INTERNAL, "Failed to create error pipe");
+  }
+  fcntl(errorPipe[0], F_SETFL, O_NONBLOCK);
+
+  const auto startTime = std::chrono::steady_clock::now();
+  const pid_t pid = fork();
+  if (pid < 0) {
+    for (int fd : {outputFd, errorPipe[0], errorPipe[1]}) {
+      close(fd);
+    }
+    return Status(StatusCode::INTERNAL, "fork() failed");
+  }
+  if (pid == 0) {
+    setpgid(0, 0);
+    auto fail = [&](const char* message) {
+      if (write(errorPipe[1], message, strlen(message)) < 0) {
+        // Nothing more we can do.
+      }
+      _exit(kSetupErrorExitCode);
+    };
+#ifdef __linux__
+    if (cpu.has_value()) {
+      cpu_set_t cpus;
+      CPU_ZERO(&cpus);
+      CPU_SET(*cpu, &cpus);
+      if (sched_setaffinity(0, sizeof(cpus), &cpus)) {
+        fail("Failed to set CPU affinity");
+      }
+    }
+#endif
+    if (niceness && setpriority(PRIO_PROCESS, 0, niceness)) {
+      fail("Failed to set process priority");
+    }
+    const int devNull = open("/dev/null", O_RDONLY | O_CLOEXEC);
+    if (devNull >= 0) {
+      dup2(devNull, STDIN_FILENO);
+    }
+    dup2(outputFd, STDOUT_FILENO);
+    dup2(outputFd, STDERR_FILENO);
+    if (chdir(cwdString.c_str())) {
+      fail("Failed to change to working directory");
+    }
+    execve(argv[0], argv.data(), envp.data());
+    fail("Failed to execute binary");
+  }
+  // Set the process group of the child from both processes to avoid a race.
+  setpgid(pid, pid);
+  close(outputFd);
+  close(errorPipe[1]);
+
+  // Kill the process group if the run exceeds the timeout.
+  std::mutex mutex;
+  std::condition_variable finished;
+  bool done = false;
+  bool timedOut = false;
+  const auto deadline = startTime + std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                                        std::chrono::duration<double>(timeoutSeconds));
+  std::thread watchdog([&]() {
+    std::unique_lock<std::mutex> lock(mutex);
+    if (!finished.wait_until(lock, deadline, [&]() { return done; })) {
+      timedOut = true;
+      kill(-pid, SIGKILL);
+    }
+  });
+
+  int status = 0;
+  while (waitpid(pid, &status, 0) < 0 && errno == EINTR) {
+  }
+  const auto endTime = std::chrono::steady_clock::now();
+  {
+    const std::lock_guard<std::mutex> lock(mutex);
+    done = true;
+  }
+  finished.notify_one();
+  watchdog.join();
+  // Kill any processes that the binary left behind.
+  kill(-pid, SIGKILL);
+
+  char setupError[256] = {0};
+  const ssize_t setupErrorSize = read(errorPipe[0], setupError, sizeof(setupError) - 1);
+  close(errorPipe[0]);
+  if (setupErrorSize > 0) {
+    return Status(StatusCode::INTERNAL,
+                  fmt::format("{}: {}", std::string(setupError, setupErrorSize), binary.string()));
+  }
+
+  if (timedOut) {
+    return Status(StatusCode::DEADLINE_EXCEEDED,
+                  fmt::format("Benchmark run exceeded timeout of {} seconds", timeoutSeconds));
+  }
+  if (!WIFEXITED(status) || WEXITSTATUS(status)) {
+    const int exitCode = WIFEXITED(status) ? WEXITSTATUS(status) : 128 + WTERMSIG(status);
+    return Status(StatusCode::INTERNAL,
+                  fmt::format("Benchmark run failed with exit code {}. Output:\n{}", exitCode,
+                              readOutputTail(outputPath)));
+  }
+
+  walltimeSeconds = std::chrono::duration<double>(endTime - startTime).count();
+  return Status::OK;
+}
+
+// Run every run of the dynamic config once and return the total wall time.
+Status runAll(const fs::path& binary, const BenchmarkDynamicConfig& dynamicConfig,
+              const fs::path& workerDirectory, std::optional<int> cpu, const RuntimeConfig& config,
+              double& walltimeSeconds) {
+  walltimeSeconds = 0;
+  for (const auto& run : dynamicConfig.run()) {
+    double runWalltime;
+    RETURN_IF_ERROR(runBinary(binary, run, workerDirectory / "cwd", workerDirectory / "output.txt",
+                              cpu, config.niceness, config.timeoutSeconds, runWalltime));
+    walltimeSeconds += runWalltime;
+  }
+  return Status::OK;
+}
+
+}  // anonymous namespace
+
+Status setRuntimeConfigParameter(RuntimeConfig& config, const std::string& key,
+                                 const std::string& value, std::string& reply) {
+  if (key == "llvm.runtime.warmup_runs") {
+    RETURN_IF_ERROR(parseInt(key, value, 0, 1000000, &config.warmupRuns));
+    reply = std::to_string(config.warmupRuns);
+  } else if (key == "llvm.runtime.measured_runs") {
+    RETURN_IF_ERROR(parseInt(key, value, 1, 1000000, &config.measuredRuns));
+    reply = std::to_string(config.measuredRuns);
+  } else if (key == "llvm.runtime.parallelism") {
+    RETURN_IF_ERROR(parseInt(key, value, 0, 4096, &config.parallelism));
+    reply = std::to_string(config.parallelism);
+  } else if (key == "llvm.runtime.nice") {
+    RETURN_IF_ERROR(parseInt(key, value, -20, 19, &config.niceness));
+    reply = std::to_string(config.niceness);
+  } else if (key == "llvm.runtime.timeout_seconds") {
+    try {
+      config.timeoutSeconds = std::stod(value);
+    } catch (std::exception const& e) {
+      return Status(StatusCode::INVALID_ARGUMENT,
+                    fmt::format("Invalid value for session parameter {}: \"{}\"", key, value));
+    }
+    if (config.timeoutSeconds <= 0) {
+      return Status(StatusCode::INVALID_ARGUMENT,
+                    fmt::format("Session parameter {} must be positive", key));
+    }
+    reply = fmt::format("{}", config.timeoutSeconds);
+  } else if (key == "llvm.runtime.cpu_affinity") {
+#ifndef __linux__
+    if (!value.empty()) {
+      return Status(StatusCode::INVALID_ARGUMENT, "CPU affinity is not supported on this platform");
+    }
+#endif
+    std::vector<int> cpus;
+    std::stringstream ss(value);
+    std::string cpu;
+    while (std::getline(ss, cpu, ',')) {
+      int cpuNumber;
+      RETURN_IF_ERROR(parseInt(key, cpu, 0, kMaxCpuNumber, &cpuNumber));
+      cpus.push_back(cpuNumber);
+    }
+    config.cpuAffinity = cpus;
+    reply = value;
+  } else {
+    return Status(StatusCode::INVALID_ARGUMENT,
+                  fmt::format("Unknown session parameter: \"{}\"", key));
+  }
+  return Status::OK;
+}
+
+Status measureRuntime(const llvm::Module& module, const BenchmarkHash& moduleHash,
+                      const BenchmarkDynamicConfig& dynamicConfig, const RuntimeConfig& config,
+                      const fs::path& workingDirectory, std::vector<double>& measurements) {
+  if (!dynamicConfig.run_size()) {
+    return Status(StatusCode::INVALID_ARGUMENT,
+                  "Benchmark does not support runtime measurements, no runs are configured");
+  }
+
+  fs::path binary;
+  RETURN_IF_ERROR(BinaryCache::getSingleton().getBinary(module, moduleHash, dynamicConfig,
+                                                        workingDirectory, binary));
+
+  int workerCount = config.parallelism;
+  if (!workerCount) {
+    workerCount = config.cpuAffinity.empty() ? std::max(getAvailableCpuCount() - 1, 1)
+                                             : static_cast<int>(config.cpuAffinity.size());
+  }
+  workerCount = std::min(workerCount, config.measuredRuns);
+
+  measurements.assign(config.measuredRuns, 0);
+  std::atomic<int> nextMeasurement{0};
+  std::vector<Status> statuses(workerCount);
+  std::vector<std::thread> workers;
+  workers.reserve(workerCount);
+
+  for (int i = 0; i < workerCount; ++i) {
+    workers.emplace_back([&, i]() {
+      std::optional<int> cpu;
+      if (!config.cpuAffinity.empty()) {
+        cpu = config.cpuAffinity[i % config.cpuAffinity.size()];
+      }
+      const fs::path workerDirectory = fs::unique_path(workingDirectory / "runtime-%%%%-%%%%");
+      fs::create_directories(workerDirectory / "cwd");
+
+      Status status = Status::OK;
+      double walltimeSeconds;
+      for (int j = 0; status.ok() && j < config.warmupRuns; ++j) {
+        status = runAll(binary, dynamicConfig, workerDirectory, cpu, config, walltimeSeconds);
+      }
+      for (int j = nextMeasurement++; status.ok() && j < config.measuredRuns;
+           j = nextMeasurement++) {
+        status = runAll(binary, dynamicConfig, workerDirectory, cpu, config, walltimeSeconds);
+        measurements[j] = walltimeSeconds;
+      }
+      if (!status.ok()) {
+        // Stop the other workers from starting new measurements.
+        nextMeasurement = config.measuredRuns;
+      }
+      statuses[i] = status;
+
+      boost::system::error_code ec;
+      fs::remove_all(workerDirectory, ec);
+    });
+  }
+  for (auto& worker : workers) {
+    worker.join();
+  }
+
+  for (const auto& status : statuses) {
+    RETURN_IF_ERROR(status);
+  }
+  return Status::OK;
+}
+
+}  // namespace compiler_gym::llvm_service
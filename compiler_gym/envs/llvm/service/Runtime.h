@@ -0,0 +1,93 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <grpcpp/grpcpp.h>
+
+#include <string>
+#include <vector>
+
+#include "boost/filesystem.hpp"
+#include "compiler_gym/envs/llvm/service/Benchmark.h"
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+#include "llvm/IR/Module.h"
+
+namespace compiler_gym::llvm_service {
+
+/**
+ * The settings used to measure the runtime of a benchmark.
+ *
+ * These are configured by the user through session parameters, see
+ * setRuntimeConfigParameter().
+ */
+struct RuntimeConfig {
+  /** The number of unmeasured runs to perform before measuring. */
+  int warmupRuns = 0;
+  /** The number of measurements to return. */
+  int measuredRuns = 1;
+  /**
+   * The maximum number of measurements to perform concurrently. If zero, one
+   * measurement is performed for each CPU that is available to the service,
+   * keeping one CPU free for the service itself.
+   */
+  int parallelism = 1;
+  /**
+   * The CPUs to pin the benchmark processes to. Each concurrent measurement is
+   * pinned to a different CPU from this list. If empty, the processes are not
+   * pinned.
+   */
+  std::vector<int> cpuAffinity;
+  /** The scheduling priority (nice value) of the benchmark processes. */
+  int niceness = 0;
+  /** The maximum number of seconds that a single benchmark run may take. */
+  double timeoutSeconds = 300;
+};
+
+/**
+ * Set a runtime configuration value from a session parameter.
+ *
+ * The supported keys are `llvm.runtime.warmup_runs`,
+ * `llvm.runtime.measured_runs`, `llvm.runtime.parallelism`,
+ * `llvm.runtime.cpu_affinity` (a comma-separated list of CPU numbers),
+ * `llvm.runtime.nice`, and `llvm.runtime.timeout_seconds`.
+ *
+ * @param config The configuration to update.
+ * @param key The parameter key.
+ * @param value The parameter value.
+ * @param reply Set to the new value of the parameter.
+ * @return `OK` on success, or `INVALID_ARGUMENT` if the key or value is not
+ *    valid.
+ */
+[[nodiscard]] grpc::Status setRuntimeConfigParameter(RuntimeConfig& config, const std::string& key,
+                                                     const std::string& value, std::string& reply);
+
+/**
+ * Measure the runtime of an LLVM module.
+ *
+ * The module is compiled to a binary using the `link_argument` values of the
+ * dynamic config. Binaries are cached by module hash, so a module is compiled
+ * only once per state. Each measurement is the total wall time of running the
+ * binary once for every `run` of the dynamic config. Measurements are divided
+ * between `parallelism` worker threads, and each worker performs the
+ * configured number of warmup runs before its first measurement.
+ *
+ * @param module The module to measure.
+ * @param moduleHash The hash of the module.
+ * @param dynamicConfig The description of how to build and run the benchmark.
+ * @param config The measurement settings.
+ * @param workingDirectory The directory to build and run binaries in.
+ * @param measurements Set to a list of `measuredRuns` wall times, in seconds.
+ * @return `OK` on success, `INVALID_ARGUMENT` if the benchmark has no runs or
+ *    fails to compile, `DEADLINE_EXCEEDED` if a run times out, or `INTERNAL`
+ *    if a run fails.
+ */
+[[nodiscard]] grpc::Status measureRuntime(const llvm::Module& module,
+                                          const BenchmarkHash& moduleHash,
+                                          const BenchmarkDynamicConfig& dynamicConfig,
+                                          const RuntimeConfig& config,
+                                          const boost::filesystem::path& workingDirectory,
+                                          std::vector<double>& measurements);
+
+}  // namespace compiler_gym::llvm_service
@@ -0,0 +1,80 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a client-side checkpoint of an environment's state."""
+from typing import Dict, List, Optional
+
+from compiler_gym.datasets import Benchmark
+from compiler_gym.spaces import Reward
+
+
+class SessionCheckpoint:
+    """A checkpoint of the state of an environment.
+
+    Checkpoints are created by :meth:`env.save_checkpoint()
+    <compiler_gym.envs.CompilerEnv.save_checkpoint>` and loaded by
+    :meth:`env.load_checkpoint() <compiler_gym.envs.CompilerEnv.load_checkpoint>`.
+    Unlike a :class:`SessionSnapshot <compiler_gym.envs.SessionSnapshot>`, the
+    compiler state of a checkpoint is held by the client as a serialized state,
+    so it remains valid if the service that it was saved from dies, and it can
+    be loaded into an environment that uses a different service of the same
+    compiler version and platform.
+
+    If the service does not support serializing sessions, :code:`state` is
+    :code:`None` and loading the checkpoint replays the actions of the episode.
+
+    :ivar benchmark: The benchmark of the episode.
+
+    :vartype benchmark: Benchmark
+
+    :ivar actions: The actions of the episode up to the checkpoint.
+
+    :vartype actions: List[int]
+
+    :ivar episode_reward: The cumulative reward of the episode up to the
+        checkpoint.
+
+    :vartype episode_reward: Optional[float]
+
+    :ivar state: The serialized compiler state, or :code:`None` if the service
+        does not support serialization.
+
+    :vartype state: Optional[bytes]
+    """
+
+    __slots__ = ["benchmark", "actions", "episode_reward", "reward_spaces", "state"]
+
+    def __init__(
+        self,
+        benchmark: Benchmark,
+        actions: List[int],
+        episode_reward: Optional[float],
+        reward_spaces: Dict[str, Reward],
+        state: Optional[bytes] = None,
+    ):
+        """Constructor.
+
+        :param benchmark: The benchmark of the episode.
+
+        :param actions: The actions of the episode.
+
+        :param episode_reward: The cumulative reward of the episode.
+
+        :param reward_spaces: Copies of the reward spaces of the environment,
+            which hold the per-episode reward state.
+
+        :param state: The serialized compiler state, if any.
+        """
+        self.benchmark = benchmark
+        self.actions = actions
+        self.episode_reward = episode_reward
+        self.reward_spaces = reward_spaces
+        self.state = state
+
+    def __repr__(self) -> str:
+        size = "None" if self.state is None else f"{len(self.state)} bytes"
+        return (
+            f"SessionCheckpoint(benchmark={self.benchmark.uri}, "
+            f"num_actions={len(self.actions)}, state={size})"
+        )
@@ -0,0 +1,123 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a handle to a snapshot of an environment's state."""
+import weakref
+from typing import Deque, Dict, List, Optional
+
+from compiler_gym.datasets import Benchmark
+from compiler_gym.spaces import Reward
+
+
+class SessionSnapshot:
+    """A handle to an immutable snapshot of the state of an environment.
+
+    Snapshots are created by :meth:`env.snapshot()
+    <compiler_gym.envs.CompilerEnv.snapshot>` and consumed by
+    :meth:`env.restore() <compiler_gym.envs.CompilerEnv.restore>`. The compiler
+    state of a snapshot is held by the compiler service, so a handle is cheap
+    to create and to keep. The service-side state is released once there are no
+    remaining references to the handle, or when :meth:`release()` is called.
+
+    A snapshot records the episode state of the environment, so restoring from
+    a snapshot is always possible: if the service does not support snapshots,
+    or if the service has since been restarted, the state is recreated by
+    replaying the actions of the episode.
+
+    :ivar benchmark: The benchmark of the episode.
+
+    :vartype benchmark: Benchmark
+
+    :ivar actions: The actions of the episode up to the snapshot.
+
+    :vartype actions: List[int]
+
+    :ivar episode_reward: The cumulative reward of the episode up to the
+        snapshot.
+
+    :vartype episode_reward: Optional[float]
+
+    :ivar snapshot_id: The ID of the service-side snapshot, or :code:`None` if
+        the service does not support snapshots.
+
+    :vartype snapshot_id: Optional[int]
+    """
+
+    __slots__ = [
+        "benchmark",
+        "actions",
+        "episode_reward",
+        "reward_spaces",
+        "snapshot_id",
+        "connection",
+        "_finalizer",
+        "__weakref__",
+    ]
+
+    def __init__(
+        self,
+        benchmark: Benchmark,
+        actions: List[int],
+        episode_reward: Optional[float],
+        reward_spaces: Dict[str, Reward],
+        snapshot_id: Optional[int] = None,
+        connection=None,
+        released_snapshots: Optional[Deque[int]] = None,
+    ):
+        """Constructor.
+
+        :param benchmark: The benchmark of the episode.
+
+        :param actions: The actions of the episode.
+
+        :param episode_reward: The cumulative reward of the episode.
+
+        :param reward_spaces: Copies of the reward spaces of the environment,
+            which hold the per-episode reward state.
+
+        :param snapshot_id: The ID of the service-side snapshot, if any.
+
+        :param connection: The service connection that owns the snapshot.
+
+        :param released_snapshots: A queue that the snapshot ID is appended to
+            once the handle is released, for the environment to forward to the
+            service.
+        """
+        self.benchmark = benchmark
+        self.actions = actions
+        self.episode_reward = episode_reward
+        self.reward_spaces = reward_spaces
+        self.snapshot_id = snapshot_id
+        self.connection = connection
+        self._finalizer = None
+        if snapshot_id is not None and released_snapshots is not None:
+            # The finalizer holds a reference to the queue, not the environment,
+            # so a snapshot does not keep its environment alive.
+            self._finalizer = weakref.finalize(
+                self, released_snapshots.append, snapshot_id
+            )
+
+    @property
+    def released(self) -> bool:
+        """Whether the service-side snapshot has been released.
+
+        :type: bool
+        """
+        return self._finalizer is None or not self._finalizer.alive
+
+    def release(self) -> None:
+        """Release the service-side snapshot.
+
+        The handle can still be passed to :meth:`env.restore()
+        <compiler_gym.envs.CompilerEnv.restore>`, which will then replay the
+        actions of the episode.
+        """
+        if self._finalizer:
+            self._finalizer()
+
+    def __repr__(self) -> str:
+        return (
+            f"SessionSnapshot(benchmark={self.benchmark.uri}, "
+            f"num_actions={len(self.actions)}, snapshot_id={self.snapshot_id})"
+        )
@@ -28,15 +28,20 @@ Users who wish to create a submission for this leaderboard may use
 automatically evaluate their agent on the test set.
 """
 import logging
+import multiprocessing
 import os
+import random
+import signal
+import traceback
+from collections import Counter, defaultdict
 from itertools import islice
 from pathlib import Path
-from threading import Thread
-from time import sleep
-from typing import Callable, List
+from queue import Empty
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
 
 import gym
 import humanize
+import numpy as np
 from absl import app, flags
 
 import compiler_gym.envs  # noqa Register environments.
@@ -46,8 +51,11 @@ from compiler_gym.compiler_env_state import (
     CompilerEnvStateReader,
     CompilerEnvStateWriter,
 )
+from compiler_gym.datasets import Datasets
 from compiler_gym.envs import LlvmEnv
+from compiler_gym.envs.llvm.datasets import get_llvm_datasets
 from compiler_gym.util.statistics import arithmetic_mean, geometric_mean
+from compiler_gym.util.tabulate import tabulate
 from compiler_gym.util.timer import Timer, humanize_duration_hms
 
 flags.DEFINE_string(
@@ -78,6 +86,12 @@ flags.DEFINE_boolean(
     "If true, read the --leaderboard_results file first and run only the "
     "evaluations not already in the results file.",
 )
+flags.DEFINE_integer(
+    "leaderboard_workers",
+    1,
+    "The number of worker processes to evaluate the policy in. Each worker "
+    "evaluates one benchmark at a time.",
+)
 FLAGS = flags.FLAGS
 
 # A policy is a function that accepts as input an LLVM environment, and
@@ -85,57 +99,137 @@ FLAGS = flags.FLAGS
 Policy = Callable[[LlvmEnv], None]
 
 
-class _EvalPolicyWorker(Thread):
-    """Worker thread to evaluate a policy."""
-
-    def __init__(
-        self,
-        env: LlvmEnv,
-        benchmarks: List[str],
-        policy: Policy,
-        init_states: List[CompilerEnvState],
-    ):
-        super().__init__()
-        self.env = env
-        self.benchmarks = benchmarks
-        self.policy = policy
-        self.states: List[CompilerEnvState] = init_states
-        self.alive = True
-
-    def run(self):
-        # Determine if we need to print a header.
-        header = (
-            not Path(FLAGS.leaderboard_results).is_file()
-            or os.stat(FLAGS.leaderboard_results).st_size == 0
+class _EvalJob(NamedTuple):
+    """A single evaluation of the policy."""
+
+    benchmark: str
+    """The URI of the benchmark to evaluate."""
+
+    seed: int
+    """The repetition number of the evaluation on this benchmark, used to seed
+    the random number generators.
+    """
+
+
+def _read_results(path: Path) -> List[CompilerEnvState]:
+    """Read the states of a results file, if it exists."""
+    if not path.is_file():
+        return []
+    with CompilerEnvStateReader(open(path)) as reader:
+        return list(reader)
+
+
+def _pending_jobs(
+    benchmarks: List[str], n: int, completed_states: Iterable[CompilerEnvState]
+) -> List[_EvalJob]:
+    """Return the evaluations that are not already in a list of completed
+    states. The k-th completed state of a benchmark is the result of seed k.
+    """
+    completed_counts = Counter(state.benchmark for state in completed_states)
+    return [
+        _EvalJob(benchmark=benchmark, seed=seed)
+        for benchmark in benchmarks
+        for seed in range(completed_counts[benchmark], n)
+    ]
+
+
+def _pop_longest_job(jobs: List[_EvalJob], walltimes: Dict[str, float]) -> _EvalJob:
+    """Remove and return the job with the longest estimated walltime.
+
+    Benchmarks with no recorded walltime are assumed to be the longest, so
+    that they are measured early.
+    """
+    index = max(
+        range(len(jobs)),
+        key=lambda i: (
+            walltimes.get(jobs[i].benchmark, float("inf")),
+            # Break ties in benchmark and seed order.
+            -i,
+        ),
+    )
+    return jobs.pop(index)
+
+
+def _eval_policy(env: LlvmEnv, policy: Policy, job: _EvalJob) -> CompilerEnvState:
+    """Run the policy on a benchmark and return the final state."""
+    random.seed(job.seed)
+    np.random.seed(job.seed)
+    env.reset(benchmark=job.benchmark)
+    env.action_space.seed(job.seed)
+    with Timer() as timer:
+        policy(env)
+
+    # Sanity check that the policy didn't change the expected experimental
+    # setup.
+    assert env.in_episode, "Environment is no longer in an episode"
+    assert env.benchmark and (
+        env.benchmark == job.benchmark
+    ), "Policy changed environment benchmark"
+    assert env.reward_space, "Policy unset environment reward space"
+    assert (
+        env.reward_space.id == "IrInstructionCountOz"
+    ), "Policy changed environment reward space"
+
+    # Override walltime in the generated state.
+    state = env.state.copy()
+    state.walltime = timer.time
+    return state
+
+
+def _eval_policy_worker(
+    worker_id: int,
+    policy: Policy,
+    jobs: multiprocessing.SimpleQueue,
+    results: multiprocessing.Queue,
+) -> None:
+    """Worker process to evaluate a policy.
+
+    Jobs are received one at a time, and each result is sent back with the ID
+    of the worker so that it can be given a new job. A :code:`None` job stops
+    the worker.
+    """
+    # The main process handles keyboard interrupts and stops the workers once
+    # their current job is complete.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    env = gym.make("llvm-ic-v0")
+    env.logger.setLevel(logging.DEBUG)
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            try:
+                state = _eval_policy(env, policy, job)
+            except Exception:  # pylint: disable=broad-except
+                results.put((worker_id, job, None, traceback.format_exc()))
+                return
+            results.put((worker_id, job, state, None))
+    finally:
+        env.close()
+
+
+def _walltime_percentiles_table(states: List[CompilerEnvState]) -> str:
+    """Format a table of the walltime percentiles of each benchmark."""
+    walltimes = defaultdict(list)
+    for state in states:
+        walltimes[state.benchmark].append(state.walltime)
+    rows = []
+    for benchmark, values in sorted(walltimes.items()):
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        rows.append(
+            (
+                benchmark,
+                len(values),
+                f"{p50:.3f}",
+                f"{p90:.3f}",
+                f"{p99:.3f}",
+                f"{max(values):.3f}",
+            )
         )
-        with CompilerEnvStateWriter(
-            open(FLAGS.leaderboard_results, "a"), header=header
-        ) as writer:
-            for benchmark in self.benchmarks:
-                self.env.reset(benchmark=benchmark)
-                with Timer() as timer:
-                    self.policy(self.env)
-
-                # Sanity check that the policy didn't change the expected
-                # experimental setup.
-                assert self.env.in_episode, "Environment is no longer in an episode"
-                assert self.env.benchmark and (
-                    self.env.benchmark == benchmark
-                ), "Policy changed environment benchmark"
-                assert self.env.reward_space, "Policy unset environment reward space"
-                assert (
-                    self.env.reward_space.id == "IrInstructionCountOz"
-                ), "Policy changed environment reward space"
-
-                # Override walltime in the generated state.
-                state = self.env.state.copy()
-                state.walltime = timer.time
-
-                writer.write_state(state, flush=True)
-                self.states.append(state)
-
-                if not self.alive:
-                    return
+    return tabulate(
+        rows,
+        headers=("Benchmark", "Runs", "p50 (s)", "p90 (s)", "p99 (s)", "Max (s)"),
+    )
 
 
 def eval_llvm_instcount_policy(policy: Policy) -> None:
@@ -216,6 +310,20 @@ def eval_llvm_instcount_policy(policy: Policy) -> None:
 
         $ python my_policy.py --helpfull
 
+    The policy is evaluated in worker processes, which are forked from the
+    calling process. Since gRPC does not support forking a process with open
+    channels, do not create an environment before calling this function. Use :code:`--leaderboard_workers` to evaluate multiple
+    benchmarks concurrently. Benchmarks are scheduled longest first, using the
+    walltimes recorded in the results file by previous evaluations. Each result
+    is appended to the results file as soon as it completes, so an interrupted
+    evaluation can be continued using :code:`--resume`. Once complete, the
+    percentiles of the walltimes of each benchmark are printed.
+
+    Each repetition of the policy on a benchmark is given a seed, which is used
+    to seed the :code:`random` and :code:`numpy` random number generators and
+    the environment's action space. The seed of the k-th result of a benchmark
+    in the results file is k.
+
     Once you are happy with your approach, see the `contributing guide
     <https://github.com/facebookresearch/CompilerGym/blob/development/CONTRIBUTING.md#leaderboard-submissions>`_
     for instructions on preparing a submission to the leaderboard.
@@ -224,13 +332,11 @@ def eval_llvm_instcount_policy(policy: Policy) -> None:
     def main(argv):
         assert len(argv) == 1, f"Unknown args: {argv[:1]}"
         assert FLAGS.n > 0, "n must be > 0"
-
-        env = gym.make("llvm-ic-v0")
+        assert FLAGS.leaderboard_workers > 0, "leaderboard_workers must be > 0"
 
         # Stream verbose CompilerGym logs to file.
         logger = logging.getLogger("compiler_gym")
         logger.setLevel(logging.DEBUG)
-        env.logger.setLevel(logging.DEBUG)
         log_handler = logging.FileHandler(FLAGS.leaderboard_logfile)
         logger.addHandler(log_handler)
         logger.propagate = False
@@ -238,71 +344,158 @@ def eval_llvm_instcount_policy(policy: Policy) -> None:
         print(f"Writing results to {FLAGS.leaderboard_results}")
         print(f"Writing logs to {FLAGS.leaderboard_logfile}")
 
+        # Build the list of benchmarks to evaluate. The datasets are created
+        # directly rather than through an environment, so that no gRPC channel
+        # has been opened in this process when the worker processes are forked.
+        benchmarks = Datasets(get_llvm_datasets())[FLAGS.test_dataset].benchmark_uris()
+        if FLAGS.max_benchmarks:
+            benchmarks = islice(benchmarks, FLAGS.max_benchmarks)
+        benchmarks = sorted(benchmarks)
+        total_count = len(benchmarks) * FLAGS.n
+
+        # The results file records the walltimes of previous evaluations, which
+        # are used to schedule the longest benchmarks first. If we are resuming
+        # from a previous job, the evaluations that have already been completed
+        # are also removed from the list of evaluations to run.
+        results_path = Path(FLAGS.leaderboard_results)
+        previous_states = _read_results(results_path)
+        walltime_history: Dict[str, List[float]] = defaultdict(list)
+        for state in previous_states:
+            walltime_history[state.benchmark].append(state.walltime)
+        walltimes = {
+            benchmark: float(np.median(values))
+            for benchmark, values in walltime_history.items()
+        }
+        states: List[CompilerEnvState] = []
+        if FLAGS.resume:
+            states = [s for s in previous_states if s.benchmark in benchmarks]
+        pending = _pending_jobs(benchmarks, FLAGS.n, states)
+        completed_count = total_count - len(pending)
+
+        # Determine if we need to print a header.
+        header = not results_path.is_file() or os.stat(results_path).st_size == 0
+
+        # Workers are forked so that the policy need not be picklable. This is
+        # safe only because this process has not yet opened a gRPC channel.
+        # They are not daemonic so that policies may start processes of their
+        # own.
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        job_queues = []
+        workers = []
+        # The IDs of the workers that have been sent a job.
+        busy = set()
+        for i in range(min(FLAGS.leaderboard_workers, len(pending))):
+            job_queues.append(context.SimpleQueue())
+            workers.append(
+                context.Process(
+                    target=_eval_policy_worker,
+                    args=(i, policy, job_queues[i], results),
+                )
+            )
+            workers[-1].start()
+            job_queues[i].put(_pop_longest_job(pending, walltimes))
+            busy.add(i)
+
+        error: Optional[str] = None
+        # Set on error or keyboard interrupt to stop sending new jobs.
+        stopping = False
+        timer = Timer().reset()
         try:
-            # Build the list of benchmarks to evaluate.
-            benchmarks = env.datasets[FLAGS.test_dataset].benchmark_uris()
-            if FLAGS.max_benchmarks:
-                benchmarks = islice(benchmarks, FLAGS.max_benchmarks)
-            benchmarks = list(benchmarks)
-
-            # Repeat the searches for the requested number of iterations.
-            benchmarks *= FLAGS.n
-            benchmarks = sorted(benchmarks)
-            total_count = len(benchmarks)
-
-            # If we are resuming from a previous job, read the states that have
-            # already been proccessed and remove those benchmarks from the list
-            # of benchmarks to evaluate.
-            init_states = []
-            if FLAGS.resume and Path(FLAGS.leaderboard_results).is_file():
-                with CompilerEnvStateReader(open(FLAGS.leaderboard_results)) as reader:
-                    for state in reader:
-                        init_states.append(state)
-                        if state.benchmark in benchmarks:
-                            benchmarks.remove(state.benchmark)
-
-            # Run the benchmark loop in background so that we can asynchronously
-            # log progress.
-            worker = _EvalPolicyWorker(env, benchmarks, policy, init_states)
-            worker.start()
-            timer = Timer().reset()
-            try:
+            with CompilerEnvStateWriter(
+                open(results_path, "a"), header=header
+            ) as writer:
                 print(
                     f"=== Evaluating policy on "
                     f"{humanize.intcomma(total_count)} "
-                    f"{FLAGS.test_dataset} benchmarks ==="
+                    f"{FLAGS.test_dataset} benchmarks "
+                    f"using {humanize.intcomma(len(workers))} workers ==="
                     "\n\n"  # Blank lines will be filled below
                 )
-                while worker.is_alive():
-                    done_count = len(worker.states)
-                    remaining_count = total_count - done_count
-                    time = timer.time
-                    gmean_reward = geometric_mean([s.reward for s in worker.states])
-                    mean_walltime = (
-                        arithmetic_mean([s.walltime for s in worker.states]) or time
-                    )
-                    print(
-                        "\r\033[2A"
-                        "\033[K"
-                        f"Runtime: {humanize_duration_hms(time)}. "
-                        f"Estimated completion: {humanize_duration_hms(time + mean_walltime * remaining_count)}. "
-                        f"Completed: {humanize.intcomma(done_count)} / {humanize.intcomma(total_count)} "
-                        f"({done_count / total_count:.1%})."
-                        "\n\033[K"
-                        f"Current mean walltime: {mean_walltime:.3f}s / benchmark."
-                        "\n\033[K"
-                        f"Current geomean reward: {gmean_reward:.4f}.",
-                        flush=True,
-                        end="",
-                    )
-                    sleep(1)
-            except KeyboardInterrupt:
-                print("\nkeyboard interrupt", flush=True)
-                worker.alive = False
-                # User interrupt, don't validate.
-                FLAGS.validate = False
+                while busy:
+                    try:
+                        try:
+                            worker_id, job, state, job_error = results.get(timeout=1)
+                        except Empty:
+                            for worker_id in list(busy):
+                                if not workers[worker_id].is_alive():
+                                    busy.discard(worker_id)
+                                    error = (
+                                        f"Worker process {worker_id} exited with "
+                                        f"code {workers[worker_id].exitcode}"
+                                    )
+                                    stopping = True
+                        else:
+                            busy.discard(worker_id)
+                            if job_error:
+                                error, stopping = job_error, True
+                            else:
+                                # Checkpoint the result as soon as it is
+                                # received.
+                                writer.write_state(state, flush=True)
+                                states.append(state)
+                                completed_count += 1
+                                walltime_history[job.benchmark].append(state.walltime)
+                                walltimes[job.benchmark] = float(
+                                    np.median(walltime_history[job.benchmark])
+                                )
+                            if pending and not stopping:
+                                job_queues[worker_id].put(
+                                    _pop_longest_job(pending, walltimes)
+                                )
+                                busy.add(worker_id)
+
+                        remaining_count = total_count - completed_count
+                        time = timer.time
+                        gmean_reward = geometric_mean([s.reward for s in states])
+                        mean_walltime = (
+                            arithmetic_mean([s.walltime for s in states]) or time
+                        )
+                        estimated_completion = (
+                            time + mean_walltime * remaining_count / len(workers)
+                        )
+                        print(
+                            "\r\033[2A"
+                            "\033[K"
+                            f"Runtime: {humanize_duration_hms(time)}. "
+                            f"Estimated completion: {humanize_duration_hms(estimated_completion)}. "
+                            f"Completed: {humanize.intcomma(completed_count)} / {humanize.intcomma(total_count)} "
+                            f"({completed_count / total_count:.1%})."
+                            "\n\033[K"
+                            f"Current mean walltime: {mean_walltime:.3f}s / benchmark."
+                            "\n\033[K"
+                            f"Current geomean reward: {gmean_reward:.4f}.",
+                            flush=True,
+                            end="",
+                        )
+                    except KeyboardInterrupt:
+                        if stopping:
+                            raise
+                        print("\nkeyboard interrupt", flush=True)
+                        print(
+                            f"Waiting for {len(busy)} in-progress evaluations to "
+                            "complete. Run again with --resume to continue.\n\n",
+                            flush=True,
+                        )
+                        # User interrupt, don't validate.
+                        FLAGS.validate = False
+                        stopping = True
         finally:
-            env.close()
+            for job_queue in job_queues:
+                job_queue.put(None)
+            for worker in workers:
+                if busy:
+                    # A repeated keyboard interrupt, don't wait for the
+                    # in-progress evaluations.
+                    worker.terminate()
+                worker.join()
+
+        if error:
+            raise OSError(f"Policy evaluation failed:\n{error}")
+
+        if states:
+            print("\n\nWalltime percentiles:")
+            print(_walltime_percentiles_table(states), flush=True)
 
         if FLAGS.validate:
             FLAGS.env = "llvm-ic-v0"
@@ -41,20 +41,33 @@ def replay_actions(env: CompilerEnv, action_names: List[str], outdir: Path):
 
     if isinstance(env, LlvmEnv):
         env.write_bitcode(outdir / "optimized.bc")
+        # Compute all of the observations in a single round trip.
+        (
+            ic_o0,
+            ic_oz,
+            ic,
+            text_size_o0,
+            text_size_oz,
+            text_size,
+        ) = env.observation.get_many(
+            [
+                "IrInstructionCountO0",
+                "IrInstructionCountOz",
+                "IrInstructionCount",
+                "ObjectTextSizeO0",
+                "ObjectTextSizeOz",
+                "ObjectTextSizeBytes",
+            ]
+        )
         print(
             tabulate(
                 [
-                    (
-                        "IR instruction count",
-                        env.observation["IrInstructionCountO0"],
-                        env.observation["IrInstructionCountOz"],
-                        env.observation["IrInstructionCount"],
-                    ),
+                    ("IR instruction count", ic_o0, ic_oz, ic),
                     (
                         "Object .text size (bytes)",
-                        env.observation["ObjectTextSizeO0"],
-                        env.observation["ObjectTextSizeOz"],
-                        env.observation["ObjectTextSizeBytes"],
+                        text_size_o0,
+                        text_size_oz,
+                        text_size,
                     ),
                 ],
                 headers=("", "-O0", "-Oz", "final"),
@@ -4,11 +4,13 @@
 # LICENSE file in the root directory of this source tree.
 """Simple parallelized random search."""
 import json
+import multiprocessing
+import signal
 from multiprocessing import cpu_count
 from pathlib import Path
-from threading import Thread
+from queue import Empty
 from time import sleep, time
-from typing import Callable, List, Optional, Tuple, Union
+from typing import Callable, List, NamedTuple, Optional, Tuple, Union
 
 import humanize
 
@@ -19,57 +21,98 @@ from compiler_gym.util import logs
 from compiler_gym.util.logs import create_logging_dir
 
 
-class RandomAgentWorker(Thread):
-    """Worker thread to run a repeating agent.
+class RandomSearchProgress(NamedTuple):
+    """The aggregate progress of a pool of random search workers."""
 
-    To stop the agent, set the :code:`alive` attribute of this thread to False.
+    total_environment_count: int
+    total_episode_count: int
+    total_step_count: int
+    best_returns: float
+    best_actions: List[int]
+    best_commandline: str
+    best_found_at_time: float
+
+
+class RandomAgentWorker:
+    """Worker to run a repeating agent in a worker process.
+
+    The worker keeps a single environment alive for as long as it can, and
+    starts each episode after the first by restoring a snapshot of the initial
+    state rather than calling :meth:`reset()
+    <compiler_gym.envs.CompilerEnv.reset>`. A new environment is created only
+    if an episode ends.
+
+    Progress counters are written to shared memory. The best returns found by
+    any worker are also held in shared memory, so a worker publishes its
+    actions to the main process only when it improves on the global best.
     """
 
     def __init__(
         self,
         make_env: Callable[[], CompilerEnv],
         patience: int,
+        worker_id: int,
+        shared: "_SharedSearchState",
     ):
-        super().__init__()
         self._make_env = make_env
         self._patience = patience
+        self._worker_id = worker_id
+        self._shared = shared
+        self._initial_state = None
 
-        # Incremental progress.
-        self.total_environment_count = 0
-        self.total_episode_count = 0
-        self.total_step_count = 0
+        # The best returns found by this worker.
         self.best_returns = -float("inf")
-        self.best_actions: List[int] = []
-        self.best_commandline: List[int] = []
-        self.best_found_at_time = time()
-
-        self.alive = True  # Set this to False to signal the thread to stop.
 
     @property
     def should_run_one_episode(self) -> bool:
         """Whether to run an episode."""
-        return self.alive or not self.total_episode_count
+        return (
+            not self._shared.stop.is_set()
+            or not self._shared.episode_counts[self._worker_id]
+        )
 
     def run(self) -> None:
-        """Run episodes in an infinite loop."""
+        """Run episodes until signalled to stop."""
+        # The main process handles keyboard interrupts and signals the workers
+        # to stop.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
         while self.should_run_one_episode:
-            self.total_environment_count += 1
+            self._shared.environment_counts[self._worker_id] += 1
+            self._initial_state = None
             env = self._make_env()
             try:
                 self._patience = self._patience or env.action_space.n
                 self.run_one_environment(env)
+            except ServiceError:
+                # Service error can be raised on abrupt service termination
+                # causing RPC errors. Start a new environment.
+                pass
             finally:
                 env.close()
 
     def run_one_environment(self, env: CompilerEnv) -> None:
-        """Run random walks in an infinite loop. Returns if the environment ends."""
-        try:
-            while self.should_run_one_episode:
-                self.total_episode_count += 1
-                if not self.run_one_episode(env):
-                    return
-        finally:
-            env.close()
+        """Run random walks until signalled to stop. Returns if the environment
+        ends.
+        """
+        while self.should_run_one_episode:
+            self._shared.episode_counts[self._worker_id] += 1
+            if not self.run_one_episode(env):
+                return
+
+    def start_episode(self, env: CompilerEnv) -> None:
+        """Put the environment in its initial state.
+
+        The first episode of an environment calls :meth:`reset()
+        <compiler_gym.envs.CompilerEnv.reset>`. Later episodes restore a
+        snapshot of the initial state. Wrapped environments are always reset so
+        that the wrappers can reset their own state.
+        """
+        if self._initial_state is not None:
+            env.restore(self._initial_state)
+        else:
+            env.reset()
+            if isinstance(env, CompilerEnv):
+                self._initial_state = env.snapshot()
 
     def run_one_episode(self, env: CompilerEnv) -> bool:
         """Run a single random episode.
@@ -77,34 +120,186 @@ class RandomAgentWorker(Thread):
         :param env: An environment.
         :return: True if the episode ended gracefully, else False.
         """
-        observation = env.reset()
+        self.start_episode(env)
         actions: List[int] = []
         patience = self._patience
         total_returns = 0
         while patience >= 0:
             patience -= 1
-            self.total_step_count += 1
+            self._shared.step_counts[self._worker_id] += 1
             # === Your agent here! ===
             action_index = env.action_space.sample()
             # === End of agent. ===
             actions.append(action_index)
-            observation, reward, done, _ = env.step(action_index)
+            _, reward, done, _ = env.step(action_index)
             if done:
                 return False
             total_returns += reward
             if total_returns > self.best_returns:
                 patience = self._patience
                 self.best_returns = total_returns
-                self.best_actions = actions.copy()
-                try:
-                    self.best_commandline = env.commandline()
-                except NotImplementedError:
-                    self.best_commandline = ""
-                self.best_found_at_time = time()
+                self._shared.publish(env, total_returns, actions)
 
         return True
 
 
+class _SharedSearchState:
+    """State shared between the random search workers and the main process."""
+
+    def __init__(self, context, nproc: int):
+        # Per-worker counters. Each element is written by a single worker, so
+        # no lock is needed.
+        self.environment_counts = context.Array("q", nproc, lock=False)
+        self.episode_counts = context.Array("q", nproc, lock=False)
+        self.step_counts = context.Array("q", nproc, lock=False)
+        # The best returns of any worker, and the time at which they were found.
+        self.best_returns = context.Value("d", -float("inf"))
+        self.best_found_at_time = context.Value("d", time(), lock=False)
+        # A queue of (returns, actions, commandline) tuples which improved on
+        # the best returns at the time they were found.
+        self.improvements = context.Queue()
+        self.stop = context.Event()
+
+    def publish(self, env: CompilerEnv, returns: float, actions: List[int]) -> None:
+        """Publish the actions of an episode if it improves on the best
+        returns of all workers.
+        """
+        with self.best_returns.get_lock():
+            if returns <= self.best_returns.value:
+                return
+            self.best_returns.value = returns
+            self.best_found_at_time.value = time()
+        try:
+            commandline = env.commandline()
+        except NotImplementedError:
+            commandline = ""
+        self.improvements.put((returns, actions.copy(), commandline))
+
+
+def _run_worker(
+    make_env: Callable[[], CompilerEnv],
+    patience: int,
+    worker_id: int,
+    shared: _SharedSearchState,
+) -> None:
+    RandomAgentWorker(make_env, patience, worker_id, shared).run()
+
+
+class RandomAgentWorkerPool:
+    """A pool of :class:`RandomAgentWorker` processes.
+
+    Each worker runs in its own process so that sampling, reward bookkeeping,
+    and message decoding are not serialized by the global interpreter lock.
+    Worker processes are started from a fork server rather than forked from
+    the calling process, since gRPC does not support forking a process that
+    has open channels. As a result, :code:`make_env` must be picklable, for
+    example a module-level function or a :code:`functools.partial` of one, and
+    not a lambda or a nested function.
+
+    Example usage:
+
+        >>> with RandomAgentWorkerPool(make_env, patience=0, nproc=8) as pool:
+        ...     sleep(60)
+        ...     progress = pool.progress()
+        >>> progress.best_returns
+        1.0159
+
+    :param make_env: A picklable callable that returns an environment. This is
+        called in the worker processes.
+    :param patience: The number of steps that a worker makes without
+        improvement before starting a new episode. If zero, the size of the
+        action space is used.
+    :param nproc: The number of worker processes.
+
+    :raises OSError: From :meth:`progress()` and :meth:`close()` if a worker
+        process has died.
+    """
+
+    def __init__(
+        self,
+        make_env: Callable[[], CompilerEnv],
+        patience: int,
+        nproc: int = cpu_count(),
+    ):
+        self.nproc = nproc
+        context = multiprocessing.get_context("forkserver")
+        self._shared = _SharedSearchState(context, nproc)
+        self._best_returns = -float("inf")
+        self._best_actions: List[int] = []
+        self._best_commandline = ""
+        self._workers = [
+            context.Process(
+                target=_run_worker,
+                args=(make_env, patience, i, self._shared),
+                daemon=True,
+            )
+            for i in range(nproc)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def progress(self) -> RandomSearchProgress:
+        """Return the aggregate progress of the workers.
+
+        :raises OSError: If a worker process has died.
+        """
+        self._receive_improvements()
+        self._check_workers()
+        return RandomSearchProgress(
+            total_environment_count=sum(self._shared.environment_counts),
+            total_episode_count=sum(self._shared.episode_counts),
+            total_step_count=sum(self._shared.step_counts),
+            best_returns=self._best_returns,
+            best_actions=self._best_actions,
+            best_commandline=self._best_commandline,
+            best_found_at_time=self._shared.best_found_at_time.value,
+        )
+
+    def close(self) -> None:
+        """Signal the workers to stop and wait for them to end.
+
+        Each worker completes at least one episode before ending.
+
+        :raises OSError: If a worker process has died.
+        """
+        self._shared.stop.set()
+        # Keep draining the queue so that workers are not blocked on flushing
+        # their results.
+        while any(worker.is_alive() for worker in self._workers):
+            self._receive_improvements()
+            for worker in self._workers:
+                worker.join(timeout=0.1)
+        self._receive_improvements()
+        self._check_workers()
+
+    def _check_workers(self) -> None:
+        """Raise an error if a worker process has died."""
+        for i, worker in enumerate(self._workers):
+            if worker.exitcode:
+                # Stop the remaining workers, since the search is incomplete.
+                self._shared.stop.set()
+                raise OSError(
+                    f"Random search worker {i} exited with returncode {worker.exitcode}"
+                )
+
+    def _receive_improvements(self) -> None:
+        while True:
+            try:
+                returns, actions, commandline = self._shared.improvements.get_nowait()
+            except Empty:
+                return
+            if returns > self._best_returns:
+                self._best_returns = returns
+                self._best_actions = actions
+                self._best_commandline = commandline
+
+    def __enter__(self) -> "RandomAgentWorkerPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
 def random_search(
     make_env: Callable[[], CompilerEnv],
     outdir: Optional[Union[str, Path]] = None,
@@ -151,17 +346,16 @@ def random_search(
         with open(str(metadata_path), "w") as f:
             json.dump(metadata, f, sort_keys=True, indent=2)
 
-    workers = [RandomAgentWorker(make_env, patience) for _ in range(nproc)]
-    for worker in workers:
-        worker.start()
+    started = time()
+    pool = RandomAgentWorkerPool(make_env, patience, nproc)
 
+    best_returns = -float("inf")
     best_actions = []
     best_commandline = ""
-    started = time()
     last_best_returns = -float("inf")
 
     print(
-        f"Started {len(workers)} worker threads for {benchmark_uri} "
+        f"Started {nproc} worker processes for {benchmark_uri} "
         f"using reward {reward_space_name}."
     )
     print(f"Writing logs to {outdir}")
@@ -187,18 +381,13 @@ def random_search(
             )
             while not end_time or time() < end_time:
                 sleep(0.5)
-                total_episode_count = sum(
-                    worker.total_episode_count for worker in workers
-                )
-                total_step_count = sum(worker.total_step_count for worker in workers)
-                total_environment_count = sum(
-                    worker.total_environment_count for worker in workers
-                )
-
-                best_worker = max(workers, key=lambda worker: worker.best_returns)
-                best_returns = best_worker.best_returns
-                best_actions = best_worker.best_actions
-                best_commandline = best_worker.best_commandline
+                progress = pool.progress()
+                total_episode_count = progress.total_episode_count
+                total_step_count = progress.total_step_count
+                total_environment_count = progress.total_environment_count
+                best_returns = progress.best_returns
+                best_actions = progress.best_actions
+                best_commandline = progress.best_commandline
                 runtime = time() - started
                 print(
                     "\r\033[1A"
@@ -212,7 +401,7 @@ def random_search(
                     "\033[K"
                     f"Best reward: {best_returns:.4f} "
                     f"({len(best_actions)} passes, "
-                    f"found after {humanize.naturaldelta(best_worker.best_found_at_time - started)})",
+                    f"found after {humanize.naturaldelta(progress.best_found_at_time - started)})",
                     end="",
                     flush=True,
                 )
@@ -232,25 +421,41 @@ def random_search(
     except KeyboardInterrupt:
         print("\nkeyboard interrupt", end="", flush=True)
 
+    print("\n", flush=True)
+    print("Ending worker processes ... ", end="", flush=True)
+    pool.close()
+    print("done")
+
+    # Workers complete their current episode before ending, which may improve
+    # on the best result.
+    progress = pool.progress()
+    runtime = time() - started
+    if progress.best_returns > last_best_returns:
+        best_returns = progress.best_returns
+        best_actions = progress.best_actions
+        best_commandline = progress.best_commandline
+        entry = logs.ProgressLogEntry(
+            runtime_seconds=runtime,
+            total_episode_count=progress.total_episode_count,
+            total_step_count=progress.total_step_count,
+            num_passes=len(best_actions),
+            reward=best_returns,
+        )
+        with open(str(progress_path), "a") as f:
+            print(entry.to_csv(), file=f, flush=True)
+    print(
+        f"Throughput: {humanize.intcomma(int(progress.total_step_count / runtime))} "
+        f"steps / sec across {nproc} workers "
+        f"({humanize.intcomma(int(progress.total_step_count / runtime / nproc))} "
+        "steps / sec / worker)."
+    )
+
     best_action_names = [action_space_names[a] for a in best_actions]
     with open(str(best_actions_path), "w") as f:
         f.write("\n".join(best_action_names))
         f.write("\n")
     with open(str(best_commandline_path), "w") as f:
         print(best_commandline, file=f)
-    print("\n", flush=True)
-
-    print("Ending worker threads ... ", end="", flush=True)
-    for worker in workers:
-        worker.alive = False
-    for worker in workers:
-        try:
-            worker.join()
-        except ServiceError:
-            # Service error can be raised on abrupt service termination causing
-            # RPC errors.
-            pass
-    print("done")
 
     print("Replaying actions from best solution found:")
     env = make_env()
@@ -20,6 +20,33 @@ Status CompilationSession::endOfStep(bool actionHadNoEffect, bool& endOfEpisode,
   return Status::OK;
 }
 
+Status CompilationSession::saveState(std::string& state) {
+  return Status(StatusCode::UNIMPLEMENTED, "CompilationSession::saveState() not implemented");
+}
+
+Status CompilationSession::loadState(const std::string& state) {
+  return Status(StatusCode::UNIMPLEMENTED, "CompilationSession::loadState() not implemented");
+}
+
+Status CompilationSession::execute(const ExecuteSessionRequest& request,
+                                   ExecuteSessionReply& reply) {
+  return Status(StatusCode::UNIMPLEMENTED, "CompilationSession::execute() not implemented");
+}
+
+Status CompilationSession::handleSessionParameter(const std::string& key,
+                                                  const std::string& value, std::string& reply) {
+  return Status(StatusCode::UNIMPLEMENTED,
+                "CompilationSession::handleSessionParameter() not implemented");
+}
+
+void CompilationSession::recordTiming(const std::string& name, double wallTimeSeconds) {
+  if (timings_) {
+    (*timings_->mutable_session())[name] += wallTimeSeconds;
+  }
+}
+
+std::map<std::string, double> CompilationSession::getCompilerStats() const { return {}; }
+
 CompilationSession::CompilationSession(const boost::filesystem::path& workingDirectory)
     : workingDirectory_(workingDirectory) {}
 
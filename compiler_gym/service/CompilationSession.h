@@ -6,7 +6,9 @@
 
 #include <grpcpp/grpcpp.h>
 
+#include <map>
 #include <optional>
+#include <string>
 #include <vector>
 
 #include "boost/filesystem.hpp"
@@ -115,10 +117,91 @@ class CompilationSession {
   [[nodiscard]] virtual grpc::Status endOfStep(bool actionHadNoEffect, bool& endOfEpisode,
                                                std::optional<ActionSpace>& newActionSpace);
 
+  /**
+   * Optional. Serialize the state of the session to a string.
+   *
+   * The serialized state must contain everything needed to reconstruct the
+   * session using loadState(), but it need not be portable between machines or
+   * compiler versions. This is used by the runtime to move snapshots of a
+   * session out of memory.
+   *
+   * @param state The string to write the serialized state to.
+   * @return `OK` on success, else an error code and message.
+   */
+  [[nodiscard]] virtual grpc::Status saveState(std::string& state);
+
+  /**
+   * Optional. Initialize a CompilationSession from a state that was produced
+   * by saveState().
+   *
+   * This may be called after construction instead of init(), and before
+   * applyAction() or computeObservation(). This will only be called once.
+   *
+   * @param state A serialized state.
+   * @return `OK` on success, else an error code and message.
+   */
+  [[nodiscard]] virtual grpc::Status loadState(const std::string& state);
+
+  /**
+   * Optional. Compile and run the program of the current compiler state.
+   *
+   * Implementations should run the program in a separate process so that a
+   * crash of the program does not take down the service, and must enforce the
+   * requested timeout.
+   *
+   * @param request The execution request.
+   * @param reply The execution result.
+   * @return `OK` if the program was run, regardless of its exit code, else an
+   *    error code and message. `UNIMPLEMENTED` indicates that the program
+   *    cannot be executed by the service.
+   */
+  [[nodiscard]] virtual grpc::Status execute(const ExecuteSessionRequest& request,
+                                             ExecuteSessionReply& reply);
+
+  /**
+   * Optional. Handle a session parameter sent by the user.
+   *
+   * Session parameters are key-value pairs that configure the behavior of a
+   * session, for example the settings used to compute an observation. Their
+   * meaning is defined by the compiler service.
+   *
+   * @param key The parameter key.
+   * @param value The parameter value.
+   * @param reply A string response to the parameter.
+   * @return `OK` on success, `INVALID_ARGUMENT` if the key or value is not
+   *    recognized, else an error code and message.
+   */
+  [[nodiscard]] virtual grpc::Status handleSessionParameter(const std::string& key,
+                                                            const std::string& value,
+                                                            std::string& reply);
+
+  /**
+   * Optional. Get statistics about the compiler that are shared by all
+   * sessions, such as the sizes of caches.
+   *
+   * These are returned by the GetStats() RPC. Like getCompilerVersion(), this
+   * is called on a newly constructed instance.
+   *
+   * @return A map from statistic name to value. Names should be prefixed by
+   *    the name of the compiler, e.g. `"mycompiler.cache_size_bytes"`.
+   */
+  virtual std::map<std::string, double> getCompilerStats() const;
+
   CompilationSession(const boost::filesystem::path& workingDirectory);
 
   virtual ~CompilationSession() = default;
 
+  /**
+   * Set the timings of the current step.
+   *
+   * This is called by the runtime before and after each step in which timings
+   * were requested. While set, timings reported using recordTiming() are added
+   * to it.
+   *
+   * @param timings The timings to record to, or `nullptr` to stop recording.
+   */
+  inline void setStepTimings(StepTimings* timings) { timings_ = timings; }
+
  protected:
   /**
    * Get the working directory.
@@ -137,10 +220,31 @@ class CompilationSession {
    *
    * @return A path.
    */
-  inline const boost::filesystem::path& workingDirectory() { return workingDirectory_; }
+  inline const boost::filesystem::path& workingDirectory() const { return workingDirectory_; }
+
+  /**
+   * Whether timings are being recorded for the current step.
+   *
+   * Use this to skip the cost of measuring a timing that would not be used.
+   *
+   * @return True if recordTiming() will record timings.
+   */
+  inline bool recordingTimings() const { return timings_ != nullptr; }
+
+  /**
+   * Report the wall time of a phase of the current step.
+   *
+   * Timings with the same name are summed. This is a no-op if timings are not
+   * being recorded.
+   *
+   * @param name The name of the phase, e.g. `"mycompiler.run_pass"`.
+   * @param wallTimeSeconds The wall time of the phase, in seconds.
+   */
+  void recordTiming(const std::string& name, double wallTimeSeconds);
 
  private:
   const boost::filesystem::path workingDirectory_;
+  StepTimings* timings_ = nullptr;
 };
 
 }  // namespace compiler_gym
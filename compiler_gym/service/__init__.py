@@ -13,6 +13,7 @@ from compiler_gym.service.connection import (
     ServiceTransportError,
     SessionNotFound,
 )
+from compiler_gym.service.service_pool import ServicePool
 
 __all__ = [
     "CompilerGymServiceConnection",
@@ -22,6 +23,7 @@ __all__ = [
     "ServiceInitError",
     "ServiceIsClosed",
     "ServiceOSError",
+    "ServicePool",
     "ServiceTransportError",
     "SessionNotFound",
 ]
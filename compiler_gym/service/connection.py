@@ -9,11 +9,13 @@ import random
 import shutil
 import subprocess
 import sys
+from collections import deque
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from signal import Signals
 from time import sleep, time
-from typing import Iterable, List, Optional, TypeVar, Union
+from typing import Deque, Iterable, List, Optional, Set, TypeVar, Union
 
 import grpc
 from pydantic import BaseModel
@@ -23,7 +25,12 @@ from compiler_gym.service.proto import (
     CompilerGymServiceStub,
     GetSpacesReply,
     GetSpacesRequest,
+    GetStatsReply,
+    GetStatsRequest,
     ObservationSpace,
+    StepBatchRequest,
+    StepReply,
+    StepRequest,
 )
 from compiler_gym.util.debug_util import get_debug_level
 from compiler_gym.util.runfiles_path import (
@@ -82,6 +89,11 @@ class ConnectionOpts(BaseModel):
     rpc_init_max_seconds: float = 3
     """The maximum number of seconds to wait for an RPC connection to establish."""
 
+    cpu_affinity: Optional[List[int]] = None
+    """If set, restrict a local service process to run on these CPUs. This has
+    no effect on platforms that do not support setting the CPU affinity of a
+    process."""
+
 
 class ServiceError(Exception):
     """Error raised from the service."""
@@ -134,6 +146,37 @@ else:
     StubMethod = Callable[[Request], Reply]
 
 
+# Map from the integer value of a gRPC status code to the status code.
+_STATUS_CODES = {code.value[0]: code for code in grpc.StatusCode}
+
+
+def _status_error(status_code: int, details: str) -> Exception:
+    """Return the exception that :meth:`Connection.__call__` raises for an RPC
+    that fails with the given status, for errors that are reported in a reply
+    message rather than as the status of the RPC.
+    """
+    code = _STATUS_CODES.get(status_code)
+    if code == grpc.StatusCode.INVALID_ARGUMENT:
+        return ValueError(details)
+    elif code == grpc.StatusCode.UNIMPLEMENTED:
+        return NotImplementedError(details)
+    elif code == grpc.StatusCode.NOT_FOUND:
+        return FileNotFoundError(details)
+    elif code == grpc.StatusCode.RESOURCE_EXHAUSTED:
+        return ServiceOSError(details)
+    elif code == grpc.StatusCode.FAILED_PRECONDITION:
+        return TypeError(details)
+    elif code == grpc.StatusCode.UNAVAILABLE:
+        return ServiceTransportError(details)
+    elif code == grpc.StatusCode.DEADLINE_EXCEEDED:
+        return TimeoutError(details)
+    elif code == grpc.StatusCode.DATA_LOSS:
+        return ServiceError(details)
+    return ServiceError(
+        f"RPC call returned status code {code or status_code} and error `{details}`"
+    )
+
+
 class Connection:
     """Base class for service connections."""
 
@@ -277,10 +320,13 @@ class ManagedConnection(Connection):
         rpc_init_max_seconds: float,
         process_exit_max_seconds: float,
         logger: logging.Logger,
+        cpu_affinity: Optional[List[int]] = None,
     ):
         """Constructor.
 
         :param local_service_binary: The path of the service binary.
+        :param cpu_affinity: If set, the CPUs that the service process is
+            restricted to run on.
         :raises TimeoutError: If fails to establish connection within a specified time limit.
         """
         self.process_exit_max_seconds = process_exit_max_seconds
@@ -328,10 +374,17 @@ class ManagedConnection(Connection):
             cmd.append(args)
 
         logger.debug("Exec %s", cmd)
+        # Set the CPU affinity in the child process before the service starts
+        # so that it is inherited by every thread that the service creates.
+        preexec_fn = None
+        if cpu_affinity and hasattr(os, "sched_setaffinity"):
+            preexec_fn = partial(os.sched_setaffinity, 0, cpu_affinity)
+
         self.process = subprocess.Popen(
             cmd,
             env=env,
             cwd=local_service_binary.parent,
+            preexec_fn=preexec_fn,
         )
         self._process_returncode_exception_raised = False
 
@@ -551,6 +604,13 @@ class CompilerGymServiceConnection:
     :ivar action_spaces: A list of action spaces provided by the service.
     :ivar observation_spaces: A list of observation spaces provided by the
         service.
+    :ivar benchmarks_sent: The URIs of benchmarks that have been sent to the
+        service over this connection. A benchmark in this set does not need to
+        be sent again, unless the service has since evicted it from its cache.
+    :ivar released_snapshots: A queue of the IDs of session snapshots that are
+        no longer referenced by the client and can be released by the service.
+        IDs are appended by the garbage collector, possibly concurrently with
+        other threads, so they must be removed using :code:`popleft()`.
     """
 
     def __init__(
@@ -587,6 +647,8 @@ class CompilerGymServiceConnection:
         """Create and establish a connection."""
         self.connection = self._create_connection(self.endpoint, self.opts, self.logger)
         self.stub = self.connection.stub
+        self.benchmarks_sent: Set[str] = set()
+        self.released_snapshots: Deque[int] = deque()
 
     @classmethod
     def _create_connection(
@@ -626,6 +688,7 @@ class CompilerGymServiceConnection:
                         rpc_init_max_seconds=opts.rpc_init_max_seconds,
                         port_init_max_seconds=opts.local_service_port_init_max_seconds,
                         logger=logger,
+                        cpu_affinity=opts.cpu_affinity,
                     )
                 else:
                     endpoint_name = endpoint
@@ -682,7 +745,12 @@ class CompilerGymServiceConnection:
         service process is replaced.
         """
         if self.connection:
-            self.connection.close()
+            try:
+                self.connection.close()
+            except ServiceError as e:
+                # Closing a service that has crashed raises an error. Report it
+                # and carry on with the restart.
+                self.logger.warning("%s", e)
         self._establish_connection()
 
     def __call__(
@@ -754,3 +822,64 @@ class CompilerGymServiceConnection:
                 retry_wait_backoff_exponent or self.opts.retry_wait_backoff_exponent
             ),
         )
+
+    def get_stats(self) -> GetStatsReply:
+        """Get statistics about the service.
+
+        This includes the number of active sessions, the state of the
+        benchmark cache, the resident set size of the service process, and the
+        call counts and latency histograms of the RPC methods it has served.
+        Compiler-specific statistics are in the :code:`compiler_stats` map.
+
+        Example usage:
+
+        .. code-block:: python
+
+            >>> stats = env.service.get_stats()
+            >>> stats.session_count
+            1
+
+        Use :func:`write_prometheus_textfile()
+        <compiler_gym.service.service_stats.write_prometheus_textfile>` to
+        export the statistics.
+
+        :return: A :code:`GetStatsReply` message.
+
+        :raises NotImplementedError: If the service does not support
+            statistics.
+        """
+        return self(self.stub.GetStats, GetStatsRequest())
+
+    def step_batch(
+        self, requests: List[StepRequest]
+    ) -> List[Union[StepReply, Exception]]:
+        """Run steps on several sessions of the service using a single
+        :code:`StepBatch()` call.
+
+        Each session may appear at most once in the batch. The steps are
+        independent: the failure of one step does not prevent the others from
+        running.
+
+        :param requests: A list of step requests.
+
+        :return: A list with one entry per request, which is either the reply
+            to the step or the exception that a :code:`Step()` call would have
+            raised, in the same order as :code:`requests`.
+
+        :raises NotImplementedError: If the service does not support batched
+            steps. Use :code:`Step()` instead.
+
+        :raises ServiceError: If the service returned the wrong number of
+            results.
+        """
+        reply = self(self.stub.StepBatch, StepBatchRequest(step=requests))
+        if len(reply.result) != len(requests):
+            raise ServiceError(
+                f"Requested {len(requests)} steps but received {len(reply.result)}"
+            )
+        return [
+            _status_error(result.status_code, result.status_message)
+            if result.status_code
+            else result.reply
+            for result in reply.result
+        ]
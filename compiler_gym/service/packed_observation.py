@@ -0,0 +1,108 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module implements the packed array encoding of observations.
+
+Vectors of integers or real values are usually sent as repeated protocol buffer
+fields, which must be converted to NumPy arrays one element at a time. With the
+packed encoding, the service instead sends the raw array in the
+:code:`binary_value` field of the :code:`Observation` message, prefixed by a
+header describing its dtype and shape, and the client decodes it without
+copying using :code:`np.frombuffer()`. See the :code:`Observation` message in
+:code:`compiler_gym_service.proto` for the format.
+
+Decoded arrays are read-only views of the message. :class:`CompilerEnv
+<compiler_gym.envs.CompilerEnv>` copies them into writable arrays before
+returning them, unless :code:`zero_copy_observations` is set.
+"""
+import struct
+
+import numpy as np
+
+from compiler_gym.service.proto import Observation, ObservationSpace
+
+_HEADER = struct.Struct("<cB6x")
+_DIM = struct.Struct("<Q")
+
+_DTYPES = {
+    b"q": np.dtype("<i8"),
+    b"d": np.dtype("<f8"),
+}
+
+
+def supports_packed_encoding(space: ObservationSpace) -> bool:
+    """Return whether observations from a space can use the packed encoding.
+
+    :param space: An observation space.
+
+    :return: :code:`True` if the space is an :code:`int64_range_list` or
+        :code:`double_range_list` space.
+    """
+    return space.WhichOneof("shape") in {"int64_range_list", "double_range_list"}
+
+
+def pack_array(array: np.ndarray) -> bytes:
+    """Encode an array as a packed array.
+
+    :param array: An array of int64 or double values.
+
+    :return: The packed array.
+
+    :raises TypeError: If the array does not have a supported dtype.
+    """
+    for code, dtype in _DTYPES.items():
+        if array.dtype.kind == dtype.kind and array.dtype.itemsize == dtype.itemsize:
+            break
+    else:
+        raise TypeError(f"Unsupported dtype for packed array: {array.dtype}")
+    return b"".join(
+        [_HEADER.pack(code, array.ndim)]
+        + [_DIM.pack(dim) for dim in array.shape]
+        + [np.ascontiguousarray(array, dtype=dtype).tobytes()]
+    )
+
+
+def unpack_array(data: bytes) -> np.ndarray:
+    """Decode a packed array.
+
+    The returned array is a read-only view of :code:`data`.
+
+    :param data: The packed array.
+
+    :return: An array.
+
+    :raises ValueError: If the data is not a valid packed array.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Packed array is truncated")
+    code, ndim = _HEADER.unpack_from(data, 0)
+    if code not in _DTYPES:
+        raise ValueError(f"Unknown packed array dtype: {code}")
+    shape = tuple(
+        _DIM.unpack_from(data, _HEADER.size + i * _DIM.size)[0] for i in range(ndim)
+    )
+    offset = _HEADER.size + ndim * _DIM.size
+    count = int(np.prod(shape, dtype=np.int64))
+    dtype = _DTYPES[code]
+    if len(data) != offset + count * dtype.itemsize:
+        raise ValueError("Packed array size does not match its shape")
+    return np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def pack_observation(observation: Observation) -> None:
+    """Convert an observation to the packed encoding, in place.
+
+    Observations that are not vectors of integers or real values are not
+    modified.
+
+    :param observation: The observation to convert.
+    """
+    value = observation.WhichOneof("value")
+    if value == "int64_list":
+        array = np.array(observation.int64_list.value, dtype=np.int64)
+    elif value == "double_list":
+        array = np.array(observation.double_list.value, dtype=np.float64)
+    else:
+        return
+    observation.binary_value = pack_array(array)
@@ -8,26 +8,51 @@ from compiler_gym.service.proto.compiler_gym_service_pb2 import (
     AddBenchmarkReply,
     AddBenchmarkRequest,
     Benchmark,
+    BenchmarkCacheStats,
+    BenchmarkDynamicConfig,
+    BenchmarkRun,
     DoubleList,
     EndSessionReply,
     EndSessionRequest,
+    ExecuteSessionReply,
+    ExecuteSessionRequest,
     File,
     ForkSessionReply,
     ForkSessionRequest,
     GetSpacesReply,
     GetSpacesRequest,
+    GetStatsReply,
+    GetStatsRequest,
     GetVersionReply,
     GetVersionRequest,
     Int64List,
+    LoadSessionReply,
+    LoadSessionRequest,
     Observation,
     ObservationSpace,
+    ReleaseSnapshotsReply,
+    ReleaseSnapshotsRequest,
+    RestoreSessionReply,
+    RestoreSessionRequest,
+    RpcStats,
+    SaveSessionReply,
+    SaveSessionRequest,
     ScalarLimit,
     ScalarRange,
     ScalarRangeList,
+    SendSessionParameterReply,
+    SendSessionParameterRequest,
+    SessionParameter,
+    SnapshotSessionReply,
+    SnapshotSessionRequest,
     StartSessionReply,
     StartSessionRequest,
+    StepBatchReply,
+    StepBatchRequest,
+    StepBatchResult,
     StepReply,
     StepRequest,
+    StepTimings,
 )
 from compiler_gym.service.proto.compiler_gym_service_pb2_grpc import (
     CompilerGymServiceServicer,
@@ -40,6 +65,9 @@ __all__ = [
     "AddBenchmarkReply",
     "AddBenchmarkRequest",
     "Benchmark",
+    "BenchmarkCacheStats",
+    "BenchmarkDynamicConfig",
+    "BenchmarkRun",
     "CompilerGymServiceConnection",
     "CompilerGymServiceStub",
     "CompilerGymServiceServicer",
@@ -47,25 +75,47 @@ __all__ = [
     "DoubleList",
     "EndSessionReply",
     "EndSessionRequest",
+    "ExecuteSessionReply",
+    "ExecuteSessionRequest",
     "File",
     "ForkSessionReply",
     "ForkSessionRequest",
     "GetSpacesReply",
     "GetSpacesRequest",
+    "GetStatsReply",
+    "GetStatsRequest",
     "GetVersionReply",
     "GetVersionRequest",
     "Int64List",
+    "LoadSessionReply",
+    "LoadSessionRequest",
     "Observation",
     "ObservationSpace",
+    "ReleaseSnapshotsReply",
+    "ReleaseSnapshotsRequest",
+    "RestoreSessionReply",
+    "RestoreSessionRequest",
+    "RpcStats",
+    "SaveSessionReply",
+    "SaveSessionRequest",
     "ScalarLimit",
     "ScalarRange",
     "ScalarRangeList",
+    "SendSessionParameterReply",
+    "SendSessionParameterRequest",
     "ServiceError",
     "ServiceInitError",
     "ServiceIsClosed",
     "ServiceTransportError",
+    "SessionParameter",
+    "SnapshotSessionReply",
+    "SnapshotSessionRequest",
     "StartSessionReply",
     "StartSessionRequest",
+    "StepBatchReply",
+    "StepBatchRequest",
+    "StepBatchResult",
     "StepReply",
     "StepRequest",
+    "StepTimings",
 ]
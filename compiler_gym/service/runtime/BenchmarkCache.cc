@@ -14,14 +14,19 @@ namespace compiler_gym::runtime {
 BenchmarkCache::BenchmarkCache(size_t maxSizeInBytes, std::optional<std::mt19937_64> rand)
     : rand_(rand.has_value() ? *rand : std::mt19937_64(std::random_device()())),
       maxSizeInBytes_(maxSizeInBytes),
-      sizeInBytes_(0){};
+      sizeInBytes_(0),
+      hitCount_(0),
+      missCount_(0),
+      evictionCount_(0){};
 
 const Benchmark* BenchmarkCache::get(const std::string& uri) const {
   auto it = benchmarks_.find(uri);
   if (it == benchmarks_.end()) {
+    ++missCount_;
     return nullptr;
   }
 
+  ++hitCount_;
   return &it->second;
 }
 
@@ -53,6 +58,19 @@ void BenchmarkCache::add(const Benchmark&& benchmark) {
   sizeInBytes_ += size;
 }
 
+const Benchmark* BenchmarkCache::addAndGet(const Benchmark&& benchmark) {
+  const std::string uri = benchmark.uri();
+  if (benchmarks_.count(uri)) {
+    ++hitCount_;
+  } else {
+    ++missCount_;
+  }
+
+  // Eviction happens before insertion, so the new benchmark is always cached.
+  add(std::move(benchmark));
+  return &benchmarks_.at(uri);
+}
+
 void BenchmarkCache::evictToCapacity(std::optional<size_t> targetSize) {
   int evicted = 0;
   targetSize = targetSize.has_value() ? targetSize : maxSizeInBytes() / 2;
@@ -65,6 +83,7 @@ void BenchmarkCache::evictToCapacity(std::optional<size_t> targetSize) {
 
     // Evict the benchmark from the pool of loaded benchmarks.
     ++evicted;
+    ++evictionCount_;
     sizeInBytes_ -= iterator->second.ByteSizeLong();
     benchmarks_.erase(iterator);
   }
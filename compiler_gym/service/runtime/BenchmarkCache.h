@@ -40,7 +40,7 @@ class BenchmarkCache {
 
   /**
    * Lookup a benchmark. The pointer set by this method is valid only until the
-   * next call to add().
+   * next call to add(). Each lookup is counted as a hit or a miss.
    *
    * @param uri The URI of the benchmark.
    * @return A Benchmark pointer.
@@ -54,6 +54,17 @@ class BenchmarkCache {
    */
   void add(const Benchmark&& benchmark);
 
+  /**
+   * Move-insert the given benchmark to the cache and look it up. The lookup is
+   * counted as a hit if a benchmark with the same URI was already cached, else
+   * as a miss. The pointer returned by this method is valid only until the next
+   * call to add().
+   *
+   * @param benchmark A benchmark to insert.
+   * @return A Benchmark pointer.
+   */
+  const Benchmark* addAndGet(const Benchmark&& benchmark);
+
   /**
    * Get the number of elements in the cache.
    *
@@ -75,6 +86,27 @@ class BenchmarkCache {
    */
   inline size_t maxSizeInBytes() const { return maxSizeInBytes_; };
 
+  /**
+   * The number of lookups that found the requested benchmark.
+   *
+   * @return A nonnegative integer.
+   */
+  inline int64_t hitCount() const { return hitCount_; };
+
+  /**
+   * The number of lookups that did not find the requested benchmark.
+   *
+   * @return A nonnegative integer.
+   */
+  inline int64_t missCount() const { return missCount_; };
+
+  /**
+   * The number of benchmarks that have been evicted from the cache.
+   *
+   * @return A nonnegative integer.
+   */
+  inline int64_t evictionCount() const { return evictionCount_; };
+
   /**
    * Set a new maximum size of the cache.
    *
@@ -98,6 +130,10 @@ class BenchmarkCache {
   std::mt19937_64 rand_;
   size_t maxSizeInBytes_;
   size_t sizeInBytes_;
+
+  mutable int64_t hitCount_;
+  mutable int64_t missCount_;
+  int64_t evictionCount_;
 };
 
 }  // namespace compiler_gym::runtime
@@ -6,6 +6,7 @@
 
 #include <grpcpp/grpcpp.h>
 
+#include <chrono>
 #include <memory>
 #include <mutex>
 
@@ -14,6 +15,8 @@
 #include "compiler_gym/service/proto/compiler_gym_service.grpc.pb.h"
 #include "compiler_gym/service/proto/compiler_gym_service.pb.h"
 #include "compiler_gym/service/runtime/BenchmarkCache.h"
+#include "compiler_gym/service/runtime/RpcStatsRecorder.h"
+#include "compiler_gym/service/runtime/SnapshotCache.h"
 
 namespace compiler_gym::runtime {
 
@@ -29,7 +32,8 @@ template <typename CompilationSessionType>
 class CompilerGymService final : public compiler_gym::CompilerGymService::Service {
  public:
   CompilerGymService(const boost::filesystem::path& workingDirectory,
-                     std::unique_ptr<BenchmarkCache> benchmarks = nullptr);
+                     std::unique_ptr<BenchmarkCache> benchmarks = nullptr,
+                     std::unique_ptr<SnapshotCache> snapshots = nullptr);
 
   // RPC endpoints.
   grpc::Status GetVersion(grpc::ServerContext* context, const GetVersionRequest* request,
@@ -54,11 +58,44 @@ class CompilerGymService final : public compiler_gym::CompilerGymService::Servic
   grpc::Status Step(grpc::ServerContext* context, const StepRequest* request,
                     StepReply* reply) final override;
 
+  // Steps on different sessions are run concurrently, so the same thread
+  // safety assumptions as for Step() apply.
+  grpc::Status StepBatch(grpc::ServerContext* context, const StepBatchRequest* request,
+                         StepBatchReply* reply) final override;
+
   grpc::Status AddBenchmark(grpc::ServerContext* context, const AddBenchmarkRequest* request,
                             AddBenchmarkReply* reply) final override;
 
+  grpc::Status SnapshotSession(grpc::ServerContext* context, const SnapshotSessionRequest* request,
+                               SnapshotSessionReply* reply) final override;
+
+  grpc::Status RestoreSession(grpc::ServerContext* context, const RestoreSessionRequest* request,
+                              RestoreSessionReply* reply) final override;
+
+  grpc::Status ReleaseSnapshots(grpc::ServerContext* context,
+                                const ReleaseSnapshotsRequest* request,
+                                ReleaseSnapshotsReply* reply) final override;
+
+  grpc::Status SaveSession(grpc::ServerContext* context, const SaveSessionRequest* request,
+                           SaveSessionReply* reply) final override;
+
+  grpc::Status LoadSession(grpc::ServerContext* context, const LoadSessionRequest* request,
+                           LoadSessionReply* reply) final override;
+
+  grpc::Status ExecuteSession(grpc::ServerContext* context, const ExecuteSessionRequest* request,
+                              ExecuteSessionReply* reply) final override;
+
+  grpc::Status SendSessionParameter(grpc::ServerContext* context,
+                                    const SendSessionParameterRequest* request,
+                                    SendSessionParameterReply* reply) final override;
+
+  grpc::Status GetStats(grpc::ServerContext* context, const GetStatsRequest* request,
+                        GetStatsReply* reply) final override;
+
   inline BenchmarkCache& benchmarks() { return *benchmarks_; }
 
+  inline SnapshotCache& snapshots() { return *snapshots_; }
+
   // Get the number of active sessions.
   inline int sessionCount() const { return static_cast<int>(sessions_.size()); }
 
@@ -78,6 +115,9 @@ class CompilerGymService final : public compiler_gym::CompilerGymService::Servic
   // Add the given session and return its ID.
   uint64_t addSession(std::unique_ptr<CompilationSession> session);
 
+  // The implementation of Step(), shared with StepBatch().
+  [[nodiscard]] grpc::Status step(const StepRequest* request, StepReply* reply);
+
  private:
   const boost::filesystem::path workingDirectory_;
   const std::vector<ActionSpace> actionSpaces_;
@@ -85,10 +125,15 @@ class CompilerGymService final : public compiler_gym::CompilerGymService::Servic
 
   std::unordered_map<uint64_t, std::unique_ptr<CompilationSession>> sessions_;
   std::unique_ptr<BenchmarkCache> benchmarks_;
+  std::unique_ptr<SnapshotCache> snapshots_;
 
-  // Mutex used to ensure thread safety of creation and destruction of sessions.
+  // Mutex used to ensure thread safety of creation and destruction of sessions
+  // and snapshots.
   std::mutex sessionsMutex_;
   uint64_t nextSessionId_;
+
+  RpcStatsRecorder rpcStats_;
+  const std::chrono::steady_clock::time_point startTime_;
 };
 
 }  // namespace compiler_gym::runtime
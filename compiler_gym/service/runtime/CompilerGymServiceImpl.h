@@ -10,6 +10,12 @@
 
 #include <fmt/format.h>
 
+#include <chrono>
+#include <future>
+#include <unordered_set>
+#include <vector>
+
+#include "compiler_gym/service/runtime/PackedObservation.h"
 #include "compiler_gym/util/GrpcStatusMacros.h"
 #include "compiler_gym/util/Version.h"
 
@@ -17,16 +23,21 @@ namespace compiler_gym::runtime {
 
 template <typename CompilationSessionType>
 CompilerGymService<CompilationSessionType>::CompilerGymService(
-    const boost::filesystem::path& workingDirectory, std::unique_ptr<BenchmarkCache> benchmarks)
+    const boost::filesystem::path& workingDirectory, std::unique_ptr<BenchmarkCache> benchmarks,
+    std::unique_ptr<SnapshotCache> snapshots)
     : workingDirectory_(workingDirectory),
       actionSpaces_(CompilationSessionType(workingDirectory).getActionSpaces()),
       observationSpaces_(CompilationSessionType(workingDirectory).getObservationSpaces()),
       benchmarks_(benchmarks ? std::move(benchmarks) : std::make_unique<BenchmarkCache>()),
-      nextSessionId_(0) {}
+      snapshots_(snapshots ? std::move(snapshots)
+                           : std::make_unique<SnapshotCache>(workingDirectory / "snapshots")),
+      nextSessionId_(0),
+      startTime_(std::chrono::steady_clock::now()) {}
 
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::GetVersion(
     grpc::ServerContext* context, const GetVersionRequest* request, GetVersionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("GetVersion");
   VLOG(2) << "GetVersion()";
   reply->set_service_version(COMPILER_GYM_VERSION);
   CompilationSessionType environment(workingDirectory());
@@ -38,12 +49,15 @@ template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::GetSpaces(grpc::ServerContext* context,
                                                                    const GetSpacesRequest* request,
                                                                    GetSpacesReply* reply) {
+  const auto rpcTimer = rpcStats_.time("GetSpaces");
   VLOG(2) << "GetSpaces()";
   for (const auto& actionSpace : actionSpaces_) {
     *reply->add_action_space_list() = actionSpace;
   }
   for (const auto& observationSpace : observationSpaces_) {
-    *reply->add_observation_space_list() = observationSpace;
+    ObservationSpace* space = reply->add_observation_space_list();
+    *space = observationSpace;
+    space->set_supports_packed_encoding(supportsPackedEncoding(observationSpace));
   }
   return grpc::Status::OK;
 }
@@ -51,16 +65,27 @@ grpc::Status CompilerGymService<CompilationSessionType>::GetSpaces(grpc::ServerC
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::StartSession(
     grpc::ServerContext* context, const StartSessionRequest* request, StartSessionReply* reply) {
-  if (!request->benchmark().size()) {
+  const auto rpcTimer = rpcStats_.time("StartSession");
+  const std::string& uri = request->benchmark().size() ? request->benchmark()
+                                                       : request->benchmark_definition().uri();
+  if (!uri.size()) {
     return grpc::Status(grpc::StatusCode::INVALID_ARGUMENT,
                         "No benchmark URI set for StartSession()");
   }
 
   const std::lock_guard<std::mutex> lock(sessionsMutex_);
-  VLOG(1) << "StartSession(" << request->benchmark() << "), " << sessionCount()
-          << " active sessions";
-
-  const Benchmark* benchmark = benchmarks().get(request->benchmark());
+  VLOG(1) << "StartSession(" << uri << "), " << sessionCount() << " active sessions";
+
+  // If the client sent the benchmark along with the request, add it to the
+  // cache so that the session can be started without an AddBenchmark() round
+  // trip. This counts as a cache miss if the benchmark was not already cached.
+  const Benchmark* benchmark = nullptr;
+  if (request->has_benchmark_definition()) {
+    benchmark = benchmarks().addAndGet(std::move(request->benchmark_definition()));
+  }
+  if (!benchmark || benchmark->uri() != uri) {
+    benchmark = benchmarks().get(uri);
+  }
   if (!benchmark) {
     return grpc::Status(grpc::StatusCode::NOT_FOUND, "Benchmark not found");
   }
@@ -80,7 +105,11 @@ grpc::Status CompilerGymService<CompilationSessionType>::StartSession(
     const ObservationSpace* observationSpace;
     RETURN_IF_ERROR(
         observation_space(environment.get(), request->observation_space(i), &observationSpace));
-    RETURN_IF_ERROR(environment->computeObservation(*observationSpace, *reply->add_observation()));
+    Observation* observation = reply->add_observation();
+    RETURN_IF_ERROR(environment->computeObservation(*observationSpace, *observation));
+    if (request->packed_observations() && supportsPackedEncoding(*observationSpace)) {
+      packObservation(*observation);
+    }
   }
 
   reply->set_session_id(addSession(std::move(environment)));
@@ -91,6 +120,7 @@ grpc::Status CompilerGymService<CompilationSessionType>::StartSession(
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::ForkSession(
     grpc::ServerContext* context, const ForkSessionRequest* request, ForkSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("ForkSession");
   const std::lock_guard<std::mutex> lock(sessionsMutex_);
 
   CompilationSession* baseSession;
@@ -111,6 +141,7 @@ grpc::Status CompilerGymService<CompilationSessionType>::ForkSession(
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::EndSession(
     grpc::ServerContext* context, const EndSessionRequest* request, EndSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("EndSession");
   VLOG(1) << "EndSession(" << request->session_id() << "), " << sessionCount() - 1
           << " sessions remaining";
 
@@ -132,11 +163,84 @@ template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::Step(grpc::ServerContext* context,
                                                               const StepRequest* request,
                                                               StepReply* reply) {
+  const auto rpcTimer = rpcStats_.time("Step");
+  return step(request, reply);
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::StepBatch(
+    grpc::ServerContext* context, const StepBatchRequest* request, StepBatchReply* reply) {
+  const auto rpcTimer = rpcStats_.time("StepBatch");
+  VLOG(2) << "StepBatch(), " << request->step_size() << " steps";
+
+  // Steps on the same session cannot be run concurrently.
+  std::unordered_set<uint64_t> sessionIds;
+  for (const auto& stepRequest : request->step()) {
+    if (!sessionIds.insert(stepRequest.session_id()).second) {
+      return grpc::Status(
+          grpc::StatusCode::INVALID_ARGUMENT,
+          fmt::format("Duplicate session in StepBatch(): {}", stepRequest.session_id()));
+    }
+  }
+
+  // Add the results up front so that the steps can fill them in concurrently
+  // without reallocating the repeated field.
+  for (int i = 0; i < request->step_size(); ++i) {
+    reply->add_result();
+  }
+  const auto runStep = [&](int i) {
+    StepBatchResult* result = reply->mutable_result(i);
+    const grpc::Status status = step(&request->step(i), result->mutable_reply());
+    if (!status.ok()) {
+      result->set_status_code(status.error_code());
+      result->set_status_message(status.error_message());
+      result->clear_reply();
+    }
+  };
+
+  // Run the steps concurrently, as separate Step() calls would be, using the
+  // calling thread for the first step.
+  std::vector<std::future<void>> steps;
+  for (int i = 1; i < request->step_size(); ++i) {
+    steps.push_back(std::async(std::launch::async, runStep, i));
+  }
+  if (request->step_size()) {
+    runStep(0);
+  }
+  for (auto& future : steps) {
+    future.get();
+  }
+
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::step(const StepRequest* request,
+                                                              StepReply* reply) {
   CompilationSession* environment;
   RETURN_IF_ERROR(session(request->session_id(), &environment));
 
   VLOG(2) << "Session " << request->session_id() << " Step()";
 
+  // Timings are only measured if requested, so that the cost of reading the
+  // clock is not paid by every step.
+  using Clock = std::chrono::steady_clock;
+  const bool recordTimings = request->record_timings();
+  const auto now = [&]() { return recordTimings ? Clock::now() : Clock::time_point(); };
+  const auto secondsSince = [](Clock::time_point start) {
+    return std::chrono::duration<double>(Clock::now() - start).count();
+  };
+  StepTimings* timings = recordTimings ? reply->mutable_timings() : nullptr;
+  const Clock::time_point stepStartTime = now();
+
+  // Let the session report finer-grained timings for the duration of this
+  // step. The guard stops recording on every return path.
+  environment->setStepTimings(timings);
+  struct StepTimingsGuard {
+    CompilationSession* session;
+    ~StepTimingsGuard() { session->setStepTimings(nullptr); }
+  } stepTimingsGuard{environment};
+
   bool endOfEpisode = false;
   std::optional<ActionSpace> newActionSpace;
   bool actionsHadNoEffect = true;
@@ -145,8 +249,12 @@ grpc::Status CompilerGymService<CompilationSessionType>::Step(grpc::ServerContex
   for (int i = 0; i < request->action_size(); ++i) {
     bool actionHadNoEffect = false;
     std::optional<ActionSpace> newActionSpaceFromAction;
+    const Clock::time_point actionStartTime = now();
     RETURN_IF_ERROR(environment->applyAction(request->action(i), endOfEpisode,
                                              newActionSpaceFromAction, actionHadNoEffect));
+    if (timings) {
+      timings->add_action(secondsSince(actionStartTime));
+    }
     actionsHadNoEffect &= actionHadNoEffect;
     if (newActionSpaceFromAction.has_value()) {
       newActionSpace = *newActionSpaceFromAction;
@@ -162,11 +270,29 @@ grpc::Status CompilerGymService<CompilationSessionType>::Step(grpc::ServerContex
     RETURN_IF_ERROR(
         observation_space(environment, request->observation_space(i), &observationSpace));
     DCHECK(observationSpace) << "No observation space set";
-    RETURN_IF_ERROR(environment->computeObservation(*observationSpace, *reply->add_observation()));
+    Observation* observation = reply->add_observation();
+    const Clock::time_point observationStartTime = now();
+    RETURN_IF_ERROR(environment->computeObservation(*observationSpace, *observation));
+    if (timings) {
+      timings->add_observation(secondsSince(observationStartTime));
+    }
+    if (request->packed_observations() && supportsPackedEncoding(*observationSpace)) {
+      const Clock::time_point packStartTime = now();
+      packObservation(*observation);
+      if (timings) {
+        timings->set_pack_observations(timings->pack_observations() +
+                                       secondsSince(packStartTime));
+      }
+    }
   }
 
   // Call the end-of-step callback.
+  const Clock::time_point endOfStepStartTime = now();
   RETURN_IF_ERROR(environment->endOfStep(actionsHadNoEffect, endOfEpisode, newActionSpace));
+  if (timings) {
+    timings->set_end_of_step(secondsSince(endOfStepStartTime));
+    timings->set_total(secondsSince(stepStartTime));
+  }
 
   reply->set_action_had_no_effect(actionsHadNoEffect);
   if (newActionSpace.has_value()) {
@@ -179,6 +305,7 @@ grpc::Status CompilerGymService<CompilationSessionType>::Step(grpc::ServerContex
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::AddBenchmark(
     grpc::ServerContext* context, const AddBenchmarkRequest* request, AddBenchmarkReply* reply) {
+  const auto rpcTimer = rpcStats_.time("AddBenchmark");
   // We need to grab the sessions lock here to ensure thread safe access to the
   // benchmarks cache.
   const std::lock_guard<std::mutex> lock(sessionsMutex_);
@@ -191,6 +318,172 @@ grpc::Status CompilerGymService<CompilationSessionType>::AddBenchmark(
   return grpc::Status::OK;
 }
 
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::SnapshotSession(
+    grpc::ServerContext* context, const SnapshotSessionRequest* request,
+    SnapshotSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("SnapshotSession");
+  const std::lock_guard<std::mutex> lock(sessionsMutex_);
+
+  CompilationSession* environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "SnapshotSession(" << request->session_id() << "), " << snapshots().size()
+          << " snapshots";
+
+  // Prefer a serialized state, which is compact and can be spilled to disk.
+  // Fall back to storing a copy of the session if serialization is not
+  // supported.
+  std::string state;
+  const grpc::Status status = environment->saveState(state);
+  if (status.ok()) {
+    reply->set_snapshot_id(snapshots().add(std::move(state)));
+    return grpc::Status::OK;
+  } else if (status.error_code() != grpc::StatusCode::UNIMPLEMENTED) {
+    return status;
+  }
+
+  auto snapshot = std::make_unique<CompilationSessionType>(workingDirectory());
+  RETURN_IF_ERROR(snapshot->init(environment));
+  reply->set_snapshot_id(snapshots().add(std::move(snapshot)));
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::RestoreSession(
+    grpc::ServerContext* context, const RestoreSessionRequest* request,
+    RestoreSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("RestoreSession");
+  const std::lock_guard<std::mutex> lock(sessionsMutex_);
+
+  CompilationSession* environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "RestoreSession(" << request->session_id() << ", " << request->snapshot_id() << ")";
+
+  CompilationSession* snapshot;
+  std::string state;
+  RETURN_IF_ERROR(snapshots().get(request->snapshot_id(), &snapshot, &state));
+
+  // Construct the restored session before replacing the existing one so that
+  // the session is unchanged on error.
+  auto restored = std::make_unique<CompilationSessionType>(workingDirectory());
+  if (snapshot) {
+    RETURN_IF_ERROR(restored->init(snapshot));
+  } else {
+    RETURN_IF_ERROR(restored->loadState(state));
+  }
+  sessions_[request->session_id()] = std::move(restored);
+
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::ReleaseSnapshots(
+    grpc::ServerContext* context, const ReleaseSnapshotsRequest* request,
+    ReleaseSnapshotsReply* reply) {
+  const auto rpcTimer = rpcStats_.time("ReleaseSnapshots");
+  const std::lock_guard<std::mutex> lock(sessionsMutex_);
+
+  VLOG(2) << "ReleaseSnapshots(" << request->snapshot_id_size() << " snapshots)";
+  for (int i = 0; i < request->snapshot_id_size(); ++i) {
+    snapshots().release(request->snapshot_id(i));
+  }
+
+  reply->set_remaining_snapshots(static_cast<int>(snapshots().size()));
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::SaveSession(
+    grpc::ServerContext* context, const SaveSessionRequest* request, SaveSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("SaveSession");
+  const std::lock_guard<std::mutex> lock(sessionsMutex_);
+
+  CompilationSession* environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "SaveSession(" << request->session_id() << ")";
+
+  RETURN_IF_ERROR(environment->saveState(*reply->mutable_state()));
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::LoadSession(
+    grpc::ServerContext* context, const LoadSessionRequest* request, LoadSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("LoadSession");
+  const std::lock_guard<std::mutex> lock(sessionsMutex_);
+  VLOG(1) << "LoadSession(" << request->state().size() << " bytes), [" << nextSessionId_ << "]";
+
+  auto environment = std::make_unique<CompilationSessionType>(workingDirectory());
+  RETURN_IF_ERROR(environment->loadState(request->state()));
+
+  reply->set_session_id(addSession(std::move(environment)));
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::ExecuteSession(
+    grpc::ServerContext* context, const ExecuteSessionRequest* request,
+    ExecuteSessionReply* reply) {
+  const auto rpcTimer = rpcStats_.time("ExecuteSession");
+  CompilationSession* environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "ExecuteSession(" << request->session_id() << ")";
+
+  return environment->execute(*request, *reply);
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::SendSessionParameter(
+    grpc::ServerContext* context, const SendSessionParameterRequest* request,
+    SendSessionParameterReply* reply) {
+  const auto rpcTimer = rpcStats_.time("SendSessionParameter");
+  CompilationSession* environment;
+  RETURN_IF_ERROR(session(request->session_id(), &environment));
+  VLOG(1) << "SendSessionParameter(" << request->session_id() << ", "
+          << request->parameter_size() << " parameters)";
+
+  for (const auto& parameter : request->parameter()) {
+    RETURN_IF_ERROR(environment->handleSessionParameter(parameter.key(), parameter.value(),
+                                                        *reply->add_reply()));
+  }
+  return grpc::Status::OK;
+}
+
+template <typename CompilationSessionType>
+grpc::Status CompilerGymService<CompilationSessionType>::GetStats(grpc::ServerContext* context,
+                                                                  const GetStatsRequest* request,
+                                                                  GetStatsReply* reply) {
+  const auto rpcTimer = rpcStats_.time("GetStats");
+  VLOG(2) << "GetStats()";
+
+  {
+    // We need to grab the sessions lock here to ensure thread safe access to
+    // the sessions and caches.
+    const std::lock_guard<std::mutex> lock(sessionsMutex_);
+    reply->set_session_count(sessionCount());
+    reply->set_snapshot_count(static_cast<int>(snapshots().size()));
+
+    BenchmarkCacheStats* benchmarkCache = reply->mutable_benchmark_cache();
+    benchmarkCache->set_size(benchmarks().size());
+    benchmarkCache->set_size_in_bytes(benchmarks().sizeInBytes());
+    benchmarkCache->set_max_size_in_bytes(benchmarks().maxSizeInBytes());
+    benchmarkCache->set_hit_count(benchmarks().hitCount());
+    benchmarkCache->set_miss_count(benchmarks().missCount());
+    benchmarkCache->set_eviction_count(benchmarks().evictionCount());
+
+    CompilationSessionType environment(workingDirectory());
+    for (const auto& [name, value] : environment.getCompilerStats()) {
+      (*reply->mutable_compiler_stats())[name] = value;
+    }
+  }
+
+  reply->set_resident_set_size_bytes(getResidentSetSizeInBytes());
+  reply->set_uptime_seconds(
+      std::chrono::duration<double>(std::chrono::steady_clock::now() - startTime_).count());
+  rpcStats_.getStats(reply);
+  return grpc::Status::OK;
+}
+
 template <typename CompilationSessionType>
 grpc::Status CompilerGymService<CompilationSessionType>::session(uint64_t id,
                                                                  CompilationSession** environment) {
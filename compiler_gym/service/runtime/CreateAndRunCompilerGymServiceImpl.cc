@@ -10,6 +10,10 @@ DEFINE_string(
 DEFINE_string(port, "0",
               "The port to listen on. If 0, an unused port will be selected. The selected port is "
               "written to <working_dir>/port.txt.");
+DEFINE_uint64(max_snapshot_memory, compiler_gym::runtime::kMaxSnapshotSizeInBytes,
+              "The maximum number of bytes of session snapshots to hold in memory. Once "
+              "exceeded, the least recently used snapshots are written to "
+              "<working_dir>/snapshots.");
 
 namespace compiler_gym::runtime {
 
@@ -24,6 +24,7 @@
 
 DECLARE_string(port);
 DECLARE_string(working_dir);
+DECLARE_uint64(max_snapshot_memory);
 
 namespace compiler_gym::runtime {
 
@@ -87,7 +88,9 @@ template <typename CompilationSessionType>
 
   google::InitGoogleLogging(argv[0]);
 
-  CompilerGymService<CompilationSessionType> service{workingDirectory};
+  CompilerGymService<CompilationSessionType> service{
+      workingDirectory, /*benchmarks=*/nullptr,
+      std::make_unique<SnapshotCache>(workingDirectory / "snapshots", FLAGS_max_snapshot_memory)};
 
   grpc::ServerBuilder builder;
   builder.RegisterService(&service);
@@ -0,0 +1,73 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/service/runtime/PackedObservation.h"
+
+#include <cstdint>
+#include <string>
+
+namespace compiler_gym::runtime {
+
+namespace {
+
+bool isLittleEndian() {
+  const uint16_t value = 1;
+  return *reinterpret_cast<const uint8_t*>(&value) == 1;
+}
+
+// Append a value to a buffer in little-endian byte order.
+template <typename T>
+void appendLittleEndian(std::string& buffer, const T& value) {
+  const char* bytes = reinterpret_cast<const char*>(&value);
+  if (isLittleEndian()) {
+    buffer.append(bytes, sizeof(T));
+  } else {
+    for (size_t i = sizeof(T); i > 0; --i) {
+      buffer.push_back(bytes[i - 1]);
+    }
+  }
+}
+
+template <typename T>
+std::string packValues(char dtype, const google::protobuf::RepeatedField<T>& values) {
+  std::string buffer;
+  buffer.reserve(16 + values.size() * sizeof(T));
+
+  // The header: dtype, number of dimensions, padding, and the size of the one
+  // dimension.
+  const char header[8] = {dtype, 1, 0, 0, 0, 0, 0, 0};
+  buffer.append(header, sizeof(header));
+  appendLittleEndian(buffer, static_cast<uint64_t>(values.size()));
+
+  if (isLittleEndian()) {
+    buffer.append(reinterpret_cast<const char*>(values.data()), values.size() * sizeof(T));
+  } else {
+    for (const T& value : values) {
+      appendLittleEndian(buffer, value);
+    }
+  }
+  return buffer;
+}
+
+}  // anonymous namespace
+
+bool supportsPackedEncoding(const ObservationSpace& space) {
+  return space.shape_case() == ObservationSpace::ShapeCase::kInt64RangeList ||
+         space.shape_case() == ObservationSpace::ShapeCase::kDoubleRangeList;
+}
+
+void packObservation(Observation& observation) {
+  switch (observation.value_case()) {
+    case Observation::ValueCase::kInt64List:
+      observation.set_binary_value(packValues('q', observation.int64_list().value()));
+      break;
+    case Observation::ValueCase::kDoubleList:
+      observation.set_binary_value(packValues('d', observation.double_list().value()));
+      break;
+    default:
+      break;
+  }
+}
+
+}  // namespace compiler_gym::runtime
@@ -0,0 +1,31 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+
+namespace compiler_gym::runtime {
+
+/**
+ * Return whether observations from a space can be sent using the packed array
+ * encoding.
+ *
+ * @param space An observation space.
+ * @return True if the space is an int64_range_list or double_range_list space.
+ */
+bool supportsPackedEncoding(const ObservationSpace& space);
+
+/**
+ * Convert an observation to the packed array encoding, in place.
+ *
+ * Vectors of integers or real values are replaced by a packed array in the
+ * binary_value field. Other observations are not modified. See the Observation
+ * message in compiler_gym_service.proto for the format.
+ *
+ * @param observation The observation to convert.
+ */
+void packObservation(Observation& observation);
+
+}  // namespace compiler_gym::runtime
@@ -0,0 +1,62 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/service/runtime/RpcStatsRecorder.h"
+
+#include <unistd.h>
+
+#include <algorithm>
+#include <fstream>
+
+namespace compiler_gym::runtime {
+
+RpcStatsRecorder::Timer::Timer(RpcStatsRecorder* stats, const char* name)
+    : stats_(stats), name_(name), startTime_(std::chrono::steady_clock::now()) {}
+
+RpcStatsRecorder::Timer::~Timer() {
+  const auto elapsed = std::chrono::steady_clock::now() - startTime_;
+  stats_->record(name_, std::chrono::duration<double>(elapsed).count());
+}
+
+void RpcStatsRecorder::record(const std::string& name, double latencySeconds) {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  MethodStats& stats = methods_[name];
+  ++stats.callCount;
+  stats.latencySecondsSum += latencySeconds;
+
+  const auto bucket = std::lower_bound(kRpcLatencyBucketUpperBounds.begin(),
+                                       kRpcLatencyBucketUpperBounds.end(), latencySeconds);
+  if (bucket != kRpcLatencyBucketUpperBounds.end()) {
+    ++stats.bucketCounts[bucket - kRpcLatencyBucketUpperBounds.begin()];
+  }
+}
+
+void RpcStatsRecorder::getStats(GetStatsReply* reply) const {
+  const std::lock_guard<std::mutex> lock(mutex_);
+  for (const auto& [name, stats] : methods_) {
+    compiler_gym::RpcStats* rpc = reply->add_rpc();
+    rpc->set_name(name);
+    rpc->set_call_count(stats.callCount);
+    rpc->set_latency_seconds_sum(stats.latencySecondsSum);
+    int64_t cumulativeCount = 0;
+    for (size_t i = 0; i < kRpcLatencyBucketUpperBounds.size(); ++i) {
+      cumulativeCount += stats.bucketCounts[i];
+      rpc->add_latency_bucket_upper_bound(kRpcLatencyBucketUpperBounds[i]);
+      rpc->add_latency_bucket_count(cumulativeCount);
+    }
+  }
+}
+
+int64_t getResidentSetSizeInBytes() {
+  // The second field of /proc/self/statm is the number of resident pages. This
+  // is only available on Linux.
+  std::ifstream statm("/proc/self/statm");
+  int64_t sizePages, residentPages;
+  if (!(statm >> sizePages >> residentPages)) {
+    return 0;
+  }
+  return residentPages * sysconf(_SC_PAGESIZE);
+}
+
+}  // namespace compiler_gym::runtime
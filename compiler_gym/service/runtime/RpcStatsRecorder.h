@@ -0,0 +1,102 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <array>
+#include <chrono>
+#include <map>
+#include <mutex>
+#include <string>
+
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+
+namespace compiler_gym::runtime {
+
+/**
+ * The upper bounds of the RPC latency histogram buckets, in seconds.
+ */
+constexpr std::array<double, 16> kRpcLatencyBucketUpperBounds = {
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05,   0.1,     0.25,   0.5,   1,      2.5,   10,  60};
+
+/**
+ * Records the call counts and latency histograms of RPC methods.
+ *
+ * This class is thread safe.
+ *
+ * Example usage:
+ *
+ * \code{.cpp}
+ *     grpc::Status MyService::Step(...) {
+ *       const auto timer = rpcStats_.time("Step");
+ *       // ... handle the call
+ *     }
+ * \endcode
+ */
+class RpcStatsRecorder {
+ public:
+  /**
+   * Measures the latency of a single RPC call. The call is recorded when the
+   * timer is destroyed.
+   */
+  class Timer {
+   public:
+    Timer(RpcStatsRecorder* stats, const char* name);
+
+    Timer(const Timer&) = delete;
+    Timer& operator=(const Timer&) = delete;
+
+    ~Timer();
+
+   private:
+    RpcStatsRecorder* stats_;
+    const char* name_;
+    const std::chrono::steady_clock::time_point startTime_;
+  };
+
+  /**
+   * Start timing an RPC call.
+   *
+   * @param name The name of the RPC method.
+   * @return A timer that records the call when it goes out of scope.
+   */
+  inline Timer time(const char* name) { return Timer(this, name); }
+
+  /**
+   * Record a completed RPC call.
+   *
+   * @param name The name of the RPC method.
+   * @param latencySeconds The wall time of the call, in seconds.
+   */
+  void record(const std::string& name, double latencySeconds);
+
+  /**
+   * Add the statistics of every RPC method that has been called to a reply.
+   *
+   * @param reply The reply to add the statistics to.
+   */
+  void getStats(GetStatsReply* reply) const;
+
+ private:
+  struct MethodStats {
+    int64_t callCount = 0;
+    double latencySecondsSum = 0;
+    // The number of calls that fall into each bucket. These are not
+    // cumulative. Calls slower than the largest upper bound are not counted.
+    std::array<int64_t, kRpcLatencyBucketUpperBounds.size()> bucketCounts{};
+  };
+
+  mutable std::mutex mutex_;
+  std::map<std::string, MethodStats> methods_;
+};
+
+/**
+ * Get the resident set size of the current process.
+ *
+ * @return A number of bytes, or zero if it cannot be determined.
+ */
+int64_t getResidentSetSizeInBytes();
+
+}  // namespace compiler_gym::runtime
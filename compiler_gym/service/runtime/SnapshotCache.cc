@@ -0,0 +1,147 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include "compiler_gym/service/runtime/SnapshotCache.h"
+
+#include <fmt/format.h>
+#include <glog/logging.h>
+
+#include <fstream>
+#include <sstream>
+
+namespace fs = boost::filesystem;
+
+using grpc::Status;
+using grpc::StatusCode;
+
+namespace compiler_gym::runtime {
+
+SnapshotCache::SnapshotCache(const fs::path& spillDirectory, size_t maxSizeInBytes)
+    : spillDirectory_(spillDirectory),
+      maxSizeInBytes_(maxSizeInBytes),
+      sizeInBytes_(0),
+      spilledCount_(0),
+      nextId_(0) {}
+
+SnapshotCache::~SnapshotCache() {
+  if (spilledCount()) {
+    boost::system::error_code ec;
+    fs::remove_all(spillDirectory_, ec);
+  }
+}
+
+uint64_t SnapshotCache::add(std::string&& state) {
+  const uint64_t id = nextId_++;
+  const size_t size = state.size();
+  lru_.push_front(id);
+  snapshots_[id] = Snapshot{nullptr, std::move(state), false, lru_.begin()};
+  sizeInBytes_ += size;
+  VLOG(3) << "Added snapshot " << id << " of " << size << " bytes. Snapshot cache size = "
+          << sizeInBytes() << " bytes, " << this->size() << " items";
+
+  if (sizeInBytes() > maxSizeInBytes()) {
+    spillToCapacity();
+  }
+  return id;
+}
+
+uint64_t SnapshotCache::add(std::unique_ptr<CompilationSession> session) {
+  const uint64_t id = nextId_++;
+  snapshots_[id] = Snapshot{std::move(session), "", false, lru_.end()};
+  return id;
+}
+
+Status SnapshotCache::get(uint64_t id, CompilationSession** session, std::string* state) {
+  auto it = snapshots_.find(id);
+  if (it == snapshots_.end()) {
+    return Status(StatusCode::NOT_FOUND, fmt::format("Snapshot not found: {}", id));
+  }
+  Snapshot& snapshot = it->second;
+
+  *session = snapshot.session.get();
+  if (snapshot.session) {
+    return Status::OK;
+  }
+
+  if (snapshot.spilled) {
+    std::ifstream file(spillPath(id).string(), std::ios::binary);
+    std::stringstream buffer;
+    buffer << file.rdbuf();
+    if (!file) {
+      return Status(StatusCode::INTERNAL,
+                    fmt::format("Failed to read snapshot file: {}", spillPath(id).string()));
+    }
+    *state = buffer.str();
+    return Status::OK;
+  }
+
+  // Mark the state as the most recently used.
+  lru_.splice(lru_.begin(), lru_, snapshot.lruPosition);
+  *state = snapshot.state;
+  return Status::OK;
+}
+
+bool SnapshotCache::release(uint64_t id) {
+  auto it = snapshots_.find(id);
+  if (it == snapshots_.end()) {
+    return false;
+  }
+  Snapshot& snapshot = it->second;
+
+  if (snapshot.spilled) {
+    boost::system::error_code ec;
+    fs::remove(spillPath(id), ec);
+    --spilledCount_;
+  } else if (!snapshot.session) {
+    lru_.erase(snapshot.lruPosition);
+    sizeInBytes_ -= snapshot.state.size();
+  }
+  snapshots_.erase(it);
+  return true;
+}
+
+void SnapshotCache::setMaxSizeInBytes(size_t maxSizeInBytes) {
+  maxSizeInBytes_ = maxSizeInBytes;
+  spillToCapacity();
+}
+
+fs::path SnapshotCache::spillPath(uint64_t id) const {
+  return spillDirectory_ / fmt::format("{}.snapshot", id);
+}
+
+void SnapshotCache::spillToCapacity() {
+  int spilled = 0;
+
+  while (lru_.size() && sizeInBytes() > maxSizeInBytes()) {
+    const uint64_t id = lru_.back();
+    Snapshot& snapshot = snapshots_[id];
+
+    boost::system::error_code ec;
+    fs::create_directories(spillDirectory_, ec);
+    std::ofstream file(spillPath(id).string(), std::ios::binary);
+    file.write(snapshot.state.data(), snapshot.state.size());
+    file.close();
+    if (!file) {
+      LOG(ERROR) << "Failed to spill snapshot to " << spillPath(id).string()
+                 << ". Keeping snapshots in memory";
+      return;
+    }
+
+    // Release the memory of the in-memory state.
+    sizeInBytes_ -= snapshot.state.size();
+    std::string().swap(snapshot.state);
+    snapshot.spilled = true;
+    lru_.pop_back();
+    ++spilledCount_;
+    ++spilled;
+  }
+
+  if (spilled) {
+    VLOG(2) << "Spilled " << spilled << " snapshots to disk. Snapshot cache size now "
+            << sizeInBytes() << " bytes, " << spilledCount() << " of " << size()
+            << " items spilled";
+  }
+}
+
+}  // namespace compiler_gym::runtime
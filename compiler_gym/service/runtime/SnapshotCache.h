@@ -0,0 +1,144 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#pragma once
+
+#include <grpcpp/grpcpp.h>
+
+#include <list>
+#include <memory>
+#include <string>
+#include <unordered_map>
+
+#include "boost/filesystem.hpp"
+#include "compiler_gym/service/CompilationSession.h"
+
+namespace compiler_gym::runtime {
+
+constexpr size_t kMaxSnapshotSizeInBytes = 512 * 1024 * 1024;
+
+/**
+ * A store of immutable session snapshots.
+ *
+ * A snapshot is either the serialized state of a session, as produced by
+ * CompilationSession::saveState(), or, for sessions that do not support
+ * serialization, a copy of the session. Serialized states are held in memory
+ * up to a maximum size. Once that size is exceeded, the least recently used
+ * states are written to files in a spill directory and read back when
+ * requested.
+ */
+class SnapshotCache {
+ public:
+  /**
+   * Constructor.
+   *
+   * @param spillDirectory The directory to write spilled snapshots to. It is
+   *    created when the first snapshot is spilled.
+   * @param maxSizeInBytes The maximum size of the serialized states that are
+   *    held in memory.
+   */
+  SnapshotCache(const boost::filesystem::path& spillDirectory,
+                size_t maxSizeInBytes = kMaxSnapshotSizeInBytes);
+
+  ~SnapshotCache();
+
+  /**
+   * Move-insert a serialized session state.
+   *
+   * @param state A state produced by CompilationSession::saveState().
+   * @return The ID of the snapshot.
+   */
+  uint64_t add(std::string&& state);
+
+  /**
+   * Insert a copy of a session.
+   *
+   * @param session A session that must not be modified once added.
+   * @return The ID of the snapshot.
+   */
+  uint64_t add(std::unique_ptr<CompilationSession> session);
+
+  /**
+   * Lookup a snapshot. On success, exactly one of `session` and `state` is
+   * set. The session pointer is valid until the snapshot is released.
+   *
+   * @param id The ID of the snapshot.
+   * @param session Set to the session copy if the snapshot is a session, else
+   *    `nullptr`.
+   * @param state Set to the serialized state if the snapshot is a state.
+   * @return `OK` on success, `NOT_FOUND` if the snapshot does not exist, or
+   *    `INTERNAL` if a spilled snapshot could not be read.
+   */
+  [[nodiscard]] grpc::Status get(uint64_t id, CompilationSession** session, std::string* state);
+
+  /**
+   * Remove a snapshot, deleting its spill file if it has one.
+   *
+   * @param id The ID of the snapshot.
+   * @return Whether the snapshot existed.
+   */
+  bool release(uint64_t id);
+
+  /**
+   * Get the number of snapshots.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t size() const { return snapshots_.size(); }
+
+  /**
+   * Get the size of the serialized states that are held in memory.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t sizeInBytes() const { return sizeInBytes_; }
+
+  /**
+   * Get the number of snapshots that have been spilled to disk.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t spilledCount() const { return spilledCount_; }
+
+  /**
+   * The maximum size of the serialized states that are held in memory.
+   *
+   * @return A nonnegative integer.
+   */
+  inline size_t maxSizeInBytes() const { return maxSizeInBytes_; }
+
+  /**
+   * Set a new maximum in-memory size, spilling snapshots if required.
+   *
+   * @param maxSizeInBytes A number of bytes.
+   */
+  void setMaxSizeInBytes(size_t maxSizeInBytes);
+
+ private:
+  struct Snapshot {
+    std::unique_ptr<CompilationSession> session;
+    std::string state;
+    bool spilled;
+    // The position of the snapshot in the least-recently-used list. Only valid
+    // for serialized states that are held in memory.
+    std::list<uint64_t>::iterator lruPosition;
+  };
+
+  boost::filesystem::path spillPath(uint64_t id) const;
+
+  // Spill the least recently used states until the in-memory size is at most
+  // maxSizeInBytes().
+  void spillToCapacity();
+
+  const boost::filesystem::path spillDirectory_;
+  std::unordered_map<uint64_t, Snapshot> snapshots_;
+  // The IDs of in-memory serialized states, most recently used first.
+  std::list<uint64_t> lru_;
+  size_t maxSizeInBytes_;
+  size_t sizeInBytes_;
+  size_t spilledCount_;
+  uint64_t nextId_;
+};
+
+}  // namespace compiler_gym::runtime
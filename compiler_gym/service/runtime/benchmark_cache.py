@@ -33,11 +33,20 @@ class BenchmarkCache:
         self._benchmarks: Dict[str, Benchmark] = {}
         self._size_in_bytes = 0
 
+        # Counters for service statistics.
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
     def __getitem__(self, uri: str) -> Benchmark:
-        """Get a benchmark by URI. Raises KeyError."""
+        """Get a benchmark by URI. Raises KeyError. Each lookup is counted as
+        a hit or a miss.
+        """
         item = self._benchmarks.get(uri)
         if item is None:
+            self.miss_count += 1
             raise KeyError(uri)
+        self.hit_count += 1
         return item
 
     def __contains__(self, uri: str):
@@ -80,6 +89,17 @@ class BenchmarkCache:
         self._benchmarks[uri] = benchmark
         self._size_in_bytes += size
 
+    def add_and_get(self, benchmark: Benchmark) -> Benchmark:
+        """Add benchmark to cache and look it up. The lookup is counted as a hit
+        if a benchmark with the same URI was already cached, else as a miss.
+        """
+        if benchmark.uri in self._benchmarks:
+            self.hit_count += 1
+        else:
+            self.miss_count += 1
+        self[benchmark.uri] = benchmark
+        return benchmark
+
     def evict_to_capacity(self, target_size_in_bytes: Optional[int] = None) -> None:
         """Evict benchmarks randomly to reduce the capacity below 50%."""
         evicted = 0
@@ -91,6 +111,7 @@ class BenchmarkCache:
 
         while self.size and self.size_in_bytes > target_size_in_bytes:
             evicted += 1
+            self.eviction_count += 1
             key = self.rng.choice(list(self._benchmarks.keys()))
             self._size_in_bytes -= self._benchmarks[key].ByteSize()
             del self._benchmarks[key]
@@ -4,14 +4,24 @@
 # LICENSE file in the root directory of this source tree.
 import logging
 from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
 from threading import Lock
-from typing import Dict
+from time import perf_counter, time
+from typing import Dict, Optional
 
 from grpc import StatusCode
 
 from compiler_gym.service.compilation_session import CompilationSession
-from compiler_gym.service.proto import AddBenchmarkReply, AddBenchmarkRequest
+from compiler_gym.service.packed_observation import (
+    pack_observation,
+    supports_packed_encoding,
+)
+from compiler_gym.service.proto import (
+    AddBenchmarkReply,
+    AddBenchmarkRequest,
+    BenchmarkCacheStats,
+)
 from compiler_gym.service.proto import (
     CompilerGymServiceServicer as CompilerGymServiceServicerStub,
 )
@@ -20,14 +30,25 @@ from compiler_gym.service.proto import (
     EndSessionRequest,
     GetSpacesReply,
     GetSpacesRequest,
+    GetStatsReply,
+    GetStatsRequest,
     GetVersionReply,
     GetVersionRequest,
+    Observation,
+    ObservationSpace,
     StartSessionReply,
     StartSessionRequest,
+    StepBatchReply,
+    StepBatchRequest,
     StepReply,
     StepRequest,
+    StepTimings,
 )
 from compiler_gym.service.runtime.benchmark_cache import BenchmarkCache
+from compiler_gym.service.runtime.rpc_stats_recorder import (
+    RpcStatsRecorder,
+    get_resident_set_size_in_bytes,
+)
 from compiler_gym.util.version import __version__
 
 
@@ -53,10 +74,41 @@ def exception_to_grpc_status(context):
         handle_exception_as(e, StatusCode.DEADLINE_EXCEEDED)
 
 
+def record_rpc_stats(method):
+    """Decorator that records the latency of an RPC method of
+    :class:`CompilerGymService` in its :code:`rpc_stats`.
+    """
+
+    @wraps(method)
+    def wrapped(self, request, context):
+        with self.rpc_stats.time(method.__name__):
+            return method(self, request, context)
+
+    return wrapped
+
+
+class _StepStatus:
+    """Records the status of a single step of a :meth:`StepBatch()
+    <CompilerGymService.StepBatch>` call, in place of the RPC context.
+    """
+
+    def __init__(self):
+        self.code: Optional[StatusCode] = None
+        self.details: str = ""
+
+    def set_code(self, code: StatusCode) -> None:
+        self.code = code
+
+    def set_details(self, details: str) -> None:
+        self.details = details
+
+
 class CompilerGymService(CompilerGymServiceServicerStub):
     def __init__(self, working_directory: Path, compilation_session_type):
         self.working_directory = working_directory
         self.benchmarks = BenchmarkCache()
+        self.rpc_stats = RpcStatsRecorder()
+        self.start_time = time()
 
         self.compilation_session_type = compilation_session_type
         self.sessions: Dict[int, CompilationSession] = {}
@@ -66,6 +118,16 @@ class CompilerGymService(CompilerGymServiceServicerStub):
         self.action_spaces = compilation_session_type.action_spaces
         self.observation_spaces = compilation_session_type.observation_spaces
 
+        # The runtime can pack any numeric list observation, so advertise
+        # support for the packed encoding on every such space.
+        self.advertised_observation_spaces = []
+        for space in self.observation_spaces:
+            advertised_space = ObservationSpace()
+            advertised_space.CopyFrom(space)
+            advertised_space.supports_packed_encoding = supports_packed_encoding(space)
+            self.advertised_observation_spaces.append(advertised_space)
+
+    @record_rpc_stats
     def GetVersion(self, request: GetVersionRequest, context) -> GetVersionReply:
         del context  # Unused
         del request  # Unused
@@ -75,41 +137,55 @@ class CompilerGymService(CompilerGymServiceServicerStub):
             compiler_version=self.compilation_session_type.compiler_version,
         )
 
+    @record_rpc_stats
     def GetSpaces(self, request: GetSpacesRequest, context) -> GetSpacesReply:
         del request  # Unused
         logging.debug("GetSpaces()")
         with exception_to_grpc_status(context):
             return GetSpacesReply(
                 action_space_list=self.action_spaces,
-                observation_space_list=self.observation_spaces,
+                observation_space_list=self.advertised_observation_spaces,
             )
 
+    @record_rpc_stats
     def StartSession(self, request: StartSessionRequest, context) -> StartSessionReply:
         """Create a new compilation session."""
-        logging.debug("StartSession(%s), [%d]", request.benchmark, self.next_session_id)
+        uri = request.benchmark or request.benchmark_definition.uri
+        logging.debug("StartSession(%s), [%d]", uri, self.next_session_id)
         reply = StartSessionReply()
 
-        if not request.benchmark:
+        if not uri:
             context.set_code(StatusCode.INVALID_ARGUMENT)
             context.set_details("No benchmark URI set for StartSession()")
             return reply
 
         with self.sessions_lock, exception_to_grpc_status(context):
-            if request.benchmark not in self.benchmarks:
-                context.set_code(StatusCode.NOT_FOUND)
-                context.set_details("Benchmark not found")
-                return reply
+            # If the client sent the benchmark along with the request, add it
+            # to the cache so that the session can be started without an
+            # AddBenchmark() round trip. This counts as a cache miss if the
+            # benchmark was not already cached.
+            benchmark = None
+            if request.HasField("benchmark_definition"):
+                benchmark = self.benchmarks.add_and_get(request.benchmark_definition)
+
+            if benchmark is None or benchmark.uri != uri:
+                try:
+                    benchmark = self.benchmarks[uri]
+                except KeyError:
+                    context.set_code(StatusCode.NOT_FOUND)
+                    context.set_details("Benchmark not found")
+                    return reply
 
             session = self.compilation_session_type(
                 working_directory=self.working_directory,
                 action_space=self.action_spaces[request.action_space],
-                benchmark=self.benchmarks[request.benchmark],
+                benchmark=benchmark,
             )
 
             # Generate the initial observations.
             reply.observation.extend(
                 [
-                    session.get_observation(self.observation_spaces[obs])
+                    self._get_observation(session, obs, request.packed_observations)
                     for obs in request.observation_space
                 ]
             )
@@ -120,6 +196,7 @@ class CompilerGymService(CompilerGymServiceServicerStub):
 
         return reply
 
+    @record_rpc_stats
     def EndSession(self, request: EndSessionRequest, context) -> EndSessionReply:
         del context  # Unused
         logging.debug(
@@ -133,8 +210,41 @@ class CompilerGymService(CompilerGymServiceServicerStub):
                 del self.sessions[request.session_id]
             return EndSessionReply(remaining_sessions=len(self.sessions))
 
+    @record_rpc_stats
     def Step(self, request: StepRequest, context) -> StepReply:
         logging.debug("Step()")
+        return self._step(request, context)
+
+    @record_rpc_stats
+    def StepBatch(self, request: StepBatchRequest, context) -> StepBatchReply:
+        """Run a batch of steps on different sessions. The steps are run in
+        order, and the failure of one step does not prevent the others from
+        running.
+        """
+        logging.debug("StepBatch(), %d steps", len(request.step))
+        reply = StepBatchReply()
+
+        session_ids = [step.session_id for step in request.step]
+        if len(set(session_ids)) != len(session_ids):
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            context.set_details("Duplicate session in StepBatch()")
+            return reply
+
+        for step in request.step:
+            step_context = _StepStatus()
+            step_reply = self._step(step, step_context)
+            result = reply.result.add()
+            if step_context.code is None:
+                result.reply.CopyFrom(step_reply)
+            else:
+                result.status_code = step_context.code.value[0]
+                result.status_message = step_context.details
+        return reply
+
+    def _step(self, request: StepRequest, context) -> StepReply:
+        """The implementation of :meth:`Step`, shared with
+        :meth:`StepBatch`.
+        """
         reply = StepReply()
 
         if request.session_id not in self.sessions:
@@ -145,23 +255,58 @@ class CompilerGymService(CompilerGymServiceServicerStub):
         session = self.sessions[request.session_id]
 
         reply.action_had_no_effect = True
+        # Timings are only measured if requested.
+        timings = reply.timings if request.record_timings else None
+        step_start_time = perf_counter()
 
         with exception_to_grpc_status(context):
             for action in request.action:
+                action_start_time = perf_counter()
                 reply.end_of_session, nas, ahne = session.apply_action(action)
+                if timings is not None:
+                    timings.action.append(perf_counter() - action_start_time)
                 reply.action_had_no_effect &= ahne
                 if nas:
                     reply.new_action_space.CopyFrom(nas)
 
             reply.observation.extend(
                 [
-                    session.get_observation(self.observation_spaces[obs])
+                    self._get_observation(
+                        session, obs, request.packed_observations, timings
+                    )
                     for obs in request.observation_space
                 ]
             )
 
+        if timings is not None:
+            timings.total = perf_counter() - step_start_time
+
         return reply
 
+    def _get_observation(
+        self,
+        session: CompilationSession,
+        index: int,
+        packed: bool,
+        timings: Optional[StepTimings] = None,
+    ) -> Observation:
+        """Compute an observation, using the packed encoding if requested. If
+        :code:`timings` is set, the wall times of computing and packing the
+        observation are added to it.
+        """
+        space = self.observation_spaces[index]
+        start_time = perf_counter()
+        observation = session.get_observation(space)
+        if timings is not None:
+            timings.observation.append(perf_counter() - start_time)
+        if packed and supports_packed_encoding(space):
+            start_time = perf_counter()
+            pack_observation(observation)
+            if timings is not None:
+                timings.pack_observations += perf_counter() - start_time
+        return observation
+
+    @record_rpc_stats
     def AddBenchmark(self, request: AddBenchmarkRequest, context) -> AddBenchmarkReply:
         del context  # Unused
         reply = AddBenchmarkReply()
@@ -169,3 +314,25 @@ class CompilerGymService(CompilerGymServiceServicerStub):
             for benchmark in request.benchmark:
                 self.benchmarks[benchmark.uri] = benchmark
         return reply
+
+    @record_rpc_stats
+    def GetStats(self, request: GetStatsRequest, context) -> GetStatsReply:
+        del context  # Unused
+        del request  # Unused
+        logging.debug("GetStats()")
+        with self.sessions_lock:
+            reply = GetStatsReply(
+                session_count=len(self.sessions),
+                benchmark_cache=BenchmarkCacheStats(
+                    size=self.benchmarks.size,
+                    size_in_bytes=self.benchmarks.size_in_bytes,
+                    max_size_in_bytes=self.benchmarks.max_size_in_bytes,
+                    hit_count=self.benchmarks.hit_count,
+                    miss_count=self.benchmarks.miss_count,
+                    eviction_count=self.benchmarks.eviction_count,
+                ),
+            )
+        reply.resident_set_size_bytes = get_resident_set_size_in_bytes()
+        reply.uptime_seconds = time() - self.start_time
+        self.rpc_stats.get_stats(reply)
+        return reply
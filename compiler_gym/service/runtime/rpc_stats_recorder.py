@@ -0,0 +1,125 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import accumulate
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List
+
+from compiler_gym.service.proto import GetStatsReply, RpcStats
+
+# The upper bounds of the RPC latency histogram buckets, in seconds. Keep in
+# sync with kRpcLatencyBucketUpperBounds in RpcStatsRecorder.h.
+RPC_LATENCY_BUCKET_UPPER_BOUNDS: List[float] = [
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    10,
+    60,
+]
+
+
+class RpcStatsRecorder:
+    """Records the call counts and latency histograms of RPC methods.
+
+    This class is thread safe.
+
+    Example usage:
+
+    .. code-block:: python
+
+        def Step(self, request, context):
+            with self.rpc_stats.time("Step"):
+                ...
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # A mapping from RPC name to call count, latency sum, and the
+        # non-cumulative bucket counts of the latency histogram.
+        self._call_counts: Dict[str, int] = {}
+        self._latency_sums: Dict[str, float] = {}
+        self._bucket_counts: Dict[str, List[int]] = {}
+
+    @contextmanager
+    def time(self, name: str):
+        """Record the wall time of the wrapped block as a call to an RPC
+        method.
+
+        :param name: The name of the RPC method.
+        """
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start_time)
+
+    def record(self, name: str, latency_seconds: float) -> None:
+        """Record a completed RPC call.
+
+        :param name: The name of the RPC method.
+
+        :param latency_seconds: The wall time of the call, in seconds.
+        """
+        bucket = bisect_left(RPC_LATENCY_BUCKET_UPPER_BOUNDS, latency_seconds)
+        with self._lock:
+            if name not in self._call_counts:
+                self._call_counts[name] = 0
+                self._latency_sums[name] = 0
+                self._bucket_counts[name] = [0] * len(RPC_LATENCY_BUCKET_UPPER_BOUNDS)
+            self._call_counts[name] += 1
+            self._latency_sums[name] += latency_seconds
+            # Calls slower than the largest upper bound are only counted by
+            # the implicit final bucket.
+            if bucket < len(RPC_LATENCY_BUCKET_UPPER_BOUNDS):
+                self._bucket_counts[name][bucket] += 1
+
+    def get_stats(self, reply: GetStatsReply) -> None:
+        """Add the statistics of every RPC method that has been called to a
+        reply.
+
+        :param reply: The reply to add the statistics to.
+        """
+        with self._lock:
+            for name in sorted(self._call_counts):
+                reply.rpc.append(
+                    RpcStats(
+                        name=name,
+                        call_count=self._call_counts[name],
+                        latency_seconds_sum=self._latency_sums[name],
+                        latency_bucket_upper_bound=RPC_LATENCY_BUCKET_UPPER_BOUNDS,
+                        latency_bucket_count=list(
+                            accumulate(self._bucket_counts[name])
+                        ),
+                    )
+                )
+
+
+def get_resident_set_size_in_bytes() -> int:
+    """Get the resident set size of the current process.
+
+    :return: A number of bytes, or zero if it cannot be determined.
+    """
+    # The second field of /proc/self/statm is the number of resident pages.
+    # This is only available on Linux.
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
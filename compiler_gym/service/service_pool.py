@@ -0,0 +1,239 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a pool of compiler services that environments share."""
+import logging
+import os
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional, Union
+
+from compiler_gym.service.connection import (
+    CompilerGymServiceConnection,
+    ConnectionOpts,
+    ManagedConnection,
+    ServiceError,
+)
+
+
+def _available_cpus() -> List[int]:
+    """Return the CPUs that this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _cpu_groups(cpus: List[int], n: int) -> List[List[int]]:
+    """Split a list of CPUs into n contiguous groups of near-equal size. If
+    there are fewer CPUs than groups, CPUs are shared between groups.
+    """
+    if len(cpus) < n:
+        return [[cpus[i % len(cpus)]] for i in range(n)]
+    size, remainder = divmod(len(cpus), n)
+    groups, start = [], 0
+    for i in range(n):
+        end = start + size + (1 if i < remainder else 0)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+
+class ServicePool:
+    """A pool of compiler service connections that environments are assigned
+    to by load.
+
+    A single compiler service process serializes the creation of sessions and
+    shares one heap and one RPC thread pool between every environment that
+    connects to it. A :code:`ServicePool` spreads environments over multiple
+    services. When an environment is created using the pool, it is connected to
+    the service that has the fewest environments. Environments created by
+    :meth:`fork() <compiler_gym.envs.CompilerEnv.fork>` use the same service as
+    the environment that they were forked from.
+
+    When the endpoint is the path of a service binary, the pool launches that
+    many service processes and, where supported, pins each one to its own group
+    of CPUs. A service process that has crashed is restarted the next time that
+    it is assigned an environment. A service that an environment reports as
+    suspect when releasing it, such as one that timed out, is not assigned new
+    environments and is restarted once no environment is using it. When the
+    endpoint is one or more URLs, the pool connects to those existing services.
+
+    Example usage:
+
+        >>> with ServicePool(llvm.LLVM_SERVICE_BINARY, size=8) as pool:
+        ...     envs = [gym.make("llvm-v0", service_pool=pool) for _ in range(64)]
+        ...     # ... use envs
+        ...     for env in envs:
+        ...         env.close()
+
+    Environments must be closed before the pool that they use.
+    """
+
+    def __init__(
+        self,
+        endpoint: Union[Path, str, List[str]],
+        size: Optional[int] = None,
+        opts: Optional[ConnectionOpts] = None,
+        pin_cpus: bool = True,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """Constructor.
+
+        :param endpoint: Either the path of a service binary, or the URL of a
+            service, or a list of service URLs.
+
+        :param size: The number of service processes to launch. Only used when
+            the endpoint is a service binary. If not provided, one service is
+            launched for every four available CPUs.
+
+        :param opts: The options used to connect to the services.
+
+        :param pin_cpus: Whether to restrict each launched service process to
+            its own group of CPUs.
+
+        :param logger: The logger to use.
+
+        :raises ValueError: If :code:`size` is not positive, or if it is
+            provided for service URLs.
+        """
+        opts = opts or ConnectionOpts()
+        self.logger = logger or logging.getLogger("compiler_gym.service")
+        self.members: List[CompilerGymServiceConnection] = []
+
+        if isinstance(endpoint, Path):
+            cpus = _available_cpus()
+            if size is None:
+                size = max(1, len(cpus) // 4)
+            if size < 1:
+                raise ValueError(f"Pool size must be positive, got {size}")
+            endpoints = [endpoint] * size
+            member_opts = [opts] * size
+            if pin_cpus:
+                member_opts = [
+                    opts.copy(update={"cpu_affinity": group})
+                    for group in _cpu_groups(cpus, size)
+                ]
+        else:
+            if size is not None:
+                raise ValueError("Pool size cannot be set for service URLs")
+            endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+            if not endpoints:
+                raise ValueError("No service URLs provided")
+            member_opts = [opts] * len(endpoints)
+
+        try:
+            for member_endpoint, member_opt in zip(endpoints, member_opts):
+                self.members.append(
+                    CompilerGymServiceConnection(
+                        endpoint=member_endpoint, opts=member_opt, logger=self.logger
+                    )
+                )
+        except:  # noqa
+            self.close()
+            raise
+
+        self._loads = [0] * len(self.members)
+        # Members that may be hung, and are restarted once their load is zero.
+        self._suspect = [False] * len(self.members)
+        self._lock = Lock()
+
+    def _index(self, connection: CompilerGymServiceConnection) -> int:
+        for i, member in enumerate(self.members):
+            if member is connection:
+                return i
+        raise ValueError(f"Connection is not a member of this pool: {connection}")
+
+    @staticmethod
+    def _is_alive(connection: CompilerGymServiceConnection) -> bool:
+        if connection.closed:
+            return False
+        if isinstance(connection.connection, ManagedConnection):
+            return connection.connection.process.poll() is None
+        return True
+
+    def acquire(
+        self, connection: Optional[CompilerGymServiceConnection] = None
+    ) -> CompilerGymServiceConnection:
+        """Assign an environment to a service.
+
+        This is called by environments that are created using the pool. Every
+        call must be balanced by a call to :meth:`release()`.
+
+        :param connection: If provided, assign the environment to the service
+            of this connection, which must be a member of the pool. Otherwise,
+            the least loaded service is used. In either case, the service is
+            restarted if it has crashed or been closed.
+
+        :return: A service connection.
+
+        :raises ValueError: If :code:`connection` is not a member of the pool.
+        """
+        with self._lock:
+            if connection is not None:
+                index = self._index(connection)
+            else:
+                # Suspect members are not assigned new environments until they
+                # have been restarted, unless every member is suspect.
+                candidates = [
+                    i for i in range(len(self.members)) if not self._suspect[i]
+                ] or list(range(len(self.members)))
+                index = min(candidates, key=self._loads.__getitem__)
+            member = self.members[index]
+            if not self._is_alive(member):
+                self.logger.warning("Restarting service %s", member)
+                member.restart()
+                self._suspect[index] = False
+            self._loads[index] += 1
+            return member
+
+    def release(
+        self, connection: CompilerGymServiceConnection, suspect: bool = False
+    ) -> None:
+        """Remove an environment from a service.
+
+        :param connection: A connection returned by :meth:`acquire()`.
+
+        :param suspect: Whether the environment saw an error that suggests that
+            the service is hung, such as a timeout. A suspect service is not
+            assigned new environments, and is restarted once no environment is
+            using it.
+
+        :raises ValueError: If :code:`connection` is not a member of the pool.
+        """
+        with self._lock:
+            index = self._index(connection)
+            self._loads[index] = max(self._loads[index] - 1, 0)
+            self._suspect[index] |= suspect
+            if self._suspect[index] and not self._loads[index]:
+                self.logger.warning("Restarting suspect service %s", connection)
+                connection.restart()
+                self._suspect[index] = False
+
+    @property
+    def loads(self) -> List[int]:
+        """The number of environments assigned to each service.
+
+        :type: List[int]
+        """
+        with self._lock:
+            return list(self._loads)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def close(self) -> None:
+        """Close the connections to all services, terminating any service
+        processes that were launched by the pool.
+        """
+        for member in self.members:
+            try:
+                member.close()
+            except ServiceError as e:
+                self.logger.warning("%s", e)
+
+    def __enter__(self) -> "ServicePool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,289 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module provides utilities for exporting the statistics of a compiler
+service, as returned by :meth:`CompilerGymServiceConnection.get_stats()
+<compiler_gym.service.CompilerGymServiceConnection.get_stats>`.
+
+Statistics can be written to a file in the Prometheus text exposition format,
+for scraping by a textfile collector such as the one of the Prometheus node
+exporter:
+
+    >>> from compiler_gym.service.service_stats import write_prometheus_textfile
+    >>> write_prometheus_textfile(
+    ...     env.service.get_stats(),
+    ...     "/var/lib/node_exporter/compiler_gym.prom",
+    ...     labels={"service": "llvm"},
+    ... )
+
+Use :class:`ServiceStatsExporter` to periodically rewrite the file while an
+environment is in use.
+"""
+import logging
+import re
+from pathlib import Path
+from threading import Event, Thread
+from typing import Dict, List, Optional, Union
+
+from compiler_gym.service.connection import CompilerGymServiceConnection, ServiceError
+from compiler_gym.service.proto import GetStatsReply
+from compiler_gym.util.filesystem import atomic_file_write
+
+# The prefix of the names of exported metrics.
+METRIC_PREFIX = "compiler_gym_service"
+
+
+def benchmark_cache_hit_rate(stats: GetStatsReply) -> float:
+    """Return the ratio of benchmark cache lookups that found the requested
+    benchmark.
+
+    :param stats: The statistics of a service.
+
+    :return: A value in the range [0, 1]. Zero if there have been no lookups.
+    """
+    cache = stats.benchmark_cache
+    lookups = cache.hit_count + cache.miss_count
+    return cache.hit_count / lookups if lookups else 0.0
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels.items())
+        + "}"
+    )
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _metric_name(name: str) -> str:
+    """Convert a compiler statistic name to a valid Prometheus metric name."""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def service_stats_to_prometheus(
+    stats: GetStatsReply, labels: Optional[Dict[str, str]] = None
+) -> str:
+    """Format the statistics of a service in the Prometheus text exposition
+    format.
+
+    :param stats: The statistics of a service.
+
+    :param labels: Labels to add to every metric, for example to identify the
+        service.
+
+    :return: A string.
+    """
+    labels = labels or {}
+    lines: List[str] = []
+
+    def add_metric(
+        name: str,
+        metric_type: str,
+        description: str,
+        value: Union[int, float],
+    ) -> None:
+        name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    add_metric(
+        "sessions", "gauge", "The number of active sessions.", stats.session_count
+    )
+    add_metric(
+        "snapshots", "gauge", "The number of session snapshots.", stats.snapshot_count
+    )
+    cache = stats.benchmark_cache
+    add_metric(
+        "benchmark_cache_size",
+        "gauge",
+        "The number of benchmarks in the cache.",
+        cache.size,
+    )
+    add_metric(
+        "benchmark_cache_bytes",
+        "gauge",
+        "The combined size of the benchmarks in the cache.",
+        cache.size_in_bytes,
+    )
+    add_metric(
+        "benchmark_cache_max_bytes",
+        "gauge",
+        "The maximum size of the cache before evictions.",
+        cache.max_size_in_bytes,
+    )
+    add_metric(
+        "benchmark_cache_hits_total",
+        "counter",
+        "The number of cache lookups that found the benchmark.",
+        cache.hit_count,
+    )
+    add_metric(
+        "benchmark_cache_misses_total",
+        "counter",
+        "The number of cache lookups that did not find the benchmark.",
+        cache.miss_count,
+    )
+    add_metric(
+        "benchmark_cache_evictions_total",
+        "counter",
+        "The number of benchmarks evicted from the cache.",
+        cache.eviction_count,
+    )
+    add_metric(
+        "benchmark_cache_hit_ratio",
+        "gauge",
+        "The ratio of cache lookups that found the benchmark.",
+        benchmark_cache_hit_rate(stats),
+    )
+    add_metric(
+        "resident_set_size_bytes",
+        "gauge",
+        "The resident set size of the service process.",
+        stats.resident_set_size_bytes,
+    )
+    add_metric(
+        "uptime_seconds",
+        "gauge",
+        "The number of seconds since the service started.",
+        stats.uptime_seconds,
+    )
+
+    if stats.rpc:
+        name = f"{METRIC_PREFIX}_rpc_latency_seconds"
+        lines.append(f"# HELP {name} The latencies of the RPC calls.")
+        lines.append(f"# TYPE {name} histogram")
+        for rpc in stats.rpc:
+            rpc_labels = {**labels, "rpc": rpc.name}
+            for upper_bound, count in zip(
+                rpc.latency_bucket_upper_bound, rpc.latency_bucket_count
+            ):
+                bucket_labels = {**rpc_labels, "le": _format_value(upper_bound)}
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            bucket_labels = {**rpc_labels, "le": "+Inf"}
+            lines.append(
+                f"{name}_bucket{_format_labels(bucket_labels)} {rpc.call_count}"
+            )
+            lines.append(
+                f"{name}_sum{_format_labels(rpc_labels)} "
+                f"{_format_value(rpc.latency_seconds_sum)}"
+            )
+            lines.append(f"{name}_count{_format_labels(rpc_labels)} {rpc.call_count}")
+
+    for stat_name, value in sorted(stats.compiler_stats.items()):
+        name = f"{METRIC_PREFIX}_{_metric_name(stat_name)}"
+        lines.append(f"# HELP {name} The {stat_name} compiler statistic.")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(
+    stats: GetStatsReply,
+    path: Union[str, Path],
+    labels: Optional[Dict[str, str]] = None,
+) -> None:
+    """Write the statistics of a service to a file in the Prometheus text
+    exposition format.
+
+    The file is replaced atomically so that a collector never reads a partially
+    written file.
+
+    :param stats: The statistics of a service.
+
+    :param path: The path of the file to write.
+
+    :param labels: Labels to add to every metric, for example to identify the
+        service.
+    """
+    with atomic_file_write(Path(path), fileobj=True, mode="w") as f:
+        f.write(service_stats_to_prometheus(stats, labels))
+
+
+class ServiceStatsExporter:
+    """Periodically write the statistics of a service to a file in the
+    Prometheus text exposition format.
+
+    The statistics are written from a background thread until :meth:`close()`
+    is called.
+
+    Example usage:
+
+        >>> with ServiceStatsExporter(env.service, "/tmp/compiler_gym.prom"):
+        ...     train(env)
+    """
+
+    def __init__(
+        self,
+        service: CompilerGymServiceConnection,
+        path: Union[str, Path],
+        interval_seconds: float = 15,
+        labels: Optional[Dict[str, str]] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """Constructor.
+
+        :param service: The connection of the service to export the statistics
+            of.
+
+        :param path: The path of the file to write.
+
+        :param interval_seconds: The number of seconds between writes.
+
+        :param labels: Labels to add to every metric, for example to identify
+            the service.
+
+        :param logger: The logger to report errors to.
+        """
+        self.service = service
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self.labels = labels
+        self.logger = logger or logging.getLogger("compiler_gym")
+        self._closed = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.export()
+            if self._closed.wait(self.interval_seconds):
+                break
+
+    def export(self) -> None:
+        """Write the current statistics of the service. Errors are logged, not
+        raised, so that a service that is restarting does not stop the
+        exporter.
+        """
+        try:
+            write_prometheus_textfile(
+                self.service.get_stats(), self.path, labels=self.labels
+            )
+        except (ServiceError, NotImplementedError, OSError, TimeoutError) as e:
+            self.logger.warning("Failed to export service statistics: %s", e)
+
+    def close(self) -> None:
+        """Stop exporting statistics."""
+        self._closed.set()
+        self._thread.join()
+
+    def __enter__(self) -> "ServiceStatsExporter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,11 +1,13 @@
 """This module defines an API for processing LLVM-IR with inst2vec."""
+import os
 import pickle
-from typing import List
+from threading import Lock
+from typing import Dict, List, Optional
 
 import numpy as np
 
-from compiler_gym.third_party.inst2vec import inst2vec_preprocess
-from compiler_gym.util.runfiles_path import runfiles_path
+from compiler_gym.util.filesystem import atomic_file_write
+from compiler_gym.util.runfiles_path import cache_path, runfiles_path
 
 _PICKLED_VOCABULARY = runfiles_path(
     "compiler_gym/third_party/inst2vec/dictionary.pickle"
@@ -15,22 +17,73 @@ _PICKLED_EMBEDDINGS = runfiles_path(
 )
 
 
+def _load_embeddings() -> np.ndarray:
+    """Load the embeddings matrix as a read-only memory-mapped array.
+
+    The first call converts the pickled matrix to a :code:`.npy` file in the
+    cache. Subsequent calls, from any process, map that file into memory rather
+    than unpickling a private copy of the matrix.
+    """
+    stat = os.stat(_PICKLED_EMBEDDINGS)
+    path = cache_path(f"inst2vec/embeddings-{stat.st_size}-{stat.st_mtime_ns}.npy")
+    if not path.is_file():
+        with open(str(_PICKLED_EMBEDDINGS), "rb") as f:
+            embeddings = np.asarray(pickle.load(f))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_file_write(path, fileobj=True) as f:
+            np.save(f, embeddings)
+    return np.load(str(path), mmap_mode="r")
+
+
 class Inst2vecEncoder:
-    """An LLVM encoder for inst2vec."""
+    """An LLVM encoder for inst2vec.
+
+    The vocabulary and embeddings are loaded on first use, so constructing an
+    encoder is cheap.
+    """
 
     def __init__(self):
-        # TODO(github.com/facebookresearch/CompilerGym/issues/122): Lazily
-        # instantiate inst2vec encoder.
-        with open(str(_PICKLED_VOCABULARY), "rb") as f:
-            self.vocab = pickle.load(f)
+        self._vocab: Optional[Dict[str, int]] = None
+        self._embeddings: Optional[np.ndarray] = None
+        self._lock = Lock()
 
-        with open(str(_PICKLED_EMBEDDINGS), "rb") as f:
-            self.embeddings = pickle.load(f)
+    @property
+    def vocab(self) -> Dict[str, int]:
+        """The mapping from pre-processed statements to embedding indices.
 
-        self.unknown_vocab_element = self.vocab["!UNK"]
+        :type: Dict[str, int]
+        """
+        with self._lock:
+            if self._vocab is None:
+                with open(str(_PICKLED_VOCABULARY), "rb") as f:
+                    self._vocab = pickle.load(f)
+            return self._vocab
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """The embeddings matrix, indexed by :meth:`encode` values. This is a
+        read-only memory-mapped array.
+
+        :type: np.ndarray
+        """
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = _load_embeddings()
+            return self._embeddings
+
+    @property
+    def unknown_vocab_element(self) -> int:
+        """The embedding index of statements that are not in the vocabulary.
+
+        :type: int
+        """
+        return self.vocab["!UNK"]
 
     def preprocess(self, ir: str) -> List[str]:
         """Produce a list of pre-processed statements from an IR."""
+        # Deferred import, as this module imports networkx.
+        from compiler_gym.third_party.inst2vec import inst2vec_preprocess
+
         lines = [[x] for x in ir.split("\n")]
         try:
             structs = inst2vec_preprocess.GetStructTypes(ir)
@@ -49,11 +102,13 @@ class Inst2vecEncoder:
 
     def encode(self, preprocessed: List[str]) -> List[int]:
         """Produce embedding indices for a list of pre-processed statements."""
+        vocab = self.vocab
+        unknown_vocab_element = vocab["!UNK"]
         return [
-            self.vocab.get(statement, self.unknown_vocab_element)
-            for statement in preprocessed
+            vocab.get(statement, unknown_vocab_element) for statement in preprocessed
         ]
 
     def embed(self, encoded: List[int]) -> np.ndarray:
         """Produce a matrix of embeddings from a list of encoded statements."""
-        return np.vstack([self.embeddings[index] for index in encoded])
+        embeddings = self.embeddings
+        return np.vstack([embeddings[index] for index in encoded])
@@ -4,8 +4,11 @@
 # LICENSE file in the root directory of this source tree.
 import hashlib
 import logging
-from time import sleep
-from typing import List, Optional, Union
+import os
+import tempfile
+from pathlib import Path
+from time import sleep, time
+from typing import Callable, List, Optional, TypeVar, Union
 
 import fasteners
 import requests
@@ -14,6 +17,11 @@ from compiler_gym.util.filesystem import atomic_file_write
 from compiler_gym.util.runfiles_path import cache_path
 from compiler_gym.util.truncate import truncate
 
+T = TypeVar("T")
+
+# The size of chunks to read when streaming a download to disk.
+_CHUNK_SIZE = 1024 * 1024
+
 
 class DownloadFailed(IOError):
     """Error thrown if a download fails."""
@@ -67,22 +75,76 @@ def _do_download_attempt(url: str, sha256: Optional[str]) -> bytes:
     return content
 
 
-def _download(urls: List[str], sha256: Optional[str], max_retries: int) -> bytes:
-    if not urls:
-        raise ValueError("No URLs to download")
+def _do_streaming_download_attempt(url: str, sha256: str) -> Path:
+    logging.info("Downloading %s ...", url)
+    path = cache_path(f"downloads/{sha256}")
+    path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Cache hit.
-    if sha256 and cache_path(f"downloads/{sha256}").is_file():
-        with open(str(cache_path(f"downloads/{sha256}")), "rb") as f:
-            return f.read()
+    try:
+        req = requests.get(url, stream=True)
+    except IOError as e:
+        raise DownloadFailed(str(e)) from e
+
+    start_time = time()
+    size = 0
+    checksum = hashlib.sha256()
+    # Write to a temporary file which is renamed once the checksum is verified.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{sha256}.", delete=False
+    ) as f:
+        tmp_path = Path(f.name)
+        try:
+            if req.status_code == 429:
+                raise TooManyRequests("429 Too Many Requests")
+            elif req.status_code != 200:
+                raise DownloadFailed(
+                    f"GET returned status code {req.status_code}: {url}"
+                )
 
+            # Hash the data as it arrives, rather than buffering it in memory.
+            for chunk in req.iter_content(chunk_size=_CHUNK_SIZE):
+                checksum.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        except IOError as e:
+            tmp_path.unlink()
+            if isinstance(e, DownloadFailed):
+                raise
+            raise DownloadFailed(str(e)) from e
+        finally:
+            req.close()
+
+    actual_sha256 = checksum.hexdigest()
+    if sha256 != actual_sha256:
+        tmp_path.unlink()
+        raise DownloadFailed(
+            f"Checksum of download does not match:\n"
+            f"Url: {url}\n"
+            f"Expected: {sha256}\n"
+            f"Actual:   {actual_sha256}"
+        )
+    os.replace(tmp_path, path)
+
+    elapsed = max(time() - start_time, 1e-6)
+    logging.debug(
+        "Downloaded %s, %.1f MB at %.1f MB/s", url, size / 1e6, size / 1e6 / elapsed
+    )
+    return path
+
+
+def _retry_loop(
+    urls: List[str], download_attempt: Callable[[str], T], max_retries: int
+) -> T:
+    """Call :code:`download_attempt(url)` on each of the URLs in turn until one
+    succeeds, retrying up to :code:`max_retries` times.
+    """
     # A retry loop, and loop over all urls provided.
     last_exception = None
     wait_time = 5
     for _ in range(max(max_retries, 1)):
         for url in urls:
             try:
-                return _do_download_attempt(url, sha256)
+                return download_attempt(url)
             except TooManyRequests as e:
                 last_exception = e
                 logging.info(
@@ -98,6 +160,18 @@ def _download(urls: List[str], sha256: Optional[str], max_retries: int) -> bytes
     raise last_exception
 
 
+def _download(urls: List[str], sha256: Optional[str], max_retries: int) -> bytes:
+    if not urls:
+        raise ValueError("No URLs to download")
+
+    # Cache hit.
+    if sha256 and cache_path(f"downloads/{sha256}").is_file():
+        with open(str(cache_path(f"downloads/{sha256}")), "rb") as f:
+            return f.read()
+
+    return _retry_loop(urls, lambda url: _do_download_attempt(url, sha256), max_retries)
+
+
 def download(
     urls: Union[str, List[str]], sha256: Optional[str] = None, max_retries: int = 3
 ) -> bytes:
@@ -133,3 +207,42 @@ def download(
     else:
         with fasteners.InterProcessLock(cache_path("downloads/.lock")):
             return _download(urls, None, max_retries)
+
+
+def download_to_file(
+    urls: Union[str, List[str]], sha256: str, max_retries: int = 3
+) -> Path:
+    """Download a file to the local cache and return its path.
+
+    Unlike :func:`download`, the file contents are streamed to disk and hashed
+    as they arrive, so memory usage is constant regardless of the size of the
+    file. The file is stored in :code:`$cache_path/downloads/$sha256`. See
+    :func:`compiler_gym.cache_path`.
+
+    An inter-process lock ensures that only a single process downloads a given
+    file at a time.
+
+    :param urls: Either a single URL of the file to download, or a list of URLs
+        to download.
+
+    :param sha256: The expected sha256 checksum of the file.
+
+    :return: The path of the downloaded file.
+
+    :raises IOError: If the download fails, or if the downloaded content does
+        match the expected :code:`sha256` checksum.
+    """
+    # Convert a singular string into a list of strings.
+    urls = [urls] if not isinstance(urls, list) else urls
+    if not urls:
+        raise ValueError("No URLs to download")
+
+    path = cache_path(f"downloads/{sha256}")
+    with fasteners.InterProcessLock(cache_path(f"downloads/.{sha256}.lock")):
+        # Cache hit.
+        if path.is_file():
+            return path
+
+        return _retry_loop(
+            urls, lambda url: _do_streaming_download_attempt(url, sha256), max_retries
+        )
@@ -72,5 +72,7 @@ def atomic_file_write(
         try:
             yield tmp if fileobj else tmp_path
         finally:
+            # Flush buffered writes so that the file is complete when renamed.
+            tmp.flush()
             if tmp_path.is_file():
                 os.rename(tmp_path, path)
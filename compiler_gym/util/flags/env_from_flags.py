@@ -6,7 +6,7 @@
 import sys
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 import gym
 from absl import app, flags
@@ -137,6 +137,23 @@ def env_from_flags(benchmark: Optional[Union[str, Benchmark]] = None) -> Compile
         raise app.UsageError("Neither --env or --local_service_binary is set")
 
 
+def env_from_argv(
+    argv: List[str], benchmark: Optional[Union[str, Benchmark]] = None
+) -> CompilerEnv:
+    """Create an environment from the flags of the given command line.
+
+    Unlike :func:`env_from_flags`, this can be called in a process that was not
+    forked from the process that parsed the command line, such as a worker of
+    a :code:`spawn` or :code:`forkserver` multiprocessing context. If the flags
+    have not been parsed in the current process, they are parsed from
+    :code:`argv`. Flags that are not defined in the current process are
+    ignored.
+    """
+    if not FLAGS.is_parsed():
+        FLAGS(argv, known_only=True)
+    return env_from_flags(benchmark=benchmark)
+
+
 @contextmanager
 def env_session_from_flags(
     benchmark: Optional[Union[str, Benchmark]] = None
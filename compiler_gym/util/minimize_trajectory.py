@@ -12,8 +12,11 @@ returns an error.
 """
 import logging
 import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from math import ceil, log
-from typing import Callable, Iterable
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from compiler_gym.util.truncate import truncate
 
@@ -34,20 +37,150 @@ def environment_validation_fails(env: "CompilerEnv") -> bool:  # noqa: F821
     return not validation_result.okay()
 
 
-def _apply_and_test(env, actions, hypothesis, flakiness) -> bool:
-    """Run specific actions on environment and return whether hypothesis holds."""
-    env.reset(benchmark=env.benchmark)
-    for _ in range(flakiness):
-        logging.debug("Applying %d actions ...", len(actions))
-        _, _, done, info = env.step(actions)
-        if done:
-            raise MinimizationError(
-                f"Failed to replay actions: {info.get('error_details', '')}"
-            )
+class _TrajectoryEvaluator:
+    """Tests a hypothesis on candidate trajectories.
+
+    Rather than resetting the environment and replaying every action of a
+    candidate, the evaluator keeps snapshots of the states reached after every
+    :code:`snapshot_interval` actions and resumes from the longest cached prefix
+    of the candidate. Environments without snapshot support are reset and
+    replayed.
+
+    Batches of candidates are evaluated concurrently on forks of the
+    environment. The forks share the same compiler service, so they share the
+    cached snapshots. The evaluator uses its own thread pool rather than the
+    shared one, since hypotheses such as :code:`env.validate()` submit work to
+    the shared pool and would deadlock waiting on a pool that is filled with
+    evaluations.
+    """
+
+    def __init__(
+        self,
+        env: "CompilerEnv",  # noqa: F821
+        hypothesis: Hypothesis,
+        flakiness: int,
+        parallelism: int = 1,
+        snapshot_interval: int = 10,
+        max_snapshots: int = 128,
+    ):
+        self.env = env
+        self.parallelism = max(parallelism, 1)
+        self._hypothesis = hypothesis
+        self._flakiness = flakiness
+        self._snapshot_interval = snapshot_interval
+        self._max_snapshots = max_snapshots
+        self._benchmark = env.benchmark
+        self._use_snapshots = hasattr(env, "snapshot") and snapshot_interval > 0
+        # A map from action prefix to the snapshot of its state, in least
+        # recently used order.
+        self._snapshots: Dict[Tuple[int, ...], Any] = OrderedDict()
+        self._snapshots_lock = Lock()
+        # The environments used to evaluate batches of candidates. Forks are
+        # created on first use.
+        self._envs = [env]
+        # The thread pool used to evaluate batches of candidates. Created on
+        # first use.
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def test(self, actions: List[int]) -> bool:
+        """Return whether the hypothesis holds on a trajectory. The
+        environment is left in the state of the trajectory.
+        """
+        return self._apply_and_test(self.env, actions)
+
+    def test_many(self, candidates: List[List[int]]) -> List[bool]:
+        """Return whether the hypothesis holds on each of up to
+        :code:`parallelism` trajectories, evaluated concurrently.
+        """
+        assert len(candidates) <= self.parallelism
+        if len(candidates) == 1:
+            return [self.test(candidates[0])]
+        while len(self._envs) < len(candidates):
+            self._envs.append(self.env.fork())
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.parallelism)
+        futures = [
+            self._executor.submit(self._apply_and_test, env, actions)
+            for env, actions in zip(self._envs, candidates)
+        ]
+        return [future.result() for future in futures]
+
+    def apply(self, actions: List[int]) -> None:
+        """Put the environment in the state of a trajectory."""
+        if self.env.actions != actions:
+            self._apply(self.env, actions)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for env in self._envs[1:]:
+            env.close()
+        self._envs = [self.env]
+        self._snapshots.clear()
+
+    def _apply_and_test(self, env, actions: List[int]) -> bool:
+        """Run specific actions on environment and return whether hypothesis
+        holds.
+        """
+        for _ in range(self._flakiness):
+            self._apply(env, actions)
+            if self._hypothesis(env):
+                return True
+        return False
+
+    def _apply(self, env, actions: List[int]) -> None:
+        start, snapshot = self._longest_cached_prefix(actions)
+        if snapshot is None:
+            env.reset(benchmark=self._benchmark)
+        else:
+            env.restore(snapshot)
+
+        logging.debug(
+            "Applying %d actions, resuming from %d cached actions",
+            len(actions) - start,
+            start,
+        )
+        while start < len(actions):
+            if self._use_snapshots:
+                end = min(
+                    (start // self._snapshot_interval + 1) * self._snapshot_interval,
+                    len(actions),
+                )
+            else:
+                end = len(actions)
+            _, _, done, info = env.step(actions[start:end])
+            if done:
+                raise MinimizationError(
+                    f"Failed to replay actions: {info.get('error_details', '')}"
+                )
+            if self._use_snapshots and not end % self._snapshot_interval:
+                self._add_snapshot(actions[:end], env.snapshot())
+            start = end
         logging.debug("Applied %d actions", len(actions))
-        if hypothesis(env):
-            return True
-    return False
+
+    def _longest_cached_prefix(self, actions: List[int]) -> Tuple[int, Any]:
+        """Return the length of the longest prefix of the actions that has a
+        cached snapshot, and the snapshot.
+        """
+        if not self._use_snapshots:
+            return 0, None
+        with self._snapshots_lock:
+            end = len(actions) - len(actions) % self._snapshot_interval
+            for length in range(end, 0, -self._snapshot_interval):
+                key = tuple(actions[:length])
+                snapshot = self._snapshots.get(key)
+                if snapshot is not None:
+                    self._snapshots.move_to_end(key)
+                    return length, snapshot
+        return 0, None
+
+    def _add_snapshot(self, actions: List[int], snapshot) -> None:
+        with self._snapshots_lock:
+            self._snapshots[tuple(actions)] = snapshot
+            self._snapshots.move_to_end(tuple(actions))
+            while len(self._snapshots) > self._max_snapshots:
+                self._snapshots.popitem(last=False)
 
 
 def bisect_trajectory(
@@ -55,11 +188,16 @@ def bisect_trajectory(
     hypothesis: Hypothesis = environment_validation_fails,
     reverse: bool = False,
     flakiness: int = 1,
+    parallelism: int = 1,
+    snapshot_interval: int = 10,
 ) -> Iterable["CompilerEnv"]:  # noqa: F821
-    """Run a binary search to remove the suffix or prefix of a trjectory.
+    """Run a k-ary search to remove the suffix or prefix of a trjectory.
 
-    Requires worst-case O(log n) evaluation rounds, where n is the length of the
-    trajectory.
+    Each round of the search tests :code:`parallelism` split points of the
+    remaining interval concurrently, on forks of the environment, narrowing the
+    interval by a factor of :code:`parallelism + 1`. A parallelism of 1 is a
+    binary search. Requires worst-case O(log n / log (parallelism + 1))
+    evaluation rounds, where n is the length of the trajectory.
 
     :param env: An environment whose action trajectory should be minimized.
     :param hypothesis: The hypothesis that is used to determine if a trajectory
@@ -73,79 +211,109 @@ def bisect_trajectory(
         to check if it holds. If the hypothesis returns :code:`True` within this
         many iterations, it is said to hold. It needs to only return
         :code:`True` once.
+    :param parallelism: The number of candidate trajectories to test
+        concurrently.
+    :param snapshot_interval: The number of actions between cached snapshots of
+        intermediate states. Candidate trajectories are applied by resuming
+        from the longest cached prefix. If zero, every candidate is applied
+        from the initial state.
     :returns: A generator that yields the input environment every time the
         trajectory is successfully reduced.
     :raises MinimizationError: If the environment action replay fails, or if
         the hypothesis does not hold on the initial trajectory.
     """
-
-    def apply_and_test(actions):
-        return _apply_and_test(env, actions, hypothesis, flakiness)
-
     all_actions = env.actions.copy()
     # No actions to minimize.
     if not all_actions:
         return env
 
+    def candidate(num_actions: int) -> List[int]:
+        if reverse:
+            return all_actions[len(all_actions) - num_actions :]
+        return all_actions[:num_actions]
+
     logging.info(
         "%sisecting sequence of %d actions",
         "Reverse b" if reverse else "B",
         len(all_actions),
     )
-    if not apply_and_test(all_actions):
-        raise MinimizationError(
-            "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
-        )
+    evaluator = _TrajectoryEvaluator(
+        env,
+        hypothesis,
+        flakiness,
+        parallelism=parallelism,
+        snapshot_interval=snapshot_interval,
+    )
+    try:
+        if not evaluator.test(all_actions):
+            raise MinimizationError(
+                "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
+            )
 
-    left = 0
-    right = len(all_actions) - 1
-    step = 0
-    while right >= left:
-        step += 1
-        remaining_steps = int(log(max(right - left, 1), 2))
-        mid = left + ((right - left) // 2)
-        logging.debug(
-            "Bisect step=%d, left=%d, right=%d, mid=%d", step, left, right, mid
-        )
+        # The search is over the number of actions to keep. The hypothesis is
+        # known to hold when keeping `right` actions, and assumed not to hold
+        # when keeping `left` actions.
+        left = -1
+        right = len(all_actions)
+        step = 0
+        while right - left > 1:
+            step += 1
+            num_splits = min(evaluator.parallelism, right - left - 1)
+            splits = [
+                left + (right - left) * (i + 1) // (num_splits + 1)
+                for i in range(num_splits)
+            ]
+            remaining_steps = int(
+                ceil(log(max((right - left) / (num_splits + 1), 1), num_splits + 1))
+            )
+            logging.debug(
+                "Bisect step=%d, left=%d, right=%d, splits=%s",
+                step,
+                left,
+                right,
+                splits,
+            )
 
-        actions = all_actions[mid:] if reverse else all_actions[:mid]
-        if apply_and_test(actions):
-            logging.info(
-                "🟢 Hypothesis holds at num_actions=%d, remaining bisect steps=%d",
-                mid,
-                remaining_steps,
+            results = evaluator.test_many([candidate(split) for split in splits])
+            for split, holds in zip(splits, results):
+                logging.info(
+                    "%s at num_actions=%d, remaining bisect steps=%d",
+                    "🟢 Hypothesis holds" if holds else "🔴 Hypothesis does not hold",
+                    split,
+                    remaining_steps,
+                )
+
+            holding_splits = [split for split, holds in zip(splits, results) if holds]
+            if holding_splits:
+                right = holding_splits[0]
+            left = max(
+                [left]
+                + [
+                    split
+                    for split, holds in zip(splits, results)
+                    if not holds and split < right
+                ]
             )
-            yield env
-            if reverse:
-                left = mid + 1
-            else:
-                right = mid - 1
-        else:
+            if holding_splits:
+                evaluator.apply(candidate(right))
+                yield env
+
+        if right == len(all_actions):
+            logging.info("Failed to reduce trajectory length using bisection")
+        elif right:
+            index = len(all_actions) - right if reverse else right - 1
             logging.info(
-                "🔴 Hypothesis does not hold at num_actions=%d, remaining bisect steps=%d",
-                mid,
-                remaining_steps,
+                "Determined that action %d of %d is the %s at which the hypothesis holds: %s",
+                index,
+                len(all_actions),
+                "last" if reverse else "first",
+                env.action_space.flags[all_actions[index]],
             )
-            if reverse:
-                right = mid - 1
-            else:
-                left = mid + 1
-
-    mid = max(left, right) - 1 if reverse else min(left, right) + 1
-    if (reverse and mid < 0) or (not reverse and mid >= len(all_actions)):
-        actions = all_actions
-        logging.info("Failed to reduce trajectory length using bisection")
-    else:
-        actions = all_actions[mid:] if reverse else all_actions[:mid]
-        logging.info(
-            "Determined that action %d of %d is the first at which the hypothesis holds: %s",
-            mid,
-            len(all_actions),
-            env.action_space.flags[all_actions[mid]],
-        )
 
-    if not apply_and_test(actions):
-        raise MinimizationError("Post-bisect sanity check failed!")
+        if not evaluator.test(candidate(right)):
+            raise MinimizationError("Post-bisect sanity check failed!")
+    finally:
+        evaluator.close()
 
     yield env
 
@@ -158,6 +326,8 @@ def random_minimization(
     discard_ratio_decay: float = 0.75,
     min_trajectory_len: int = 5,
     flakiness: int = 1,
+    parallelism: int = 1,
+    snapshot_interval: int = 10,
 ) -> Iterable["CompilerEnv"]:  # noqa: F821
     """Run an iterative process of randomly removing actions to minimize a
     trajectory.
@@ -189,56 +359,74 @@ def random_minimization(
         to check if it holds. If the hypothesis returns :code:`True` within this
         many iterations, it is said to hold. It needs to only return
         :code:`True` once.
+    :param parallelism: The number of random candidates to test concurrently in
+        each round of minimization, on forks of the environment. The first
+        candidate for which the hypothesis holds is kept.
+    :param snapshot_interval: The number of actions between cached snapshots of
+        intermediate states. Candidate trajectories are applied by resuming
+        from the longest cached prefix. If zero, every candidate is applied
+        from the initial state.
     :returns: A generator that yields the input environment every time the
         trajectory is successfully reduced.
     :raises MinimizationError: If the environment action replay fails, or if
         the hypothesis does not hold on the initial trajectory.
     """
-
-    def apply_and_test(actions):
-        return _apply_and_test(env, actions, hypothesis, flakiness)
-
-    actions = env.actions.copy()
-    if not apply_and_test(actions):
-        raise MinimizationError(
-            "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
-        )
-
-    max_num_steps = int(log(len(actions), 2) * num_steps_ratio_multiplier)
-
-    num_steps = 0
-    discard_ratio = init_discard_ratio
-    while len(actions) >= min_trajectory_len and num_steps < max_num_steps:
-        num_steps += 1
-        num_to_remove = int(ceil(len(actions) * discard_ratio))
-        candidate_actions = actions.copy()
-        # Delete actions randomly.
-        for _ in range(num_to_remove):
-            del candidate_actions[random.randint(0, len(candidate_actions) - 1)]
-        if apply_and_test(candidate_actions):
-            logging.info(
-                "🟢 Hypothesis holds with %s of %s actions randomly removed, continuing",
-                num_to_remove,
-                len(actions),
-            )
-            actions = candidate_actions
-            discard_ratio = init_discard_ratio
-            yield env
-        else:
-            logging.info(
-                "🔴 Hypothesis does not hold with %s of %s actions randomly removed, rolling back",
-                num_to_remove,
-                len(actions),
+    evaluator = _TrajectoryEvaluator(
+        env,
+        hypothesis,
+        flakiness,
+        parallelism=parallelism,
+        snapshot_interval=snapshot_interval,
+    )
+    try:
+        actions = env.actions.copy()
+        if not evaluator.test(actions):
+            raise MinimizationError(
+                "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
             )
-            discard_ratio *= discard_ratio_decay
-            if num_to_remove == 1:
+
+        max_num_steps = int(log(len(actions), 2) * num_steps_ratio_multiplier)
+
+        num_steps = 0
+        discard_ratio = init_discard_ratio
+        while len(actions) >= min_trajectory_len and num_steps < max_num_steps:
+            num_steps += 1
+            num_to_remove = int(ceil(len(actions) * discard_ratio))
+            candidates = []
+            for _ in range(evaluator.parallelism):
+                candidate_actions = actions.copy()
+                # Delete actions randomly.
+                for _ in range(num_to_remove):
+                    del candidate_actions[random.randint(0, len(candidate_actions) - 1)]
+                candidates.append(candidate_actions)
+            results = evaluator.test_many(candidates)
+            if any(results):
                 logging.info(
-                    "Terminating random minimization after failing with only a single action removed"
+                    "🟢 Hypothesis holds with %s of %s actions randomly removed, continuing",
+                    num_to_remove,
+                    len(actions),
                 )
-                break
-
-    if not apply_and_test(actions):
-        raise MinimizationError("Post-minimization sanity check failed!")
+                actions = candidates[results.index(True)]
+                discard_ratio = init_discard_ratio
+                evaluator.apply(actions)
+                yield env
+            else:
+                logging.info(
+                    "🔴 Hypothesis does not hold with %s of %s actions randomly removed, rolling back",
+                    num_to_remove,
+                    len(actions),
+                )
+                discard_ratio *= discard_ratio_decay
+                if num_to_remove == 1:
+                    logging.info(
+                        "Terminating random minimization after failing with only a single action removed"
+                    )
+                    break
+
+        if not evaluator.test(actions):
+            raise MinimizationError("Post-minimization sanity check failed!")
+    finally:
+        evaluator.close()
 
     yield env
 
@@ -247,12 +435,15 @@ def minimize_trajectory_iteratively(
     env: "CompilerEnv",  # noqa: F821
     hypothesis: Hypothesis = environment_validation_fails,
     flakiness: int = 1,
+    parallelism: int = 1,
+    snapshot_interval: int = 10,
 ) -> Iterable["CompilerEnv"]:  # noqa: F821
     """Minimize a trajectory by remove actions, one at a time, until a minimal
     trajectory is reached.
 
     Performs up to O(n * n / 2) evaluation rounds, where n is the length of the
-    trajectory.
+    trajectory. Each evaluation resumes from a cached snapshot of the state
+    before the removed action, so only the actions that follow it are applied.
 
     :param env: An environment whose action trajectory should be minimized.
     :param hypothesis: The hypothesis that is used to determine if a trajectory
@@ -269,60 +460,88 @@ def minimize_trajectory_iteratively(
         the hypothesis does not hold on the initial trajectory.
     """
 
-    def apply_and_test(actions):
-        return _apply_and_test(env, actions, hypothesis, flakiness)
-
     all_actions = env.actions.copy()
     init_num_actions = len(all_actions)
     if not all_actions:  # Nothing to minimize.
         return
 
-    if not apply_and_test(all_actions):
-        raise MinimizationError(
-            "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
-        )
+    evaluator = _TrajectoryEvaluator(
+        env,
+        hypothesis,
+        flakiness,
+        parallelism=parallelism,
+        snapshot_interval=snapshot_interval,
+    )
+    try:
+        if not evaluator.test(all_actions):
+            raise MinimizationError(
+                "Hypothesis failed on the initial state! The hypothesis must hold for the first state."
+            )
 
-    pass_num = 0
-    actions_removed = 0
-    action_has_been_pruned = True
-    # Outer loop. Repeat iterative reduction until no change is made.
-    while action_has_been_pruned and len(all_actions) > 1:
-        pass_num += 1
-        action_has_been_pruned = False
-        action_mask = [True] * len(all_actions)
-        logging.info("Minimization pass on sequence of %d actions", len(all_actions))
-
-        # Inner loop. Go through every action and see if it can be removed.
-        for i in range(len(action_mask)):
-            action_mask[i] = False
-            action_name = env.action_space.flags[all_actions[i]]
-            actions = [action for action, mask in zip(all_actions, action_mask) if mask]
-            if apply_and_test(actions):
-                logging.info(
-                    "🟢 Hypothesis holds with action %s removed, %d actions remaining",
-                    action_name,
-                    sum(action_mask),
-                )
-                action_has_been_pruned = True
-                actions_removed += 1
-                yield env
-            else:
-                action_mask[i] = True
-                logging.info(
-                    "🔴 Hypothesis does not hold with action %s removed, %d actions remaining",
-                    action_name,
-                    sum(action_mask),
-                )
+        pass_num = 0
+        actions_removed = 0
+        action_has_been_pruned = True
+        # Outer loop. Repeat iterative reduction until no change is made.
+        while action_has_been_pruned and len(all_actions) > 1:
+            pass_num += 1
+            action_has_been_pruned = False
+            action_mask = [True] * len(all_actions)
+            logging.info(
+                "Minimization pass on sequence of %d actions", len(all_actions)
+            )
 
-        all_actions = [action for action, mask in zip(all_actions, action_mask) if mask]
+            # Inner loop. Go through every action and see if it can be removed.
+            # Removals are tested speculatively in batches, and the first
+            # removal in a batch for which the hypothesis holds is kept. The
+            # remainder of the batch is tested again against the new mask.
+            i = 0
+            while i < len(action_mask):
+                batch = range(i, min(i + evaluator.parallelism, len(action_mask)))
+                candidates = [
+                    [
+                        action
+                        for k, (action, mask) in enumerate(
+                            zip(all_actions, action_mask)
+                        )
+                        if mask and k != j
+                    ]
+                    for j in batch
+                ]
+                results = evaluator.test_many(candidates)
+                for j, actions, holds in zip(batch, candidates, results):
+                    action_name = env.action_space.flags[all_actions[j]]
+                    i = j + 1
+                    if holds:
+                        action_mask[j] = False
+                        logging.info(
+                            "🟢 Hypothesis holds with action %s removed, %d actions remaining",
+                            action_name,
+                            sum(action_mask),
+                        )
+                        action_has_been_pruned = True
+                        actions_removed += 1
+                        evaluator.apply(actions)
+                        yield env
+                        break
+                    logging.info(
+                        "🔴 Hypothesis does not hold with action %s removed, %d actions remaining",
+                        action_name,
+                        sum(action_mask),
+                    )
+
+            all_actions = [
+                action for action, mask in zip(all_actions, action_mask) if mask
+            ]
 
-    logging.info(
-        "Minimization halted after %d passes, %d of %d actions removed",
-        pass_num,
-        actions_removed,
-        init_num_actions,
-    )
-    if not apply_and_test(all_actions):
-        raise ValueError("Post-bisect sanity check failed!")
+        logging.info(
+            "Minimization halted after %d passes, %d of %d actions removed",
+            pass_num,
+            actions_removed,
+            init_num_actions,
+        )
+        if not evaluator.test(all_actions):
+            raise ValueError("Post-bisect sanity check failed!")
+    finally:
+        evaluator.close()
 
     yield env
@@ -3,25 +3,253 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Validate environment states."""
-import random
-from concurrent.futures import as_completed
-from typing import Callable, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+from queue import Empty, Queue
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from compiler_gym.compiler_env_state import CompilerEnvState
 from compiler_gym.envs.compiler_env import CompilerEnv
-from compiler_gym.util import thread_pool
+from compiler_gym.util.timer import Timer
+from compiler_gym.validation_error import ValidationError
 from compiler_gym.validation_result import ValidationResult
 
+# A list of (index, state) tuples of states that share a benchmark, where index
+# is the position of the state in the input.
+StateGroup = List[Tuple[int, CompilerEnvState]]
 
-def _validate_states_worker(
-    make_env: Callable[[], CompilerEnv], state: CompilerEnvState
+
+def _estimated_cost(group: StateGroup) -> int:
+    """Estimate the cost of validating a group of states as the number of
+    actions to replay, plus a fixed cost per state for resetting the
+    environment and validating the benchmark.
+    """
+    return sum(1 + len(state.commandline.split()) for _, state in group)
+
+
+def _group_states_by_benchmark(states: List[CompilerEnvState]) -> List[StateGroup]:
+    """Group states by benchmark, ordered by decreasing estimated cost."""
+    groups: Dict[str, StateGroup] = {}
+    for i, state in enumerate(states):
+        groups.setdefault(state.benchmark, []).append((i, state))
+    # Schedule the most expensive groups first so that the slowest validations
+    # do not straggle at the end of a parallel run.
+    return sorted(groups.values(), key=_estimated_cost, reverse=True)
+
+
+def _split_groups(groups: List[StateGroup], num_chunks: int) -> List[StateGroup]:
+    """Split groups of states so that there are enough of them to keep every
+    worker busy.
+
+    Groups with an estimated cost greater than 1/num_chunks of the total are
+    split into chunks of roughly that cost. The states of a group are sorted by
+    commandline before it is split so that states with shared action prefixes
+    stay in the same chunk. The chunks are ordered by decreasing estimated
+    cost.
+    """
+    total_cost = sum(_estimated_cost(group) for group in groups)
+    max_chunk_cost = max(total_cost // max(num_chunks, 1), 1)
+
+    chunks: List[StateGroup] = []
+    for group in groups:
+        if _estimated_cost(group) <= max_chunk_cost:
+            chunks.append(group)
+            continue
+        chunk: StateGroup = []
+        chunk_cost = 0
+        for i, state in sorted(group, key=lambda x: x[1].commandline):
+            chunk.append((i, state))
+            chunk_cost += _estimated_cost([(i, state)])
+            if chunk_cost >= max_chunk_cost:
+                chunks.append(chunk)
+                chunk, chunk_cost = [], 0
+        if chunk:
+            chunks.append(chunk)
+    return sorted(chunks, key=_estimated_cost, reverse=True)
+
+
+class _ActionTrie:
+    """A node in a trie of action sequences. Each node stores the states whose
+    actions end at that node.
+    """
+
+    __slots__ = ["children", "states"]
+
+    def __init__(self):
+        self.children: Dict[int, "_ActionTrie"] = {}
+        self.states: StateGroup = []
+
+    def insert(self, actions: List[int], state: Tuple[int, CompilerEnvState]):
+        node = self
+        for action in actions:
+            node = node.children.setdefault(action, _ActionTrie())
+        node.states.append(state)
+
+    def iter_states(self) -> Iterable[Tuple[int, CompilerEnvState]]:
+        """Yield the states of this node and all of its descendants."""
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            yield from node.states
+            nodes += node.children.values()
+
+    def edges(self) -> Iterable[Tuple[List[int], "_ActionTrie"]]:
+        """Yield the outgoing edges of this node as (actions, node) tuples,
+        where chains of nodes that have a single child and no states are
+        collapsed into a single edge.
+        """
+        for action, node in self.children.items():
+            actions = [action]
+            while not node.states and len(node.children) == 1:
+                action, node = next(iter(node.children.items()))
+                actions.append(action)
+            yield actions, node
+
+
+def _replay_failed_result(
+    state: CompilerEnvState, error: ValueError, walltime: float
 ) -> ValidationResult:
-    env = make_env()
+    return ValidationResult.construct(
+        state=state,
+        walltime=walltime,
+        actions_replay_failed=True,
+        errors=[
+            ValidationError(
+                type="Action replay failed",
+                data={
+                    "exception": str(error),
+                    "exception_type": type(error).__name__,
+                },
+            )
+        ],
+    )
+
+
+def _validate_group_with_shared_prefixes(
+    env: CompilerEnv, group: StateGroup
+) -> Iterable[Tuple[int, ValidationResult]]:
+    """Validate a group of states of the same benchmark, replaying each action
+    prefix that is shared between states only once.
+
+    The action sequences of the states are inserted into a trie which is walked
+    depth-first. At nodes where the trie branches, the environment state is
+    snapshotted so that each branch continues from the shared prefix rather
+    than from the start of the episode. The walltime of each result is the time
+    taken to replay the actions that are not shared with its parent node in the
+    trie, plus the time to validate it.
+    """
+    trie = _ActionTrie()
+    for i, state in group:
+        try:
+            actions = env.commandline_to_actions(state.commandline)
+        except ValueError:
+            # Fall back to regular validation to report the error.
+            yield i, env.validate(state)
+            continue
+        trie.insert(actions, (i, state))
+    if not trie.states and not trie.children:
+        return
+
+    env.reset(benchmark=group[0][1].benchmark)
+
+    # A stack of (node, snapshot, actions) tuples, where snapshot is the state
+    # to restore before stepping the actions to reach node. A snapshot of None
+    # means that the walk continues from the current state of the environment.
+    stack = [(trie, None, [])]
+    while stack:
+        node, snapshot, actions = stack.pop()
+        with Timer() as replay:
+            if snapshot is not None:
+                env.restore(snapshot)
+            if actions:
+                _, _, done, info = env.step(actions)
+            else:
+                done = False
+
+        if done:
+            error = ValueError(
+                f"Environment terminated with error: `{info.get('error_details')}`"
+            )
+            for i, state in node.iter_states():
+                yield i, _replay_failed_result(state, error, replay.time)
+            continue
+
+        for i, state in node.states:
+            validation = {
+                "state": state,
+                "actions_replay_failed": False,
+                "reward_validated": False,
+                "reward_validation_failed": False,
+                "benchmark_semantics_validated": False,
+                "benchmark_semantics_validation_failed": False,
+            }
+            errors: List[ValidationError] = []
+            with Timer() as walltime:
+                env._validate_replayed_state(state, validation, errors)
+            yield i, ValidationResult.construct(
+                walltime=replay.time + walltime.time, errors=errors, **validation
+            )
+
+        edges = list(node.edges())
+        if len(edges) > 1:
+            snapshot = env.snapshot()
+        # The first edge is pushed last so that it is visited next, continuing
+        # from the current state. The other edges restore the snapshot.
+        for j, (actions, child) in reversed(list(enumerate(edges))):
+            stack.append((child, snapshot if j else None, actions))
+
+
+def _validate_groups(
+    env: CompilerEnv, groups: Iterable[StateGroup], share_prefixes: bool = False
+) -> Iterable[Tuple[int, ValidationResult]]:
+    """Validate groups of states using a single environment."""
+    for group in groups:
+        if share_prefixes:
+            yield from _validate_group_with_shared_prefixes(env, group)
+        else:
+            for i, state in group:
+                yield i, env.validate(state)
+
+
+def _validate_states_worker(
+    make_env: Callable[[], CompilerEnv],
+    groups: "Queue[StateGroup]",
+    results: "Queue[Optional[Tuple[int, ValidationResult]]]",
+    share_prefixes: bool,
+) -> None:
+    """Validate groups of states from a queue until it is empty. A
+    :code:`None` is put on the results queue when done.
+    """
+
+    def iter_groups():
+        while True:
+            try:
+                yield groups.get_nowait()
+            except Empty:
+                return
+
     try:
-        result = env.validate(state)
+        env = make_env()
+        try:
+            for result in _validate_groups(env, iter_groups(), share_prefixes):
+                results.put(result)
+        finally:
+            env.close()
     finally:
-        env.close()
-    return result
+        results.put(None)
+
+
+def _inorder(
+    results: Iterable[Tuple[int, ValidationResult]]
+) -> Iterable[ValidationResult]:
+    """Yield indexed results in order of increasing index."""
+    pending: Dict[int, ValidationResult] = {}
+    next_index = 0
+    for i, result in results:
+        pending[i] = result
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
 
 
 def validate_states(
@@ -29,37 +257,99 @@ def validate_states(
     states: Iterable[CompilerEnvState],
     nproc: Optional[int] = None,
     inorder: bool = False,
+    share_prefixes: bool = False,
 ) -> Iterable[ValidationResult]:
     """A parallelized implementation of
     :meth:`env.validate() <compiler_gym.envs.CompilerEnv.validate>` for batched
     validation.
 
-    :param make_env: A callback which instantiates a compiler environment.
+    Each worker thread creates a single environment that it uses to validate
+    all of its states. States are grouped by benchmark, and each worker
+    validates a group of states using the same environment. Groups that are
+    too large to keep all workers busy are split into chunks that are
+    validated by different workers. Groups are scheduled in decreasing order
+    of the number of actions that must be replayed.
+
+    :param make_env: A callback which instantiates a compiler environment. It
+        is called once per worker.
     :param states: A sequence of compiler environment states to validate.
-    :param nproc: The number of parallel worker processes to run.
+    :param nproc: The number of parallel workers to run. Defaults to the number
+        of cores on the machine.
     :param inorder: Whether to return results in the order they were provided,
         or in the order that they are available.
+    :param share_prefixes: If :code:`True`, actions that are shared between
+        states of the same benchmark are replayed only once. The states of each
+        benchmark are arranged into a trie of action sequences, and
+        :meth:`env.snapshot() <compiler_gym.envs.CompilerEnv.snapshot>` is
+        used at the points where the sequences diverge. This is faster when
+        many states share long action prefixes, such as the intermediate
+        results of a search. The reported walltime of each result then
+        excludes the time to replay any shared prefix.
     :return: An iterator over validation results. The order of results may
         differ from the input states.
     """
-    executor = thread_pool.get_thread_pool_executor()
+    states = list(states)
+    groups = _group_states_by_benchmark(states)
+    nproc = max(min(nproc or cpu_count(), len(states)), 1)
+    if nproc > 1:
+        # Split large groups so that a few benchmarks with many states do not
+        # serialize the validation. Several chunks per worker balance the load
+        # when the estimated costs are inaccurate.
+        groups = _split_groups(groups, nproc * 4)
+        nproc = min(nproc, len(groups))
 
     if nproc == 1:
-        map_func = map
-    elif inorder:
-        map_func = executor.map
-    else:
-        # The validation function of benchmarks can vary wildly in computational
-        # demands. Shuffle the order of states (unless explicitly asked for them
-        # to be kept inorder) as crude load balancing for the case where
-        # multiple states are provided for each benchmark.
-        states = list(states)
-        random.shuffle(states)
-
-        def map_func(func, envs, states):
-            futures = (
-                executor.submit(func, env, state) for env, state in zip(envs, states)
-            )
-            return (r.result() for r in as_completed(futures))
+        env = make_env()
+        try:
+            results = _validate_groups(env, groups, share_prefixes)
+            if inorder:
+                results = _inorder(results)
+            else:
+                results = (result for _, result in results)
+            yield from results
+        finally:
+            env.close()
+        return
+
+    group_queue: "Queue[StateGroup]" = Queue()
+    for group in groups:
+        group_queue.put(group)
+    result_queue: "Queue[Optional[Tuple[int, ValidationResult]]]" = Queue()
+
+    # Use a dedicated pool rather than the shared thread pool, as the workers
+    # are long-lived and validation callbacks may submit jobs to the shared
+    # pool.
+    executor = ThreadPoolExecutor(max_workers=nproc)
+    workers = [
+        executor.submit(
+            _validate_states_worker, make_env, group_queue, result_queue, share_prefixes
+        )
+        for _ in range(nproc)
+    ]
 
-    yield from map_func(_validate_states_worker, [make_env] * len(states), states)
+    def completed_results() -> Iterable[Tuple[int, ValidationResult]]:
+        remaining_workers = len(workers)
+        while remaining_workers:
+            result = result_queue.get()
+            if result is None:
+                remaining_workers -= 1
+            else:
+                yield result
+        # Propagate any errors raised by the workers.
+        for worker in workers:
+            worker.result()
+
+    try:
+        if inorder:
+            yield from _inorder(completed_results())
+        else:
+            yield from (result for _, result in completed_results())
+    finally:
+        # If the caller stops iterating early, let the workers finish their
+        # current state and exit.
+        while True:
+            try:
+                group_queue.get_nowait()
+            except Empty:
+                break
+        executor.shutdown(wait=False)
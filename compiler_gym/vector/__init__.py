@@ -0,0 +1,12 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""The :code:`compiler_gym.vector` module provides vectorized environments that
+step multiple CompilerGym environments together.
+"""
+from compiler_gym.vector.compiler_vector_env import CompilerVectorEnv
+
+__all__ = [
+    "CompilerVectorEnv",
+]
@@ -0,0 +1,316 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""This module defines a vectorized environment that steps multiple CompilerGym
+environments together.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from gym.spaces import Box, Space
+
+from compiler_gym.envs import CompilerEnv
+from compiler_gym.envs.compiler_env import _wrapped_step, _wrapped_step_batch
+from compiler_gym.service.proto import StepReply, StepRequest
+from compiler_gym.util.gym_type_hints import ActionType, ObservationType, StepType
+
+# The return type of CompilerVectorEnv.step(): stacked observations, rewards,
+# and done flags, and a list of info dicts.
+VectorStepType = Tuple[
+    Optional[Union[np.ndarray, List[ObservationType]]],
+    Optional[np.ndarray],
+    np.ndarray,
+    List[Dict[str, Any]],
+]
+
+
+class CompilerVectorEnv:
+    """A vector of CompilerGym environments that are stepped together.
+
+    Unlike :code:`gym.vector.AsyncVectorEnv`, which runs every sub-environment
+    in its own Python process with its own compiler service, the
+    sub-environments of a :code:`CompilerVectorEnv` run in the current process
+    and share a small number of compiler services. Only the first
+    sub-environment of each service is created using :code:`make_env`. The
+    others are created using :meth:`fork()
+    <compiler_gym.envs.CompilerEnv.fork>`, so they start from the same state
+    and share the service connection.
+
+    On every call to :meth:`step()`, the steps of the sub-environments that
+    share a service are sent to it in a single :code:`StepBatch()` call, and
+    the services are called concurrently. The calling thread blocks until
+    every step is complete. Services that do not implement
+    :code:`StepBatch()`, and sub-environments that are not :class:`CompilerEnv
+    <compiler_gym.envs.CompilerEnv>` instances (such as wrapped environments),
+    are stepped using one :code:`Step()` call per sub-environment from a
+    thread pool instead.
+    Observations from :code:`Box` spaces are stacked into a single array of
+    shape :code:`(num_envs, *observation_space.shape)`, which is preallocated.
+    Other observations are returned as a list. Sub-environments that reach the
+    end of an episode are reset automatically.
+
+    Example usage:
+
+        >>> env = CompilerVectorEnv(
+        ...     lambda: gym.make("llvm-autophase-ic-v0", benchmark="cbench-v1/crc32"),
+        ...     n=8,
+        ... )
+        >>> observations = env.reset()
+        >>> observations.shape
+        (8, 56)
+        >>> actions = [env.action_space.sample() for _ in range(env.num_envs)]
+        >>> observations, rewards, dones, infos = env.step(actions)
+        >>> env.close()
+
+    :ivar envs: The sub-environments.
+
+    :vartype envs: List[CompilerEnv]
+
+    :ivar num_envs: The number of sub-environments.
+
+    :vartype num_envs: int
+    """
+
+    def __init__(
+        self,
+        make_env: Callable[[], CompilerEnv],
+        n: int,
+        num_services: int = 1,
+        auto_reset: bool = True,
+        copy: bool = True,
+    ):
+        """Constructor.
+
+        :param make_env: A callable that takes no arguments and returns a new
+            environment. It is called once per service.
+
+        :param n: The number of sub-environments.
+
+        :param num_services: The number of compiler services to distribute the
+            sub-environments over.
+
+        :param auto_reset: Whether to reset sub-environments when they reach
+            the end of an episode. If set, the observation returned by
+            :meth:`step()` for a sub-environment that is done is the
+            observation of the reset environment, and the final observation of
+            the episode is in the :code:`terminal_observation` entry of its info
+            dict.
+
+        :param copy: Whether to return a copy of the stacked observations. If
+            not set, the same preallocated array is returned by every call to
+            :meth:`reset()` and :meth:`step()`, and its contents are overwritten
+            each time.
+
+        :raises ValueError: If :code:`n` is not positive, or if
+            :code:`num_services` is not in the range :code:`[1, n]`.
+        """
+        if n < 1:
+            raise ValueError(f"Number of environments must be positive, got {n}")
+        if not 1 <= num_services <= n:
+            raise ValueError(
+                f"Number of services must be in the range [1, {n}], got {num_services}"
+            )
+        self.num_envs = n
+        self.auto_reset = auto_reset
+        self.copy = copy
+        self.envs: List[CompilerEnv] = []
+        self._executor = ThreadPoolExecutor(max_workers=n)
+        # Set to False if a service does not implement StepBatch().
+        self._step_batch_supported = True
+
+        try:
+            for _ in range(num_services):
+                env = make_env()
+                env.reset()
+                self.envs.append(env)
+            # Fork the remaining sub-environments from the first environment of
+            # each service so that they share its connection.
+            for i in range(num_services, n):
+                self.envs.append(self.envs[i % num_services].fork())
+        except:  # noqa
+            self.close()
+            raise
+
+        self._observations: Optional[np.ndarray] = None
+        if isinstance(self.observation_space, Box):
+            self._observations = np.empty(
+                (n,) + self.observation_space.shape,
+                dtype=self.observation_space.dtype,
+            )
+
+    @property
+    def observation_space(self) -> Optional[Space]:
+        """The observation space of a single sub-environment.
+
+        :type: Optional[Space]
+        """
+        return self.envs[0].observation_space
+
+    @property
+    def action_space(self) -> Space:
+        """The action space of a single sub-environment.
+
+        :type: Space
+        """
+        return self.envs[0].action_space
+
+    def _stack(
+        self, observations: Sequence[ObservationType]
+    ) -> Optional[Union[np.ndarray, List[ObservationType]]]:
+        """Stack the observations of the sub-environments."""
+        if self.observation_space is None:
+            return None
+        if self._observations is None:
+            return list(observations)
+        for i, observation in enumerate(observations):
+            self._observations[i] = observation
+        return self._observations.copy() if self.copy else self._observations
+
+    def reset(self) -> Optional[Union[np.ndarray, List[ObservationType]]]:
+        """Reset all of the sub-environments.
+
+        :return: The stacked initial observations, or :code:`None` if the
+            sub-environments have no observation space.
+        """
+        observations = list(self._executor.map(lambda env: env.reset(), self.envs))
+        return self._stack(observations)
+
+    def _step(self, env: CompilerEnv, action: ActionType):
+        """Step a single sub-environment, resetting it if the episode ends."""
+        observation, reward, done, info = env.step(action)
+        if done and self.auto_reset:
+            info["terminal_observation"] = observation
+            observation = env.reset()
+        return observation, reward, done, info
+
+    def _step_service(
+        self, indices: List[int], requests: List[StepRequest]
+    ) -> Optional[List[Union[StepReply, Exception]]]:
+        """Send the steps of the given sub-environments, which share a service,
+        in a single StepBatch() call. Returns :code:`None` if the service does
+        not implement StepBatch().
+        """
+        service = self.envs[indices[0]].service
+        try:
+            return _wrapped_step_batch(service, requests)
+        except NotImplementedError:
+            self._step_batch_supported = False
+            return None
+        except Exception as e:
+            # The whole batch failed, so every step failed with the same error.
+            return [e] * len(indices)
+
+    def _step_session(
+        self, env: CompilerEnv, request: StepRequest
+    ) -> Union[StepReply, Exception]:
+        """Send the step of a single sub-environment in a Step() call."""
+        try:
+            return _wrapped_step(env.service, request)
+        except Exception as e:
+            return e
+
+    def _step_batched(self, actions: Sequence[ActionType]) -> List[StepType]:
+        """Step every sub-environment using one StepBatch() call per service."""
+        # pylint: disable=protected-access
+        spaces = [
+            env._step_spaces(action, None, None)
+            for env, action in zip(self.envs, actions)
+        ]
+        pending = [env._begin_step(*args) for env, args in zip(self.envs, spaces)]
+
+        # Group the sub-environments by the service that they are connected to.
+        services: Dict[int, List[int]] = {}
+        for i, env in enumerate(self.envs):
+            services.setdefault(id(env.service), []).append(i)
+        groups = list(services.values())
+
+        replies: List[Optional[Union[StepReply, Exception]]] = [None] * self.num_envs
+        batch_replies = self._executor.map(
+            lambda indices: self._step_service(
+                indices, [pending[i].request for i in indices]
+            ),
+            groups,
+        )
+        for indices, group_replies in zip(groups, batch_replies):
+            for i, reply in zip(indices, group_replies or []):
+                replies[i] = reply
+
+        # Fall back to one Step() call per sub-environment for services that do
+        # not implement StepBatch().
+        unsent = [i for i, reply in enumerate(replies) if reply is None]
+        unsent_replies = self._executor.map(
+            lambda i: self._step_session(self.envs[i], pending[i].request), unsent
+        )
+        for i, reply in zip(unsent, unsent_replies):
+            replies[i] = reply
+
+        results = [
+            env._finish_step(
+                None, None, observation_spaces, reward_spaces, env._end_step(p, reply)
+            )
+            for env, (_, observation_spaces, reward_spaces), p, reply in zip(
+                self.envs, spaces, pending, replies
+            )
+        ]
+
+        if self.auto_reset:
+            done = [i for i, (_, _, done, _) in enumerate(results) if done]
+            observations = self._executor.map(lambda i: self.envs[i].reset(), done)
+            for i, observation in zip(done, observations):
+                terminal_observation, reward, _, info = results[i]
+                info["terminal_observation"] = terminal_observation
+                results[i] = observation, reward, True, info
+        return results
+
+    def step(self, actions: Sequence[ActionType]) -> VectorStepType:
+        """Take a step in every sub-environment.
+
+        :param actions: A sequence of actions, one per sub-environment. An
+            action may be a list of actions, as accepted by :meth:`env.step()
+            <compiler_gym.envs.CompilerEnv.step>`.
+
+        :return: A tuple of stacked observations, an array of rewards, an array
+            of done flags, and a list of info dicts. Observations and rewards
+            are :code:`None` if the sub-environments have no observation or
+            reward space.
+
+        :raises ValueError: If the number of actions does not match the number
+            of sub-environments.
+        """
+        if len(actions) != self.num_envs:
+            raise ValueError(
+                f"Expected {self.num_envs} actions, received {len(actions)}"
+            )
+        if self._step_batch_supported and all(
+            isinstance(env, CompilerEnv) for env in self.envs
+        ):
+            results = self._step_batched(actions)
+        else:
+            results = list(self._executor.map(self._step, self.envs, actions))
+        observations, rewards, dones, infos = zip(*results)
+        return (
+            self._stack(observations),
+            None if rewards[0] is None else np.array(rewards, dtype=np.float64),
+            np.array(dones, dtype=bool),
+            list(infos),
+        )
+
+    def close(self) -> None:
+        """Close all of the sub-environments."""
+        # Close the forked sub-environments before the environments that they
+        # were forked from, so that each service is shut down once its last
+        # session has ended.
+        for env in reversed(self.envs):
+            env.close()
+        self._executor.shutdown()
+
+    def __len__(self) -> int:
+        return self.num_envs
+
+    def __enter__(self) -> "CompilerVectorEnv":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
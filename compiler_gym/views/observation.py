@@ -2,7 +2,10 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-from typing import Callable, Dict, List
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
 
 from compiler_gym.service.proto import ObservationSpace
 from compiler_gym.util.gym_type_hints import (
@@ -13,6 +16,25 @@ from compiler_gym.util.gym_type_hints import (
 )
 from compiler_gym.views.observation_space_spec import ObservationSpaceSpec
 
+# A process-wide cache of observation space specs, keyed by the index and
+# serialized proto that they are constructed from. Specs are immutable, so
+# environments that connect to the same compiler service share them.
+_SPECS: Dict[Tuple[int, bytes], ObservationSpaceSpec] = {}
+_SPECS_LOCK = Lock()
+
+
+def _get_spec(index: int, proto: ObservationSpace) -> ObservationSpaceSpec:
+    """Return the observation space spec for a proto, constructing it if
+    required.
+    """
+    key = (index, proto.SerializeToString(deterministic=True))
+    with _SPECS_LOCK:
+        spec = _SPECS.get(key)
+        if spec is None:
+            spec = ObservationSpaceSpec.from_proto(index, proto)
+            _SPECS[key] = spec
+        return spec
+
 
 class ObservationView:
     """A view into the available observation spaces of a service.
@@ -29,6 +51,23 @@ class ObservationView:
         [0, 1, ..., 2]
         >>> observation["Ir"]
         int main() {...}
+
+    The :class:`ObservationSpaceSpec <compiler_gym.views.ObservationSpaceSpec>`
+    instances in :code:`spaces` are shared between environments that use the
+    same compiler service and must not be modified. Use
+    :meth:`add_derived_space()
+    <compiler_gym.views.ObservationView.add_derived_space>` to customize a
+    space.
+
+    Observations from deterministic spaces are cached until the environment
+    state changes, so repeatedly reading the same observation between calls to
+    :meth:`env.step() <compiler_gym.envs.CompilerEnv.step>` does not require a
+    round trip to the compiler service. The cache holds read-only arrays, and
+    array observations are returned as writable copies unless :code:`zero_copy`
+    is set, so modifying a returned observation does not change later reads.
+    Use :meth:`get_many()
+    <compiler_gym.views.ObservationView.get_many>` to compute observations from
+    multiple spaces in a single round trip.
     """
 
     def __init__(
@@ -43,9 +82,13 @@ class ObservationView:
         self.spaces: Dict[str, ObservationSpaceSpec] = {}
 
         self._raw_step = raw_step
+        self._cache: Dict[str, ObservationType] = {}
+        # If set, cached array observations are returned as read-only arrays
+        # rather than copied. This is set by the environment.
+        self.zero_copy = False
 
         for i, s in enumerate(spaces):
-            self._add_space(ObservationSpaceSpec.from_proto(i, s))
+            self._add_space(_get_spec(i, s))
 
     def __getitem__(self, observation_space: str) -> ObservationType:
         """Request an observation from the given space.
@@ -59,18 +102,105 @@ class ObservationView:
         :raises SessionNotFound: If :meth:`env.reset()
             <compiler_gym.envs.CompilerEnv.reset>` has not been called.
         """
-        observation_space: ObservationSpaceSpec = self.spaces[observation_space]
-        observations, _, _, _ = self._raw_step(
-            actions=[], observations=[observation_space], rewards=[]
+        return self.get_many([observation_space])[0]
+
+    def get_many(self, observation_spaces: Iterable[str]) -> List[ObservationType]:
+        """Request observations from multiple spaces.
+
+        Any observations that are not cached are computed in a single round
+        trip to the compiler service.
+
+        Example usage:
+
+            >>> env.observation.get_many(["IrInstructionCount", "IrSha1"])
+            [1024, "4f1b..."]
+
+        :param observation_spaces: The observation spaces to query.
+
+        :return: A list of observations, one per requested space.
+
+        :raises KeyError: If a requested observation space does not exist.
+
+        :raises SessionNotFound: If :meth:`env.reset()
+            <compiler_gym.envs.CompilerEnv.reset>` has not been called.
+        """
+        specs: List[ObservationSpaceSpec] = [
+            self.spaces[space] for space in observation_spaces
+        ]
+
+        # Deduplicate the spaces that must be computed, preserving order.
+        misses: List[ObservationSpaceSpec] = list(
+            {spec.id: spec for spec in specs if spec.id not in self._cache}.values()
         )
-        assert (
-            len(observations) == 1
-        ), f"Expected 1 observation. Received: {len(observations)}"
-        return observations[0]
+        computed: Dict[str, ObservationType] = {}
+        if misses:
+            observations, _, _, _ = self._raw_step(
+                actions=[], observations=misses, rewards=[]
+            )
+            assert len(observations) == len(
+                misses
+            ), f"Expected {len(misses)} observations. Received: {len(observations)}"
+            computed = {spec.id: value for spec, value in zip(misses, observations)}
+            # The environment's raw_step() caches the observations that it
+            # computes, so only cache those that are not already cached.
+            uncached = [
+                (spec, value)
+                for spec, value in zip(misses, observations)
+                if spec.id not in self._cache
+            ]
+            self.update_cache(
+                [spec for spec, _ in uncached], [value for _, value in uncached]
+            )
+
+        return [
+            computed[spec.id]
+            if spec.id in computed
+            else self._copy_if_array(self._cache[spec.id])
+            for spec in specs
+        ]
+
+    def _copy_if_array(self, observation: ObservationType) -> ObservationType:
+        """Return a writable copy of a cached array observation, unless
+        :code:`zero_copy` is set.
+        """
+        if not self.zero_copy and isinstance(observation, np.ndarray):
+            return observation.copy()
+        return observation
+
+    def update_cache(
+        self,
+        observation_spaces: Iterable[ObservationSpaceSpec],
+        observations: Iterable[ObservationType],
+    ) -> None:
+        """Record observations of the current environment state.
+
+        Observations from non-deterministic spaces are not cached. Read-only
+        arrays are cached as they are, and writable arrays are copied into
+        read-only arrays, so that the caller may go on to modify the
+        observations that it was given. This is called by the environment after
+        computing observations.
+
+        :param observation_spaces: The spaces that the observations are from.
+
+        :param observations: The observation values.
+        """
+        for space, observation in zip(observation_spaces, observations):
+            if space.deterministic:
+                if isinstance(observation, np.ndarray) and observation.flags.writeable:
+                    observation = observation.copy()
+                    observation.flags.writeable = False
+                self._cache[space.id] = observation
+
+    def clear_cache(self) -> None:
+        """Discard all cached observations. This is called by the environment
+        whenever its state changes.
+        """
+        self._cache.clear()
 
     def _add_space(self, space: ObservationSpaceSpec):
         """Register a new space."""
         self.spaces[space.id] = space
+        self._cache.pop(space.id, None)
         # Bind a new method to this class that is a callback to compute the
         # given observation space. E.g. if a new space is added with ID
         # `FooBar`, this observation can be computed using
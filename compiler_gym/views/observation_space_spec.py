@@ -5,10 +5,10 @@
 import json
 from typing import Callable, Optional, Union
 
-import networkx as nx
 import numpy as np
 from gym.spaces import Box, Space
 
+from compiler_gym.service.packed_observation import unpack_array
 from compiler_gym.service.proto import Observation, ObservationSpace, ScalarRange
 from compiler_gym.spaces.scalar import Scalar
 from compiler_gym.spaces.sequence import Sequence
@@ -16,6 +16,9 @@ from compiler_gym.util.gym_type_hints import ObservationType
 
 
 def _json2nx(observation):
+    # Deferred import, as networkx is slow to import.
+    import networkx as nx
+
     json_data = json.loads(observation.string_value)
     return nx.readwrite.json_graph.node_link_graph(
         json_data, multigraph=True, directed=True
@@ -53,7 +56,14 @@ class ObservationSpaceSpec:
     :ivar default_value: A default observation. This value will be returned by
         :func:`CompilerEnv.step() <compiler_gym.envs.CompilerEnv.step>` if
         :func:`CompilerEnv.observation_space <compiler_gym.envs.CompilerEnv.observation_space>`
-        is set and the service terminates.
+        is set and the service terminates. It is computed on first access.
+
+    :ivar supports_packed_encoding: Whether the service can send observations
+        from this space as packed arrays, which are decoded without copying.
+        :meth:`translate` decodes packed observations to read-only arrays.
+        :class:`CompilerEnv <compiler_gym.envs.CompilerEnv>` copies them into
+        writable arrays unless :code:`zero_copy_observations` is set.
+    :vartype supports_packed_encoding: bool
     """
 
     def __init__(
@@ -65,7 +75,9 @@ class ObservationSpaceSpec:
         to_string: Callable[[ObservationType], str],
         deterministic: bool,
         platform_dependent: bool,
-        default_value: ObservationType,
+        default_value: Optional[ObservationType] = None,
+        lazy_default_value: Optional[Callable[[], ObservationType]] = None,
+        supports_packed_encoding: bool = False,
     ):
         """Constructor. Don't call directly, use make_derived_space()."""
         self.id: str = id
@@ -73,10 +85,24 @@ class ObservationSpaceSpec:
         self.space = space
         self.deterministic = deterministic
         self.platform_dependent = platform_dependent
-        self.default_value = default_value
+        self._default_value = default_value
+        self._lazy_default_value = lazy_default_value
+        self.supports_packed_encoding = supports_packed_encoding
         self.translate = translate
         self.to_string = to_string
 
+    @property
+    def default_value(self) -> ObservationType:
+        if self._lazy_default_value is not None:
+            self._default_value = self._lazy_default_value()
+            self._lazy_default_value = None
+        return self._default_value
+
+    @default_value.setter
+    def default_value(self, value: ObservationType) -> None:
+        self._default_value = value
+        self._lazy_default_value = None
+
     def __hash__(self) -> int:
         # Quickly hash observation spaces by comparing the index into the list
         # of spaces returned by the environment. This means that you should not
@@ -145,11 +171,11 @@ class ObservationSpaceSpec:
             space = make_seq(proto.string_size_range, str, (0, None))
 
             def translate(observation):
-                return nx.readwrite.json_graph.node_link_graph(
-                    json.loads(observation.string_value), multigraph=True, directed=True
-                )
+                return _json2nx(observation)
 
             def to_string(observation):
+                import networkx as nx
+
                 return json.dumps(
                     nx.readwrite.json_graph.node_link_data(observation), indent=2
                 )
@@ -171,6 +197,8 @@ class ObservationSpaceSpec:
             )
 
             def translate(observation):
+                if observation.WhichOneof("value") == "binary_value":
+                    return unpack_array(observation.binary_value)
                 return np.array(observation.int64_list.value, dtype=np.int64)
 
             to_string = str
@@ -180,6 +208,8 @@ class ObservationSpaceSpec:
             )
 
             def translate(observation):
+                if observation.WhichOneof("value") == "binary_value":
+                    return unpack_array(observation.binary_value)
                 return np.array(observation.double_list.value, dtype=np.float64)
 
             to_string = str
@@ -230,7 +260,8 @@ class ObservationSpaceSpec:
             to_string=to_string,
             deterministic=proto.deterministic,
             platform_dependent=proto.platform_dependent,
-            default_value=translate(proto.default_value),
+            lazy_default_value=lambda: translate(proto.default_value),
+            supports_packed_encoding=proto.supports_packed_encoding,
         )
 
     def make_derived_space(
@@ -242,6 +273,7 @@ class ObservationSpaceSpec:
         default_value: Optional[ObservationType] = None,
         platform_dependent: Optional[bool] = None,
         to_string: Callable[[ObservationType], str] = None,
+        lazy_default_value: Optional[Callable[[], ObservationType]] = None,
     ) -> "ObservationSpaceSpec":
         """Create a derived observation space.
 
@@ -261,6 +293,9 @@ class ObservationSpaceSpec:
         :param to_string: A callback to convert and observation to a string
             representation. If not provided, the callback is inherited from the
             base observation space.
+        :param lazy_default_value: A callback that computes the default value
+            for the observation space on first use. Use this instead of
+            :code:`default_value` if the default value is expensive to compute.
         :return: A new ObservationSpaceSpec.
         """
         return ObservationSpaceSpec(
@@ -269,10 +304,14 @@ class ObservationSpaceSpec:
             space=space or self.space,
             translate=lambda observation: translate(self.translate(observation)),
             to_string=to_string or self.to_string,
-            default_value=(
-                translate(self.default_value)
-                if default_value is None
-                else default_value
+            default_value=default_value,
+            lazy_default_value=(
+                lazy_default_value
+                or (
+                    (lambda: translate(self.default_value))
+                    if default_value is None
+                    else None
+                )
             ),
             deterministic=(
                 self.deterministic if deterministic is None else deterministic
@@ -282,4 +321,5 @@ class ObservationSpaceSpec:
                 if platform_dependent is None
                 else platform_dependent
             ),
+            supports_packed_encoding=self.supports_packed_encoding,
         )
@@ -7,6 +7,7 @@ from typing import Dict, List
 
 from compiler_gym.datasets import Benchmark
 from compiler_gym.spaces.reward import Reward
+from compiler_gym.util.gym_type_hints import RewardType
 from compiler_gym.views.observation import ObservationView
 
 
@@ -22,6 +23,11 @@ class RewardView:
         >>> env.reward["codesize"]
         -1243
 
+    Rewards from deterministic spaces are cached until the environment state
+    changes, so repeatedly reading the same reward between calls to
+    :meth:`env.step() <compiler_gym.envs.CompilerEnv.step>` returns the same
+    value without recomputing it.
+
     :ivar spaces: Specifications of available reward spaces.
 
     :vartype spaces: Dict[str, Reward]
@@ -35,6 +41,7 @@ class RewardView:
         self.spaces: Dict[str, Reward] = {}
         self.previous_action = None
         self._observation_view = observation_view
+        self._cache: Dict[str, RewardType] = {}
 
         for space in spaces:
             self._add_space(space)
@@ -56,9 +63,20 @@ class RewardView:
         # to env.step() rather than using this lazy view.
         if not self.spaces:
             raise ValueError("No reward spaces")
+        if reward_space in self._cache:
+            return self._cache[reward_space]
         space = self.spaces[reward_space]
-        observations = [self._observation_view[obs] for obs in space.observation_spaces]
-        return space.update(self.previous_action, observations, self._observation_view)
+        observations = (
+            self._observation_view.get_many(space.observation_spaces)
+            if space.observation_spaces
+            else []
+        )
+        reward = space.update(
+            self.previous_action, observations, self._observation_view
+        )
+        if space.deterministic:
+            self._cache[reward_space] = reward
+        return reward
 
     def reset(self, benchmark: Benchmark) -> None:
         """Reset the rewards space view. This is called on
@@ -67,9 +85,16 @@ class RewardView:
         :param benchmark: The benchmark that is used for this episode.
         """
         self.previous_action = None
+        self.clear_cache()
         for space in self.spaces.values():
             space.reset(benchmark=benchmark)
 
+    def clear_cache(self) -> None:
+        """Discard all cached rewards. This is called by the environment
+        whenever its state changes.
+        """
+        self._cache.clear()
+
     def add_space(self, space: Reward) -> None:
         """Register a new :class:`Reward <compiler_gym.spaces.Reward>` space.
 
@@ -82,6 +107,7 @@ class RewardView:
     def _add_space(self, space: Reward):
         """Register a new space."""
         self.spaces[space.id] = space
+        self._cache.pop(space.id, None)
         # Bind a new method to this class that is a callback to compute the
         # given reward space. E.g. if a new space is added with ID `FooBar`,
         # this reward can be computed using env.reward.FooBar().
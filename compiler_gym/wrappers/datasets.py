@@ -2,13 +2,18 @@
 #
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
+from collections import deque
+from concurrent.futures import Future, wait
 from itertools import cycle
-from typing import Iterable, Optional, Union
+from typing import Deque, Iterable, Optional, Union
 
 import numpy as np
 
-from compiler_gym.datasets import Benchmark
+from compiler_gym.datasets import Benchmark, BenchmarkInitError
 from compiler_gym.envs import CompilerEnv
+from compiler_gym.service import ServiceError
+from compiler_gym.service.proto import AddBenchmarkRequest
+from compiler_gym.util import thread_pool
 from compiler_gym.wrappers.core import CompilerEnvWrapper
 
 BenchmarkArg = Union[str, Benchmark]
@@ -20,24 +25,121 @@ class IterateOverBenchmarks(CompilerEnvWrapper):
     <compiler_gym.envs.CompilerEnv.reset>` once the iterator is exhausted. Use
     :class:`CycleOverBenchmarks` or :class:`RandomOrderBenchmarks` for wrappers
     which will loop over the benchmarks.
+
+    Resolving a benchmark can be expensive, for example when the benchmark must
+    be generated or compiled, and it must then be uploaded to the compiler
+    service. Use the :code:`prefetch` argument to do this work for the next few
+    benchmarks in background threads, so that :meth:`reset()
+    <compiler_gym.envs.CompilerEnv.reset>` only has to start the session:
+
+        >>> env = IterateOverBenchmarks(
+        ...     env,
+        ...     benchmarks=env.datasets["generator://csmith-v0"].benchmark_uris(),
+        ...     prefetch=4,
+        ... )
+
+    Pass benchmark URIs rather than :class:`Benchmark
+    <compiler_gym.datasets.Benchmark>` instances so that the benchmarks are
+    resolved in the background threads.
+
+    When prefetching, benchmarks that fail to resolve are skipped rather than
+    raising :class:`BenchmarkInitError
+    <compiler_gym.datasets.BenchmarkInitError>` from :code:`reset()`. Prefetching
+    does not start a session, so a benchmark that the compiler service fails to
+    parse still raises an error from :code:`reset()`.
     """
 
-    def __init__(self, env: CompilerEnv, benchmarks: Iterable[BenchmarkArg]):
+    def __init__(
+        self,
+        env: CompilerEnv,
+        benchmarks: Iterable[BenchmarkArg],
+        prefetch: int = 0,
+    ):
         """Constructor.
 
         :param env: The environment to wrap.
 
         :param benchmarks: An iterable sequence of benchmarks.
+
+        :param prefetch: The number of upcoming benchmarks to resolve and
+            register with the compiler service in background threads. If zero,
+            benchmarks are resolved synchronously on :code:`reset()`.
         """
         super().__init__(env)
         self.benchmarks = iter(benchmarks)
+        self.prefetch = prefetch
+        self._prefetched: Deque[Future] = deque()
 
     def reset(self, benchmark: Optional[BenchmarkArg] = None, **kwargs):
         if benchmark is not None:
             raise TypeError("Benchmark passed toIterateOverBenchmarks.reset()")
-        benchmark: BenchmarkArg = next(self.benchmarks)
+        if self.prefetch:
+            benchmark: BenchmarkArg = self._next_prefetched_benchmark()
+        else:
+            benchmark: BenchmarkArg = next(self.benchmarks)
         return self.env.reset(benchmark=benchmark)
 
+    def close(self):
+        # Wait for any in-flight prefetches to finish before closing the
+        # environment, else they would race with the service shutting down.
+        for future in self._prefetched:
+            future.cancel()
+        wait(self._prefetched)
+        self._prefetched.clear()
+        self.env.close()
+
+    def _next_prefetched_benchmark(self) -> Benchmark:
+        """Return the next prefetched benchmark, skipping any that failed to
+        resolve, and schedule more prefetches.
+        """
+        while True:
+            while len(self._prefetched) < self.prefetch:
+                try:
+                    benchmark = next(self.benchmarks)
+                except StopIteration:
+                    break
+                self._prefetched.append(
+                    thread_pool.get_thread_pool_executor().submit(
+                        self._prefetch_benchmark, benchmark
+                    )
+                )
+
+            if not self._prefetched:
+                raise StopIteration
+
+            try:
+                return self._prefetched.popleft().result()
+            except BenchmarkInitError as e:
+                self.env.logger.warning("Skipping benchmark: %s", e)
+
+    def _prefetch_benchmark(self, benchmark: BenchmarkArg) -> Benchmark:
+        """Resolve a benchmark and upload it to the compiler service.
+
+        :raises BenchmarkInitError: If the benchmark fails to resolve.
+        """
+        if isinstance(benchmark, str):
+            benchmark = self.env.datasets.benchmark(benchmark)
+
+        service = self.env.service
+        if service is None or benchmark.uri in service.benchmarks_sent:
+            return benchmark
+
+        # Add the benchmark to the service's cache without starting a session,
+        # so that the later reset() on this benchmark does not have to send it.
+        try:
+            service(
+                service.stub.AddBenchmark,
+                AddBenchmarkRequest(benchmark=[benchmark.proto]),
+            )
+            service.benchmarks_sent.add(benchmark.uri)
+        except (ServiceError, TimeoutError) as e:
+            # Leave it to reset() to handle any errors.
+            self.env.logger.debug(
+                "Failed to prefetch benchmark %s: %s", benchmark.uri, e
+            )
+
+        return benchmark
+
 
 class CycleOverBenchmarks(IterateOverBenchmarks):
     """Cycle through a list of benchmarks on each call to :meth:`reset()
@@ -50,14 +152,18 @@ class CycleOverBenchmarks(IterateOverBenchmarks):
         self,
         env: CompilerEnv,
         benchmarks: Iterable[BenchmarkArg],
+        prefetch: int = 0,
     ):
         """Constructor.
 
         :param env: The environment to wrap.
 
         :param benchmarks: An iterable sequence of benchmarks.
+
+        :param prefetch: The number of upcoming benchmarks to resolve in
+            background threads. See :class:`IterateOverBenchmarks`.
         """
-        super().__init__(env, benchmarks=cycle(benchmarks))
+        super().__init__(env, benchmarks=cycle(benchmarks), prefetch=prefetch)
 
 
 class RandomOrderBenchmarks(IterateOverBenchmarks):
@@ -70,6 +176,7 @@ class RandomOrderBenchmarks(IterateOverBenchmarks):
         env: CompilerEnv,
         benchmarks: Iterable[BenchmarkArg],
         rng: Optional[np.random.Generator] = None,
+        prefetch: int = 0,
     ):
         """Constructor.
 
@@ -79,7 +186,14 @@ class RandomOrderBenchmarks(IterateOverBenchmarks):
 
         :param rng: A random number generator to use for random benchmark
             selection.
+
+        :param prefetch: The number of upcoming benchmarks to resolve in
+            background threads. See :class:`IterateOverBenchmarks`.
         """
         benchmarks = list(benchmarks)
         rng = rng or np.random.default_rng()
-        super().__init__(env, benchmarks=(rng.choice(benchmarks) for _ in iter(int, 1)))
+        super().__init__(
+            env,
+            benchmarks=(rng.choice(benchmarks) for _ in iter(int, 1)),
+            prefetch=prefetch,
+        )
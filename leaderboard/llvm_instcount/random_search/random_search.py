@@ -7,6 +7,7 @@
 The search is the same as the included compiler_gym.bin.random_search. See
 README.md in this directory for a detailed description.
 """
+from functools import partial
 from time import sleep
 
 import gym
@@ -14,7 +15,7 @@ from absl import flags
 
 from compiler_gym.envs import LlvmEnv
 from compiler_gym.leaderboard.llvm_instcount import eval_llvm_instcount_policy
-from compiler_gym.random_search import RandomAgentWorker
+from compiler_gym.random_search import RandomAgentWorkerPool
 
 flags.DEFINE_float(
     "patience_ratio",
@@ -32,35 +33,27 @@ flags.DEFINE_integer(
 FLAGS = flags.FLAGS
 
 
+def make_env(benchmark: str) -> LlvmEnv:
+    """Create an environment for a search worker. This is a module-level
+    function so that it can be pickled to the worker processes.
+    """
+    return gym.make("llvm-ic-v0", benchmark=benchmark)
+
+
 def random_search(env: LlvmEnv) -> None:
     """Run a random search on the given environment."""
     patience = int(env.action_space.n * FLAGS.patience_ratio)
 
-    # Start parallel random search workers.
-    workers = [
-        RandomAgentWorker(
-            make_env=lambda: gym.make("llvm-ic-v0", benchmark=env.benchmark),
-            patience=patience,
-        )
-        for _ in range(FLAGS.nproc)
-    ]
-    for worker in workers:
-        worker.start()
-
-    sleep(FLAGS.search_time)
-
-    # Stop the workers.
-    for worker in workers:
-        worker.alive = False
-    for worker in workers:
-        worker.join()
+    # Run parallel random search workers.
+    with RandomAgentWorkerPool(
+        make_env=partial(make_env, env.benchmark.uri),
+        patience=patience,
+        nproc=FLAGS.nproc,
+    ) as pool:
+        sleep(FLAGS.search_time)
 
     # Aggregate the best results.
-    best_actions = []
-    best_reward = -float("inf")
-    for worker in workers:
-        if worker.best_returns > best_reward:
-            best_reward, best_actions = worker.best_returns, list(worker.best_actions)
+    best_actions = pool.progress().best_actions
 
     # Replay the best sequence of actions to produce the final environment
     # state.
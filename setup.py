@@ -68,6 +68,7 @@ setuptools.setup(
         "compiler_gym.third_party",
         "compiler_gym.util.flags",
         "compiler_gym.util",
+        "compiler_gym.vector",
         "compiler_gym.views",
         "compiler_gym.wrappers",
         "compiler_gym",
@@ -77,6 +78,7 @@ setuptools.setup(
     },
     package_data={
         "compiler_gym": [
+            "envs/llvm/service/compiler_gym-llvm-execute-module",
             "envs/llvm/service/compiler_gym-llvm-service",
             "envs/llvm/service/libLLVMPolly.so",
             "envs/llvm/service/passes/*.txt",
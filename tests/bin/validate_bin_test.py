@@ -3,6 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Unit tests for //compiler_gym/bin:validate."""
+import json
 import tempfile
 from io import StringIO
 from pathlib import Path
@@ -12,6 +13,7 @@ import pytest
 
 from compiler_gym.bin.validate import main
 from compiler_gym.util.capture_output import capture_output
+from compiler_gym.validation_result import ValidationResult
 from tests.pytest_plugins.common import set_command_line_flags, skip_on_ci
 from tests.test_main import main as _test_main
 
@@ -91,6 +93,39 @@ def test_invalid_csv_format(monkeypatch):
     assert "Expected 4 columns in the first row of CSV" in out.stderr
 
 
+def test_interrupted_validation_log_is_valid_json(monkeypatch):
+    stdin = """
+benchmark,reward,commandline,walltime
+benchmark://cbench-v1/crc32,0,opt  input.bc -o output.bc,0.3
+benchmark://cbench-v1/crc32,0,opt  input.bc -o output.bc,0.3
+""".strip()
+
+    def interrupted_validate_states(make_env, states, **kwargs):
+        del make_env
+        del kwargs
+        yield ValidationResult(state=states[0], walltime=0)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("sys.stdin", StringIO(stdin))
+    monkeypatch.setattr(
+        "compiler_gym.bin.validate.validate_states", interrupted_validate_states
+    )
+    with tempfile.TemporaryDirectory() as d:
+        logfile = Path(d) / "validation.log.json"
+        set_command_line_flags(
+            ["argv0", "--env=llvm-ic-v0", f"--validation_logfile={logfile}"]
+        )
+        with capture_output():
+            with pytest.raises(KeyboardInterrupt):
+                main(["argv0", "-"])
+
+        with open(str(logfile)) as f:
+            log = json.load(f)
+
+    assert len(log) == 1
+    assert log[0]["state"]["benchmark"] == "benchmark://cbench-v1/crc32"
+
+
 @skip_on_ci
 def test_multiple_valid_inputs(monkeypatch):
     stdin = """
@@ -4,6 +4,7 @@
 # LICENSE file in the root directory of this source tree.
 """Unit tests for //compiler_gym/envs."""
 import logging
+from threading import Thread
 
 import gym
 import pytest
@@ -142,6 +143,32 @@ def test_step_session_id_not_found(env: CompilerEnv):
     assert not env.in_episode
 
 
+def test_release_snapshots_from_multiple_threads(env: CompilerEnv, mocker):
+    """Test that concurrent calls to _release_snapshots() send each released
+    snapshot ID to the service exactly once.
+    """
+    env.reset()
+    call = mocker.patch.object(CompilerGymServiceConnection, "__call__")
+    env.service.released_snapshots.extend(range(10000))
+
+    threads = [
+        Thread(target=env._release_snapshots)  # pylint: disable=protected-access
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sent = [
+        snapshot_id
+        for args, _ in call.call_args_list
+        for snapshot_id in args[1].snapshot_id
+    ]
+    assert sorted(sent) == list(range(10000))
+    assert not env.service.released_snapshots
+
+
 @pytest.fixture(scope="function")
 def remote_env() -> CompilerEnv:
     """A test fixture that yields a connection to a remote service."""
@@ -0,0 +1,70 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/datasets:archive_pack."""
+import io
+from pathlib import Path
+
+import pytest
+
+from compiler_gym.datasets.archive_pack import ArchivePack
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common"]
+
+
+def members(files):
+    for name, data in files.items():
+        yield name, len(data), io.BytesIO(data)
+
+
+def test_empty_pack(tmpwd: Path):
+    pack = ArchivePack.build(tmpwd / "a.pack", [])
+    assert len(pack) == 0
+    assert list(pack) == []
+    assert "a" not in pack
+    with pytest.raises(KeyError):
+        pack.read("a")
+
+
+def test_pack_read(tmpwd: Path):
+    files = {"b/c": b"Hello", "a": b"", "dé": b"\x00\x01", "b/a": b"world"}
+    pack = ArchivePack.build(tmpwd / "a.pack", members(files))
+    assert len(pack) == 4
+    assert list(pack) == sorted(files, key=lambda name: name.encode("utf-8"))
+    for name, data in files.items():
+        assert name in pack
+        assert pack.read(name) == data
+    assert "b" not in pack
+    assert "z" not in pack
+
+
+def test_reopen_pack(tmpwd: Path):
+    ArchivePack.build(tmpwd / "a.pack", members({"a": b"1", "b": b"2"})).close()
+    pack = ArchivePack(tmpwd / "a.pack")
+    assert list(pack) == ["a", "b"]
+    assert pack.read("b") == b"2"
+
+
+def test_duplicate_name(tmpwd: Path):
+    with pytest.raises(ValueError, match="Duplicate name: 'a'"):
+        ArchivePack.build(
+            tmpwd / "a.pack",
+            [("a", 1, io.BytesIO(b"1")), ("a", 1, io.BytesIO(b"2"))],
+        )
+
+
+def test_size_mismatch(tmpwd: Path):
+    with pytest.raises(ValueError, match="Expected 10 bytes for 'a', read 1"):
+        ArchivePack.build(tmpwd / "a.pack", [("a", 10, io.BytesIO(b"1"))])
+
+
+def test_invalid_pack(tmpwd: Path):
+    (tmpwd / "a.pack").write_bytes(b"not a pack file, but long enough")
+    with pytest.raises(ValueError, match="Invalid archive pack"):
+        ArchivePack(tmpwd / "a.pack")
+
+
+if __name__ == "__main__":
+    main()
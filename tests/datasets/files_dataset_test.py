@@ -3,13 +3,14 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Unit tests for //compiler_gym/datasets:files_dataset_test."""
+import os
 import tempfile
 from pathlib import Path
 
 import numpy as np
 import pytest
 
-from compiler_gym.datasets import FilesDataset
+from compiler_gym.datasets import FilesDataset, files_dataset
 from tests.test_main import main
 
 pytest_plugins = ["tests.pytest_plugins.common"]
@@ -124,5 +125,68 @@ def test_populated_dataset_random_benchmark(populated_dataset: FilesDataset):
     assert len(random_benchmarks) == num_benchmarks
 
 
+def test_populated_dataset_benchmark_from_index(populated_dataset: FilesDataset):
+    uris = list(populated_dataset.benchmark_uris())
+    for i, uri in enumerate(uris):
+        assert populated_dataset.benchmark_from_index(i).uri == uri
+    with pytest.raises(IndexError):
+        populated_dataset.benchmark_from_index(len(uris))
+
+
+def test_populated_dataset_uri_index_is_shared(populated_dataset: FilesDataset, mocker):
+    assert populated_dataset.size == 9
+
+    # A second instance of the dataset reads the existing index rather than
+    # walking the directory tree.
+    walk = mocker.spy(os, "walk")
+    dataset = FilesDataset(
+        name="benchmark://test-v0",
+        description="",
+        license="MIT",
+        dataset_root=populated_dataset.dataset_root,
+        site_data_base=populated_dataset.site_data_path.parent.parent,
+    )
+    assert dataset.size == 9
+    assert list(dataset.benchmark_uris()) == list(populated_dataset.benchmark_uris())
+    walk.assert_not_called()
+
+
+def test_populated_dataset_uri_index_is_invalidated(populated_dataset: FilesDataset):
+    assert populated_dataset.size == 9
+    (populated_dataset.dataset_root / "h.txt").touch()
+    # Force a modification time change on filesystems with coarse timestamps.
+    os.utime(populated_dataset.dataset_root, ns=(0, 0))
+    assert populated_dataset.size == 10
+    assert "benchmark://test-v0/h.txt" in populated_dataset.benchmark_uris()
+
+
+def test_populated_dataset_uri_index_is_invalidated_by_nested_change(
+    populated_dataset: FilesDataset,
+):
+    assert populated_dataset.size == 9
+    nested_dir = populated_dataset.dataset_root / "b"
+    (nested_dir / "h.txt").touch()
+    # Force a modification time change on filesystems with coarse timestamps.
+    os.utime(nested_dir, ns=(0, 0))
+    populated_dataset.refresh()
+    assert populated_dataset.size == 10
+    assert "benchmark://test-v0/b/h.txt" in populated_dataset.benchmark_uris()
+
+
+def test_populated_dataset_uri_index_is_fingerprinted_once(
+    populated_dataset: FilesDataset, mocker
+):
+    mocker.spy(files_dataset, "_directory_tree_fingerprint")
+    for _ in range(3):
+        assert populated_dataset.size == 9
+        assert len(list(populated_dataset.benchmark_uris())) == 9
+        populated_dataset.benchmark_from_index(0)
+    assert files_dataset._directory_tree_fingerprint.call_count == 1
+
+    populated_dataset.refresh()
+    assert populated_dataset.size == 9
+    assert files_dataset._directory_tree_fingerprint.call_count == 2
+
+
 if __name__ == "__main__":
     main()
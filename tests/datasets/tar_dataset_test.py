@@ -0,0 +1,163 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/datasets:tar_dataset."""
+import hashlib
+import tarfile
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from threading import Thread
+
+import pytest
+
+from compiler_gym.datasets import TarDataset
+from compiler_gym.datasets import tar_dataset as tar_dataset_lib
+from compiler_gym.util.download import DownloadFailed
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common"]
+
+
+@pytest.fixture(scope="function")
+def archive_server(tmpwd: Path):
+    """Serve a tar archive of benchmark files over HTTP."""
+    srcs = tmpwd / "srcs" / "benchmarks"
+    (srcs / "a").mkdir(parents=True)
+    for i in range(10):
+        # Use the path as the file contents so that the archive checksum is
+        # unique to this test run.
+        (srcs / "a" / f"{i}.txt").write_text(str(tmpwd / f"{i}"))
+    (srcs / "b.txt").write_text(str(tmpwd / "b"))
+
+    with tarfile.open(tmpwd / "archive.tar.bz2", "w:bz2") as arc:
+        arc.add(str(srcs), arcname="benchmarks")
+
+    # The handler serves files from the working directory, which is tmpwd.
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("localhost", 0), Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield tmpwd / "archive.tar.bz2", f"http://localhost:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_dataset(
+    site_data_base: Path, url: str, sha256: str, extract: bool = True
+) -> TarDataset:
+    return TarDataset(
+        name="benchmark://test-v0",
+        description="",
+        license="MIT",
+        site_data_base=site_data_base,
+        tar_urls=[url],
+        tar_sha256=sha256,
+        tar_compression="bz2",
+        strip_prefix="benchmarks",
+        benchmark_file_suffix=".txt",
+        extract=extract,
+    )
+
+
+@pytest.mark.parametrize("parallel_decompression", [False, True])
+def test_install_from_http_server(
+    archive_server, tmpwd: Path, mocker, parallel_decompression: bool
+):
+    archive, url = archive_server
+    sha256 = hashlib.sha256(archive.read_bytes()).hexdigest()
+    if parallel_decompression:
+        # Use bzip2 as a stand-in for a parallel decompressor, since it has the
+        # same command line interface.
+        mocker.patch.dict(tar_dataset_lib._PARALLEL_DECOMPRESSORS, {"bz2": ["bzip2"]})
+    else:
+        mocker.patch.dict(tar_dataset_lib._PARALLEL_DECOMPRESSORS, {"bz2": []})
+
+    dataset = make_dataset(tmpwd / "site_data", f"{url}/archive.tar.bz2", sha256)
+    assert not dataset.installed
+    dataset.install()
+    assert dataset.installed
+
+    assert dataset.size == 11
+    assert (dataset.dataset_root / "a" / "9.txt").read_text() == str(tmpwd / "9")
+    assert "benchmark://test-v0/b" in dataset.benchmark_uris()
+
+
+def test_install_without_extraction(archive_server, tmpwd: Path):
+    archive, url = archive_server
+    sha256 = hashlib.sha256(archive.read_bytes()).hexdigest()
+
+    dataset = make_dataset(
+        tmpwd / "site_data", f"{url}/archive.tar.bz2", sha256, extract=False
+    )
+    dataset.install()
+    assert dataset.installed
+    assert not dataset.dataset_root.exists()
+
+    assert dataset.size == 11
+    assert sorted(dataset.benchmark_uris()) == sorted(
+        ["benchmark://test-v0/b"] + [f"benchmark://test-v0/a/{i}" for i in range(10)]
+    )
+    benchmark = dataset.benchmark("benchmark://test-v0/a/9")
+    assert benchmark.proto.program.contents == str(tmpwd / "9").encode("utf-8")
+
+    with pytest.raises(LookupError, match="Benchmark not found"):
+        dataset.benchmark("benchmark://test-v0/not_found")
+
+    # Uninstalling closes the pack, which is rebuilt on next use.
+    dataset.uninstall()
+    assert not dataset.installed
+    benchmark = dataset.benchmark("benchmark://test-v0/b")
+    assert benchmark.proto.program.contents == str(tmpwd / "b").encode("utf-8")
+
+
+def test_install_without_extraction_reuses_extracted_install(
+    archive_server, tmpwd: Path
+):
+    archive, url = archive_server
+    sha256 = hashlib.sha256(archive.read_bytes()).hexdigest()
+    make_dataset(tmpwd / "site_data", f"{url}/archive.tar.bz2", sha256).install()
+
+    # A dataset that would not extract the archive uses the existing extracted
+    # tree rather than downloading the archive again.
+    dataset = make_dataset(
+        tmpwd / "site_data",
+        "http://localhost:0/not_found.tar.bz2",
+        sha256,
+        extract=False,
+    )
+    assert dataset.installed
+    dataset.install()
+    assert (dataset.dataset_root / "a" / "9.txt").is_file()
+    assert not (dataset.site_data_path / "contents.pack").exists()
+
+    assert dataset.size == 11
+    benchmark = dataset.benchmark("benchmark://test-v0/a/9")
+    assert benchmark.proto.program.uri.endswith("a/9.txt")
+
+
+def test_install_checksum_mismatch(archive_server, tmpwd: Path):
+    _, url = archive_server
+    dataset = make_dataset(tmpwd / "site_data", f"{url}/archive.tar.bz2", "0" * 64)
+
+    with pytest.raises(DownloadFailed, match="Checksum of download does not match"):
+        dataset.install()
+    assert not dataset.installed
+
+
+def test_install_not_found(archive_server, tmpwd: Path):
+    _, url = archive_server
+    dataset = make_dataset(tmpwd / "site_data", f"{url}/not_found.tar.bz2", "0" * 64)
+
+    with pytest.raises(DownloadFailed, match="GET returned status code 404"):
+        dataset.install()
+    assert not dataset.installed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/datasets:uri_index."""
+from pathlib import Path
+
+import pytest
+
+from compiler_gym.datasets.uri_index import UriIndex
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common"]
+
+
+def test_empty_index(tmpwd: Path):
+    index = UriIndex.build(tmpwd / "index.bin", [])
+    assert len(index) == 0
+    assert list(index) == []
+    with pytest.raises(IndexError):
+        index[0]  # noqa
+
+
+def test_index_lookup(tmpwd: Path):
+    names = ["a", "b/c", "", "dé"]
+    index = UriIndex.build(tmpwd / "index.bin", iter(names))
+    assert len(index) == 4
+    assert list(index) == names
+    assert index[1] == "b/c"
+    assert index[-1] == "dé"
+
+
+def test_reopen_index(tmpwd: Path):
+    UriIndex.build(tmpwd / "index.bin", ["a", "b"]).close()
+    assert list(UriIndex(tmpwd / "index.bin")) == ["a", "b"]
+
+
+def test_invalid_index(tmpwd: Path):
+    (tmpwd / "index.bin").write_bytes(b"not an index file")
+    with pytest.raises(ValueError, match="Invalid URI index"):
+        UriIndex(tmpwd / "index.bin")
+
+
+if __name__ == "__main__":
+    main()
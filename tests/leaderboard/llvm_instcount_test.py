@@ -8,7 +8,14 @@ from pathlib import Path
 import pytest
 from absl import flags
 
-from compiler_gym.leaderboard.llvm_instcount import eval_llvm_instcount_policy
+from compiler_gym.compiler_env_state import CompilerEnvState, CompilerEnvStateReader
+from compiler_gym.leaderboard.llvm_instcount import (
+    _EvalJob,
+    _pending_jobs,
+    _pop_longest_job,
+    eval_llvm_instcount_policy,
+)
+from compiler_gym.service import CompilerGymServiceConnection
 from tests.pytest_plugins.common import set_command_line_flags
 from tests.test_main import main
 
@@ -94,6 +101,91 @@ def test_eval_llvm_instcount_policy_resume(tmpwd):
     assert len(log.rstrip().split("\n")) == 5
 
 
+def test_eval_llvm_instcount_policy_parallel_workers(tmpwd, capsys):
+    set_command_line_flags(
+        [
+            "argv0",
+            "--n=2",
+            "--max_benchmarks=2",
+            "--novalidate",
+            "--leaderboard_workers=2",
+            "--leaderboard_results=test.csv",
+        ]
+    )
+    with pytest.raises(SystemExit):
+        eval_llvm_instcount_policy(null_policy)
+
+    with CompilerEnvStateReader(open("test.csv")) as reader:
+        states = list(reader)
+    assert len(states) == 4
+    assert len({state.benchmark for state in states}) == 2
+
+    # Walltime percentiles are reported for each benchmark.
+    out = capsys.readouterr().out
+    assert "Walltime percentiles" in out
+    for state in states:
+        assert state.benchmark in out
+
+
+def test_eval_llvm_instcount_policy_does_not_connect_before_forking(tmpwd, mocker):
+    # Forking a process with an open gRPC channel is unsupported, so the calling
+    # process must not connect to a service. The spy is inherited by the
+    # forked workers, but calls in the workers are not recorded here.
+    connect = mocker.spy(CompilerGymServiceConnection, "__init__")
+    set_command_line_flags(
+        [
+            "argv0",
+            "--n=1",
+            "--max_benchmarks=2",
+            "--novalidate",
+            "--leaderboard_workers=2",
+            "--leaderboard_results=test.csv",
+        ]
+    )
+    with pytest.raises(SystemExit):
+        eval_llvm_instcount_policy(null_policy)
+
+    assert Path("test.csv").is_file()
+    connect.assert_not_called()
+
+
+def test_pending_jobs():
+    completed = [
+        CompilerEnvState(
+            benchmark="benchmark://cbench-v1/a", commandline="", walltime=1
+        ),
+        CompilerEnvState(
+            benchmark="benchmark://cbench-v1/a", commandline="", walltime=1
+        ),
+        CompilerEnvState(
+            benchmark="benchmark://cbench-v1/b", commandline="", walltime=1
+        ),
+    ]
+    assert _pending_jobs(
+        ["benchmark://cbench-v1/a", "benchmark://cbench-v1/b"], 3, completed
+    ) == [
+        _EvalJob(benchmark="benchmark://cbench-v1/a", seed=2),
+        _EvalJob(benchmark="benchmark://cbench-v1/b", seed=1),
+        _EvalJob(benchmark="benchmark://cbench-v1/b", seed=2),
+    ]
+
+
+def test_pop_longest_job():
+    jobs = [
+        _EvalJob(benchmark="a", seed=0),
+        _EvalJob(benchmark="b", seed=0),
+        _EvalJob(benchmark="b", seed=1),
+        _EvalJob(benchmark="c", seed=0),
+    ]
+    walltimes = {"a": 1, "b": 10}
+    # Benchmarks without a recorded walltime are scheduled first.
+    assert _pop_longest_job(jobs, walltimes) == _EvalJob(benchmark="c", seed=0)
+    assert _pop_longest_job(jobs, walltimes) == _EvalJob(benchmark="b", seed=0)
+    assert _pop_longest_job(jobs, walltimes) == _EvalJob(benchmark="b", seed=1)
+    assert _pop_longest_job(jobs, walltimes) == _EvalJob(benchmark="a", seed=0)
+    assert not jobs
+
+
 def test_eval_llvm_instcount_policy_invalid_flag():
     set_command_line_flags(["argv0", "--n=-1"])
     with pytest.raises(AssertionError):
@@ -0,0 +1,113 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for LlvmEnv.save_checkpoint() and LlvmEnv.load_checkpoint()."""
+import gym
+
+from compiler_gym.envs import LlvmEnv
+from compiler_gym.service import ServiceError
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_save_load_checkpoint_ir(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    checkpoint = env.save_checkpoint()
+    assert checkpoint.state
+    ir = env.ir
+
+    env.step(env.action_space.flags.index("-reg2mem"))
+    assert env.ir != ir
+
+    env.load_checkpoint(checkpoint)
+    assert env.ir == ir
+    assert env.actions == checkpoint.actions
+    assert env.benchmark == "benchmark://cbench-v1/crc32"
+
+
+def test_load_checkpoint_episode_reward(env: LlvmEnv):
+    env.reward_space = "IrInstructionCount"
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    checkpoint = env.save_checkpoint()
+    _, reward_a, _, _ = env.step(env.action_space.flags.index("-simplifycfg"))
+
+    env.load_checkpoint(checkpoint)
+    assert env.episode_reward == checkpoint.episode_reward
+    _, reward_b, _, _ = env.step(env.action_space.flags.index("-simplifycfg"))
+    assert reward_a == reward_b
+
+
+def test_load_checkpoint_on_another_service(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    checkpoint = env.save_checkpoint()
+
+    with gym.make("llvm-v0") as other:
+        other.load_checkpoint(checkpoint)
+        assert other.ir == env.ir
+        assert other.actions == env.actions
+        assert other.benchmark == env.benchmark
+
+
+def test_load_checkpoint_after_service_death(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    checkpoint = env.save_checkpoint()
+    ir = env.ir
+
+    # Kill the service. See llvm_env_test.py for why this may raise.
+    try:
+        env.service.close()
+    except ServiceError as e:
+        assert "Service exited with returncode " in str(e)
+
+    env.load_checkpoint(checkpoint)
+    assert env.ir == ir
+
+
+def test_auto_checkpoint_interval(env: LlvmEnv):
+    env.auto_checkpoint_interval = 2
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    assert env._auto_checkpoint is None
+    env.step(env.action_space.flags.index("-simplifycfg"))
+    assert env._auto_checkpoint.actions == env.actions
+
+    env.reset()
+    assert env._auto_checkpoint is None
+
+
+def test_fork_recovers_from_auto_checkpoint(env: LlvmEnv):
+    env.auto_checkpoint_interval = 1
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    env.step(env.action_space.flags.index("-simplifycfg"))
+
+    # Kill the service. The next step fails and ends the episode.
+    try:
+        env.service.close()
+    except ServiceError as e:
+        assert "Service exited with returncode " in str(e)
+    _, _, done, _ = env.step(env.action_space.flags.index("-reg2mem"))
+    assert done
+    assert not env.in_episode
+    actions = env.actions.copy()
+
+    loaded = []
+    load_checkpoint = env.load_checkpoint
+    env.load_checkpoint = lambda c: loaded.append(c) or load_checkpoint(c)
+
+    # The last checkpoint is loaded and the failed action replayed on top.
+    with env.fork() as fkd:
+        assert [c.actions for c in loaded] == [actions[:2]]
+        assert env.actions == actions
+        assert fkd.actions == actions
+        assert fkd.ir == env.ir
+
+
+if __name__ == "__main__":
+    main()
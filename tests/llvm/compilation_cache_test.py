@@ -0,0 +1,57 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/envs/llvm:compilation_cache."""
+import os
+from pathlib import Path
+
+from compiler_gym.envs.llvm.compilation_cache import CompilationCache
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common"]
+
+
+def test_key_is_deterministic():
+    assert CompilationCache.key("a", b"b") == CompilationCache.key("a", b"b")
+
+
+def test_key_depends_on_input_boundaries():
+    assert CompilationCache.key("ab", "c") != CompilationCache.key("a", "bc")
+
+
+def test_get_missing_entry(tmpwd: Path):
+    cache = CompilationCache(tmpwd)
+    assert cache.get(cache.key("a")) is None
+
+
+def test_put_get(tmpwd: Path):
+    cache = CompilationCache(tmpwd)
+    key = cache.key("a")
+    cache.put(key, b"bitcode")
+    assert cache.get(key) == b"bitcode"
+    assert cache.size_in_bytes == len(b"bitcode")
+
+
+def test_eviction_is_least_recently_used(tmpwd: Path):
+    cache = CompilationCache(tmpwd, max_size_in_bytes=25)
+    a, b, c = cache.key("a"), cache.key("b"), cache.key("c")
+    cache.put(a, b"0123456789")
+    cache.put(b, b"0123456789")
+
+    # Make "a" the most recently used entry.
+    a_path = tmpwd / a[:2] / f"{a}.bc"
+    b_path = tmpwd / b[:2] / f"{b}.bc"
+    os.utime(b_path, (0, 0))
+    assert cache.get(a) == b"0123456789"
+
+    cache.put(c, b"0123456789")
+    assert a_path.is_file()
+    assert not b_path.is_file()
+    assert cache.get(b) is None
+    assert cache.get(c) == b"0123456789"
+    assert cache.size_in_bytes <= 25
+
+
+if __name__ == "__main__":
+    main()
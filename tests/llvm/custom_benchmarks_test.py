@@ -5,6 +5,7 @@
 """Tests for LLVM benchmark handling."""
 import os
 import re
+import subprocess
 import tempfile
 from pathlib import Path
 
@@ -13,13 +14,14 @@ import pytest
 
 from compiler_gym.datasets import Benchmark
 from compiler_gym.envs import LlvmEnv, llvm
+from compiler_gym.service import CompilerGymServiceConnection
 from compiler_gym.service.proto import Benchmark as BenchmarkProto
 from compiler_gym.service.proto import File
 from compiler_gym.util.runfiles_path import runfiles_path
 from tests.pytest_plugins.common import bazel_only
 from tests.test_main import main
 
-pytest_plugins = ["tests.pytest_plugins.llvm"]
+pytest_plugins = ["tests.pytest_plugins.common", "tests.pytest_plugins.llvm"]
 
 # The path of an IR file that assembles but does not compile.
 INVALID_IR_PATH = runfiles_path("tests/llvm/invalid_ir.ll")
@@ -108,6 +110,19 @@ def test_custom_benchmark(env: LlvmEnv):
     assert env.benchmark == "benchmark://new"
 
 
+def test_custom_benchmark_reset_is_single_round_trip(env: LlvmEnv, mocker):
+    """Test that reset() on a new benchmark does not call AddBenchmark()."""
+    benchmark = Benchmark.from_file("benchmark://new", EXAMPLE_BITCODE_FILE)
+    spy = mocker.spy(CompilerGymServiceConnection, "__call__")
+
+    env.reset(benchmark=benchmark)
+
+    stub_methods = [call.args[1] for call in spy.call_args_list]
+    assert env.service.stub.AddBenchmark not in stub_methods
+    assert stub_methods.count(env.service.stub.StartSession) == 1
+    assert "benchmark://new" in env.service.benchmarks_sent
+
+
 def test_custom_benchmark_constructor():
     benchmark = Benchmark.from_file("benchmark://new", EXAMPLE_BITCODE_FILE)
     env = gym.make("llvm-v0", benchmark=benchmark)
@@ -236,6 +251,40 @@ def test_make_benchmark_clang_job_standard_libraries(env: LlvmEnv):
     assert re.search(r"declare (dso_local )?i32 @printf", env.observation["Ir"])
 
 
+def test_make_benchmark_clang_job_is_cached(tmpwd: Path, mocker):
+    source = tmpwd / "input.c"
+    with open(str(source), "w") as f:
+        f.write("int A() { return 0; }")
+
+    a = llvm.make_benchmark(str(source))
+    popen = mocker.spy(subprocess, "Popen")
+    b = llvm.make_benchmark(str(source))
+
+    # A cache hit runs only the preprocessor, to compute the cache key.
+    popen.assert_called_once()
+    assert "-E" in popen.call_args[0][0]
+    assert "-emit-llvm" not in popen.call_args[0][0]
+    assert a.proto.program.contents == b.proto.program.contents
+
+
+def test_make_benchmark_cache_is_invalidated_by_included_header(tmpwd: Path):
+    (tmpwd / "include").mkdir()
+    header = tmpwd / "include" / "a.h"
+    source = tmpwd / "input.c"
+    with open(str(source), "w") as f:
+        f.write('#include "a.h"\nint A() { return VALUE; }')
+
+    with open(str(header), "w") as f:
+        f.write("#define VALUE 1\n")
+    a = llvm.make_benchmark(str(source), copt=["-Iinclude"])
+
+    with open(str(header), "w") as f:
+        f.write("#define VALUE 2\n")
+    b = llvm.make_benchmark(str(source), copt=["-Iinclude"])
+
+    assert a.proto.program.contents != b.proto.program.contents
+
+
 def test_make_benchmark_invalid_clang_job():
     with pytest.raises(OSError) as ctx:
         llvm.make_benchmark(llvm.ClangInvocation(["-invalid-arg"]))
@@ -3,6 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 """Tests for the cbench dataset."""
+import json
 import tempfile
 from pathlib import Path
 
@@ -66,6 +67,101 @@ def test_validate_sha_output_invalid():
     assert cbench.validate_sha_output(output)
 
 
+def test_gold_standard_cache_roundtrip(tmpwd: Path, monkeypatch):
+    monkeypatch.setenv("COMPILER_GYM_CACHE", str(tmpwd))
+    monkeypatch.setattr(cbench, "_GOLD_STANDARD_CACHE", {})
+    key = cbench._gold_standard_cache_key(
+        benchmark="benchmark://cbench-v1/crc32",
+        compiler_version="10.0.0",
+        cmd="$BIN $D/file",
+        linkopts=[],
+        os_env={},
+        input_files=[],
+        output_files=[Path("out.txt")],
+    )
+    assert cbench._get_gold_standard(key) is None
+
+    gold_standard = cbench._GoldStandard(
+        output="Hello", output_files={"out.txt": "abcd"}
+    )
+    cbench._set_gold_standard(key, gold_standard)
+    assert (tmpwd / "cbench-v1-gold-standard" / f"{key}.json").is_file()
+
+    # Read the persisted value back.
+    monkeypatch.setattr(cbench, "_GOLD_STANDARD_CACHE", {})
+    assert cbench._get_gold_standard(key) == gold_standard
+
+
+def test_gold_standard_cache_key_depends_on_compiler_version():
+    def key(compiler_version):
+        return cbench._gold_standard_cache_key(
+            benchmark="benchmark://cbench-v1/crc32",
+            compiler_version=compiler_version,
+            cmd="$BIN $D/file",
+            linkopts=[],
+            os_env={},
+            input_files=[],
+            output_files=[],
+        )
+
+    assert key("10.0.0") == key("10.0.0")
+    assert key("10.0.0") != key("11.0.0")
+
+
+def test_gold_standard_cache_key_depends_on_input_file_contents(tmpwd: Path):
+    def key():
+        return cbench._gold_standard_cache_key(
+            benchmark="benchmark://cbench-v1/crc32",
+            compiler_version="10.0.0",
+            cmd="$BIN $D/file",
+            linkopts=[],
+            os_env={},
+            input_files=[tmpwd / "file"],
+            output_files=[],
+        )
+
+    (tmpwd / "file").write_text("a")
+    a = key()
+    assert key() == a
+    (tmpwd / "file").write_text("bb")
+    assert key() != a
+
+
+def test_validate_populates_gold_standard_cache(env: LlvmEnv, tmpwd: Path, monkeypatch):
+    monkeypatch.setenv("COMPILER_GYM_CACHE", str(tmpwd))
+    monkeypatch.setattr(cbench, "_GOLD_STANDARD_CACHE", {})
+    env.reset("cbench-v1/crc32")
+    assert env.validate().okay()
+    assert list((tmpwd / "cbench-v1-gold-standard").glob("*.json"))
+
+    # A cached gold standard is used on subsequent validations.
+    runs = []
+    compile_and_run = cbench._compile_and_run_bitcode_file
+    monkeypatch.setattr(
+        cbench,
+        "_compile_and_run_bitcode_file",
+        lambda **kwargs: runs.append(kwargs) or compile_and_run(**kwargs),
+    )
+    assert env.validate().okay()
+    assert all("-O2" not in run["linkopts"] for run in runs)
+
+
+def test_validate_replaces_wrong_gold_standard(env: LlvmEnv, tmpwd: Path, monkeypatch):
+    monkeypatch.setenv("COMPILER_GYM_CACHE", str(tmpwd))
+    monkeypatch.setattr(cbench, "_GOLD_STANDARD_CACHE", {})
+    env.reset("cbench-v1/crc32")
+    assert env.validate().okay()
+    (path,) = (tmpwd / "cbench-v1-gold-standard").glob("*.json")
+    gold_standard = json.loads(path.read_text())
+
+    # Corrupt the persisted gold standard. The first validation attempt fails
+    # and drops it, and the retry produces and persists a new one.
+    path.write_text(json.dumps({**gold_standard, "output": "wrong"}))
+    monkeypatch.setattr(cbench, "_GOLD_STANDARD_CACHE", {})
+    assert env.validate().okay()
+    assert json.loads(path.read_text()) == gold_standard
+
+
 def test_cbench_v0_deprecation(env: LlvmEnv):
     """Test that cBench-v0 emits a deprecation warning when used."""
     with pytest.deprecated_call(match="Please use 'benchmark://cbench-v1'"):
@@ -71,5 +71,64 @@ def test_random_benchmark(llvm_stress_dataset: LlvmStressDataset):
     assert len(random_benchmarks) == num_benchmarks
 
 
+def test_generator_pool_benchmarks_match(llvm_stress_dataset: LlvmStressDataset):
+    expected = [llvm_stress_dataset.benchmark_from_seed(i) for i in range(3)]
+    pool = llvm_stress_dataset.start_generator_pool(num_workers=2, queue_size=4)
+    try:
+        for i in range(3):
+            pool.submit(i)
+        actual = [llvm_stress_dataset.benchmark_from_seed(i) for i in range(3)]
+    finally:
+        llvm_stress_dataset.stop_generator_pool()
+    assert [b.uri for b in actual] == [b.uri for b in expected]
+    assert [b.proto.program.contents for b in actual] == [
+        b.proto.program.contents for b in expected
+    ]
+
+
+def test_generator_pool_rejects_invalid_benchmark(
+    llvm_stress_dataset: LlvmStressDataset,
+):
+    llvm_stress_dataset.start_generator_pool(num_workers=1)
+    try:
+        with pytest.raises(
+            BenchmarkInitError, match="Cannot emit physreg copy instruction"
+        ):
+            llvm_stress_dataset.benchmark_from_seed(173)
+    finally:
+        llvm_stress_dataset.stop_generator_pool()
+
+
+def test_generator_pool_random_benchmark_is_deterministic(
+    llvm_stress_dataset: LlvmStressDataset,
+):
+    llvm_stress_dataset.start_generator_pool(num_workers=2, queue_size=4)
+    try:
+        a = [
+            llvm_stress_dataset.random_benchmark(np.random.default_rng(0)).uri
+            for _ in range(2)
+        ]
+        rng = np.random.default_rng(0)
+        b = llvm_stress_dataset.random_benchmark(rng).uri
+    finally:
+        llvm_stress_dataset.stop_generator_pool()
+    assert a == [b, b]
+
+
+def test_generator_pool_does_not_restat_completed_seeds(
+    llvm_stress_dataset: LlvmStressDataset, mocker
+):
+    pool = llvm_stress_dataset.start_generator_pool(num_workers=1, queue_size=4)
+    try:
+        pool.submit(0)
+        llvm_stress_dataset.benchmark_from_seed(0)
+        mocker.spy(pool, "_read_cache")
+        pool.submit(0)
+        pool.submit(0)
+        assert pool._read_cache.call_count == 0
+    finally:
+        llvm_stress_dataset.stop_generator_pool()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,183 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for the ExecuteSession() RPC of the LLVM service."""
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from compiler_gym.envs import LlvmEnv, llvm
+from compiler_gym.service.proto import ExecuteSessionReply, ExecuteSessionRequest
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common", "tests.pytest_plugins.llvm"]
+
+
+def make_benchmark(tmpwd: Path, source: str):
+    with open("a.c", "w") as f:
+        f.write(source)
+    return llvm.make_benchmark(tmpwd / "a.c")
+
+
+def execute(env: LlvmEnv, **kwargs) -> ExecuteSessionReply:
+    return env.service(
+        env.service.stub.ExecuteSession,
+        ExecuteSessionRequest(session_id=env._session_id, **kwargs),
+    )
+
+
+def test_execute_output_and_exit_code(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            """
+#include <stdio.h>
+#include <stdlib.h>
+
+int main(int argc, char** argv) {
+  printf("%d %s %s\\n", argc, argv[1], getenv("GREETING"));
+  return 3;
+}
+""",
+        )
+    )
+    reply = execute(env, argument=["foo"], environment_variable={"GREETING": "hi"})
+    assert reply.output == b"2 foo hi\n"
+    assert reply.exit_code == 3
+    assert not reply.timed_out
+    assert reply.walltime_seconds > 0
+
+
+def test_execute_working_directory(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            """
+#include <stdio.h>
+
+int main() {
+  FILE* f = fopen("out.txt", "w");
+  fputs("Hello", f);
+  fclose(f);
+  return 0;
+}
+""",
+        )
+    )
+    (tmpwd / "run").mkdir()
+    reply = execute(env, working_directory=str(tmpwd / "run"))
+    assert reply.exit_code == 0
+    assert (tmpwd / "run" / "out.txt").read_text() == "Hello"
+
+
+def test_execute_timeout(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd, "int main() { volatile int x = 1; while (x) {} return 0; }"
+        )
+    )
+    reply = execute(env, timeout_seconds=0.5)
+    assert reply.timed_out
+
+
+def test_execute_crash_does_not_kill_service(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd, "int main() { volatile int* p = 0; *p = 1; return 0; }"
+        )
+    )
+    reply = execute(env)
+    assert reply.exit_code == 128 + signal.SIGSEGV
+    # The session is still usable.
+    env.step(env.action_space.flags.index("-mem2reg"))
+
+
+def test_execute_exit_flushes_output(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            """
+#include <stdio.h>
+#include <stdlib.h>
+
+int main() {
+  printf("Hello");
+  exit(5);
+}
+""",
+        )
+    )
+    reply = execute(env)
+    assert reply.output == b"Hello"
+    assert reply.exit_code == 5
+
+
+def test_execute_does_not_inherit_file_descriptors(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            """
+#include <fcntl.h>
+#include <stdio.h>
+
+int main() {
+  int count = 0;
+  for (int fd = 3; fd < 1024; ++fd) {
+    if (fcntl(fd, F_GETFD) != -1) {
+      ++count;
+    }
+  }
+  printf("%d", count);
+  return 0;
+}
+""",
+        )
+    )
+    reply = execute(env)
+    assert reply.output == b"0"
+
+
+def test_execute_concurrent_sessions(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            """
+#include <unistd.h>
+
+int main(int argc, char** argv) {
+  if (argc > 1) {
+    sleep(5);
+  }
+  return 0;
+}
+""",
+        )
+    )
+    fkd = env.fork()
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            slow = executor.submit(execute, env, argument=["slow"])
+            fast = executor.submit(execute, fkd)
+            # The slow run must not hold the output pipe of the fast run open.
+            assert fast.result().walltime_seconds < 4
+            assert slow.result().walltime_seconds >= 4
+    finally:
+        fkd.close()
+
+
+def test_execute_unresolved_symbol(env: LlvmEnv, tmpwd: Path):
+    env.reset(
+        benchmark=make_benchmark(
+            tmpwd,
+            "int undefined_function(); int main() { return undefined_function(); }",
+        )
+    )
+    with pytest.raises(NotImplementedError, match="JIT execution failed"):
+        execute(env)
+
+
+if __name__ == "__main__":
+    main()
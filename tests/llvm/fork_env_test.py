@@ -129,6 +129,20 @@ def test_fork_spaces_are_same(env: LlvmEnv):
         fkd.close()
 
 
+def test_fork_shares_observation_spaces(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+
+    fkd = env.fork()
+    try:
+        for name, space in env.observation.spaces.items():
+            assert fkd.observation.spaces[name] is space
+        # Reward spaces hold per-episode state, so are copied.
+        for name, space in env.reward.spaces.items():
+            assert fkd.reward.spaces[name] is not space
+    finally:
+        fkd.close()
+
+
 def test_fork_state(env: LlvmEnv):
     env.reset("cbench-v1/crc32")
     env.step(0)
@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import List
 
 import gym
+import numpy as np
 import pytest
 
 import compiler_gym
@@ -172,6 +173,72 @@ def test_apply_state(env: LlvmEnv):
         other.close()
 
 
+def test_observation_spaces_are_shared_between_environments(env: LlvmEnv):
+    with gym.make("llvm-v0") as other:
+        assert set(other.observation.spaces) == set(env.observation.spaces)
+        for name, space in env.observation.spaces.items():
+            assert other.observation.spaces[name] is space
+        assert other.datasets["cbench-v1"] is env.datasets["cbench-v1"]
+        # Reward spaces hold per-episode state, so are not shared.
+        for name, space in env.reward.spaces.items():
+            assert other.reward.spaces[name] is not space
+
+
+def test_observation_get_many(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    ic, ic_o0 = env.observation.get_many(["IrInstructionCount", "IrInstructionCountO0"])
+    assert ic == env.observation["IrInstructionCount"]
+    assert ic_o0 == env.observation["IrInstructionCountO0"]
+
+
+def test_cached_observation_is_invalidated_by_step(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    before = env.observation["IrInstructionCount"]
+    assert env.observation["IrInstructionCount"] == before
+    env.step(env.action_space.flags.index("-mem2reg"))
+    assert env.observation["IrInstructionCount"] < before
+
+
+def test_cached_observation_is_invalidated_by_reset(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    after = env.observation["IrInstructionCount"]
+    env.reset()
+    assert env.observation["IrInstructionCount"] > after
+
+
+def test_observations_are_writable(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    observation = env.observation["Autophase"]
+    assert observation.flags.writeable
+    observation[0] += 1
+
+
+def test_zero_copy_observations_are_read_only(env: LlvmEnv):
+    env.zero_copy_observations = True
+    env.reset("cbench-v1/crc32")
+    observation = env.observation["Autophase"]
+    assert not observation.flags.writeable
+    with pytest.raises(ValueError):
+        observation[0] += 1
+
+
+def test_modifying_observation_does_not_change_later_reads(env: LlvmEnv):
+    observation = env.reset("cbench-v1/crc32", observation_space="Autophase")
+    expected = observation.copy()
+    observation[:] = -1
+    np.testing.assert_array_equal(env.observation["Autophase"], expected)
+
+    observation, _, _, _ = env.step(0)
+    expected = observation.copy()
+    observation[:] = -1
+    np.testing.assert_array_equal(env.observation["Autophase"], expected)
+
+    observation = env.observation["Autophase"]
+    observation[:] = -1
+    np.testing.assert_array_equal(env.observation["Autophase"], expected)
+
+
 def test_set_observation_space_from_spec(env: LlvmEnv):
     env.observation_space = env.observation.spaces["Autophase"]
     obs = env.observation_space
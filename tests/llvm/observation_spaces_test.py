@@ -60,6 +60,8 @@ def test_observation_spaces(env: LlvmEnv):
         "ObjectTextSizeO0",
         "ObjectTextSizeO3",
         "ObjectTextSizeOz",
+        "Runtime",
+        "RuntimeO0",
     }
 
 
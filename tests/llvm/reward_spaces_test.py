@@ -71,6 +71,7 @@ def test_reward_spaces(env: LlvmEnv):
         "ObjectTextSizeNorm",
         "ObjectTextSizeO3",
         "ObjectTextSizeOz",
+        "Runtime",
     }
 
 
@@ -0,0 +1,131 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for the Runtime observation and reward spaces of the LLVM environment."""
+import numpy as np
+import pytest
+
+from compiler_gym.envs import LlvmEnv
+from compiler_gym.envs.llvm.datasets.cbench import download_cBench_runtime_data
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.common", "tests.pytest_plugins.llvm"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def cbench_runtime_data():
+    download_cBench_runtime_data()
+
+
+def test_runtime_observation_space(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    space = env.observation.spaces["Runtime"]
+    assert not space.deterministic
+    assert space.platform_dependent
+
+    value = env.observation["Runtime"]
+    print(value)  # For debugging in case of error.
+    assert isinstance(value, np.ndarray)
+    assert value.shape == (1,)
+    assert space.space.contains(value)
+    assert all(value > 0)
+
+
+@pytest.mark.parametrize("observation_space", ["Runtime", "RuntimeO0"])
+def test_runtime_default_value_is_in_space(env: LlvmEnv, observation_space: str):
+    space = env.observation.spaces[observation_space]
+    assert space.space.contains(space.default_value)
+
+
+@pytest.mark.parametrize("parallelism", [1, 2, 0])
+def test_runtime_measured_runs(env: LlvmEnv, parallelism: int):
+    env.reset("cbench-v1/crc32")
+    assert (
+        env.send_params(
+            ("llvm.runtime.warmup_runs", "1"),
+            ("llvm.runtime.measured_runs", "4"),
+            ("llvm.runtime.parallelism", str(parallelism)),
+        )
+        == ["1", "4", str(parallelism)]
+    )
+
+    value = env.observation["Runtime"]
+    assert value.shape == (4,)
+    assert all(value > 0)
+
+
+def test_runtime_cpu_affinity_and_priority(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.send_params(
+        ("llvm.runtime.measured_runs", "2"),
+        ("llvm.runtime.cpu_affinity", "0"),
+        ("llvm.runtime.nice", "10"),
+    )
+    value = env.observation["Runtime"]
+    assert value.shape == (2,)
+    assert all(value > 0)
+
+
+def test_session_parameters_persist_across_reset(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.send_param("llvm.runtime.measured_runs", "3")
+    env.reset("cbench-v1/crc32")
+    assert env.observation["Runtime"].shape == (3,)
+
+
+def test_reset_observation_uses_session_parameters(env: LlvmEnv):
+    env.observation_space = "Runtime"
+    env.reset("cbench-v1/crc32")
+    env.send_param("llvm.runtime.measured_runs", "3")
+    observation = env.reset("cbench-v1/crc32")
+    assert observation.shape == (3,)
+    assert all(observation > 0)
+
+
+def test_session_parameters_inherited_by_fork(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.send_param("llvm.runtime.measured_runs", "2")
+    fkd = env.fork()
+    try:
+        assert fkd.observation["Runtime"].shape == (2,)
+    finally:
+        fkd.close()
+
+
+def test_invalid_session_parameters(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    with pytest.raises(ValueError, match="Unknown session parameter"):
+        env.send_param("llvm.runtime.invalid", "1")
+    with pytest.raises(ValueError, match="Invalid value"):
+        env.send_param("llvm.runtime.measured_runs", "abc")
+    with pytest.raises(ValueError, match="must be in the range"):
+        env.send_param("llvm.runtime.measured_runs", "0")
+
+
+def test_runtime_unoptimized_benchmark(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.send_param("llvm.runtime.measured_runs", "2")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    assert env.observation["RuntimeO0"].shape == (2,)
+
+
+def test_runtime_unsupported_benchmark(env: LlvmEnv):
+    env.reset("cbench-v1/ghostscript")
+    with pytest.raises(ValueError, match="Benchmark does not support runtime"):
+        env.observation["Runtime"]
+
+
+def test_runtime_reward(env: LlvmEnv):
+    env.reward_space = "Runtime"
+    env.reset("cbench-v1/crc32")
+    space = env.reward.spaces["Runtime"]
+    assert not space.deterministic
+    assert space.platform_dependent
+
+    _, reward, _, _ = env.step(env.action_space.flags.index("-mem2reg"))
+    assert isinstance(reward, float)
+
+
+if __name__ == "__main__":
+    main()
@@ -71,5 +71,32 @@ def test_service_env_dies_reset(env: CompilerEnv):
     assert reward is not None
 
 
+def test_get_stats(env: CompilerEnv):
+    # The first reset sends the benchmark to the service, which is a cache
+    # miss. The second reset finds it in the cache.
+    env.reset("cbench-v1/crc32")
+    env.reset("cbench-v1/crc32")
+    env.step(0)
+    stats = env.service.get_stats()
+    print(stats)  # For debugging in case of error.
+
+    assert stats.session_count == 1
+    assert stats.benchmark_cache.size >= 1
+    assert stats.benchmark_cache.size_in_bytes > 0
+    assert stats.benchmark_cache.hit_count >= 1
+    assert stats.benchmark_cache.miss_count >= 1
+    assert stats.resident_set_size_bytes > 0
+    assert stats.uptime_seconds > 0
+
+    rpcs = {rpc.name: rpc for rpc in stats.rpc}
+    assert rpcs["StartSession"].call_count >= 1
+    assert rpcs["Step"].call_count >= 1
+    assert rpcs["Step"].latency_bucket_count[-1] <= rpcs["Step"].call_count
+    assert rpcs["Step"].latency_seconds_sum > 0
+
+    assert stats.compiler_stats["llvm.benchmark_factory.loaded_benchmarks"] >= 1
+    assert stats.compiler_stats["llvm.benchmark_factory.loaded_bitcode_bytes"] > 0
+
+
 if __name__ == "__main__":
     main()
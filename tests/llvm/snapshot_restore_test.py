@@ -0,0 +1,119 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for LlvmEnv.snapshot() and LlvmEnv.restore()."""
+import gc
+
+from compiler_gym.envs import LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_snapshot_restore_ir(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    snapshot = env.snapshot()
+    assert snapshot.snapshot_id is not None
+    ir = env.ir
+
+    env.step(env.action_space.flags.index("-reg2mem"))
+    assert env.ir != ir
+
+    env.restore(snapshot)
+    assert env.ir == ir
+    assert env.actions == snapshot.actions
+
+
+def test_restore_snapshot_multiple_times(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    snapshot = env.snapshot()
+    ir = env.ir
+
+    for flag in ["-mem2reg", "-reg2mem", "-simplifycfg"]:
+        env.step(env.action_space.flags.index(flag))
+        env.restore(snapshot)
+        assert env.ir == ir
+        assert env.actions == []
+
+
+def test_restore_episode_reward(env: LlvmEnv):
+    env.reward_space = "IrInstructionCount"
+    env.reset("cbench-v1/crc32")
+    snapshot = env.snapshot()
+    _, reward_a, _, _ = env.step(env.action_space.flags.index("-mem2reg"))
+
+    env.restore(snapshot)
+    assert env.episode_reward == 0
+    _, reward_b, _, _ = env.step(env.action_space.flags.index("-mem2reg"))
+    assert reward_a == reward_b
+    assert env.episode_reward == reward_b
+
+
+def test_restore_invalidates_observation_cache(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    snapshot = env.snapshot()
+    count = env.observation["IrInstructionCount"]
+
+    env.step(env.action_space.flags.index("-mem2reg"))
+    assert env.observation["IrInstructionCount"] != count
+
+    env.restore(snapshot)
+    assert env.observation["IrInstructionCount"] == count
+
+
+def test_restore_snapshot_in_forked_environment(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    snapshot = env.snapshot()
+
+    with env.fork() as fkd:
+        fkd.step(env.action_space.flags.index("-reg2mem"))
+        fkd.restore(snapshot)
+        assert fkd.ir == env.ir
+        assert fkd.actions == env.actions
+
+
+def test_restore_after_release_replays_actions(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    snapshot = env.snapshot()
+    ir = env.ir
+    snapshot.release()
+    assert snapshot.released
+
+    env.step(env.action_space.flags.index("-reg2mem"))
+    env.restore(snapshot)
+    assert env.ir == ir
+    assert env.actions == snapshot.actions
+
+
+def test_restore_after_close(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    env.step(env.action_space.flags.index("-mem2reg"))
+    snapshot = env.snapshot()
+    ir = env.ir
+    env.close()
+
+    env.restore(snapshot)
+    assert env.ir == ir
+    assert env.benchmark == "benchmark://cbench-v1/crc32"
+
+
+def test_unreferenced_snapshots_are_released(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    snapshot = env.snapshot()
+    snapshot_id = snapshot.snapshot_id
+    del snapshot
+    gc.collect()
+    assert list(env.service.released_snapshots) == [snapshot_id]
+
+    # Released snapshots are sent to the service on the next snapshot.
+    snapshot = env.snapshot()
+    assert not env.service.released_snapshots
+    assert snapshot.snapshot_id != snapshot_id
+
+
+if __name__ == "__main__":
+    main()
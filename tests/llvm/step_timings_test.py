@@ -0,0 +1,77 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Tests for recording the timings of steps in the LLVM environment."""
+from compiler_gym.envs import LlvmEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+def test_no_timings_by_default(env: LlvmEnv):
+    env.reset("cbench-v1/crc32")
+    assert not env.record_step_timings
+    _, _, _, info = env.step(env.action_space.flags.index("-mem2reg"))
+    assert "timings" not in info
+
+
+def test_step_timings(env: LlvmEnv):
+    env.record_step_timings = True
+    env.reset("cbench-v1/crc32")
+    _, _, done, info = env.step(
+        [
+            env.action_space.flags.index("-mem2reg"),
+            env.action_space.flags.index("-gvn"),
+        ],
+        observations=["Autophase", "Programl"],
+        rewards=["IrInstructionCountOz"],
+    )
+    assert not done
+    timings = info["timings"]
+    print(timings)  # For debugging in case of error.
+
+    service = timings["service"]
+    assert len(service["actions"]) == 2
+    assert all(t > 0 for t in service["actions"])
+    assert set(service["observations"]) == {
+        "Autophase",
+        "Programl",
+        "IrInstructionCount",
+    }
+    assert service["end_of_step"] > 0
+    assert service["session"]["llvm.verify_module"] > 0
+    assert service["session"]["llvm.programl.build"] > 0
+    assert service["session"]["llvm.programl.serialize"] > 0
+    assert service["total"] >= sum(service["actions"]) + service["end_of_step"]
+
+    client = timings["client"]
+    assert set(client["translate_observations"]) == set(service["observations"])
+    assert set(client["update_rewards"]) == {"IrInstructionCountOz"}
+    assert client["rpc"] >= service["total"]
+    assert client["total"] >= client["rpc"]
+
+
+def test_step_timings_no_session_timings_without_effect(env: LlvmEnv):
+    env.record_step_timings = True
+    env.reset("cbench-v1/crc32")
+    _, _, _, info = env.step([], observations=["IrInstructionCount"])
+    service = info["timings"]["service"]
+    assert service["actions"] == []
+    assert "llvm.verify_module" not in service["session"]
+
+
+def test_step_timings_inherited_by_fork(env: LlvmEnv):
+    env.record_step_timings = True
+    env.reset("cbench-v1/crc32")
+    fkd = env.fork()
+    try:
+        assert fkd.record_step_timings
+        _, _, _, info = fkd.step(fkd.action_space.flags.index("-mem2reg"))
+        assert len(info["timings"]["service"]["actions"]) == 1
+    finally:
+        fkd.close()
+
+
+if __name__ == "__main__":
+    main()
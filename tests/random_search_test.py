@@ -5,11 +5,14 @@
 """Unit tests for //compiler_gym/bin:random_search."""
 import tempfile
 from pathlib import Path
+from pickle import PicklingError
+from time import sleep
 
 import gym
+import pytest
 
 from compiler_gym.random_replay import replay_actions_from_logs
-from compiler_gym.random_search import random_search
+from compiler_gym.random_search import RandomAgentWorkerPool, random_search
 from tests.pytest_plugins.common import set_command_line_flags
 from tests.test_main import main
 
@@ -20,6 +23,10 @@ def make_env():
     return env
 
 
+def make_broken_env():
+    raise OSError("Failed to create environment")
+
+
 def test_random_search_smoke_test():
     with tempfile.TemporaryDirectory() as tmp:
         outdir = Path(tmp)
@@ -47,5 +54,56 @@ def test_random_search_smoke_test():
             env.close()
 
 
+def test_random_search_multiple_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        outdir = Path(tmp)
+        set_command_line_flags(["argv0"])
+        best_returns, best_actions = random_search(
+            make_env=make_env,
+            outdir=outdir,
+            patience=10,
+            total_runtime=3,
+            nproc=2,
+            skip_done=False,
+        )
+
+        assert (outdir / "random_search_best_actions.txt").is_file()
+        with open(outdir / "random_search_best_actions.txt") as f:
+            assert len(f.read().strip().split("\n")) == len(best_actions)
+
+        env = make_env()
+        try:
+            env.reset()
+            _, _, done, _ = env.step(best_actions)
+            assert not done
+            assert env.episode_reward == pytest.approx(best_returns)
+        finally:
+            env.close()
+
+
+def test_random_agent_worker_pool_progress():
+    with RandomAgentWorkerPool(make_env, patience=10, nproc=2) as pool:
+        sleep(3)
+        progress = pool.progress()
+
+    assert progress.total_environment_count >= 2
+    assert progress.total_episode_count >= 2
+    assert progress.total_step_count >= progress.total_episode_count
+    assert len(progress.best_actions) > 0
+
+
+def test_random_agent_worker_pool_raises_if_worker_dies():
+    pool = RandomAgentWorkerPool(make_broken_env, patience=10, nproc=1)
+    with pytest.raises(
+        OSError, match="Random search worker 0 exited with returncode 1"
+    ):
+        pool.close()
+
+
+def test_random_agent_worker_pool_rejects_unpicklable_make_env():
+    with pytest.raises((AttributeError, PicklingError)):
+        RandomAgentWorkerPool(lambda: make_env(), patience=10, nproc=1)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/service:packed_observation."""
+import numpy as np
+import pytest
+
+from compiler_gym.service.packed_observation import (
+    pack_array,
+    pack_observation,
+    supports_packed_encoding,
+    unpack_array,
+)
+from compiler_gym.service.proto import (
+    DoubleList,
+    Int64List,
+    Observation,
+    ObservationSpace,
+    ScalarRange,
+    ScalarRangeList,
+)
+from tests.test_main import main
+
+
+@pytest.mark.parametrize(
+    "array",
+    [
+        np.array([], dtype=np.int64),
+        np.array([1, -2, 3], dtype=np.int64),
+        np.array([0.5, -1.5, 1e10], dtype=np.float64),
+        np.arange(12, dtype=np.int64).reshape(3, 4),
+    ],
+)
+def test_pack_unpack_round_trip(array: np.ndarray):
+    unpacked = unpack_array(pack_array(array))
+    assert unpacked.dtype == array.dtype
+    assert unpacked.shape == array.shape
+    np.testing.assert_array_equal(unpacked, array)
+
+
+def test_unpacked_array_is_read_only():
+    array = unpack_array(pack_array(np.array([1, 2, 3], dtype=np.int64)))
+    with pytest.raises(ValueError):
+        array[0] = 5
+
+
+def test_pack_unsupported_dtype():
+    with pytest.raises(TypeError, match="Unsupported dtype"):
+        pack_array(np.array([1, 2, 3], dtype=np.int32))
+
+
+def test_unpack_truncated_header():
+    with pytest.raises(ValueError, match="truncated"):
+        unpack_array(b"q\x01")
+
+
+def test_unpack_unknown_dtype():
+    data = bytearray(pack_array(np.array([1], dtype=np.int64)))
+    data[0] = ord("x")
+    with pytest.raises(ValueError, match="Unknown packed array dtype"):
+        unpack_array(bytes(data))
+
+
+def test_unpack_size_mismatch():
+    data = pack_array(np.array([1, 2, 3], dtype=np.int64))
+    with pytest.raises(ValueError, match="does not match its shape"):
+        unpack_array(data[:-1])
+
+
+def test_pack_int64_observation():
+    observation = Observation(int64_list=Int64List(value=[1, 2, 3]))
+    pack_observation(observation)
+    assert observation.WhichOneof("value") == "binary_value"
+    np.testing.assert_array_equal(unpack_array(observation.binary_value), [1, 2, 3])
+
+
+def test_pack_double_observation():
+    observation = Observation(double_list=DoubleList(value=[0.5, 1.5]))
+    pack_observation(observation)
+    assert observation.WhichOneof("value") == "binary_value"
+    np.testing.assert_array_equal(unpack_array(observation.binary_value), [0.5, 1.5])
+
+
+def test_pack_string_observation_is_unchanged():
+    observation = Observation(string_value="Hello, world")
+    pack_observation(observation)
+    assert observation.WhichOneof("value") == "string_value"
+    assert observation.string_value == "Hello, world"
+
+
+def test_supports_packed_encoding():
+    ranges = ScalarRangeList(range=[ScalarRange()])
+    assert supports_packed_encoding(ObservationSpace(int64_range_list=ranges))
+    assert supports_packed_encoding(ObservationSpace(double_range_list=ranges))
+    assert not supports_packed_encoding(
+        ObservationSpace(string_size_range=ScalarRange())
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -96,5 +96,36 @@ TEST(BenchmarkCache, evictToCapacityOnMaximumSizeUpdate) {
   ASSERT_EQ(cache.sizeInBytes(), 30);
 }
 
+TEST(BenchmarkCache, hitMissAndEvictionCounts) {
+  BenchmarkCache cache;
+
+  cache.add(makeBenchmarkOfSize("a", 30));
+  ASSERT_NE(cache.get("a"), nullptr);
+  ASSERT_NE(cache.get("a"), nullptr);
+  ASSERT_EQ(cache.get("b"), nullptr);
+  ASSERT_EQ(cache.hitCount(), 2);
+  ASSERT_EQ(cache.missCount(), 1);
+  ASSERT_EQ(cache.evictionCount(), 0);
+
+  cache.setMaxSizeInBytes(10);
+  ASSERT_EQ(cache.evictionCount(), 1);
+}
+
+TEST(BenchmarkCache, addAndGetCountsInsertAsMiss) {
+  BenchmarkCache cache;
+
+  const Benchmark* benchmark = cache.addAndGet(makeBenchmarkOfSize("a", 30));
+  ASSERT_NE(benchmark, nullptr);
+  ASSERT_EQ(benchmark->uri(), "a");
+  ASSERT_EQ(cache.hitCount(), 0);
+  ASSERT_EQ(cache.missCount(), 1);
+
+  // Adding a benchmark that is already cached is a hit.
+  ASSERT_NE(cache.addAndGet(makeBenchmarkOfSize("a", 30)), nullptr);
+  ASSERT_EQ(cache.hitCount(), 1);
+  ASSERT_EQ(cache.missCount(), 1);
+  ASSERT_EQ(cache.size(), 1);
+}
+
 }  // anonymous namespace
 }  // namespace compiler_gym::runtime
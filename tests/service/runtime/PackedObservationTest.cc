@@ -0,0 +1,74 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include <gtest/gtest.h>
+
+#include <cstring>
+
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+#include "compiler_gym/service/runtime/PackedObservation.h"
+
+using namespace ::testing;
+
+namespace compiler_gym::runtime {
+namespace {
+
+TEST(PackedObservation, supportsPackedEncoding) {
+  ObservationSpace space;
+  space.mutable_int64_range_list();
+  EXPECT_TRUE(supportsPackedEncoding(space));
+  space.mutable_double_range_list();
+  EXPECT_TRUE(supportsPackedEncoding(space));
+  space.mutable_string_size_range();
+  EXPECT_FALSE(supportsPackedEncoding(space));
+}
+
+TEST(PackedObservation, packInt64List) {
+  Observation observation;
+  observation.mutable_int64_list()->add_value(1);
+  observation.mutable_int64_list()->add_value(-2);
+  packObservation(observation);
+
+  ASSERT_EQ(observation.value_case(), Observation::ValueCase::kBinaryValue);
+  const std::string& data = observation.binary_value();
+  ASSERT_EQ(data.size(), 8 + 8 + 2 * 8);
+  EXPECT_EQ(data[0], 'q');
+  EXPECT_EQ(data[1], 1);
+
+  uint64_t size;
+  std::memcpy(&size, data.data() + 8, sizeof(size));
+  EXPECT_EQ(size, 2);
+
+  int64_t values[2];
+  std::memcpy(values, data.data() + 16, sizeof(values));
+  EXPECT_EQ(values[0], 1);
+  EXPECT_EQ(values[1], -2);
+}
+
+TEST(PackedObservation, packDoubleList) {
+  Observation observation;
+  observation.mutable_double_list()->add_value(0.5);
+  packObservation(observation);
+
+  ASSERT_EQ(observation.value_case(), Observation::ValueCase::kBinaryValue);
+  const std::string& data = observation.binary_value();
+  ASSERT_EQ(data.size(), 8 + 8 + 8);
+  EXPECT_EQ(data[0], 'd');
+
+  double value;
+  std::memcpy(&value, data.data() + 16, sizeof(value));
+  EXPECT_EQ(value, 0.5);
+}
+
+TEST(PackedObservation, stringObservationIsUnchanged) {
+  Observation observation;
+  observation.set_string_value("Hello, world");
+  packObservation(observation);
+
+  ASSERT_EQ(observation.value_case(), Observation::ValueCase::kStringValue);
+  EXPECT_EQ(observation.string_value(), "Hello, world");
+}
+
+}  // anonymous namespace
+}  // namespace compiler_gym::runtime
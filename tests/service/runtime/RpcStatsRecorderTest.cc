@@ -0,0 +1,64 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include <gtest/gtest.h>
+
+#include "compiler_gym/service/proto/compiler_gym_service.pb.h"
+#include "compiler_gym/service/runtime/RpcStatsRecorder.h"
+
+using namespace ::testing;
+
+namespace compiler_gym::runtime {
+namespace {
+
+TEST(RpcStatsRecorder, noCalls) {
+  RpcStatsRecorder recorder;
+  GetStatsReply reply;
+  recorder.getStats(&reply);
+  EXPECT_EQ(reply.rpc_size(), 0);
+}
+
+TEST(RpcStatsRecorder, record) {
+  RpcStatsRecorder recorder;
+  recorder.record("Step", 0.0002);
+  recorder.record("Step", 0.003);
+  recorder.record("Step", 100);
+  recorder.record("GetSpaces", 0);
+
+  GetStatsReply reply;
+  recorder.getStats(&reply);
+
+  // RPCs are sorted by name.
+  ASSERT_EQ(reply.rpc_size(), 2);
+  EXPECT_EQ(reply.rpc(0).name(), "GetSpaces");
+  const auto& step = reply.rpc(1);
+  EXPECT_EQ(step.name(), "Step");
+  EXPECT_EQ(step.call_count(), 3);
+  EXPECT_DOUBLE_EQ(step.latency_seconds_sum(), 100.0032);
+
+  ASSERT_EQ(step.latency_bucket_upper_bound_size(), kRpcLatencyBucketUpperBounds.size());
+  ASSERT_EQ(step.latency_bucket_count_size(), kRpcLatencyBucketUpperBounds.size());
+  // Bucket counts are cumulative, and calls slower than the largest upper
+  // bound are only counted by call_count.
+  EXPECT_EQ(step.latency_bucket_count(0), 0);
+  EXPECT_EQ(step.latency_bucket_count(1), 1);
+  EXPECT_EQ(step.latency_bucket_count(5), 2);
+  EXPECT_EQ(step.latency_bucket_count(step.latency_bucket_count_size() - 1), 2);
+}
+
+TEST(RpcStatsRecorder, timer) {
+  RpcStatsRecorder recorder;
+  { const auto timer = recorder.time("Step"); }
+
+  GetStatsReply reply;
+  recorder.getStats(&reply);
+  ASSERT_EQ(reply.rpc_size(), 1);
+  EXPECT_EQ(reply.rpc(0).name(), "Step");
+  EXPECT_EQ(reply.rpc(0).call_count(), 1);
+}
+
+TEST(RpcStatsRecorder, getResidentSetSizeInBytes) { EXPECT_GE(getResidentSetSizeInBytes(), 0); }
+
+}  // anonymous namespace
+}  // namespace compiler_gym::runtime
@@ -0,0 +1,143 @@
+// Copyright (c) Facebook, Inc. and its affiliates.
+//
+// This source code is licensed under the MIT license found in the
+// LICENSE file in the root directory of this source tree.
+#include <fmt/format.h>
+#include <gtest/gtest.h>
+
+#include "boost/filesystem.hpp"
+#include "compiler_gym/service/CompilationSession.h"
+#include "compiler_gym/service/runtime/SnapshotCache.h"
+
+using namespace ::testing;
+
+namespace fs = boost::filesystem;
+
+namespace compiler_gym::runtime {
+namespace {
+
+// A minimal session for storing in the cache.
+class MockSession final : public CompilationSession {
+ public:
+  MockSession(const fs::path& workingDirectory) : CompilationSession(workingDirectory) {}
+
+  std::vector<ActionSpace> getActionSpaces() const final override { return {}; }
+
+  std::vector<ObservationSpace> getObservationSpaces() const final override { return {}; }
+
+  grpc::Status init(const ActionSpace& actionSpace, const Benchmark& benchmark) final override {
+    return grpc::Status::OK;
+  }
+
+  grpc::Status applyAction(const Action& action, bool& endOfEpisode,
+                           std::optional<ActionSpace>& newActionSpace,
+                           bool& actionHadNoEffect) final override {
+    return grpc::Status::OK;
+  }
+
+  grpc::Status computeObservation(const ObservationSpace& observationSpace,
+                                  Observation& observation) final override {
+    return grpc::Status::OK;
+  }
+};
+
+class SnapshotCacheTest : public Test {
+ protected:
+  void SetUp() override {
+    spillDirectory_ = fs::unique_path(fs::temp_directory_path() / "snapshot-cache-test-%%%%-%%%%");
+  }
+
+  void TearDown() override { fs::remove_all(spillDirectory_); }
+
+  fs::path spillDirectory_;
+};
+
+TEST_F(SnapshotCacheTest, getState) {
+  SnapshotCache cache(spillDirectory_);
+  const uint64_t id = cache.add(std::string("abc"));
+  ASSERT_EQ(cache.size(), 1);
+  ASSERT_EQ(cache.sizeInBytes(), 3);
+
+  CompilationSession* session;
+  std::string state;
+  ASSERT_TRUE(cache.get(id, &session, &state).ok());
+  EXPECT_EQ(session, nullptr);
+  EXPECT_EQ(state, "abc");
+}
+
+TEST_F(SnapshotCacheTest, getSession) {
+  SnapshotCache cache(spillDirectory_);
+  auto snapshot = std::make_unique<MockSession>(spillDirectory_);
+  CompilationSession* expected = snapshot.get();
+  const uint64_t id = cache.add(std::move(snapshot));
+  EXPECT_EQ(cache.sizeInBytes(), 0);
+
+  CompilationSession* session;
+  std::string state;
+  ASSERT_TRUE(cache.get(id, &session, &state).ok());
+  EXPECT_EQ(session, expected);
+}
+
+TEST_F(SnapshotCacheTest, getNotFound) {
+  SnapshotCache cache(spillDirectory_);
+  CompilationSession* session;
+  std::string state;
+  EXPECT_EQ(cache.get(0, &session, &state).error_code(), grpc::StatusCode::NOT_FOUND);
+}
+
+TEST_F(SnapshotCacheTest, release) {
+  SnapshotCache cache(spillDirectory_);
+  const uint64_t a = cache.add(std::string("abc"));
+  const uint64_t b = cache.add(std::make_unique<MockSession>(spillDirectory_));
+
+  EXPECT_TRUE(cache.release(a));
+  EXPECT_TRUE(cache.release(b));
+  EXPECT_FALSE(cache.release(a));
+  EXPECT_EQ(cache.size(), 0);
+  EXPECT_EQ(cache.sizeInBytes(), 0);
+}
+
+TEST_F(SnapshotCacheTest, spillLeastRecentlyUsed) {
+  SnapshotCache cache(spillDirectory_, /*maxSizeInBytes=*/10);
+  const uint64_t a = cache.add(std::string(4, 'a'));
+  const uint64_t b = cache.add(std::string(4, 'b'));
+
+  // Use a so that b is the least recently used.
+  CompilationSession* session;
+  std::string state;
+  ASSERT_TRUE(cache.get(a, &session, &state).ok());
+
+  cache.add(std::string(4, 'c'));
+  EXPECT_EQ(cache.size(), 3);
+  EXPECT_EQ(cache.spilledCount(), 1);
+  EXPECT_EQ(cache.sizeInBytes(), 8);
+  EXPECT_TRUE(fs::is_regular_file(spillDirectory_ / fmt::format("{}.snapshot", b)));
+
+  // A spilled state can still be read.
+  ASSERT_TRUE(cache.get(b, &session, &state).ok());
+  EXPECT_EQ(state, std::string(4, 'b'));
+}
+
+TEST_F(SnapshotCacheTest, releaseSpilledState) {
+  SnapshotCache cache(spillDirectory_, /*maxSizeInBytes=*/0);
+  const uint64_t id = cache.add(std::string("abc"));
+  ASSERT_EQ(cache.spilledCount(), 1);
+  ASSERT_TRUE(fs::is_regular_file(spillDirectory_ / fmt::format("{}.snapshot", id)));
+
+  EXPECT_TRUE(cache.release(id));
+  EXPECT_EQ(cache.spilledCount(), 0);
+  EXPECT_FALSE(fs::exists(spillDirectory_ / fmt::format("{}.snapshot", id)));
+}
+
+TEST_F(SnapshotCacheTest, setMaxSizeInBytesSpills) {
+  SnapshotCache cache(spillDirectory_);
+  cache.add(std::string(4, 'a'));
+  cache.add(std::string(4, 'b'));
+
+  cache.setMaxSizeInBytes(4);
+  EXPECT_EQ(cache.spilledCount(), 1);
+  EXPECT_EQ(cache.sizeInBytes(), 4);
+}
+
+}  // anonymous namespace
+}  // namespace compiler_gym::runtime
@@ -140,5 +140,38 @@ def test_evict_to_capacity_on_maximum_size_update(mocker):
     assert cache.size_in_bytes == 30
 
 
+def test_hit_miss_and_eviction_counts():
+    cache = BenchmarkCache(max_size_in_bytes=100)
+
+    cache["a"] = make_benchmark_of_size(30)
+    cache["a"]
+    cache["a"]
+    with pytest.raises(KeyError):
+        cache["b"]
+    assert "b" not in cache
+    assert cache.hit_count == 2
+    assert cache.miss_count == 1
+    assert cache.eviction_count == 0
+
+    cache.max_size_in_bytes = 10
+    assert cache.eviction_count == 1
+
+
+def test_add_and_get_counts_insert_as_miss():
+    cache = BenchmarkCache()
+
+    benchmark = make_benchmark_of_size(30)
+    benchmark.uri = "a"
+    assert cache.add_and_get(benchmark) is benchmark
+    assert cache.hit_count == 0
+    assert cache.miss_count == 1
+
+    # Adding a benchmark that is already cached is a hit.
+    assert cache.add_and_get(benchmark) is benchmark
+    assert cache.hit_count == 1
+    assert cache.miss_count == 1
+    assert cache.size == 1
+
+
 if __name__ == "__main__":
     main()
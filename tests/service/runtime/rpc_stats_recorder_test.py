@@ -0,0 +1,64 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/service/runtime:rpc_stats_recorder."""
+import pytest
+
+from compiler_gym.service.proto import GetStatsReply
+from compiler_gym.service.runtime.rpc_stats_recorder import (
+    RPC_LATENCY_BUCKET_UPPER_BOUNDS,
+    RpcStatsRecorder,
+    get_resident_set_size_in_bytes,
+)
+from tests.test_main import main
+
+
+def test_no_calls():
+    reply = GetStatsReply()
+    RpcStatsRecorder().get_stats(reply)
+    assert not reply.rpc
+
+
+def test_record():
+    recorder = RpcStatsRecorder()
+    recorder.record("Step", 0.0002)
+    recorder.record("Step", 0.003)
+    recorder.record("Step", 100)
+    recorder.record("GetSpaces", 0)
+
+    reply = GetStatsReply()
+    recorder.get_stats(reply)
+
+    # RPCs are sorted by name.
+    assert [rpc.name for rpc in reply.rpc] == ["GetSpaces", "Step"]
+    step = reply.rpc[1]
+    assert step.call_count == 3
+    assert step.latency_seconds_sum == pytest.approx(100.0032)
+    assert list(step.latency_bucket_upper_bound) == RPC_LATENCY_BUCKET_UPPER_BOUNDS
+    # Bucket counts are cumulative, and calls slower than the largest upper
+    # bound are only counted by call_count.
+    assert step.latency_bucket_count[0] == 0
+    assert step.latency_bucket_count[1] == 1
+    assert step.latency_bucket_count[5] == 2
+    assert step.latency_bucket_count[-1] == 2
+
+
+def test_time():
+    recorder = RpcStatsRecorder()
+    with pytest.raises(ValueError):
+        with recorder.time("Step"):
+            raise ValueError("Calls that raise an error are recorded")
+
+    reply = GetStatsReply()
+    recorder.get_stats(reply)
+    assert reply.rpc[0].name == "Step"
+    assert reply.rpc[0].call_count == 1
+
+
+def test_get_resident_set_size_in_bytes():
+    assert get_resident_set_size_in_bytes() >= 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/service:service_pool."""
+import os
+
+import gym
+import pytest
+
+import compiler_gym.envs  # noqa Register LLVM environments.
+from compiler_gym.envs.llvm import LLVM_SERVICE_BINARY
+from compiler_gym.service import CompilerGymServiceConnection, ServicePool
+from compiler_gym.service.service_pool import _cpu_groups
+from tests.test_main import main
+
+
+@pytest.fixture(scope="function")
+def pool() -> ServicePool:
+    """Yields a pool of two LLVM services."""
+    with ServicePool(LLVM_SERVICE_BINARY, size=2) as pool:
+        yield pool
+
+
+def test_cpu_groups():
+    assert _cpu_groups([0, 1, 2, 3, 4], 2) == [[0, 1, 2], [3, 4]]
+    assert _cpu_groups([0, 1, 2, 3], 4) == [[0], [1], [2], [3]]
+    assert _cpu_groups([0, 1], 3) == [[0], [1], [0]]
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError, match="Pool size must be positive"):
+        ServicePool(LLVM_SERVICE_BINARY, size=-1)
+
+
+def test_size_with_urls():
+    with pytest.raises(ValueError, match="Pool size cannot be set for service URLs"):
+        ServicePool("localhost:8080", size=2)
+
+
+def test_envs_are_assigned_to_least_loaded_service(pool: ServicePool):
+    envs = [gym.make("llvm-v0", service_pool=pool) for _ in range(4)]
+    try:
+        assert pool.loads == [2, 2]
+        assert envs[0].service is not envs[1].service
+    finally:
+        for env in envs:
+            env.close()
+    assert pool.loads == [0, 0]
+    # Closing the environments does not close the services.
+    assert not any(member.closed for member in pool.members)
+
+
+def test_fork_uses_parent_service(pool: ServicePool):
+    env = gym.make("llvm-v0", service_pool=pool)
+    try:
+        env.reset("cbench-v1/crc32")
+        fkd = env.fork()
+        try:
+            assert fkd.service is env.service
+            assert sorted(pool.loads) == [0, 2]
+            assert fkd.state == env.state
+        finally:
+            fkd.close()
+    finally:
+        env.close()
+
+
+def test_crashed_service_is_restarted(pool: ServicePool):
+    for member in pool.members:
+        member.connection.process.terminate()
+        member.connection.process.communicate()
+
+    env = gym.make("llvm-v0", service_pool=pool)
+    try:
+        env.reset("cbench-v1/crc32")
+        assert env.service.connection.process.poll() is None
+    finally:
+        env.close()
+
+
+def test_acquire_connection_restarts_closed_service(pool: ServicePool):
+    member = pool.members[0]
+    member.close()
+
+    assert pool.acquire(member) is member
+    try:
+        assert not member.closed
+        assert member.connection.process.poll() is None
+    finally:
+        pool.release(member)
+
+
+def test_reset_error_does_not_close_pooled_service(pool: ServicePool, mocker):
+    call = CompilerGymServiceConnection.__call__
+    failed = []
+
+    def fail_first_start_session(self, stub_method, request, *args, **kwargs):
+        if stub_method == self.stub.StartSession and not failed:
+            failed.append(self)
+            raise TimeoutError("Injected error")
+        return call(self, stub_method, request, *args, **kwargs)
+
+    env = gym.make("llvm-v0", service_pool=pool)
+    try:
+        mocker.patch.object(
+            CompilerGymServiceConnection,
+            "__call__",
+            autospec=True,
+            side_effect=fail_first_start_session,
+        )
+        env.reset("cbench-v1/crc32")
+        assert len(failed) == 1
+        # The service that failed is shared, so it is not closed.
+        assert not failed[0].closed
+        assert sorted(pool.loads) == [0, 1]
+    finally:
+        env.close()
+
+
+def test_suspect_service_is_restarted_when_unused(pool: ServicePool):
+    member = pool.acquire(pool.members[0])
+    pool.acquire(member)
+    pid = member.connection.process.pid
+
+    pool.release(member, suspect=True)
+    # The service is still in use, so it is not restarted.
+    assert member.connection.process.pid == pid
+    # A suspect service is not assigned new environments.
+    other = pool.acquire()
+    assert other is pool.members[1]
+    pool.release(other)
+
+    pool.release(member)
+    assert pool.loads == [0, 0]
+    assert member.connection.process.pid != pid
+    assert member.connection.process.poll() is None
+    # Once restarted, the service is no longer suspect.
+    assert pool.acquire() is member
+    pool.release(member)
+
+
+def test_step_timeout_restarts_pooled_service(pool: ServicePool, mocker):
+    env = gym.make("llvm-v0", service_pool=pool)
+    try:
+        env.reset("cbench-v1/crc32")
+        service = env.service
+        pid = service.connection.process.pid
+        mocker.patch.object(
+            CompilerGymServiceConnection,
+            "__call__",
+            autospec=True,
+            side_effect=TimeoutError("Injected error"),
+        )
+        _, _, done, info = env.step(0)
+        assert done
+        assert info["error_type"] == "TimeoutError"
+        assert env.service is None
+        assert service.connection.process.pid != pid
+    finally:
+        env.close()
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_getaffinity"), reason="Requires sched_getaffinity()"
+)
+def test_services_are_pinned_to_cpus(pool: ServicePool):
+    groups = _cpu_groups(sorted(os.sched_getaffinity(0)), 2)
+    for member, group in zip(pool.members, groups):
+        pid = member.connection.process.pid
+        assert sorted(os.sched_getaffinity(pid)) == group
+
+
+def test_unmanaged_services(pool: ServicePool):
+    urls = [member.connection.url for member in pool.members]
+    with ServicePool(urls) as unmanaged:
+        env = gym.make("llvm-v0", service_pool=unmanaged)
+        try:
+            env.reset("cbench-v1/crc32")
+            assert unmanaged.loads == [1, 0]
+        finally:
+            env.close()
+    # Closing an unmanaged pool does not terminate the services.
+    for member in pool.members:
+        assert member.connection.process.poll() is None
+
+
+if __name__ == "__main__":
+    main()
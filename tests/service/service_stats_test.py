@@ -0,0 +1,118 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/service:service_stats."""
+from pathlib import Path
+
+from compiler_gym.service.proto import BenchmarkCacheStats, GetStatsReply, RpcStats
+from compiler_gym.service.service_stats import (
+    ServiceStatsExporter,
+    benchmark_cache_hit_rate,
+    service_stats_to_prometheus,
+    write_prometheus_textfile,
+)
+from tests.test_main import main
+
+
+def make_stats() -> GetStatsReply:
+    return GetStatsReply(
+        session_count=2,
+        snapshot_count=1,
+        benchmark_cache=BenchmarkCacheStats(
+            size=3,
+            size_in_bytes=1024,
+            max_size_in_bytes=4096,
+            hit_count=3,
+            miss_count=1,
+        ),
+        resident_set_size_bytes=1000000,
+        uptime_seconds=10.5,
+        rpc=[
+            RpcStats(
+                name="Step",
+                call_count=3,
+                latency_seconds_sum=0.5,
+                latency_bucket_upper_bound=[0.001, 1],
+                latency_bucket_count=[1, 2],
+            )
+        ],
+        compiler_stats={"llvm.benchmark_factory.loaded_bitcode_bytes": 512},
+    )
+
+
+def test_benchmark_cache_hit_rate():
+    assert benchmark_cache_hit_rate(make_stats()) == 0.75
+
+
+def test_benchmark_cache_hit_rate_no_lookups():
+    assert benchmark_cache_hit_rate(GetStatsReply()) == 0
+
+
+def test_service_stats_to_prometheus():
+    text = service_stats_to_prometheus(make_stats(), labels={"service": "llvm"})
+    print(text)  # For debugging in case of error.
+    lines = text.splitlines()
+
+    assert "# TYPE compiler_gym_service_sessions gauge" in lines
+    assert 'compiler_gym_service_sessions{service="llvm"} 2' in lines
+    assert 'compiler_gym_service_benchmark_cache_hits_total{service="llvm"} 3' in lines
+    assert (
+        'compiler_gym_service_benchmark_cache_hit_ratio{service="llvm"} 0.75' in lines
+    )
+
+    assert "# TYPE compiler_gym_service_rpc_latency_seconds histogram" in lines
+    assert (
+        "compiler_gym_service_rpc_latency_seconds_bucket"
+        '{service="llvm",rpc="Step",le="0.001"} 1'
+    ) in lines
+    assert (
+        "compiler_gym_service_rpc_latency_seconds_bucket"
+        '{service="llvm",rpc="Step",le="+Inf"} 3'
+    ) in lines
+    assert (
+        'compiler_gym_service_rpc_latency_seconds_count{service="llvm",rpc="Step"} 3'
+        in lines
+    )
+
+    assert (
+        "compiler_gym_service_llvm_benchmark_factory_loaded_bitcode_bytes"
+        '{service="llvm"} 512.0'
+    ) in lines
+
+
+def test_service_stats_to_prometheus_escapes_labels():
+    text = service_stats_to_prometheus(GetStatsReply(), labels={"a": 'b"c\\d'})
+    assert 'compiler_gym_service_sessions{a="b\\"c\\\\d"} 0' in text.splitlines()
+
+
+def test_write_prometheus_textfile(tmp_path: Path):
+    path = tmp_path / "stats.prom"
+    write_prometheus_textfile(make_stats(), path)
+    assert path.read_text() == service_stats_to_prometheus(make_stats())
+    # Only the output file remains.
+    assert list(tmp_path.iterdir()) == [path]
+
+
+class MockService:
+    """A mock service connection for use by ServiceStatsExporter."""
+
+    def __init__(self):
+        self.call_count = 0
+
+    def get_stats(self):
+        self.call_count += 1
+        return make_stats()
+
+
+def test_service_stats_exporter(tmp_path: Path):
+    path = tmp_path / "stats.prom"
+    service = MockService()
+    with ServiceStatsExporter(service, path, interval_seconds=60):
+        pass
+    assert service.call_count == 1
+    assert path.read_text() == service_stats_to_prometheus(make_stats())
+
+
+if __name__ == "__main__":
+    main()
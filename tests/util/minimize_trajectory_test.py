@@ -56,6 +56,34 @@ class MockEnv:
         return None, None, False, {}
 
 
+class MockSnapshotEnv(MockEnv):
+    """A mock environment that supports snapshots and forks, and counts the
+    number of actions applied.
+    """
+
+    def __init__(self, actions: List[int], validate=lambda env: True):
+        super().__init__(actions, validate)
+        self.applied_action_count = 0
+
+    def step(self, actions):
+        self.applied_action_count += len(actions)
+        return super().step(actions)
+
+    def snapshot(self):
+        return self.actions.copy()
+
+    def restore(self, snapshot):
+        self.actions = snapshot.copy()
+
+    def fork(self):
+        env = MockSnapshotEnv(self.original_trajectory)
+        env.actions = self.actions.copy()
+        return env
+
+    def close(self):
+        pass
+
+
 def make_hypothesis(val: int):
     """Create a hypothesis that checks if `val` is in actions."""
 
@@ -94,6 +122,48 @@ def test_reverse_bisect(n: int):
     assert env.actions == list(range(n, 10))
 
 
+@pytest.mark.parametrize("parallelism", [1, 2, 3])
+@pytest.mark.parametrize("n", range(10))
+def test_k_ary_bisect(n: int, parallelism: int):
+    """Test that bisection with parallel split points chops off the tail."""
+    env = MockSnapshotEnv(actions=list(range(10)))
+    list(
+        mt.bisect_trajectory(
+            env, make_hypothesis(n), parallelism=parallelism, snapshot_interval=3
+        )
+    )
+    assert env.actions == list(range(n + 1))
+
+
+@pytest.mark.parametrize("parallelism", [1, 3])
+@pytest.mark.parametrize("n", range(10))
+def test_reverse_k_ary_bisect(n: int, parallelism: int):
+    """Test that reverse bisection with parallel split points chops off the
+    prefix.
+    """
+    env = MockSnapshotEnv(actions=list(range(10)))
+    list(
+        mt.bisect_trajectory(
+            env, make_hypothesis(n), reverse=True, parallelism=parallelism
+        )
+    )
+    assert env.actions == list(range(n, 10))
+
+
+def test_bisect_resumes_from_cached_prefix():
+    """Test that bisection applies fewer actions when resuming from cached
+    prefix states.
+    """
+    replay_env = MockSnapshotEnv(actions=list(range(100)))
+    list(mt.bisect_trajectory(replay_env, make_hypothesis(80), snapshot_interval=0))
+
+    cached_env = MockSnapshotEnv(actions=list(range(100)))
+    list(mt.bisect_trajectory(cached_env, make_hypothesis(80), snapshot_interval=10))
+
+    assert cached_env.actions == replay_env.actions == list(range(81))
+    assert cached_env.applied_action_count < replay_env.applied_action_count / 2
+
+
 def test_minimize_trajectory_iteratively():
     """Test that reverse bisection chops off the prefix."""
     env = MockEnv(actions=list(range(10)))
@@ -120,6 +190,24 @@ def test_minimize_trajectory_iteratively_no_effect():
     assert env.actions == minimized
 
 
+@pytest.mark.parametrize("parallelism", [1, 4])
+def test_minimize_trajectory_iteratively_with_snapshots(parallelism: int):
+    """Test iterative minimization resuming from cached prefix states."""
+    env = MockSnapshotEnv(actions=list(range(30)))
+
+    minimized = [0, 3, 4, 5, 8, 9, 21, 29]
+
+    def hypothesis(env):
+        return all(x in env.actions for x in minimized)
+
+    list(
+        mt.minimize_trajectory_iteratively(
+            env, hypothesis, parallelism=parallelism, snapshot_interval=4
+        )
+    )
+    assert env.actions == minimized
+
+
 def test_random_minimization():
     """Test that random minimization reduces trajectory."""
     env = MockEnv(actions=list(range(10)))
@@ -172,5 +260,29 @@ def test_minimize_trajectory_iteratively_llvm_crc32(env):
     ]
 
 
+def test_bisect_trajectory_parallel_llvm_crc32(env):
+    """Test k-ary bisection on forks of a real environment."""
+    env.reset(benchmark="cbench-v1/crc32")
+    env.step(
+        [
+            env.action_space["-mem2reg"],
+            env.action_space["-gvn"],
+            env.action_space["-reg2mem"],
+            env.action_space["-instcombine"],
+            env.action_space["-simplifycfg"],
+        ]
+    )
+
+    def hypothesis(env):
+        return env.action_space["-reg2mem"] in env.actions
+
+    list(mt.bisect_trajectory(env, hypothesis, parallelism=2, snapshot_interval=2))
+    assert env.actions == [
+        env.action_space["-mem2reg"],
+        env.action_space["-gvn"],
+        env.action_space["-reg2mem"],
+    ]
+
+
 if __name__ == "__main__":
     main()
@@ -7,6 +7,7 @@ import gym
 import pytest
 
 from compiler_gym import CompilerEnvState, validate_states
+from compiler_gym.validate import _group_states_by_benchmark, _split_groups
 from tests.test_main import main
 
 
@@ -30,5 +31,129 @@ def test_validate_states_lambda_callback(inorder, nproc):
     assert results[0].okay()
 
 
+@pytest.mark.parametrize("nproc", (1, 2))
+def test_validate_states_reuses_environments(nproc):
+    states = [
+        CompilerEnvState(
+            benchmark=f"benchmark://cbench-v1/{benchmark}",
+            walltime=1,
+            commandline=commandline,
+        )
+        for benchmark in ["crc32", "qsort", "crc32"]
+        for commandline in [
+            "opt  input.bc -o output.bc",
+            "opt -mem2reg input.bc -o output.bc",
+        ]
+    ]
+
+    envs = []
+
+    def make_env():
+        env = gym.make("llvm-v0")
+        envs.append(env)
+        return env
+
+    results = list(
+        validate_states(make_env=make_env, states=states, inorder=True, nproc=nproc)
+    )
+    assert [r.state for r in results] == states
+    assert all(r.okay() for r in results)
+    assert len(envs) == nproc
+
+
+def test_group_states_by_benchmark():
+    a = CompilerEnvState(
+        benchmark="benchmark://cbench-v1/crc32", walltime=1, commandline="opt -a -b"
+    )
+    b = CompilerEnvState(
+        benchmark="benchmark://cbench-v1/qsort",
+        walltime=1,
+        commandline="opt -a -b -c -d -e -f -g -h",
+    )
+    groups = _group_states_by_benchmark([a, b, a])
+    # The most expensive group is scheduled first.
+    assert groups == [[(1, b)], [(0, a), (2, a)]]
+
+
+def test_split_groups():
+    states = [
+        CompilerEnvState(
+            benchmark="benchmark://cbench-v1/crc32",
+            walltime=1,
+            commandline=f"opt -a{i} input.bc -o output.bc",
+        )
+        for i in range(8)
+    ]
+    groups = _group_states_by_benchmark(states)
+    assert len(groups) == 1
+
+    # A single benchmark is split so that every worker has states to validate.
+    chunks = _split_groups(groups, 4)
+    assert len(chunks) == 4
+    assert sorted(i for chunk in chunks for i, _ in chunk) == list(range(8))
+
+
+def test_split_groups_small_groups_are_not_split():
+    a = CompilerEnvState(
+        benchmark="benchmark://cbench-v1/crc32", walltime=1, commandline="opt -a -b"
+    )
+    b = CompilerEnvState(
+        benchmark="benchmark://cbench-v1/qsort", walltime=1, commandline="opt -a -b"
+    )
+    groups = _group_states_by_benchmark([a, b])
+    assert _split_groups(groups, 2) == groups
+
+
+@pytest.mark.parametrize("nproc", (1, 2))
+def test_validate_states_share_prefixes(nproc):
+    env = gym.make("llvm-ic-v0")
+    try:
+        states = []
+        for benchmark in ["cbench-v1/crc32", "cbench-v1/qsort"]:
+            env.reset(benchmark=benchmark)
+            states.append(env.state)
+            for flag in ["-mem2reg", "-simplifycfg"]:
+                env.step(env.action_space.flags.index(flag))
+                states.append(env.state)
+            # Branch from the shared prefix.
+            env.reset(benchmark=benchmark)
+            env.step(env.action_space.flags.index("-mem2reg"))
+            env.step(env.action_space.flags.index("-reg2mem"))
+            states.append(env.state)
+    finally:
+        env.close()
+
+    results = list(
+        validate_states(
+            make_env=lambda: gym.make("llvm-ic-v0"),
+            states=states,
+            inorder=True,
+            nproc=nproc,
+            share_prefixes=True,
+        )
+    )
+    assert [r.state for r in results] == states
+    assert all(r.okay() for r in results)
+    assert all(r.reward_validated for r in results)
+
+
+def test_validate_states_share_prefixes_replay_failed():
+    state = CompilerEnvState(
+        benchmark="benchmark://cbench-v1/crc32",
+        walltime=1,
+        commandline="opt -invalid-pass input.bc -o output.bc",
+    )
+    results = list(
+        validate_states(
+            make_env=lambda: gym.make("llvm-v0"),
+            states=[state],
+            nproc=1,
+            share_prefixes=True,
+        )
+    )
+    assert len(results) == 1
+    assert results[0].actions_replay_failed
+
+
 if __name__ == "__main__":
     main()
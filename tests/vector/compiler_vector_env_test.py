@@ -0,0 +1,194 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+"""Unit tests for //compiler_gym/vector."""
+import gym
+import numpy as np
+import pytest
+from gym.spaces import Box, Discrete
+
+from compiler_gym.vector import CompilerVectorEnv
+from tests.test_main import main
+
+pytest_plugins = ["tests.pytest_plugins.llvm"]
+
+
+class MockEnv:
+    """A mock environment whose observation is the number of steps taken in
+    the current episode, and whose episodes end after three steps.
+    """
+
+    observation_space = Box(low=0, high=10, shape=(2,), dtype=np.int64)
+    action_space = Discrete(2)
+
+    def __init__(self, forked_from=None):
+        self.forked_from = forked_from
+        self.steps = 0
+        self.closed = False
+
+    def reset(self):
+        self.steps = 0
+        return np.array([self.steps, 0], dtype=np.int64)
+
+    def step(self, action):
+        self.steps += 1
+        observation = np.array([self.steps, action], dtype=np.int64)
+        return observation, 1.0, self.steps == 3, {}
+
+    def fork(self):
+        return MockEnv(forked_from=self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_invalid_num_envs():
+    with pytest.raises(ValueError, match="Number of environments must be positive"):
+        CompilerVectorEnv(MockEnv, n=0)
+
+
+def test_invalid_num_services():
+    with pytest.raises(ValueError, match="Number of services"):
+        CompilerVectorEnv(MockEnv, n=2, num_services=3)
+
+
+def test_sub_environments_are_forked():
+    with CompilerVectorEnv(MockEnv, n=5, num_services=2) as env:
+        assert len(env) == 5
+        assert env.envs[0].forked_from is None
+        assert env.envs[1].forked_from is None
+        assert env.envs[2].forked_from is env.envs[0]
+        assert env.envs[3].forked_from is env.envs[1]
+        assert env.envs[4].forked_from is env.envs[0]
+
+
+def test_close_closes_sub_environments():
+    env = CompilerVectorEnv(MockEnv, n=3)
+    env.close()
+    assert all(e.closed for e in env.envs)
+
+
+def test_stacked_observations():
+    with CompilerVectorEnv(MockEnv, n=3) as env:
+        observations = env.reset()
+        assert observations.shape == (3, 2)
+        assert observations.dtype == np.int64
+
+        observations, rewards, dones, infos = env.step([0, 1, 0])
+        np.testing.assert_array_equal(observations, [[1, 0], [1, 1], [1, 0]])
+        np.testing.assert_array_equal(rewards, [1.0, 1.0, 1.0])
+        np.testing.assert_array_equal(dones, [False, False, False])
+        assert infos == [{}, {}, {}]
+
+
+def test_observations_are_copied():
+    with CompilerVectorEnv(MockEnv, n=2) as env:
+        a = env.reset()
+        b, _, _, _ = env.step([1, 1])
+        assert a is not b
+        np.testing.assert_array_equal(a, [[0, 0], [0, 0]])
+
+
+def test_observations_are_not_copied():
+    with CompilerVectorEnv(MockEnv, n=2, copy=False) as env:
+        a = env.reset()
+        b, _, _, _ = env.step([1, 1])
+        assert a is b
+
+
+def test_auto_reset():
+    with CompilerVectorEnv(MockEnv, n=2) as env:
+        env.reset()
+        env.step([0, 0])
+        env.step([0, 0])
+        observations, _, dones, infos = env.step([1, 1])
+        np.testing.assert_array_equal(dones, [True, True])
+        np.testing.assert_array_equal(observations, [[0, 0], [0, 0]])
+        np.testing.assert_array_equal(infos[0]["terminal_observation"], [3, 1])
+
+
+def test_wrong_number_of_actions():
+    with CompilerVectorEnv(MockEnv, n=2) as env:
+        env.reset()
+        with pytest.raises(ValueError, match="Expected 2 actions, received 1"):
+            env.step([0])
+
+
+def test_llvm_sub_environments_share_service():
+    def make_env():
+        return gym.make("llvm-autophase-ic-v0", benchmark="cbench-v1/crc32")
+
+    with CompilerVectorEnv(make_env, n=3) as env:
+        assert env.envs[1].service is env.envs[0].service
+        assert env.envs[2].service is env.envs[0].service
+
+        observations = env.reset()
+        assert observations.shape == (3, 56)
+
+        observations, rewards, dones, infos = env.step([0, 1, 2])
+        assert observations.shape == (3, 56)
+        assert rewards.shape == (3,)
+        assert dones.shape == (3,)
+        assert len(infos) == 3
+
+
+def test_llvm_steps_are_batched_per_service(mocker):
+    def make_env():
+        return gym.make("llvm-autophase-ic-v0", benchmark="cbench-v1/crc32")
+
+    with CompilerVectorEnv(make_env, n=4, num_services=2) as env:
+        env.reset()
+        services = [env.envs[0].service, env.envs[1].service]
+        step_batch = [mocker.spy(service, "step_batch") for service in services]
+
+        observations, rewards, dones, _ = env.step([0, 1, 2, 3])
+        assert observations.shape == (4, 56)
+        assert rewards.shape == (4,)
+        assert not dones.any()
+
+        # One StepBatch() call per service, each containing two steps.
+        for spy in step_batch:
+            assert spy.call_count == 1
+            assert len(spy.call_args[0][0]) == 2
+        assert env.envs[0].actions == [0]
+        assert env.envs[3].actions == [3]
+
+
+def test_llvm_batched_step_matches_unbatched_step():
+    def make_env():
+        return gym.make("llvm-autophase-ic-v0", benchmark="cbench-v1/crc32")
+
+    with CompilerVectorEnv(make_env, n=2) as env, make_env() as reference:
+        env.reset()
+        reference.reset()
+        observations, rewards, _, _ = env.step([5, 5])
+        observation, reward, _, _ = reference.step(5)
+
+        np.testing.assert_array_equal(observations[0], observation)
+        np.testing.assert_array_equal(observations[1], observation)
+        assert rewards[0] == pytest.approx(reward)
+
+
+def test_llvm_falls_back_to_step_without_step_batch(mocker):
+    def make_env():
+        return gym.make("llvm-autophase-ic-v0", benchmark="cbench-v1/crc32")
+
+    with CompilerVectorEnv(make_env, n=2) as env:
+        env.reset()
+        step_batch = mocker.patch.object(
+            env.envs[0].service, "step_batch", side_effect=NotImplementedError
+        )
+
+        observations, _, dones, _ = env.step([0, 1])
+        assert observations.shape == (2, 56)
+        assert not dones.any()
+        assert env.envs[1].actions == [1]
+
+        # The service is not asked again.
+        env.step([0, 1])
+        assert step_batch.call_count == 1
+
+
+if __name__ == "__main__":
+    main()
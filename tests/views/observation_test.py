@@ -122,5 +122,166 @@ def test_observed_value_types():
     assert mock.called_observation_spaces == ["ir", "dfeat", "features", "binary"]
 
 
+def test_derived_space_default_value_is_lazy():
+    spaces = [
+        ObservationSpace(
+            name="ir",
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+        ),
+    ]
+    observation = ObservationView(MockGetObservation(), spaces)
+
+    calls = []
+
+    def lazy_default_value():
+        calls.append(None)
+        return 5
+
+    observation.add_derived_space(
+        id="ir_len",
+        base_id="ir",
+        translate=len,
+        lazy_default_value=lazy_default_value,
+    )
+    assert not calls
+    assert observation.spaces["ir_len"].default_value == 5
+    assert observation.spaces["ir_len"].default_value == 5
+    assert len(calls) == 1
+
+    # A derived space with no default value translates the default value of
+    # the base space.
+    observation.add_derived_space(id="ir_len2", base_id="ir", translate=len)
+    assert observation.spaces["ir_len2"].default_value == 0
+
+
+class MockRawStep:
+    """Mock for the raw_step callback of ObservationView that records the
+    spaces requested in each call.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, actions, observations, rewards):
+        assert not actions
+        assert not rewards
+        self.calls.append([o.id for o in observations])
+        return [f"{o.id}-value" for o in observations], [], False, {}
+
+
+def make_string_spaces(deterministic: bool):
+    return [
+        ObservationSpace(
+            name=name,
+            string_size_range=ScalarRange(min=ScalarLimit(value=0)),
+            deterministic=deterministic,
+        )
+        for name in ["a", "b", "c"]
+    ]
+
+
+def test_get_many_single_round_trip():
+    mock = MockRawStep()
+    observation = ObservationView(mock, make_string_spaces(deterministic=False))
+    assert observation.get_many(["a", "c", "a"]) == ["a-value", "c-value", "a-value"]
+    assert mock.calls == [["a", "c"]]
+
+
+def test_get_many_invalid_space():
+    mock = MockRawStep()
+    observation = ObservationView(mock, make_string_spaces(deterministic=True))
+    with pytest.raises(KeyError):
+        observation.get_many(["a", "invalid"])
+    assert not mock.calls
+
+
+def test_deterministic_observations_are_cached():
+    mock = MockRawStep()
+    observation = ObservationView(mock, make_string_spaces(deterministic=True))
+    assert observation["a"] == "a-value"
+    assert observation["a"] == "a-value"
+    assert observation.get_many(["a", "b"]) == ["a-value", "b-value"]
+    assert mock.calls == [["a"], ["b"]]
+
+    observation.clear_cache()
+    assert observation["a"] == "a-value"
+    assert mock.calls == [["a"], ["b"], ["a"]]
+
+
+def test_non_deterministic_observations_are_not_cached():
+    mock = MockRawStep()
+    observation = ObservationView(mock, make_string_spaces(deterministic=False))
+    observation["a"]
+    observation["a"]
+    assert mock.calls == [["a"], ["a"]]
+
+
+def test_update_cache():
+    mock = MockRawStep()
+    observation = ObservationView(mock, make_string_spaces(deterministic=True))
+    observation.update_cache([observation.spaces["b"]], ["cached"])
+    assert observation["b"] == "cached"
+    assert not mock.calls
+
+
+class MockArrayRawStep:
+    """Mock for the raw_step callback of ObservationView that returns a new
+    array on every call.
+    """
+
+    def __init__(self):
+        self.call_count = 0
+
+    def __call__(self, actions, observations, rewards):
+        self.call_count += 1
+        return (
+            [np.array([1, 2, 3], dtype=np.int64) for _ in observations],
+            [],
+            False,
+            {},
+        )
+
+
+def make_array_space():
+    return ObservationSpace(
+        name="features",
+        int64_range_list=ScalarRangeList(
+            range=[ScalarRange(min=ScalarLimit(value=0))] * 3
+        ),
+        deterministic=True,
+    )
+
+
+def test_modifying_observation_does_not_change_cache():
+    mock = MockArrayRawStep()
+    observation = ObservationView(mock, [make_array_space()])
+    value = observation["features"]
+    value[0] = -1
+    np.testing.assert_array_equal(observation["features"], [1, 2, 3])
+
+    value = observation["features"]
+    assert value.flags.writeable
+    value[0] = -1
+    np.testing.assert_array_equal(observation["features"], [1, 2, 3])
+    assert mock.call_count == 1
+
+
+def test_modifying_update_cache_argument_does_not_change_cache():
+    observation = ObservationView(MockArrayRawStep(), [make_array_space()])
+    value = np.array([1, 2, 3], dtype=np.int64)
+    observation.update_cache([observation.spaces["features"]], [value])
+    value[0] = -1
+    np.testing.assert_array_equal(observation["features"], [1, 2, 3])
+
+
+def test_zero_copy_cached_observation_is_read_only():
+    observation = ObservationView(MockArrayRawStep(), [make_array_space()])
+    observation.zero_copy = True
+    observation["features"]
+    value = observation["features"]
+    assert not value.flags.writeable
+    assert observation["features"] is value
+
+
 if __name__ == "__main__":
     main()
@@ -10,10 +10,11 @@ from tests.test_main import main
 
 
 class MockReward:
-    def __init__(self, id, ret=None):
+    def __init__(self, id, ret=None, deterministic=False):
         self.id = id
         self.ret = list(reversed(ret or []))
         self.observation_spaces = []
+        self.deterministic = deterministic
 
     def update(self, *args, **kwargs):
         ret = self.ret[-1]
@@ -66,5 +67,24 @@ def test_reward_values_bound_methods():
     assert value == 10
 
 
+def test_deterministic_reward_is_cached():
+    spaces = [MockReward(id="codesize", ret=[-5, 3], deterministic=True)]
+    reward = RewardView(spaces, MockObservationView())
+
+    assert reward["codesize"] == -5
+    assert reward["codesize"] == -5
+
+    reward.clear_cache()
+    assert reward["codesize"] == 3
+
+
+def test_non_deterministic_reward_is_not_cached():
+    spaces = [MockReward(id="runtime", ret=[10, 20])]
+    reward = RewardView(spaces, MockObservationView())
+
+    assert reward["runtime"] == 10
+    assert reward["runtime"] == 20
+
+
 if __name__ == "__main__":
     main()
@@ -5,7 +5,9 @@
 """Unit tests for //compiler_gym/wrappers."""
 import pytest
 
+from compiler_gym.datasets import Benchmark
 from compiler_gym.envs.llvm import LlvmEnv
+from compiler_gym.service.proto import GetStatsRequest
 from compiler_gym.wrappers import (
     CycleOverBenchmarks,
     IterateOverBenchmarks,
@@ -37,6 +39,70 @@ def test_iterate_over_benchmarks(env: LlvmEnv):
         env.reset()
 
 
+def test_iterate_over_benchmarks_prefetch(env: LlvmEnv):
+    env = IterateOverBenchmarks(
+        env=env,
+        benchmarks=[
+            "benchmark://cbench-v1/crc32",
+            "benchmark://cbench-v1/qsort",
+            "benchmark://cbench-v1/dijkstra",
+        ],
+        prefetch=2,
+    )
+
+    env.reset()
+    assert env.benchmark == "benchmark://cbench-v1/crc32"
+    env.reset()
+    assert env.benchmark == "benchmark://cbench-v1/qsort"
+    env.reset()
+    assert env.benchmark == "benchmark://cbench-v1/dijkstra"
+
+    with pytest.raises(StopIteration):
+        env.reset()
+
+
+def test_iterate_over_benchmarks_prefetch_invalid_benchmark(env: LlvmEnv):
+    env = IterateOverBenchmarks(
+        env=env,
+        benchmarks=[
+            "benchmark://cbench-v1/crc32",
+            Benchmark.from_file_contents("benchmark://new", b"Invalid bitcode"),
+            "benchmark://cbench-v1/qsort",
+        ],
+        prefetch=2,
+    )
+
+    env.reset()
+    assert env.benchmark == "benchmark://cbench-v1/crc32"
+    # Prefetching only uploads the benchmark, so the service does not parse it
+    # until the session is started.
+    with pytest.raises(ValueError, match="Failed to parse LLVM bitcode"):
+        env.reset()
+    env.reset()
+    assert env.benchmark == "benchmark://cbench-v1/qsort"
+
+    with pytest.raises(StopIteration):
+        env.reset()
+
+
+def test_iterate_over_benchmarks_prefetch_does_not_start_sessions(env: LlvmEnv):
+    env = IterateOverBenchmarks(
+        env=env,
+        benchmarks=[
+            "benchmark://cbench-v1/crc32",
+            "benchmark://cbench-v1/qsort",
+            "benchmark://cbench-v1/dijkstra",
+        ],
+        prefetch=2,
+    )
+
+    env.reset()
+    # The prefetched benchmarks are uploaded, but the only session is the one
+    # started by reset().
+    assert "benchmark://cbench-v1/qsort" in env.service.benchmarks_sent
+    assert env.service(env.service.stub.GetStats, GetStatsRequest()).session_count == 1
+
+
 def test_cycle_over_benchmarks(env: LlvmEnv):
     env = CycleOverBenchmarks(
         env=env,